@@ -1,4 +1,5 @@
 # Standard library imports
+import asyncio
 import sys
 import os
 from typing import Dict, Any, List, Optional
@@ -50,8 +51,8 @@ async def create_ai_forecast(
                 commodity, historical_data, days
             )
         else:
-            forecast_result = forecasting_service.forecast_future_consumption(
-                commodity, days
+            forecast_result = await asyncio.to_thread(
+                forecasting_service.forecast_future_consumption, commodity, days
             )
         
         # Calculate ESG score
@@ -343,6 +344,142 @@ async def get_solar_radiation_data(
         logger.error(f"Error getting solar radiation data: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/iot/grid-data/batch")
+async def get_grid_data_batch(
+    locations: List[str] = Body(..., description="Grid locations"),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """Get real-time grid data for many locations at once"""
+    try:
+        grid_data = await iot_integration_service.get_grid_data_batch(locations)
+        
+        return {
+            "grid_data": grid_data,
+            "user_id": current_user["id"],
+            "timestamp": datetime.now().isoformat()
+        }
+        
+    except Exception as e:
+        logger.error(f"Error getting grid data batch: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/iot/weather/batch")
+async def get_weather_data_batch(
+    sites: List[Dict[str, float]] = Body(..., description="Site coordinates as {lat, lon}"),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """Get weather data for many sites; nearby sites share one lookup"""
+    try:
+        weather_data = await iot_integration_service.get_weather_data_batch(
+            [(site["lat"], site["lon"]) for site in sites]
+        )
+        
+        return {
+            "weather_data": weather_data,
+            "user_id": current_user["id"],
+            "timestamp": datetime.now().isoformat()
+        }
+        
+    except KeyError as e:
+        raise HTTPException(status_code=422, detail=f"Site missing {e}")
+    except Exception as e:
+        logger.error(f"Error getting weather data batch: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/iot/solar-radiation/batch")
+async def get_solar_radiation_data_batch(
+    sites: List[Dict[str, float]] = Body(..., description="Site coordinates as {lat, lon}"),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """Get solar radiation data for many sites; nearby sites share one lookup"""
+    try:
+        solar_data = await iot_integration_service.get_solar_radiation_data_batch(
+            [(site["lat"], site["lon"]) for site in sites]
+        )
+        
+        return {
+            "solar_data": solar_data,
+            "user_id": current_user["id"],
+            "timestamp": datetime.now().isoformat()
+        }
+        
+    except KeyError as e:
+        raise HTTPException(status_code=422, detail=f"Site missing {e}")
+    except Exception as e:
+        logger.error(f"Error getting solar radiation data batch: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/iot/readings")
+async def ingest_sensor_readings(
+    readings: List[Dict[str, Any]] = Body(..., description="Readings with sensor_type, site, value and optional timestamp"),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """Ingest a batch of sensor readings into the columnar buffers"""
+    try:
+        result = iot_integration_service.ingest_readings(readings)
+        
+        return {
+            "ingestion": result,
+            "user_id": current_user["id"],
+            "timestamp": datetime.now().isoformat()
+        }
+        
+    except Exception as e:
+        logger.error(f"Error ingesting sensor readings: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/iot/rollups")
+async def get_sensor_rollups(
+    sensor_type: str = Query(..., description="Sensor type"),
+    resolution: str = Query("1m", description="Rollup resolution: 1s, 1m or 1h"),
+    site: Optional[str] = Query(None, description="Only this site"),
+    since: Optional[str] = Query(None, description="Only buckets from this ISO timestamp on"),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """Get downsampled sensor readings"""
+    try:
+        rollups = iot_integration_service.get_sensor_rollups(sensor_type, resolution, site, since)
+        if "error" in rollups:
+            raise HTTPException(status_code=400, detail=rollups["error"])
+        
+        return {
+            "sensor_rollups": rollups,
+            "user_id": current_user["id"],
+            "timestamp": datetime.now().isoformat()
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting sensor rollups: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/iot/demand-forecast/batch")
+async def predict_energy_demand_batch(
+    sites: List[str] = Body(..., description="Site names, one row per site"),
+    temperature: List[List[float]] = Body(..., description="Forecast temperature (sites x hours)"),
+    humidity: List[List[float]] = Body(..., description="Forecast humidity (sites x hours)"),
+    historical: Optional[Dict[str, Any]] = Body(None, description="History matrices (temperature, humidity, power_consumption); defaults to ingested readings"),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """Forecast energy demand for many sites from one weather forecast matrix"""
+    try:
+        forecast = iot_integration_service.predict_energy_demand_batch(sites, temperature, humidity, historical)
+        if "error" in forecast:
+            raise HTTPException(status_code=400, detail=forecast["error"])
+
+        return {
+            "demand_forecast": forecast,
+            "user_id": current_user["id"],
+            "timestamp": datetime.now().isoformat()
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error forecasting energy demand: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/iot/sensor-network-status")
 async def get_sensor_network_status(
     network_id: str = Query("main", description="Sensor network ID"),
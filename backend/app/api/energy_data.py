@@ -1,4 +1,5 @@
 # Standard library imports
+import asyncio
 import sys
 import os
 from typing import List, Optional, Dict, Any
@@ -6,7 +7,7 @@ from typing import List, Optional, Dict, Any
 # Third-party imports
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 # Local imports
 from ..db.session import get_db
@@ -18,6 +19,7 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..', 'share
 try:
     from data_integration_service import data_integration_service
     from forecasting_service import forecasting_service
+    from backtesting import backtester
     from optimization_engine import optimization_engine
     from generative_ai_service import generative_ai_service
     from quantum_optimization_service import quantum_optimization_service
@@ -25,6 +27,7 @@ except ImportError:
     # Fallback if services not available
     data_integration_service = None
     forecasting_service = None
+    backtester = None
     optimization_engine = None
     generative_ai_service = None
     quantum_optimization_service = None
@@ -36,6 +39,41 @@ class ForecastRequest(BaseModel):
     commodity: str
     days: int = 7
 
+class BatchForecastRequest(BaseModel):
+    commodities: List[str]
+    # Up to MAX_FORECAST_DAYS of the forecasting service; horizons outside it are reported in errors
+    days: int = Field(7, gt=0, le=30)
+    horizons: Dict[str, int] = {}
+    history: Dict[str, List[Dict[str, Any]]] = {}
+
+class RetrainBatchRequest(BaseModel):
+    datasets: Dict[str, List[Dict[str, Any]]]
+    incremental: bool = True
+
+class BacktestRequest(BaseModel):
+    commodity: str
+    history: List[Dict[str, Any]]
+    models: List[str] = ["ensemble", "prophet", "anomaly_corrected"]
+    # Each fold is a model fit on the backtest pool, so runs are bounded
+    horizon_hours: int = Field(24, ge=1, le=720)
+    folds: int = Field(5, ge=1, le=52)
+    step_hours: Optional[int] = Field(None, ge=1, le=8760)
+    train_window_hours: Optional[int] = Field(None, ge=1)
+
+class ActualObservation(BaseModel):
+    commodity: str
+    price: float
+    volume: Optional[float] = None
+    timestamp: Optional[str] = None
+
+class AnomalyTick(BaseModel):
+    series: str
+    value: float
+    timestamp: Optional[str] = None
+
+class AnomalyTicksRequest(BaseModel):
+    ticks: List[AnomalyTick]
+
 class OptimizationRequest(BaseModel):
     region: str = "Texas"
     use_quantum: bool = False
@@ -69,7 +107,8 @@ async def get_forecast(
 ):
     """Get price forecast for a commodity"""
     try:
-        forecast = forecasting_service.forecast_future_consumption(commodity, days)
+        # Off the event loop: the forecast may wait for another worker's recompute
+        forecast = await asyncio.to_thread(forecasting_service.forecast_future_consumption, commodity, days)
         
         if "error" in forecast:
             raise HTTPException(status_code=400, detail=forecast["error"])
@@ -95,8 +134,9 @@ async def create_forecast(
 ):
     """Create a new forecast for a commodity"""
     try:
-        forecast = forecasting_service.forecast_future_consumption(
-            request.commodity, 
+        forecast = await asyncio.to_thread(
+            forecasting_service.forecast_future_consumption,
+            request.commodity,
             request.days
         )
         
@@ -112,6 +152,75 @@ async def create_forecast(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/forecast/batch")
+async def create_batch_forecast(
+    request: BatchForecastRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Create hourly forecasts for several commodities in one request"""
+    try:
+        # Feature building and prediction for every commodity run off the event loop
+        forecast = await asyncio.to_thread(
+            forecasting_service.forecast_batch,
+            request.commodities,
+            request.days,
+            horizons=request.horizons,
+            history=request.history
+        )
+        
+        if not forecast["forecasts"]:
+            raise HTTPException(status_code=400, detail=forecast["errors"])
+        
+        return {
+            "forecast": forecast,
+            "user_id": current_user.id,
+            "timestamp": forecast.get("timestamp")
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/forecast/actuals")
+async def record_actual(
+    observation: ActualObservation,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Record an hourly actual so the next forecast starts from it"""
+    try:
+        # Persists the rolling state and invalidates cached forecasts (file and Redis writes)
+        return await asyncio.to_thread(
+            forecasting_service.update_actual,
+            observation.commodity,
+            observation.price,
+            observation.volume,
+            observation.timestamp
+        )
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/anomalies/ticks")
+async def score_anomaly_ticks(
+    request: AnomalyTicksRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Score price or sensor ticks against each series' streaming anomaly state"""
+    try:
+        if not request.ticks:
+            raise HTTPException(status_code=400, detail="No ticks provided")
+        
+        return forecasting_service.score_ticks([tick.model_dump() for tick in request.ticks])
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/real-time")
 async def get_real_time_data(
     commodities: Optional[str] = None,
@@ -440,17 +549,94 @@ async def retrain_model(
             for i in range(30)
         ]
         
-        result = forecasting_service.retrain_model(commodity, simulated_data)
+        # Trains on the background pool; forecasts keep using the current model until it finishes.
+        # Building the job (feature engineering) runs off the event loop
+        job = await asyncio.to_thread(forecasting_service.training.submit, commodity, simulated_data)
+        result = forecasting_service.training.jobs.get(commodity, {})
+        
+        if job is None:
+            raise HTTPException(status_code=400, detail=result.get("error"))
+        
+        return {
+            "retrain_result": result,
+            "user_id": current_user.id,
+            "timestamp": datetime.now().isoformat()
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/models/retrain-batch")
+async def retrain_models(
+    request: RetrainBatchRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Queue retraining of several commodities on the background training pool"""
+    try:
+        training_status = await asyncio.to_thread(
+            forecasting_service.training.train_many,
+            request.datasets,
+            incremental=request.incremental
+        )
+        
+        return {
+            "training": training_status,
+            "user_id": current_user.id,
+            "timestamp": training_status.get("timestamp")
+        }
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/models/backtest")
+async def backtest_models(
+    request: BacktestRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Walk-forward backtest of the forecasting models: MAE/MAPE per forecast hour and cost per model"""
+    try:
+        # Folds fit on the backtest process pool; waiting for them must not block the event loop
+        result = await asyncio.to_thread(
+            backtester.run,
+            request.commodity,
+            request.history,
+            models=request.models,
+            horizon_hours=request.horizon_hours,
+            folds=request.folds,
+            step_hours=request.step_hours,
+            train_window_hours=request.train_window_hours
+        )
         
         if "error" in result:
             raise HTTPException(status_code=400, detail=result["error"])
         
         return {
-            "retrain_result": result,
+            "backtest": result,
             "user_id": current_user.id,
             "timestamp": result.get("timestamp")
         }
         
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/models/training")
+async def get_training_status(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Status of background training jobs"""
+    try:
+        return {
+            "training": forecasting_service.training.get_status(),
+            "user_id": current_user.id
+        }
+        
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
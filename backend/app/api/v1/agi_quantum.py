@@ -7,8 +7,7 @@ from fastapi import APIRouter, HTTPException, Depends
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 
-from ...services.agi_trading import AGITradingAssistant, AGIComplianceValidator
-from ...services.quantum_trading import QuantumTradingEngine, QuantumComplianceValidator
+from ...core.lazy_loading import LazyService, loaded_services
 from ...schemas.trade import (
     ApiResponse, ErrorResponse, IslamicComplianceResponse
 )
@@ -16,10 +15,12 @@ from ...schemas.trade import (
 router = APIRouter(prefix="/agi-quantum", tags=["AGI and Quantum Trading"])
 
 # Initialize services
-agi_assistant = AGITradingAssistant()
-agi_validator = AGIComplianceValidator()
-quantum_engine = QuantumTradingEngine()
-quantum_validator = QuantumComplianceValidator()
+agi_assistant = LazyService("app.services.agi_trading", "AGITradingAssistant")
+agi_validator = LazyService("app.services.agi_trading", "AGIComplianceValidator")
+quantum_engine = LazyService("app.services.quantum_trading", "QuantumTradingEngine")
+quantum_validator = LazyService("app.services.quantum_trading", "QuantumComplianceValidator")
+# Loaded on a worker thread before each route, so a request during warmup never blocks the event loop
+router.dependencies.append(Depends(loaded_services(agi_assistant, agi_validator, quantum_engine, quantum_validator)))
 
 
 @router.post("/agi/market-predictions", response_model=ApiResponse)
@@ -534,7 +534,7 @@ async def auth_health():
             "timestamp": datetime.now().isoformat(),
             "message": "Authentication service is operational",
             "active_tokens": len(auth_service.active_tokens),
-            "blacklisted_tokens": len(auth_service.blacklisted_tokens)
+            "blacklisted_tokens": len(auth_service.revocations)
         }
     except Exception as e:
         logger.error(f"Authentication health check failed: {e}")
@@ -7,8 +7,7 @@ from fastapi import APIRouter, HTTPException, Depends
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 
-from ...services.decentralized_trading import DecentralizedTradingProtocol, DecentralizedTradingValidator
-from ...services.carbon_trading import CarbonCreditTradingPlatform, CarbonTradingValidator
+from ...core.lazy_loading import LazyService, loaded_services
 from ...schemas.trade import (
     ApiResponse, ErrorResponse, IslamicComplianceResponse
 )
@@ -16,10 +15,15 @@ from ...schemas.trade import (
 router = APIRouter(prefix="/blockchain-carbon", tags=["Blockchain and Carbon Trading"])
 
 # Initialize services
-decentralized_protocol = DecentralizedTradingProtocol()
-decentralized_validator = DecentralizedTradingValidator()
-carbon_platform = CarbonCreditTradingPlatform()
-carbon_validator = CarbonTradingValidator()
+# Connects to web3 HTTP providers
+decentralized_protocol = LazyService("app.services.decentralized_trading", "DecentralizedTradingProtocol", fork_safe=False)
+decentralized_validator = LazyService("app.services.decentralized_trading", "DecentralizedTradingValidator")
+carbon_platform = LazyService("app.services.carbon_trading", "CarbonCreditTradingPlatform")
+carbon_validator = LazyService("app.services.carbon_trading", "CarbonTradingValidator")
+# Loaded on a worker thread before each route, so a request during warmup never blocks the event loop
+router.dependencies.append(Depends(loaded_services(
+    decentralized_protocol, decentralized_validator, carbon_platform, carbon_validator
+)))
 
 
 # Blockchain/DeFi Trading Endpoints
@@ -7,8 +7,7 @@ from fastapi import APIRouter, HTTPException, Depends
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 
-from ...services.digital_twin import GlobalEnergyDigitalTwin, DigitalTwinComplianceValidator
-from ...services.autonomous_trading import AutonomousTradingEcosystem, AutonomousTradingValidator
+from ...core.lazy_loading import LazyService, loaded_services
 from ...schemas.trade import (
     ApiResponse, ErrorResponse, IslamicComplianceResponse
 )
@@ -16,10 +15,15 @@ from ...schemas.trade import (
 router = APIRouter(prefix="/digital-autonomous", tags=["Digital Twin and Autonomous Trading"])
 
 # Initialize services
-digital_twin = GlobalEnergyDigitalTwin()
-twin_validator = DigitalTwinComplianceValidator()
-autonomous_ecosystem = AutonomousTradingEcosystem()
-autonomous_validator = AutonomousTradingValidator()
+# Opens MQTT and Redis connections and starts the MQTT network thread
+digital_twin = LazyService("app.services.digital_twin", "GlobalEnergyDigitalTwin", fork_safe=False)
+twin_validator = LazyService("app.services.digital_twin", "DigitalTwinComplianceValidator")
+autonomous_ecosystem = LazyService("app.services.autonomous_trading", "AutonomousTradingEcosystem")
+autonomous_validator = LazyService("app.services.autonomous_trading", "AutonomousTradingValidator")
+# Loaded on a worker thread before each route, so a request during warmup never blocks the event loop
+router.dependencies.append(Depends(loaded_services(
+    digital_twin, twin_validator, autonomous_ecosystem, autonomous_validator
+)))
 
 
 # Digital Twin Endpoints
@@ -13,6 +13,10 @@ import os
 from datetime import datetime
 import logging
 
+from ...core.lazy_loading import service_registry
+from ...core.model_store import model_store
+from ...core.model_registry import model_registry
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -229,6 +233,16 @@ async def readiness_check():
         logger.error(f"Readiness check failed: {e}")
         raise HTTPException(status_code=503, detail=f"Not ready: {str(e)}")
 
+@router.get("/startup", response_model=Dict[str, Any])
+async def startup_report():
+    """Cold-start report: time to ready, router import times, lazy service load times, shared and registered models"""
+    return {
+        **service_registry.get_report(),
+        "models": model_store.get_status(),
+        "registry": model_registry.get_status(),
+        "timestamp": datetime.now().isoformat()
+    }
+
 @router.get("/live", response_model=Dict[str, Any])
 async def liveness_check():
     """Kubernetes liveness probe endpoint"""
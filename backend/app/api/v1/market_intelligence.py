@@ -7,7 +7,7 @@ from fastapi import APIRouter, HTTPException, Depends
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 
-from ...services.market_intelligence import GlobalMarketIntelligenceNetwork, MarketIntelligenceValidator
+from ...core.lazy_loading import LazyService, loaded_services
 from ...schemas.trade import (
     ApiResponse, ErrorResponse, IslamicComplianceResponse
 )
@@ -15,8 +15,10 @@ from ...schemas.trade import (
 router = APIRouter(prefix="/market-intelligence", tags=["Market Intelligence"])
 
 # Initialize services
-intelligence_network = GlobalMarketIntelligenceNetwork()
-intelligence_validator = MarketIntelligenceValidator()
+intelligence_network = LazyService("app.services.market_intelligence", "GlobalMarketIntelligenceNetwork")
+intelligence_validator = LazyService("app.services.market_intelligence", "MarketIntelligenceValidator")
+# Loaded on a worker thread before each route, so a request during warmup never blocks the event loop
+router.dependencies.append(Depends(loaded_services(intelligence_network, intelligence_validator)))
 
 
 @router.post("/collect-intelligence", response_model=ApiResponse)
@@ -12,6 +12,8 @@ import os
 from datetime import datetime
 import logging
 
+from ...core.instrumentation import instrumentation
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -246,7 +248,8 @@ async def metrics_summary():
                 "system": system_metrics,
                 "application": application_metrics,
                 "services": service_metrics,
-                "business": business_metrics
+                "business": business_metrics,
+                "instrumentation": instrumentation.get_stats()
             },
             "summary": {
                 "total_metrics": len(system_metrics) + len(application_metrics) + len(service_metrics) + len(business_metrics),
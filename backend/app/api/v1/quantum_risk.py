@@ -6,16 +6,19 @@ from fastapi import APIRouter, HTTPException, Depends
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 
-from ...services.quantum_optimizer import QuantumPortfolioOptimizer, QuantumComplianceValidator
-from ...services.advanced_risk import AdvancedRiskAnalytics, IslamicRiskValidator
+from ...core.lazy_loading import LazyService, loaded_services
 
 router = APIRouter(prefix="/quantum-risk", tags=["Quantum Optimization & Advanced Risk"])
 
 # Initialize services
-quantum_optimizer = QuantumPortfolioOptimizer()
-quantum_compliance_validator = QuantumComplianceValidator()
-advanced_risk_analytics = AdvancedRiskAnalytics()
-islamic_risk_validator = IslamicRiskValidator()
+quantum_optimizer = LazyService("app.services.quantum_optimizer", "QuantumPortfolioOptimizer")
+quantum_compliance_validator = LazyService("app.services.quantum_optimizer", "QuantumComplianceValidator")
+advanced_risk_analytics = LazyService("app.services.advanced_risk", "AdvancedRiskAnalytics")
+islamic_risk_validator = LazyService("app.services.advanced_risk", "IslamicRiskValidator")
+# Loaded on a worker thread before each route, so a request during warmup never blocks the event loop
+router.dependencies.append(Depends(loaded_services(
+    quantum_optimizer, quantum_compliance_validator, advanced_risk_analytics, islamic_risk_validator
+)))
 
 
 # Quantum Portfolio Optimization Endpoints
@@ -8,7 +8,7 @@ from typing import Dict, List, Any, Optional
 from datetime import datetime
 import logging
 
-from ...services.advanced_risk_analytics import AdvancedRiskAnalytics
+from ...core.lazy_loading import LazyService, loaded_services
 from ...schemas.trade import (
     RiskMetrics, ApiResponse, ErrorResponse
 )
@@ -18,7 +18,9 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/risk-analytics", tags=["risk_analytics"])
 
 # Initialize services
-risk_analytics = AdvancedRiskAnalytics()
+risk_analytics = LazyService("app.services.advanced_risk_analytics", "AdvancedRiskAnalytics")
+# Loaded on a worker thread before each route, so a request during warmup never blocks the event loop
+router.dependencies.append(Depends(loaded_services(risk_analytics)))
 
 # Mock user dependency for now
 async def get_current_user():
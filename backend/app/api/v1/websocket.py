@@ -38,6 +38,9 @@ async def websocket_market_data(
 ):
     """
     WebSocket endpoint for real-time market data
+    
+    Clients that request the ``quantaenergi.marketdata.v1`` subprotocol receive
+    ticks as binary delta frames (see app.core.market_data_codec) instead of JSON.
     """
     try:
         await websocket_endpoint.handle_websocket(websocket, user_id, organization_id)
@@ -236,6 +239,29 @@ async def get_offline_queue(user_id: str):
         logger.error(f"Error getting offline queue: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@router.get("/presence/{scope}/{target}")
+async def get_presence(scope: str, target: str):
+    """
+    Get the number of connections for an organization or user across all workers
+    """
+    if scope not in ("organization", "user"):
+        raise HTTPException(status_code=400, detail="scope must be 'organization' or 'user'")
+    
+    try:
+        count = await connection_manager.get_presence_count(scope, target)
+        return {
+            "success": True,
+            "data": {
+                "scope": scope,
+                "target": target,
+                "connections": count
+            },
+            "message": "Presence retrieved successfully"
+        }
+    except Exception as e:
+        logger.error(f"Error getting presence: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
 # Health check endpoint
 @router.get("/health")
 async def websocket_health():
@@ -0,0 +1,83 @@
+"""
+Local Blob Store for Task Payloads
+Large arrays passed between API and Celery workers by key instead of through the broker
+"""
+
+import os
+import re
+import time
+import uuid
+import logging
+from typing import Optional
+
+import numpy as np
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+_KEY_PATTERN = re.compile(r"^[a-z0-9_]+/[0-9a-f]{32}\.npy$")
+
+
+class LocalBlobStore:
+    """Arrays stored as .npy files in a directory shared by the API and all workers
+
+    Workers on other hosts need the directory on a shared volume. Arrays are
+    written to a temporary file and renamed into place, so readers never see
+    a partial file, and are memory-mapped on read so a task only pages in the
+    rows it touches.
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or settings.CELERY_BLOB_DIR
+
+    def _path(self, key: str) -> str:
+        if not _KEY_PATTERN.match(key):
+            raise ValueError(f"Invalid blob key: {key!r}")
+        return os.path.join(self.root, key)
+
+    def new_key(self, prefix: str = "array") -> str:
+        """Fresh key, for workflows that must know where an array will go before it is written"""
+        return f"{prefix}/{uuid.uuid4().hex}.npy"
+
+    def put_array(self, array: np.ndarray, prefix: str = "array", key: Optional[str] = None) -> str:
+        """Store an array (under ``key`` when given) and return its key"""
+        key = key or self.new_key(prefix)
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as handle:
+            np.save(handle, np.ascontiguousarray(array), allow_pickle=False)
+        os.replace(temp_path, path)
+        return key
+
+    def get_array(self, key: str, mmap: bool = True) -> np.ndarray:
+        """Load an array by key (read-only memory map by default)"""
+        return np.load(self._path(key), mmap_mode="r" if mmap else None, allow_pickle=False)
+
+    def delete(self, *keys: str) -> None:
+        """Remove blobs; missing keys are ignored"""
+        for key in keys:
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def cleanup(self, max_age: float = 86400) -> int:
+        """Remove blobs older than max_age seconds left behind by failed workflows"""
+        cutoff = time.time() - max_age
+        removed = 0
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                path = os.path.join(directory, name)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                        removed += 1
+                except OSError as e:
+                    logger.warning(f"Could not remove stale blob {path}: {e}")
+        return removed
+
+
+# Global blob store instance
+blob_store = LocalBlobStore()
@@ -3,10 +3,16 @@ Celery Configuration for Async Task Processing
 Handles background tasks, trade processing, and performance optimization
 """
 
-from celery import Celery
+from celery import Celery, states
+from celery.signals import task_failure, task_postrun, task_prerun
 import os
 from kombu import Queue
 
+from app.core.task_serialization import register_task_serializer, task_serializer
+
+# Binary serializer: NumPy arrays as raw buffers, large payloads claim-checked to the blob store
+TASK_SERIALIZER, TASK_CONTENT_TYPE = register_task_serializer()
+
 # Redis configuration for Celery broker
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 
@@ -44,9 +50,10 @@ celery_app.conf.update(
     ),
     
     # Task execution
-    task_serializer="json",
-    accept_content=["json"],
-    result_serializer="json",
+    task_serializer=TASK_SERIALIZER,
+    accept_content=["json", TASK_CONTENT_TYPE],
+    result_serializer=TASK_SERIALIZER,
+    result_accept_content=["json", TASK_CONTENT_TYPE],
     timezone="UTC",
     enable_utc=True,
     
@@ -66,6 +73,10 @@ celery_app.conf.update(
     # Error handling
     task_reject_on_worker_lost=True,
     task_ignore_result=False,
+
+    # Local in-process execution (tests and single-process development)
+    task_always_eager=os.getenv("CELERY_TASK_ALWAYS_EAGER", "false").lower() == "true",
+    task_eager_propagates=True,
 )
 
 # Task time limits
@@ -86,6 +97,10 @@ celery_app.conf.beat_schedule = {
         "task": "app.tasks.auth.cleanup_expired_tokens",
         "schedule": 3600.0,  # Every hour
     },
+    "cleanup-task-blobs": {
+        "task": "app.core.celery_app.cleanup_task_blobs",
+        "schedule": 3600.0,  # Every hour
+    },
     "generate-daily-reports": {
         "task": "app.tasks.reporting.generate_daily_reports",
         "schedule": 86400.0,  # Daily at midnight
@@ -115,6 +130,38 @@ def health_check(self):
         "timestamp": self.request.utcnow().isoformat()
     }
 
+# Blob store cleanup (claim-checked payloads and arrays left by failed workflows)
+@celery_app.task
+def cleanup_task_blobs(max_age=86400):
+    """Remove task blobs older than max_age seconds"""
+    from app.core.blob_store import blob_store
+
+    return {"status": "success", "removed": blob_store.cleanup(max_age)}
+
+# Error callback for workflows whose blobs are normally deleted by a step that will not run
+@celery_app.task
+def discard_task_blobs(*keys):
+    """Remove the blobs of a failed workflow"""
+    from app.core.blob_store import blob_store
+
+    blob_store.delete(*keys)
+    return {"status": "success", "removed": len(keys)}
+
+# Claim-checked payloads are deleted once their task no longer needs them
+@task_prerun.connect
+def bind_task_claim_checks(task_id=None, **kwargs):
+    task_serializer.bind_claim_checks(task_id)
+
+@task_failure.connect
+def discard_failed_task_claim_checks(task_id=None, **kwargs):
+    # Failed messages are acked rather than redelivered, so nothing will read the payload again
+    task_serializer.release_claim_checks(task_id, delete=True)
+
+@task_postrun.connect
+def release_task_claim_checks(task_id=None, state=None, **kwargs):
+    # Replaced tasks (IGNORED) re-send their arguments in a new message; retries keep the blob
+    task_serializer.release_claim_checks(task_id, delete=state in (states.SUCCESS, states.IGNORED))
+
 # Performance monitoring
 @celery_app.task(bind=True)
 def performance_metrics(self):
@@ -138,90 +185,40 @@ def performance_metrics(self):
 # Trade processing task
 @celery_app.task(bind=True, queue="trade_processing")
 def process_trade_async(self, trade_data):
-    """Process trade asynchronously"""
-    from app.services.enhanced_trade_lifecycle import EnhancedTradeLifecycleService
-    
-    try:
-        service = EnhancedTradeLifecycleService()
-        result = service.process_trade(trade_data)
-        
-        return {
-            "status": "success",
-            "trade_id": result.get("trade_id"),
-            "processing_time": self.request.utcnow().isoformat()
-        }
-    except Exception as e:
-        return {
-            "status": "error",
-            "error": str(e),
-            "timestamp": self.request.utcnow().isoformat()
-        }
+    """Process trade asynchronously (user and organization are taken from the trade data)"""
+    from app.tasks import replace_with
+    from app.tasks.trade_processing import process_trade
+
+    return replace_with(self, process_trade.s(
+        trade_data, trade_data.get("user_id") or "system", trade_data.get("organization_id")
+    ))
 
 # Risk calculation task
 @celery_app.task(bind=True, queue="risk_calculation")
 def calculate_risk_async(self, portfolio_data):
-    """Calculate portfolio risk asynchronously"""
-    from app.services.advanced_risk_analytics import AdvancedRiskAnalytics
-    
-    try:
-        analytics = AdvancedRiskAnalytics()
-        risk_metrics = analytics.calculate_portfolio_risk(portfolio_data)
-        
-        return {
-            "status": "success",
-            "risk_metrics": risk_metrics,
-            "timestamp": self.request.utcnow().isoformat()
-        }
-    except Exception as e:
-        return {
-            "status": "error",
-            "error": str(e),
-            "timestamp": self.request.utcnow().isoformat()
-        }
+    """Calculate portfolio risk asynchronously (chunked by book)"""
+    from app.tasks import replace_with
+    from app.tasks.risk_calculation import calculate_portfolio_risk
+
+    return replace_with(self, calculate_portfolio_risk.s(portfolio_data))
 
 # Market data update task
 @celery_app.task(bind=True, queue="market_data")
 def update_market_data(self):
     """Update market data asynchronously"""
-    from app.services.market_data_integration import MarketDataService
-    
-    try:
-        service = MarketDataService()
-        updated_data = service.fetch_and_update_market_data()
-        
-        return {
-            "status": "success",
-            "updated_symbols": len(updated_data),
-            "timestamp": self.request.utcnow().isoformat()
-        }
-    except Exception as e:
-        return {
-            "status": "error",
-            "error": str(e),
-            "timestamp": self.request.utcnow().isoformat()
-        }
+    from app.tasks import replace_with
+    from app.tasks.market_data import update_market_data as update_feeds
+
+    return replace_with(self, update_feeds.s())
 
 # Notification task
 @celery_app.task(bind=True, queue="notifications")
 def send_notification_async(self, notification_data):
     """Send notification asynchronously"""
-    from app.services.notification_service import NotificationService
-    
-    try:
-        service = NotificationService()
-        result = service.send_notification(notification_data)
-        
-        return {
-            "status": "success",
-            "notification_id": result.get("notification_id"),
-            "timestamp": self.request.utcnow().isoformat()
-        }
-    except Exception as e:
-        return {
-            "status": "error",
-            "error": str(e),
-            "timestamp": self.request.utcnow().isoformat()
-        }
+    from app.tasks import replace_with
+    from app.tasks.notifications import send_notification
+
+    return replace_with(self, send_notification.s(notification_data))
 
 # Export Celery app for use in other modules
 __all__ = ["celery_app"]
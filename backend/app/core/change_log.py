@@ -0,0 +1,314 @@
+"""
+Versioned Change Log for Offline Sync
+Per user/organization sequence-numbered, compacted entity changes served as paged deltas
+"""
+
+import logging
+import uuid
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from .event_bus import BaseEvent, EventHandler, EventType
+
+logger = logging.getLogger(__name__)
+
+# Entity types tracked for mobile/offline clients
+SYNC_ENTITY_TYPES = ("trades", "positions", "notifications")
+
+
+def sync_scope(kind: str, identifier: str) -> str:
+    """Change log scope for a user or organization"""
+    return f"{kind}:{identifier}"
+
+
+@dataclass
+class ChangeRecord:
+    """Latest known state of one entity within a scope"""
+    version: int
+    entity_type: str
+    entity_id: str
+    operation: str
+    data: Optional[Dict[str, Any]]
+    changed_at: datetime = field(default_factory=datetime.utcnow)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Wire representation sent to clients"""
+        return {
+            "version": self.version,
+            "entity_type": self.entity_type,
+            "entity_id": self.entity_id,
+            "operation": self.operation,
+            "data": self.data,
+            "changed_at": self.changed_at.isoformat(),
+        }
+
+
+class _ScopeLog:
+    """Compacted log for a single user or organization
+
+    ``entries`` holds records in version order (``versions`` alongside for
+    bisecting). A record superseded by a newer change of the same entity
+    stays in place until enough have accumulated to compact the arrays;
+    ``records`` maps each entity to its live record.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self.min_version = 0
+        self.records: Dict[tuple, ChangeRecord] = {}
+        self.versions: List[int] = []
+        self.entries: List[ChangeRecord] = []
+        # Entries before head are superseded or evicted
+        self.head = 0
+
+    def is_live(self, record: ChangeRecord) -> bool:
+        return self.records.get((record.entity_type, record.entity_id)) is record
+
+    def append(self, key: tuple, record: ChangeRecord) -> None:
+        self.records[key] = record
+        self.versions.append(record.version)
+        self.entries.append(record)
+        if len(self.entries) - self.head > 2 * len(self.records):
+            self.compact()
+
+    def evict_oldest(self) -> None:
+        while not self.is_live(self.entries[self.head]):
+            self.head += 1
+        evicted = self.entries[self.head]
+        del self.records[(evicted.entity_type, evicted.entity_id)]
+        self.head += 1
+        self.min_version = evicted.version
+
+    def compact(self) -> None:
+        """Drop superseded entries"""
+        self.entries = [record for record in self.entries[self.head:] if self.is_live(record)]
+        self.versions = [record.version for record in self.entries]
+        self.head = 0
+
+    def iter_since(self, since_version: int, wanted: Optional[set]) -> Iterable[ChangeRecord]:
+        """Live records newer than since_version, oldest first"""
+        for index in range(bisect_right(self.versions, since_version, self.head), len(self.entries)):
+            record = self.entries[index]
+            if (wanted is None or record.entity_type in wanted) and self.is_live(record):
+                yield record
+
+
+class ChangeLog:
+    """Compacted, versioned change log keyed by scope (e.g. "user:42", "organization:7")
+
+    Each scope has its own monotonic version counter. Only the latest change
+    per entity is kept, so a client that was offline for a week receives one
+    record per touched entity rather than every intermediate update. A page
+    starts at a bisected offset into the version-ordered records, so paging
+    through a delta costs time proportional to its size.
+
+    When a scope exceeds ``max_entries_per_scope`` the oldest records are
+    evicted and the scope's ``min_version`` rises; clients older than that
+    must do a full resync.
+
+    Versions only mean something within one log: each worker process (and
+    each restart) has its own, identified by ``epoch``. Pages carry the
+    epoch and a client that sends back a different one, e.g. after
+    reconnecting to another worker, gets a full resync instead of a delta
+    from an unrelated sequence.
+
+    The log lives in process memory and is not shared between workers, so
+    offline sync only works with a single worker, or with clients pinned to
+    one worker (sticky sessions) and changes recorded on that same worker.
+    With the multi-worker fan-out, a client served by different workers
+    gets a full resync on every switch and does not see changes recorded
+    on the others.
+    """
+
+    def __init__(self, max_entries_per_scope: int = 50000):
+        self.max_entries_per_scope = max_entries_per_scope
+        self.epoch = uuid.uuid4().hex
+        self._scopes: Dict[str, _ScopeLog] = {}
+
+    def record(
+        self,
+        scope: str,
+        entity_type: str,
+        entity_id: str,
+        data: Optional[Dict[str, Any]] = None,
+        operation: str = "upsert"
+    ) -> int:
+        """Record the new state of an entity and return the scope's new version"""
+        if operation not in ("upsert", "delete"):
+            raise ValueError(f"Unsupported change operation: {operation}")
+
+        log = self._scopes.setdefault(scope, _ScopeLog())
+        log.version += 1
+        key = (entity_type, str(entity_id))
+
+        log.append(key, ChangeRecord(
+            version=log.version,
+            entity_type=entity_type,
+            entity_id=str(entity_id),
+            operation=operation,
+            data=None if operation == "delete" else data,
+        ))
+
+        while len(log.records) > self.max_entries_per_scope:
+            log.evict_oldest()
+
+        return log.version
+
+    def current_version(self, scope: str) -> int:
+        """Latest version for a scope (0 if nothing recorded)"""
+        log = self._scopes.get(scope)
+        return log.version if log else 0
+
+    def changes_since(
+        self,
+        scope: str,
+        since_version: int,
+        entity_types: Optional[Iterable[str]] = None
+    ) -> List[ChangeRecord]:
+        """Compacted changes newer than since_version, oldest first"""
+        log = self._scopes.get(scope)
+        if log is None:
+            return []
+
+        return list(log.iter_since(since_version, set(entity_types) if entity_types else None))
+
+    def count_since(
+        self,
+        scope: str,
+        since_version: int,
+        entity_types: Optional[Iterable[str]] = None
+    ) -> int:
+        """Number of compacted changes newer than since_version"""
+        log = self._scopes.get(scope)
+        if log is None:
+            return 0
+        if not entity_types and since_version <= log.min_version:
+            return len(log.records)
+        return sum(1 for _ in log.iter_since(since_version, set(entity_types) if entity_types else None))
+
+    def get_page(
+        self,
+        scope: str,
+        since_version: int = 0,
+        limit: int = 500,
+        entity_types: Optional[Iterable[str]] = None,
+        epoch: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """One page of the sync protocol
+
+        The client stores ``to_version`` and ``epoch`` and sends them back as
+        ``since_version`` and ``epoch`` for the next page until ``has_more``
+        is false.
+        """
+        log = self._scopes.get(scope)
+        current = log.version if log else 0
+        full_resync = bool(since_version > 0 and epoch != self.epoch)
+        full_resync = full_resync or bool(log and since_version < log.min_version)
+        if full_resync or since_version > current:
+            # Client is behind the compaction floor or ahead of a restarted server
+            since_version = 0
+
+        page: List[ChangeRecord] = []
+        has_more = False
+        if log is not None:
+            for record in log.iter_since(since_version, set(entity_types) if entity_types else None):
+                if len(page) == limit:
+                    has_more = True
+                    break
+                page.append(record)
+        to_version = page[-1].version if has_more else current
+
+        return {
+            "scope": scope,
+            "epoch": self.epoch,
+            "from_version": since_version,
+            "to_version": to_version,
+            "current_version": current,
+            "full_resync": full_resync,
+            "has_more": has_more,
+            "changes": [record.to_dict() for record in page],
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Change log statistics"""
+        return {
+            "epoch": self.epoch,
+            "scopes": len(self._scopes),
+            "records": sum(len(log.records) for log in self._scopes.values()),
+        }
+
+
+class TradeChangeLogHandler(EventHandler):
+    """Records trade lifecycle events in the change log of their user and organization
+
+    Captured trades also update the net position per commodity of both
+    scopes, which is recorded as a "positions" change; cancelling a trade
+    reverses its contribution.
+    """
+
+    EVENT_TYPES = (
+        EventType.TRADE_CAPTURED,
+        EventType.TRADE_VALIDATED,
+        EventType.TRADE_CONFIRMED,
+        EventType.TRADE_ALLOCATED,
+        EventType.TRADE_SETTLED,
+        EventType.TRADE_INVOICED,
+        EventType.TRADE_PAID,
+        EventType.TRADE_CANCELLED,
+    )
+
+    def __init__(self, log: ChangeLog):
+        self.log = log
+        # trade_id -> (scopes, commodity, side, quantity) of trades counted in a position
+        self._open_trades: Dict[str, tuple] = {}
+        self._positions: Dict[tuple, Dict[str, Any]] = {}
+
+    async def handle(self, event: BaseEvent) -> None:
+        trade_id = event.payload.get("trade_id")
+        if not trade_id:
+            return
+
+        data = {**event.payload, "status": event.metadata.event_type.value}
+        scopes = [
+            sync_scope(kind, identifier)
+            for kind, identifier in (("user", event.metadata.user_id),
+                                     ("organization", event.metadata.organization_id))
+            if identifier
+        ]
+        for scope in scopes:
+            self.log.record(scope, "trades", trade_id, data)
+
+        event_type = event.metadata.event_type
+        if event_type == EventType.TRADE_CAPTURED and trade_id not in self._open_trades:
+            trade = event.payload.get("trade_data") or {}
+            direction = getattr(trade.get("trade_direction"), "value", trade.get("trade_direction"))
+            try:
+                quantity = float(trade.get("quantity") or 0)
+            except (TypeError, ValueError):
+                return
+            if not trade.get("commodity") or quantity <= 0:
+                return
+            side = "short_position" if str(direction).lower() == "sell" else "long_position"
+            self._open_trades[trade_id] = (scopes, trade["commodity"], side, quantity)
+            self._apply_position(scopes, trade["commodity"], side, quantity, 1)
+        elif event_type == EventType.TRADE_CANCELLED and trade_id in self._open_trades:
+            scopes, commodity, side, quantity = self._open_trades.pop(trade_id)
+            self._apply_position(scopes, commodity, side, -quantity, -1)
+
+    def _apply_position(self, scopes: List[str], commodity: str, side: str, quantity: float, trades: int) -> None:
+        """Adjust one side of the commodity position of each scope and record the new position"""
+        for scope in scopes:
+            position = self._positions.setdefault((scope, commodity), {
+                "commodity": commodity, "long_position": 0.0, "short_position": 0.0, "trade_count": 0,
+            })
+            position[side] += quantity
+            position["trade_count"] += trades
+            position["net_position"] = position["long_position"] - position["short_position"]
+            position["last_updated"] = datetime.utcnow().isoformat()
+            self.log.record(scope, "positions", commodity, dict(position))
+
+
+# Global change log instance
+change_log = ChangeLog()
@@ -68,6 +68,43 @@ class Settings(BaseSettings):
     PROMETHEUS_MULTIPROC_DIR: str = os.getenv("PROMETHEUS_MULTIPROC_DIR", "/tmp")
     ENABLE_METRICS: bool = os.getenv("ENABLE_METRICS", "true").lower() == "true"
     
+    # WebSocket fan-out across workers ("none", "unix" or "redis")
+    WS_FANOUT_BACKEND: str = os.getenv("WS_FANOUT_BACKEND", "none")
+    WS_FANOUT_SOCKET_DIR: str = os.getenv("WS_FANOUT_SOCKET_DIR", "/tmp/quantaenergi-ws")
+    WS_FANOUT_CHANNEL: str = os.getenv("WS_FANOUT_CHANNEL", "ws:fanout")
+    # Seconds a worker's Redis presence entries outlive its last heartbeat
+    WS_PRESENCE_TTL_SECONDS: int = int(os.getenv("WS_PRESENCE_TTL_SECONDS", "30"))
+    
+    # JWT revocation sharing across workers ("none", "unix" or "redis")
+    AUTH_REVOCATION_BACKEND: str = os.getenv("AUTH_REVOCATION_BACKEND", "none")
+    AUTH_REVOCATION_CHANNEL: str = os.getenv("AUTH_REVOCATION_CHANNEL", "auth:revocations")
+    AUTH_TOKEN_CACHE_SIZE: int = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000"))
+    
+    # gRPC market data streaming (energy_service.py)
+    GRPC_BIND_ADDRESS: str = os.getenv("GRPC_BIND_ADDRESS", "127.0.0.1:50052")
+    GRPC_TICK_BATCH_SIZE: int = int(os.getenv("GRPC_TICK_BATCH_SIZE", "1000"))
+    GRPC_TICK_BATCH_DELAY_MS: int = int(os.getenv("GRPC_TICK_BATCH_DELAY_MS", "5"))
+    GRPC_TICK_MAX_PENDING_BATCHES: int = int(os.getenv("GRPC_TICK_MAX_PENDING_BATCHES", "64"))
+    GRPC_FEED_INTERVAL_MS: int = int(os.getenv("GRPC_FEED_INTERVAL_MS", "1000"))
+    
+    # Celery (blob dir must be shared by the API and every worker)
+    CELERY_BLOB_DIR: str = os.getenv("CELERY_BLOB_DIR", "/tmp/quantaenergi-blobs")
+    RISK_CHUNK_SIZE: int = int(os.getenv("RISK_CHUNK_SIZE", "500"))
+    # Task payloads above this size go to the blob dir and only the key goes through the broker (0 disables)
+    CELERY_CLAIM_CHECK_BYTES: int = int(os.getenv("CELERY_CLAIM_CHECK_BYTES", str(8 * 1024 * 1024)))
+    CELERY_COMPRESS_MIN_BYTES: int = int(os.getenv("CELERY_COMPRESS_MIN_BYTES", "4096"))
+    # Registered push tokens, read by notification workers (also shared by the API and every worker)
+    PUSH_TOKEN_DIR: str = os.getenv("PUSH_TOKEN_DIR", "/tmp/quantaenergi-push-tokens")
+
+    # Heavy services behind the v1 routers load on first use; "background" also warms them after startup,
+    # "preload" loads them and the model artifacts in the master process (gunicorn preload_app)
+    SERVICE_WARMUP: str = os.getenv("SERVICE_WARMUP", "background")
+    MODEL_DIR: str = os.getenv("MODEL_DIR", "models")
+    MODEL_RELOAD_CHECK_SECONDS: float = float(os.getenv("MODEL_RELOAD_CHECK_SECONDS", "30"))
+    MODEL_REGISTRY_DIR: str = os.getenv("MODEL_REGISTRY_DIR", os.path.join(os.getenv("MODEL_DIR", "models"), "registry"))
+    MODEL_REGISTRY_VERIFY: bool = os.getenv("MODEL_REGISTRY_VERIFY", "true").lower() == "true"
+    MODEL_REGISTRY_KEEP_VERSIONS: int = int(os.getenv("MODEL_REGISTRY_KEEP_VERSIONS", "3"))
+
     # Security
     ENABLE_HTTPS: bool = os.getenv("ENABLE_HTTPS", "true").lower() == "true"
     
@@ -0,0 +1,352 @@
+"""
+Service Instrumentation
+Low-overhead latency, batch size and cache metrics for service hot paths, exported to Prometheus on scrape
+"""
+
+import functools
+import inspect
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from prometheus_client import REGISTRY
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, HistogramMetricFamily
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.00001, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+OVERFLOW_LABEL = "other"
+
+
+class _HistogramShard:
+    __slots__ = ("counts", "total")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.total = 0.0
+
+
+class _CounterShard:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+
+class _ThreadShard(threading.local):
+    """The calling thread's shard; ``__init__`` runs again the first time each thread touches it"""
+
+    def __init__(self, factory: Callable[[], Any], shards: List[Any]):
+        self.shard = factory()
+        shards.append(self.shard)
+
+
+class HistogramChild:
+    """One label set: per-thread counters updated without locks, summed at scrape time
+
+    Instrumented calls run both on the event loop and in ``asyncio.to_thread``
+    workers, so each thread writes only its own shard and no increment is lost.
+    Shards outlive their threads, which keeps the totals monotonic; the
+    default executor reuses a bounded pool, so their number stays small.
+    """
+
+    __slots__ = ("bounds", "local", "shards")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.shards: List[_HistogramShard] = []
+        self.local = _ThreadShard(functools.partial(_HistogramShard, len(bounds) + 1), self.shards)
+
+    def observe(self, value: float) -> None:
+        shard = self.local.shard
+        shard.counts[bisect_left(self.bounds, value)] += 1
+        shard.total += value
+
+    @property
+    def counts(self) -> List[int]:
+        return [sum(column) for column in zip(*(shard.counts for shard in list(self.shards)))]
+
+    @property
+    def total(self) -> float:
+        return sum(shard.total for shard in list(self.shards))
+
+
+class CounterChild:
+    __slots__ = ("local", "shards")
+
+    def __init__(self):
+        self.shards: List[_CounterShard] = []
+        self.local = _ThreadShard(_CounterShard, self.shards)
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.local.shard.value += amount
+
+    @property
+    def value(self) -> float:
+        return sum(shard.value for shard in list(self.shards))
+
+
+class _Metric(ABC):
+    """Labelled metric with a cap on distinct label sets
+
+    Label sets beyond ``max_label_sets`` share one child whose labels are all
+    ``"other"``, so an unbounded label (a symbol, a user id) cannot blow up
+    the exposition or the worker's memory.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str], max_label_sets: int):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.max_label_sets = max_label_sets
+        self.children: Dict[Tuple[str, ...], Any] = {}
+        self.overflowed = 0
+
+    @abstractmethod
+    def _new_child(self):
+        """Fresh child for a label set"""
+
+    def labels(self, *values: Any):
+        """Child for a label set; bind once and keep it on hot paths"""
+        key = tuple(str(value) for value in values)
+        child = self.children.get(key)
+        if child is None:
+            if len(self.children) >= self.max_label_sets:
+                self.overflowed += 1
+                key = (OVERFLOW_LABEL,) * len(self.labelnames)
+                child = self.children.get(key)
+            if child is None:
+                child = self.children[key] = self._new_child()
+        return child
+
+
+class FastHistogram(_Metric):
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str], buckets: Sequence[float], max_label_sets: int):
+        super().__init__(name, documentation, labelnames, max_label_sets)
+        self.bounds = tuple(buckets)
+
+    def _new_child(self) -> HistogramChild:
+        return HistogramChild(self.bounds)
+
+    def collect(self) -> HistogramMetricFamily:
+        family = HistogramMetricFamily(self.name, self.documentation, labels=self.labelnames)
+        for key, child in list(self.children.items()):
+            cumulative = 0
+            buckets = []
+            for bound, count in zip(self.bounds + (float("inf"),), child.counts):
+                cumulative += count
+                buckets.append(("+Inf" if bound == float("inf") else repr(float(bound)), cumulative))
+            family.add_metric(list(key), buckets, child.total)
+        return family
+
+
+class FastCounter(_Metric):
+    def _new_child(self) -> CounterChild:
+        return CounterChild()
+
+    def collect(self) -> CounterMetricFamily:
+        family = CounterMetricFamily(self.name, self.documentation, labels=self.labelnames)
+        for key, child in list(self.children.items()):
+            family.add_metric(list(key), child.value)
+        return family
+
+
+class ServiceInstrumentation:
+    """Decorators and context managers for service entry points
+
+    Observations update pre-bound Python counters; nothing touches
+    prometheus_client until a scrape, when ``collect`` turns the counters
+    into metric families. Caches that already count hits and misses are
+    registered with ``track_cache`` and read only at scrape time.
+    """
+
+    def __init__(self, enabled: bool = True, max_label_sets: int = 200):
+        self.enabled = enabled
+        self.latency = FastHistogram(
+            "service_call_duration_seconds", "Service entry point latency", ["operation"], LATENCY_BUCKETS, max_label_sets
+        )
+        self.errors = FastCounter(
+            "service_call_errors_total", "Service entry point calls that raised", ["operation"], max_label_sets
+        )
+        self.batch_size = FastHistogram(
+            "service_batch_size", "Items handled per service call", ["operation"], SIZE_BUCKETS, max_label_sets
+        )
+        self.cache_requests = FastCounter(
+            "service_cache_requests_total", "Cache lookups by result", ["cache", "result"], max_label_sets
+        )
+        self.cache_sources: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+    def instrument(self, operation: str, batch: Optional[Callable[..., int]] = None):
+        """Decorator recording latency, errors and (optionally) batch size of sync or async callables
+
+        ``batch`` receives the call's arguments and returns the number of items.
+        """
+        def decorator(func: Callable) -> Callable:
+            if not self.enabled:
+                return func
+            latency = self.latency.labels(operation)
+            errors = self.errors.labels(operation)
+            sizes = self.batch_size.labels(operation) if batch else None
+            # Bound once: the wrappers below do two clock reads, one bisect and two adds per call
+            bounds = latency.bounds
+            clock = time.perf_counter
+
+            if inspect.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    if sizes is not None:
+                        sizes.observe(batch(*args, **kwargs))
+                    started = clock()
+                    try:
+                        result = await func(*args, **kwargs)
+                    except BaseException:
+                        errors.inc()
+                        latency.observe(clock() - started)
+                        raise
+                    elapsed = clock() - started
+                    shard = latency.local.shard
+                    shard.counts[bisect_left(bounds, elapsed)] += 1
+                    shard.total += elapsed
+                    return result
+                return async_wrapper
+
+            if sizes is not None:
+                @functools.wraps(func)
+                def batch_wrapper(*args, **kwargs):
+                    sizes.observe(batch(*args, **kwargs))
+                    started = clock()
+                    try:
+                        result = func(*args, **kwargs)
+                    except BaseException:
+                        errors.inc()
+                        latency.observe(clock() - started)
+                        raise
+                    elapsed = clock() - started
+                    shard = latency.local.shard
+                    shard.counts[bisect_left(bounds, elapsed)] += 1
+                    shard.total += elapsed
+                    return result
+                return batch_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                started = clock()
+                try:
+                    result = func(*args, **kwargs)
+                except BaseException:
+                    errors.inc()
+                    latency.observe(clock() - started)
+                    raise
+                elapsed = clock() - started
+                shard = latency.local.shard
+                shard.counts[bisect_left(bounds, elapsed)] += 1
+                shard.total += elapsed
+                return result
+            return wrapper
+
+        return decorator
+
+    def timer(self, operation: str) -> "_Timer":
+        """Context manager timing a block (``with instrumentation.timer("mtm"): ...``)"""
+        return _Timer(self.latency.labels(operation), self.errors.labels(operation), self.enabled)
+
+    def record_batch(self, operation: str, size: int) -> None:
+        if self.enabled:
+            self.batch_size.labels(operation).observe(size)
+
+    def record_cache(self, cache: str, hit: bool) -> None:
+        if self.enabled:
+            self.cache_requests.labels(cache, "hit" if hit else "miss").inc()
+
+    def track_cache(self, cache: str, stats: Callable[[], Dict[str, Any]]) -> None:
+        """Report a cache's own ``hits``/``misses`` counters at scrape time"""
+        self.cache_sources[cache] = stats
+
+    def _cache_totals(self) -> Dict[str, List[float]]:
+        totals: Dict[str, List[float]] = {}
+        for (cache, result), child in list(self.cache_requests.children.items()):
+            totals.setdefault(cache, [0.0, 0.0])[0 if result == "hit" else 1] += child.value
+        for cache, stats in list(self.cache_sources.items()):
+            try:
+                values = stats()
+            except Exception as e:
+                logger.warning(f"Cache stats for {cache} unavailable: {e}")
+                continue
+            entry = totals.setdefault(cache, [0.0, 0.0])
+            entry[0] += values.get("hits", 0)
+            entry[1] += values.get("misses", 0)
+        return totals
+
+    def collect(self):
+        """prometheus_client collector hook"""
+        yield self.latency.collect()
+        yield self.errors.collect()
+        yield self.batch_size.collect()
+
+        totals = self._cache_totals()
+        requests = CounterMetricFamily(
+            "service_cache_lookups_total", "Cache lookups by result, including tracked caches", labels=["cache", "result"]
+        )
+        ratio = GaugeMetricFamily("service_cache_hit_ratio", "Cache hit ratio since start", labels=["cache"])
+        for cache, (hits, misses) in totals.items():
+            requests.add_metric([cache, "hit"], hits)
+            requests.add_metric([cache, "miss"], misses)
+            ratio.add_metric([cache], hits / (hits + misses) if hits + misses else 0.0)
+        yield requests
+        yield ratio
+
+    def describe(self):
+        # Describing lazily would call collect() at registration; nothing to check up front
+        return []
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Per-operation call counts, mean latency and cache hit ratios"""
+        operations = {}
+        for (operation,), child in list(self.latency.children.items()):
+            calls = sum(child.counts)
+            errors = self.errors.children.get((operation,))
+            operations[operation] = {
+                "calls": calls,
+                "errors": errors.value if errors else 0,
+                "mean_seconds": child.total / calls if calls else 0.0,
+            }
+        return {
+            "operations": operations,
+            "caches": {
+                cache: hits / (hits + misses) if hits + misses else 0.0
+                for cache, (hits, misses) in self._cache_totals().items()
+            },
+            "label_overflows": self.latency.overflowed + self.batch_size.overflowed + self.cache_requests.overflowed,
+        }
+
+
+class _Timer:
+    __slots__ = ("latency", "errors", "enabled", "started")
+
+    def __init__(self, latency: HistogramChild, errors: CounterChild, enabled: bool):
+        self.latency = latency
+        self.errors = errors
+        self.enabled = enabled
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if self.enabled:
+            if exc_type is not None:
+                self.errors.inc()
+            self.latency.observe(time.perf_counter() - self.started)
+        return False
+
+
+# Global instrumentation instance
+instrumentation = ServiceInstrumentation(enabled=settings.ENABLE_METRICS)
+REGISTRY.register(instrumentation)
+instrument = instrumentation.instrument
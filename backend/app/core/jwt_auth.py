@@ -4,6 +4,7 @@ Implements secure token generation, validation, and role-based access control
 """
 
 import jwt
+import time
 import asyncio
 import logging
 from datetime import datetime, timedelta
@@ -15,6 +16,10 @@ from passlib.context import CryptContext
 import secrets
 import hashlib
 
+from .config import settings
+from .instrumentation import instrumentation
+from .token_cache import PermissionMatrix, RevocationList, VerifiedTokenCache, token_digest
+
 logger = logging.getLogger(__name__)
 
 # Security configuration
@@ -39,8 +44,11 @@ class JWTAuthManager:
         self.access_token_expire_minutes = ACCESS_TOKEN_EXPIRE_MINUTES
         self.refresh_token_expire_days = REFRESH_TOKEN_EXPIRE_DAYS
         
-        # In-memory token blacklist (use Redis in production)
-        self.token_blacklist = set()
+        # Verified claims by token digest, valid until each token's exp
+        self.token_cache = VerifiedTokenCache(max_size=settings.AUTH_TOKEN_CACHE_SIZE)
+        
+        # Revoked token digests (shared across workers once attached to a bridge)
+        self.revocations = RevocationList()
         
         # User roles and permissions mapping
         self.role_permissions = {
@@ -62,6 +70,9 @@ class JWTAuthManager:
                 "reporting_view"
             ]
         }
+        
+        # Role x permission bitmap compiled from role_permissions
+        self.permission_matrix = PermissionMatrix(self.role_permissions)
     
     def create_access_token(self, data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
         """
@@ -134,6 +145,9 @@ class JWTAuthManager:
         """
         Verify and decode JWT token
         
+        Tokens already verified by this worker are served from the token cache
+        until they expire; only the first request pays for the signature check.
+        
         Args:
             token: JWT token string
             
@@ -144,13 +158,20 @@ class JWTAuthManager:
             HTTPException: If token is invalid or expired
         """
         try:
-            # Check if token is blacklisted
-            if token in self.token_blacklist:
+            now = time.time()
+            digest = token_digest(token)
+            
+            # Check if token is revoked
+            if self.revocations.is_revoked(digest, now):
                 raise HTTPException(
                     status_code=status.HTTP_401_UNAUTHORIZED,
                     detail="Token has been revoked"
                 )
             
+            cached = self.token_cache.get(digest, now)
+            if cached is not None:
+                return dict(cached)
+            
             # Decode token
             payload = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
             
@@ -163,15 +184,18 @@ class JWTAuthManager:
             
             # Check expiration
             exp = payload.get("exp")
-            if exp and datetime.utcnow() > datetime.fromtimestamp(exp):
+            if exp and now > exp:
                 raise HTTPException(
                     status_code=status.HTTP_401_UNAUTHORIZED,
                     detail="Token has expired"
                 )
             
+            self.token_cache.put(digest, payload, exp)
             logger.debug(f"Token verified for user: {payload.get('user_id', 'unknown')}")
-            return payload
+            return dict(payload)
             
+        except HTTPException:
+            raise
         except jwt.ExpiredSignatureError:
             logger.warning("Token has expired")
             raise HTTPException(
@@ -225,7 +249,7 @@ class JWTAuthManager:
     
     def revoke_token(self, token: str) -> bool:
         """
-        Revoke token by adding to blacklist
+        Revoke token on this worker and every worker sharing the revocation list
         
         Args:
             token: Token to revoke
@@ -234,7 +258,17 @@ class JWTAuthManager:
             True if successful
         """
         try:
-            self.token_blacklist.add(token)
+            digest = token_digest(token)
+            
+            # Keep the revocation until the token would have expired anyway
+            try:
+                claims = jwt.decode(token, options={"verify_signature": False})
+                expires_at = float(claims["exp"])
+            except (jwt.InvalidTokenError, KeyError, TypeError, ValueError):
+                expires_at = time.time() + timedelta(days=self.refresh_token_expire_days).total_seconds()
+            
+            self.revocations.revoke(digest, expires_at)
+            self.token_cache.discard(digest)
             logger.info("Token revoked successfully")
             return True
         except Exception as e:
@@ -253,14 +287,8 @@ class JWTAuthManager:
             True if user has permission
         """
         try:
-            user_permissions = self.role_permissions.get(user_role, [])
-            
-            # Admin has all permissions
-            if "*" in user_permissions:
-                return True
-            
-            # Check specific permission
-            return required_permission in user_permissions
+            # Compiled bitmap; roles with "*" (admin) have all permissions
+            return self.permission_matrix.allows(user_role, required_permission)
             
         except Exception as e:
             logger.error(f"Permission check error: {str(e)}")
@@ -304,6 +332,7 @@ class JWTAuthManager:
 
 # Global auth manager instance
 auth_manager = JWTAuthManager()
+instrumentation.track_cache("jwt_tokens", auth_manager.token_cache.get_stats)
 
 # Decorator for authentication
 def require_auth(func):
@@ -334,7 +363,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> Dict[str, Any
             "email": payload.get("email"),
             "organization_id": payload.get("organization_id"),
             "role": payload.get("role"),
-            "permissions": auth_manager.role_permissions.get(payload.get("role", ""), []),
+            "permissions": auth_manager.permission_matrix.permissions(payload.get("role", "")),
             "is_active": payload.get("is_active", True)
         }
         
@@ -0,0 +1,214 @@
+"""
+Lazy Service Loading
+Routers register cheaply; heavy service modules are imported on first use or by background warmup
+"""
+
+import asyncio
+import importlib
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+
+class LazyService:
+    """Proxy that imports its module and instantiates the service on first attribute access
+
+    Router modules keep their ``service = LazyService(...)`` globals and call
+    methods on them as before; the import (torch, qiskit, web3, ...) and the
+    constructor run once, on the first request or during warmup. A failed
+    import is recorded and raised again on every access.
+
+    Services whose constructor starts threads or opens connections (MQTT,
+    Redis, web3 providers) pass ``fork_safe=False``: a gunicorn preload
+    only imports their module in the master, and each worker builds its own
+    instance after the fork, since threads do not survive it.
+    """
+
+    def __init__(
+        self,
+        module: str,
+        attribute: str,
+        *args,
+        registry: Optional["ServiceRegistry"] = None,
+        fork_safe: bool = True,
+        **kwargs
+    ):
+        self._module = module
+        self._attribute = attribute
+        self.fork_safe = fork_safe
+        self._args = args
+        self._kwargs = kwargs
+        self._instance = None
+        self._error: Optional[BaseException] = None
+        self._lock = threading.Lock()
+        self._registry = registry or service_registry
+        self._registry.register(self)
+
+    @property
+    def name(self) -> str:
+        return f"{self._module}.{self._attribute}"
+
+    @property
+    def loaded(self) -> bool:
+        return self._instance is not None
+
+    def load(self) -> Any:
+        """Import and instantiate the service if that has not happened yet"""
+        if self._instance is not None:
+            return self._instance
+        with self._lock:
+            if self._instance is None:
+                if self._error is not None:
+                    raise self._error
+                self._instance = self._create()
+        return self._instance
+
+    async def aload(self) -> Any:
+        """``load`` on a worker thread, so an import (or waiting for warmup's) never blocks the event loop"""
+        if self._instance is not None:
+            return self._instance
+        return await asyncio.to_thread(self.load)
+
+    def _create(self) -> Any:
+        registry = self._registry
+        started = time.perf_counter()
+        try:
+            module = registry.import_module(self._module)
+            imported = time.perf_counter()
+            instance = getattr(module, self._attribute)(*self._args, **self._kwargs)
+        except Exception as e:
+            self._error = e
+            registry.record_service(self.name, time.perf_counter() - started, 0.0, error=e)
+            logger.error(f"Failed to load service {self.name}: {e}")
+            raise
+        registry.record_service(self.name, imported - started, time.perf_counter() - imported)
+        return instance
+
+    # Loads synchronously: routers resolve their services first with loaded_services
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+
+    def __repr__(self) -> str:
+        return f"<LazyService {self.name} ({'loaded' if self.loaded else 'pending'})>"
+
+
+def loaded_services(*services: LazyService) -> Callable:
+    """Router dependency that loads services off the event loop before the route runs
+
+    A request arriving while warmup is still importing a service waits on a
+    worker thread instead of stalling every other request in the worker. A
+    service that fails to load is left for the route to report.
+    """
+    async def dependency() -> None:
+        for service in services:
+            try:
+                await service.aload()
+            except Exception:
+                pass
+    return dependency
+
+
+class ServiceRegistry:
+    """Lazy services and timed imports, reported by /api/v1/health/startup"""
+
+    def __init__(self):
+        self.services: List[LazyService] = []
+        self.imports: Dict[str, Dict[str, Any]] = {}
+        self.loads: Dict[str, Dict[str, Any]] = {}
+        self.ready_at: Optional[float] = None
+        self.warmup_seconds: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def register(self, service: LazyService) -> None:
+        with self._lock:
+            self.services.append(service)
+
+    def import_module(self, name: str) -> Any:
+        """Import a module, recording the time when this call performed the import"""
+        if name in sys.modules:
+            return sys.modules[name]
+        with self.timed(name):
+            return importlib.import_module(name)
+
+    @contextmanager
+    def timed(self, name: str):
+        """Record how long the enclosed import block took"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.imports[name] = {"seconds": round(time.perf_counter() - started, 4)}
+
+    def record_service(self, name: str, import_seconds: float, init_seconds: float, error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            self.loads[name] = {
+                "import_seconds": round(import_seconds, 4),
+                "init_seconds": round(init_seconds, 4),
+                "loaded_at": datetime.now().isoformat(),
+                "error": f"{type(error).__name__}: {error}" if error else None,
+            }
+
+    def mark_ready(self) -> None:
+        """Called once the app accepts requests"""
+        self.ready_at = time.time()
+
+    def preload(self) -> int:
+        """Load every fork-safe service synchronously (master process, before workers fork)
+
+        Services that are not fork-safe only have their module imported;
+        workers build them on first use or in their own warmup.
+        """
+        for service in list(self.services):
+            try:
+                if service.fork_safe:
+                    service.load()
+                else:
+                    self.import_module(service._module)
+            except Exception:
+                pass
+        return sum(1 for service in self.services if service.loaded)
+
+    async def warmup(self) -> Dict[str, Any]:
+        """Load every pending service on a worker thread, one at a time, without blocking the loop"""
+        started = time.perf_counter()
+        for service in list(self.services):
+            if service.loaded:
+                continue
+            try:
+                await asyncio.to_thread(service.load)
+            except Exception:
+                # Already recorded; the endpoint using it will report the error
+                pass
+        self.warmup_seconds = round(time.perf_counter() - started, 4)
+        logger.info(f"Service warmup finished in {self.warmup_seconds}s")
+        return self.get_report()
+
+    def get_report(self) -> Dict[str, Any]:
+        """Import and startup timings"""
+        process_started = psutil.Process().create_time()
+        return {
+            "process_started_at": datetime.fromtimestamp(process_started).isoformat(),
+            "ready_seconds": round(self.ready_at - process_started, 3) if self.ready_at else None,
+            "warmup_seconds": self.warmup_seconds,
+            "imports": dict(sorted(self.imports.items(), key=lambda item: -item[1]["seconds"])),
+            "services": {
+                service.name: self.loads.get(service.name, {"status": "pending"}) for service in self.services
+            },
+            "loaded": sum(1 for service in self.services if service.loaded),
+            "pending": sum(1 for service in self.services if not service.loaded),
+        }
+
+
+# Global service registry instance
+service_registry = ServiceRegistry()
@@ -0,0 +1,241 @@
+"""
+Binary Market Data Codec for WebSocket Streams
+Compact, delta-encoded tick frames negotiated as a WebSocket subprotocol
+"""
+
+import math
+import struct
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+# Subprotocol clients request in Sec-WebSocket-Protocol to receive binary frames
+BINARY_SUBPROTOCOL = "quantaenergi.marketdata.v1"
+
+FRAME_VERSION = 1
+FRAME_KEY = 0
+FRAME_DELTA = 1
+
+# Frame layout (little endian):
+#   header: version u8 | frame type u8 | tick count u16 | sequence u32 | base timestamp ms i64
+#   entry:  symbol id u16 | field mask u8 | timestamp offset ms u32 | one f64 per set mask bit
+# A field the tick did not carry is sent as NaN and decoded as None.
+_HEADER = struct.Struct("<BBHIq")
+_ENTRY = struct.Struct("<HBI")
+_VALUE = struct.Struct("<d")
+
+TICK_FIELDS = ("bid", "ask", "last", "volume")
+_FULL_MASK = (1 << len(TICK_FIELDS)) - 1
+_MAX_TICKS_PER_FRAME = 0xFFFF
+
+
+def _field_value(value: Any) -> float:
+    """Tick field as a float, NaN when missing"""
+    return math.nan if value is None else float(value)
+
+
+def _same(old: float, new: float) -> bool:
+    # NaN != NaN, but a field that stays missing is unchanged
+    return old == new or (old != old and new != new)
+
+
+def to_epoch_ms(timestamp: Any) -> int:
+    """Normalise a tick timestamp (datetime, ISO string or epoch ms) to epoch ms"""
+    if timestamp is None:
+        return int(datetime.now(timezone.utc).timestamp() * 1000)
+    if isinstance(timestamp, (int, float)):
+        return int(timestamp)
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return int(timestamp.timestamp() * 1000)
+
+
+class SymbolRegistry:
+    """Assigns stable small integer ids to symbols"""
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._symbols: List[str] = []
+
+    def get_id(self, symbol: str) -> Tuple[int, bool]:
+        """Return the id for a symbol and whether it was newly assigned"""
+        symbol_id = self._ids.get(symbol)
+        if symbol_id is not None:
+            return symbol_id, False
+        if len(self._ids) > 0xFFFF:
+            raise ValueError("Symbol registry is full")
+        symbol_id = len(self._ids)
+        self._ids[symbol] = symbol_id
+        self._symbols.append(symbol)
+        return symbol_id, True
+
+    def get_symbol(self, symbol_id: int) -> Optional[str]:
+        """Symbol assigned to an id, if any"""
+        return self._symbols[symbol_id] if 0 <= symbol_id < len(self._symbols) else None
+
+    def as_dict(self) -> Dict[str, int]:
+        """Full symbol to id mapping"""
+        return dict(self._ids)
+
+
+@dataclass
+class EncodedFrame:
+    """Binary frame plus symbol ids the client has not seen yet"""
+    payload: bytes
+    new_symbols: Dict[str, int]
+    is_keyframe: bool
+    tick_count: int
+
+
+class DeltaEncoder:
+    """Per-connection encoder tracking the client's last snapshot
+
+    Only fields that changed since the last frame sent to this client are
+    written. A keyframe carrying every field is emitted on the first frame,
+    after ``reset`` (client resync) and every ``keyframe_interval`` frames.
+    A frame holds at most ``_MAX_TICKS_PER_FRAME`` ticks; ``encode_frames``
+    splits larger batches over several frames.
+    """
+
+    def __init__(self, registry: SymbolRegistry, keyframe_interval: int = 100):
+        self.registry = registry
+        self.keyframe_interval = keyframe_interval
+        self._snapshot: Dict[int, Tuple[float, ...]] = {}
+        self._known_symbols: set = set()
+        self._sequence = 0
+        self._frames_since_key = 0
+        self._force_key = True
+
+    def reset(self) -> None:
+        """Forget the client snapshot so the next frame is a keyframe"""
+        self._snapshot.clear()
+        self._known_symbols.clear()
+        self._force_key = True
+
+    def encode_frames(self, ticks: List[Dict[str, Any]]) -> List[EncodedFrame]:
+        """Encode any number of ticks into as many frames as they need (none if nothing changed)"""
+        frames = []
+        for start in range(0, len(ticks), _MAX_TICKS_PER_FRAME):
+            frame = self.encode(ticks[start:start + _MAX_TICKS_PER_FRAME])
+            if frame is not None:
+                frames.append(frame)
+        return frames
+
+    def encode(self, ticks: List[Dict[str, Any]]) -> Optional[EncodedFrame]:
+        """Encode ticks into one frame, or None if nothing changed"""
+        if len(ticks) > _MAX_TICKS_PER_FRAME:
+            raise ValueError(f"At most {_MAX_TICKS_PER_FRAME} ticks fit in one frame; use encode_frames")
+        is_keyframe = self._force_key or self._frames_since_key >= self.keyframe_interval
+        new_symbols: Dict[str, int] = {}
+        entries: List[Tuple[int, int, int, Tuple[float, ...]]] = []
+        if not ticks:
+            return None
+        if is_keyframe:
+            # The client drops its snapshot on a keyframe; mirror that here
+            self._snapshot.clear()
+
+        for tick in ticks:
+            symbol = tick["symbol"]
+            symbol_id, _ = self.registry.get_id(symbol)
+            if symbol_id not in self._known_symbols:
+                new_symbols[symbol] = symbol_id
+                self._known_symbols.add(symbol_id)
+
+            values = tuple(_field_value(tick.get(field)) for field in TICK_FIELDS)
+            previous = None if is_keyframe else self._snapshot.get(symbol_id)
+            if previous is None:
+                mask = _FULL_MASK
+            else:
+                mask = 0
+                for bit, (old, new) in enumerate(zip(previous, values)):
+                    if not _same(old, new):
+                        mask |= 1 << bit
+                if not mask:
+                    continue
+
+            self._snapshot[symbol_id] = values
+            entries.append((symbol_id, mask, to_epoch_ms(tick.get("timestamp")), values))
+
+        if not entries:
+            return None
+
+        base_ts = min(entry[2] for entry in entries)
+        self._sequence = (self._sequence + 1) & 0xFFFFFFFF
+        parts = [_HEADER.pack(
+            FRAME_VERSION,
+            FRAME_KEY if is_keyframe else FRAME_DELTA,
+            len(entries),
+            self._sequence,
+            base_ts,
+        )]
+        for symbol_id, mask, ts, values in entries:
+            parts.append(_ENTRY.pack(symbol_id, mask, ts - base_ts))
+            for bit, value in enumerate(values):
+                if mask & (1 << bit):
+                    parts.append(_VALUE.pack(value))
+
+        if is_keyframe:
+            self._force_key = False
+            self._frames_since_key = 0
+        else:
+            self._frames_since_key += 1
+
+        return EncodedFrame(
+            payload=b"".join(parts),
+            new_symbols=new_symbols,
+            is_keyframe=is_keyframe,
+            tick_count=len(entries),
+        )
+
+
+class DeltaDecoder:
+    """Client-side decoder rebuilding full ticks from binary frames"""
+
+    def __init__(self):
+        self._symbols: Dict[int, str] = {}
+        self._snapshot: Dict[int, List[float]] = {}
+        self.last_sequence: Optional[int] = None
+
+    def update_symbols(self, symbols: Dict[str, int]) -> None:
+        """Apply a symbol_map control message"""
+        for symbol, symbol_id in symbols.items():
+            self._symbols[int(symbol_id)] = symbol
+
+    def decode(self, data: bytes) -> List[Dict[str, Any]]:
+        """Decode a frame into full tick dicts for the symbols it touched"""
+        version, frame_type, count, sequence, base_ts = _HEADER.unpack_from(data, 0)
+        if version != FRAME_VERSION:
+            raise ValueError(f"Unsupported market data frame version {version}")
+        if frame_type == FRAME_KEY:
+            self._snapshot.clear()
+
+        offset = _HEADER.size
+        ticks = []
+        for _ in range(count):
+            symbol_id, mask, ts_offset = _ENTRY.unpack_from(data, offset)
+            offset += _ENTRY.size
+
+            values = self._snapshot.get(symbol_id)
+            if values is None:
+                if mask != _FULL_MASK:
+                    raise ValueError(f"Delta for unknown symbol id {symbol_id}, resync required")
+                values = [0.0] * len(TICK_FIELDS)
+                self._snapshot[symbol_id] = values
+
+            for bit in range(len(TICK_FIELDS)):
+                if mask & (1 << bit):
+                    values[bit] = _VALUE.unpack_from(data, offset)[0]
+                    offset += _VALUE.size
+
+            tick = {"symbol": self._symbols.get(symbol_id, str(symbol_id)), "timestamp": base_ts + ts_offset}
+            tick.update((field, None if value != value else value) for field, value in zip(TICK_FIELDS, values))
+            ticks.append(tick)
+
+        self.last_sequence = sequence
+        return ticks
+
+
+# Global symbol registry shared by all connections of this worker
+symbol_registry = SymbolRegistry()
@@ -0,0 +1,422 @@
+"""
+Model Registry
+Versioned serving artifacts in a compact memory-mapped form, verified by checksum and loaded on first use
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_.-]+$")
+FOREST_ARRAYS = ("children", "feature", "threshold", "value", "roots")
+LATEST_FILE = "LATEST"
+MANIFEST_FILE = "manifest.json"
+
+
+class CompiledForest:
+    """Tree ensemble flattened into contiguous node arrays
+
+    Every tree of a random forest, gradient boosting model, XGBoost
+    regressor (``gbtree`` booster, squared-error objective) or a voting
+    average of them is stored in the same ``children``/``feature``/
+    ``threshold``/``value`` arrays, with the forest averaging, learning
+    rate and voting weights folded into the leaf values. Prediction walks
+    all trees for all rows at once, one depth level per step, and is a
+    sum of leaves plus ``bias``. The arrays are plain ``.npy`` files, so
+    workers map them instead of unpickling thousands of Tree objects.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], bias: float, max_depth: int, n_features: int):
+        self.arrays = arrays
+        self.bias = bias
+        self.max_depth = max_depth
+        self.n_features_in_ = n_features
+
+    @classmethod
+    def from_estimator(cls, model: Any) -> "CompiledForest":
+        """Flatten a fitted RandomForest/GradientBoosting/XGBoost regressor or a VotingRegressor of them"""
+        from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor, VotingRegressor
+
+        if isinstance(model, VotingRegressor):
+            weights = np.ones(len(model.estimators_)) if model.weights is None else np.asarray(model.weights, dtype=float)
+            members = list(zip(model.estimators_, weights / weights.sum()))
+        else:
+            members = [(model, 1.0)]
+
+        trees: List[Tuple[Any, float]] = []
+        bias = 0.0
+        for estimator, weight in members:
+            if isinstance(estimator, RandomForestRegressor):
+                trees.extend((tree.tree_, weight / len(estimator.estimators_)) for tree in estimator.estimators_)
+            elif isinstance(estimator, GradientBoostingRegressor):
+                init = estimator._raw_predict_init(np.zeros((1, estimator.n_features_in_)))
+                bias += weight * float(init[0, 0])
+                trees.extend((tree.tree_, weight * estimator.learning_rate) for tree in estimator.estimators_[:, 0])
+            elif hasattr(estimator, "get_booster"):
+                booster_trees, booster_bias = _booster_trees(estimator)
+                bias += weight * booster_bias
+                trees.extend((tree, weight) for tree in booster_trees)
+            else:
+                raise TypeError(f"Cannot flatten {type(estimator).__name__}")
+
+        sizes = [tree.node_count for tree, _ in trees]
+        offsets = np.concatenate(([0], np.cumsum(sizes)[:-1])).astype(np.int32)
+        left = np.concatenate([tree.children_left for tree, _ in trees]).astype(np.int32)
+        right = np.concatenate([tree.children_right for tree, _ in trees]).astype(np.int32)
+        feature = np.concatenate([tree.feature for tree, _ in trees]).astype(np.int32)
+        threshold = np.concatenate([tree.threshold for tree, _ in trees]).astype(np.float64)
+        value = np.concatenate([tree.value[:, 0, 0] * scale for tree, scale in trees]).astype(np.float64)
+
+        # Child indices become absolute; leaves point at themselves so extra steps keep them in place
+        node_offsets = np.repeat(offsets, sizes)
+        leaves = left < 0
+        nodes = np.arange(len(left), dtype=np.int32)
+        left = np.where(leaves, nodes, left + node_offsets).astype(np.int32)
+        right = np.where(leaves, nodes, right + node_offsets).astype(np.int32)
+        feature[leaves] = 0
+        threshold[leaves] = np.inf
+        # Interleaved (right, left) pairs: the next node is children[2 * node + went_left]
+        children = np.stack([right, left], axis=1).ravel()
+
+        arrays = {"children": children, "feature": feature, "threshold": threshold, "value": value, "roots": offsets}
+        n_features = members[0][0].n_features_in_
+        return cls(arrays, bias, max(tree.max_depth for tree, _ in trees), n_features)
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Predictions for scaled feature rows (same input as the original estimator)"""
+        # Trees compare float32 features, as sklearn does
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[np.newaxis, :]
+        children, feature, threshold, roots = (self.arrays[name] for name in ("children", "feature", "threshold", "roots"))
+
+        # One flat (row, tree) cursor array; np.take on 1-d arrays is the cheapest gather
+        flat = X.ravel()
+        row_offsets = np.repeat(np.arange(len(X)) * X.shape[1], len(roots))
+        nodes = np.tile(roots, len(X))
+        for _ in range(self.max_depth):
+            went_left = np.take(flat, row_offsets + np.take(feature, nodes)) <= np.take(threshold, nodes)
+            nodes = np.take(children, nodes * 2 + went_left)
+        return np.take(self.arrays["value"], nodes).reshape(len(X), len(roots)).sum(axis=1) + self.bias
+
+    @property
+    def nbytes(self) -> int:
+        return sum(array.nbytes for array in self.arrays.values())
+
+
+class _BoosterTree:
+    """One XGBoost tree in the node-array layout of a fitted sklearn ``tree_``"""
+
+    def __init__(self, dump: Dict[str, Any], feature_index: Dict[str, int]):
+        nodes: List[Dict[str, Any]] = []
+        stack = [(dump, 0)]
+        self.max_depth = 0
+        while stack:
+            node, depth = stack.pop()
+            nodes.append(node)
+            self.max_depth = max(self.max_depth, depth)
+            stack.extend((child, depth + 1) for child in node.get("children", ()))
+        position = {node["nodeid"]: index for index, node in enumerate(nodes)}
+
+        self.node_count = len(nodes)
+        self.children_left = np.full(self.node_count, -1, dtype=np.int32)
+        self.children_right = np.full(self.node_count, -1, dtype=np.int32)
+        self.feature = np.zeros(self.node_count, dtype=np.int32)
+        self.threshold = np.zeros(self.node_count)
+        self.value = np.zeros((self.node_count, 1, 1))
+        for index, node in enumerate(nodes):
+            if "leaf" in node:
+                self.value[index, 0, 0] = node["leaf"]
+                continue
+            if node["missing"] != node["no"]:
+                # NaN fails every comparison and always takes the right branch here
+                raise TypeError("Cannot flatten XGBoost trees that send missing values left")
+            self.children_left[index] = position[node["yes"]]
+            self.children_right[index] = position[node["no"]]
+            self.feature[index] = feature_index[node["split"]]
+            # XGBoost goes left on x < split; the largest float32 below it gives the same split with <=
+            self.threshold[index] = np.nextafter(np.float32(node["split_condition"]), np.float32(-np.inf))
+
+
+def _booster_trees(estimator: Any) -> Tuple[List[_BoosterTree], float]:
+    """Trees and bias (base score) of a fitted XGBoost regressor"""
+    booster = estimator.get_booster()
+    config = json.loads(booster.save_config())["learner"]
+    if config["gradient_booster"]["name"] != "gbtree" or config["objective"]["name"] != "reg:squarederror":
+        raise TypeError(f"Cannot flatten {type(estimator).__name__} with a non-tree booster or non-identity objective")
+
+    names = booster.feature_names or [f"f{i}" for i in range(booster.num_features())]
+    feature_index = {name: i for i, name in enumerate(names)}
+    dumps = booster.get_dump(dump_format="json")
+    rounds = booster.num_boosted_rounds()
+    trees_per_round = max(1, len(dumps) // max(rounds, 1))
+    best_iteration = getattr(estimator, "best_iteration", None)
+    if best_iteration is not None:
+        # Early stopping: predict() only uses the rounds up to the best one
+        rounds = best_iteration + 1
+        dumps = dumps[:rounds * trees_per_round]
+    trees = [_BoosterTree(json.loads(dump), feature_index) for dump in dumps]
+
+    # The dumped base score is rounded; recover it exactly from one margin prediction
+    import xgboost
+
+    origin = np.zeros((1, len(names)), dtype=np.float32)
+    margin = booster.predict(xgboost.DMatrix(origin, feature_names=booster.feature_names),
+                             output_margin=True, iteration_range=(0, rounds))
+    leaves = sum(tree.value[_leaf_for(tree, origin[0]), 0, 0] for tree in trees)
+    return trees, float(margin[0]) - leaves
+
+
+def _leaf_for(tree: _BoosterTree, row: np.ndarray) -> int:
+    node = 0
+    while tree.children_left[node] >= 0:
+        node = tree.children_left[node] if row[tree.feature[node]] <= tree.threshold[node] else tree.children_right[node]
+    return node
+
+
+class RegisteredModel:
+    """One loaded version: the predictor, its scaler and manifest"""
+
+    __slots__ = ("name", "version", "model", "scaler", "manifest", "load_seconds", "loaded_at")
+
+    def __init__(self, name: str, version: int, model: Any, scaler: Any, manifest: Dict[str, Any], load_seconds: float):
+        self.name = name
+        self.version = version
+        self.model = model
+        self.scaler = scaler
+        self.manifest = manifest
+        self.load_seconds = load_seconds
+        self.loaded_at = time.time()
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Predictions for raw feature rows"""
+        return self.model.predict(self.scaler.transform(X) if self.scaler is not None else X)
+
+
+class ModelRegistry:
+    """Versioned model artifacts under ``root/<name>/v<version>/``
+
+    ``publish`` writes a version into a temporary directory (flattened tree
+    arrays when the model allows it, a joblib file otherwise), records a
+    SHA-256 per file in ``manifest.json``, renames the directory into place
+    and then points ``LATEST`` at it. ``get`` loads the latest version the
+    first time a model is used, memory-mapping its arrays so every worker
+    shares one page-cache copy, verifies the checksums once per process,
+    and picks up newer versions at most every ``check_interval`` seconds.
+    Each publish prunes all but the newest ``keep_versions`` versions
+    (0 keeps every version).
+    """
+
+    def __init__(
+        self,
+        root: Optional[str] = None,
+        check_interval: Optional[float] = None,
+        verify: Optional[bool] = None,
+        keep_versions: Optional[int] = None
+    ):
+        self.root = root or settings.MODEL_REGISTRY_DIR
+        self.check_interval = settings.MODEL_RELOAD_CHECK_SECONDS if check_interval is None else check_interval
+        self.verify = settings.MODEL_REGISTRY_VERIFY if verify is None else verify
+        self.keep_versions = settings.MODEL_REGISTRY_KEEP_VERSIONS if keep_versions is None else keep_versions
+        self._loaded: Dict[str, RegisteredModel] = {}
+        self._checked_at: Dict[str, float] = {}
+        self._verified: Dict[str, Tuple[int, int]] = {}
+        self._lock = threading.Lock()
+        self.stats = {"publishes": 0, "loads": 0, "reloads": 0, "checksum_failures": 0, "pruned": 0}
+
+    def _model_dir(self, name: str) -> str:
+        if not _NAME_PATTERN.match(name):
+            raise ValueError(f"Invalid model name: {name!r}")
+        # Resolved per call, like the model store, so a relative root follows the working directory
+        return os.path.join(os.path.abspath(self.root), name)
+
+    def latest_version(self, name: str) -> Optional[int]:
+        try:
+            with open(os.path.join(self._model_dir(name), LATEST_FILE)) as handle:
+                return int(json.load(handle)["version"])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def versions(self, name: str) -> List[int]:
+        directory = self._model_dir(name)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(int(entry[1:]) for entry in os.listdir(directory) if re.match(r"^v\d+$", entry))
+
+    def publish(
+        self,
+        name: str,
+        model: Any,
+        scaler: Any = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        version: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Write a new version and make it the latest; returns its manifest"""
+        directory = self._model_dir(name)
+        os.makedirs(directory, exist_ok=True)
+        version = version or (self.latest_version(name) or 0) + 1
+        temp_dir = os.path.join(directory, f".v{version}.{os.getpid()}.tmp")
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        os.makedirs(temp_dir)
+
+        manifest: Dict[str, Any] = {
+            "name": name,
+            "version": version,
+            "published_at": datetime.now().isoformat(),
+            "metadata": metadata or {},
+            "files": {},
+        }
+        try:
+            compiled = CompiledForest.from_estimator(model)
+        except (TypeError, AttributeError):
+            compiled = None
+
+        if compiled is not None:
+            manifest.update(format="forest", bias=compiled.bias, max_depth=compiled.max_depth, n_features=compiled.n_features_in_)
+            for array_name in FOREST_ARRAYS:
+                np.save(os.path.join(temp_dir, f"{array_name}.npy"), compiled.arrays[array_name], allow_pickle=False)
+        else:
+            manifest["format"] = "joblib"
+            joblib.dump(model, os.path.join(temp_dir, "model.joblib"), compress=0)
+        if scaler is not None:
+            joblib.dump(scaler, os.path.join(temp_dir, "scaler.joblib"), compress=0)
+
+        for file_name in sorted(os.listdir(temp_dir)):
+            manifest["files"][file_name] = _sha256(os.path.join(temp_dir, file_name))
+        with open(os.path.join(temp_dir, MANIFEST_FILE), "w") as handle:
+            json.dump(manifest, handle, indent=2, default=str)
+
+        target = os.path.join(directory, f"v{version}")
+        if os.path.exists(target):
+            # Republishing a version: mapped files of the old directory stay valid until unmapped
+            shutil.rmtree(target)
+        os.rename(temp_dir, target)
+        _write_json_atomic(os.path.join(directory, LATEST_FILE), {"version": version})
+        if self.keep_versions:
+            # Workers still mapping a removed version keep their pages until they reload
+            self.prune(name, self.keep_versions)
+
+        self.stats["publishes"] += 1
+        logger.info(f"Published {name} v{version} ({manifest['format']})")
+        return manifest
+
+    def get(self, name: str, version: Optional[int] = None, force: bool = False) -> RegisteredModel:
+        """Loaded model (latest version unless ``version`` is given), loading it on first use"""
+        directory = self._model_dir(name)
+        key = directory if version is None else f"{directory}@{version}"
+        entry = self._loaded.get(key)
+        now = time.monotonic()
+        if entry is not None and (version is not None or (not force and now - self._checked_at.get(key, 0) < self.check_interval)):
+            return entry
+
+        wanted = version or self.latest_version(name)
+        if wanted is None:
+            raise KeyError(f"No published versions of {name}")
+        self._checked_at[key] = now
+        if entry is not None and entry.version == wanted:
+            return entry
+
+        with self._lock:
+            entry = self._loaded.get(key)
+            if entry is None or entry.version != wanted:
+                reloading = entry is not None
+                entry = self._load(name, wanted)
+                self._loaded[key] = entry
+                self.stats["reloads" if reloading else "loads"] += 1
+        return entry
+
+    def _load(self, name: str, version: int) -> RegisteredModel:
+        started = time.perf_counter()
+        directory = os.path.join(self._model_dir(name), f"v{version}")
+        with open(os.path.join(directory, MANIFEST_FILE)) as handle:
+            manifest = json.load(handle)
+        if self.verify:
+            self._verify(directory, manifest)
+
+        if manifest["format"] == "forest":
+            arrays = {
+                array_name: np.load(os.path.join(directory, f"{array_name}.npy"), mmap_mode="r", allow_pickle=False)
+                for array_name in FOREST_ARRAYS
+            }
+            model = CompiledForest(arrays, manifest["bias"], manifest["max_depth"], manifest["n_features"])
+        else:
+            model = joblib.load(os.path.join(directory, "model.joblib"), mmap_mode="r")
+        scaler_path = os.path.join(directory, "scaler.joblib")
+        scaler = joblib.load(scaler_path) if os.path.exists(scaler_path) else None
+
+        load_seconds = time.perf_counter() - started
+        logger.info(f"Loaded {name} v{version} in {load_seconds * 1000:.1f}ms")
+        return RegisteredModel(name, version, model, scaler, manifest, load_seconds)
+
+    def _verify(self, directory: str, manifest: Dict[str, Any]) -> None:
+        for file_name, checksum in manifest["files"].items():
+            path = os.path.join(directory, file_name)
+            stat = os.stat(path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+            # Each process hashes a file once; unchanged files are not read again
+            if self._verified.get(path) == signature:
+                continue
+            if _sha256(path) != checksum:
+                self.stats["checksum_failures"] += 1
+                raise ValueError(f"Checksum mismatch for {path}")
+            self._verified[path] = signature
+
+    def prune(self, name: str, keep: int = 3) -> int:
+        """Delete all but the newest ``keep`` versions (never the latest)"""
+        latest = self.latest_version(name)
+        removed = 0
+        for version in self.versions(name)[:-keep] if keep else self.versions(name):
+            if version != latest:
+                shutil.rmtree(os.path.join(self._model_dir(name), f"v{version}"), ignore_errors=True)
+                removed += 1
+        self.stats["pruned"] += removed
+        return removed
+
+    def get_status(self) -> Dict[str, Any]:
+        """Loaded versions, their load times and footprint"""
+        return {
+            "root": os.path.abspath(self.root),
+            "loaded": {
+                key: {
+                    "version": entry.version,
+                    "format": entry.manifest["format"],
+                    "load_ms": round(entry.load_seconds * 1000, 2),
+                    "mapped_bytes": entry.model.nbytes if isinstance(entry.model, CompiledForest) else None,
+                }
+                for key, entry in self._loaded.items()
+            },
+            **self.stats,
+        }
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_json_atomic(path: str, value: Dict[str, Any]) -> None:
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w") as handle:
+        json.dump(value, handle)
+    os.replace(temp_path, path)
+
+
+# Global model registry instance
+model_registry = ModelRegistry()
@@ -0,0 +1,179 @@
+"""
+Shared Model Store
+Read-only model weights and reference arrays loaded once and shared by all API workers
+"""
+
+import gc
+import os
+import re
+import threading
+import time
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+import joblib
+import numpy as np
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+
+class SharedModelStore:
+    """Model artifacts and reference arrays mapped read-only from disk
+
+    Artifacts are loaded with ``joblib.load(mmap_mode="r")``, so the NumPy
+    arrays inside them (scaler statistics, coefficient matrices, ...) are
+    pages of the file itself: every worker maps the same page-cache copy
+    whether it was forked from a preloading master or spawned by uvicorn.
+    Objects that copy their arrays on unpickling (sklearn trees) still share
+    memory copy-on-write when loaded by the master before fork; ``freeze``
+    keeps the garbage collector from dirtying those pages.
+
+    Retrained models are written to a temporary file and renamed into
+    place. Each worker notices the new file signature on its next ``get``
+    (checked at most every ``check_interval`` seconds) and swaps the cached
+    object; callers still holding the old object finish with it unchanged.
+    """
+
+    def __init__(self, model_dir: Optional[str] = None, check_interval: Optional[float] = None):
+        self.model_dir = model_dir or settings.MODEL_DIR
+        self.check_interval = settings.MODEL_RELOAD_CHECK_SECONDS if check_interval is None else check_interval
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.stats = {"loads": 0, "reloads": 0, "hits": 0, "saves": 0}
+
+    def _resolve(self, path: str) -> str:
+        return os.path.abspath(path if os.path.isabs(path) or os.path.dirname(path) else os.path.join(self.model_dir, path))
+
+    @staticmethod
+    def _signature(path: str) -> Tuple[int, int]:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def get(self, path: str, force: bool = False) -> Any:
+        """Current version of an artifact, loading or reloading it when the file changed
+
+        ``force`` checks the file now instead of waiting for ``check_interval``
+        (e.g. right after another process wrote it).
+        """
+        path = self._resolve(path)
+        entry = self._entries.get(path)
+        now = time.monotonic()
+        if entry is not None and not force and now - entry["checked_at"] < self.check_interval:
+            self.stats["hits"] += 1
+            return entry["value"]
+
+        signature = self._signature(path)
+        if entry is not None and entry["signature"] == signature:
+            entry["checked_at"] = now
+            self.stats["hits"] += 1
+            return entry["value"]
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None or entry["signature"] != signature:
+                value = self._load(path)
+                self.stats["reloads" if entry is not None else "loads"] += 1
+                if entry is not None:
+                    logger.info(f"Reloaded model artifact {path}")
+                entry = {"value": value, "signature": signature, "checked_at": now, "loaded_at": time.time()}
+                self._entries[path] = entry
+        return entry["value"]
+
+    def _load(self, path: str) -> Any:
+        if path.endswith(".npy"):
+            return np.load(path, mmap_mode="r", allow_pickle=False)
+        try:
+            return joblib.load(path, mmap_mode="r")
+        except ValueError:
+            # Plain pickles (not written by joblib) cannot be memory-mapped
+            return joblib.load(path)
+
+    def save(self, value: Any, path: str) -> str:
+        """Write an artifact atomically; readers switch to it on their next check"""
+        path = self._resolve(path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        if isinstance(value, np.ndarray):
+            with open(temp_path, "wb") as handle:
+                np.save(handle, np.ascontiguousarray(value), allow_pickle=False)
+        else:
+            # Uncompressed so arrays can be memory-mapped on load
+            joblib.dump(value, temp_path, compress=0)
+        os.replace(temp_path, path)
+        self.stats["saves"] += 1
+
+        with self._lock:
+            self._entries.pop(path, None)
+        return path
+
+    def share_array(self, name: str, array: np.ndarray) -> np.ndarray:
+        """Publish reference data as a shared read-only array and return the mapped view"""
+        if not _NAME_PATTERN.match(name):
+            raise ValueError(f"Invalid shared array name: {name!r}")
+        path = self.save(array, os.path.join(self.model_dir, "shared", f"{name}.npy"))
+        return self.get(path)
+
+    def get_array(self, name: str) -> np.ndarray:
+        """Shared reference array published by share_array (in this or another process)"""
+        return self.get(os.path.join(self.model_dir, "shared", f"{name}.npy"))
+
+    def preload(self, pattern: str = ".pkl") -> int:
+        """Load every artifact under model_dir (call in the master before workers fork)"""
+        loaded = 0
+        for directory, _, files in os.walk(self.model_dir):
+            for name in sorted(files):
+                if name.endswith(pattern) or name.endswith(".npy"):
+                    try:
+                        self.get(os.path.join(directory, name))
+                        loaded += 1
+                    except Exception as e:
+                        logger.warning(f"Could not preload {name}: {e}")
+        logger.info(f"Preloaded {loaded} model artifacts from {self.model_dir}")
+        return loaded
+
+    @staticmethod
+    def freeze() -> None:
+        """Move every object allocated so far out of GC tracking so forked workers keep sharing its pages"""
+        gc.collect()
+        gc.freeze()
+
+    def get_status(self) -> Dict[str, Any]:
+        """Loaded artifacts and counters"""
+        return {
+            "model_dir": self.model_dir,
+            "artifacts": {
+                path: {"loaded_at": entry["loaded_at"], "size": entry["signature"][1]}
+                for path, entry in self._entries.items()
+            },
+            "frozen_objects": gc.get_freeze_count(),
+            **self.stats,
+        }
+
+
+# Global model store instance
+model_store = SharedModelStore()
+
+_preloaded = False
+
+
+def preload_for_fork() -> bool:
+    """With SERVICE_WARMUP=preload, load artifacts and fork-safe lazy services and freeze the GC
+
+    Every ASGI module gunicorn may load with ``preload_app`` (main.py,
+    app.main) calls this at import time, so the work happens once in the
+    master and forked workers inherit it copy-on-write.
+    """
+    global _preloaded
+    if settings.SERVICE_WARMUP != "preload" or _preloaded:
+        return False
+    from .lazy_loading import service_registry
+
+    model_store.preload()
+    service_registry.preload()
+    model_store.freeze()
+    _preloaded = True
+    return True
@@ -0,0 +1,301 @@
+"""
+Request Inspection Engine
+Precompiled attack-pattern rules evaluated over query, headers and body in a single pass
+"""
+
+import re
+import logging
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+logger = logging.getLogger(__name__)
+
+# Character classes with at most this many literals are used as anchors
+_MAX_CLASS_ANCHORS = 8
+
+# Characters ordered from rarest to most common in typical JSON/query payloads;
+# each anchor is gated on its rarest character, which is found with memchr
+_CHAR_RARITY = "$<>`|&;#!*()\\%@{}[]=+^~'?/-:.,\"zqxjkvbgfywmpucldhsnrioate_0123456789 "
+
+# Above this many anchor occurrences a full regex search is cheaper than probing each one
+_MAX_ANCHOR_PROBES = 4096
+
+
+def _prefix_literals(items) -> Optional[FrozenSet[str]]:
+    """Lower-cased strings of which every match of a parsed pattern starts with one
+
+    Returns None when the pattern can start with an unbounded set of strings
+    (e.g. ``\\w+``), in which case the rule is always searched in full.
+    """
+    prefix = ""
+    for op, av in items:
+        if op is sre_parse.LITERAL:
+            prefix += chr(av).lower()
+            continue
+        if op is sre_parse.AT:
+            # Zero-width assertions are re-checked by the regex at the probe
+            continue
+        if prefix:
+            return frozenset([prefix])
+
+        if op is sre_parse.SUBPATTERN:
+            return _prefix_literals(av[-1])
+        if op is sre_parse.BRANCH:
+            alternatives = [_prefix_literals(branch) for branch in av[1]]
+            return frozenset().union(*alternatives) if all(alternatives) else None
+        if op is sre_parse.IN:
+            if len(av) <= _MAX_CLASS_ANCHORS and all(o is sre_parse.LITERAL for o, _ in av):
+                return frozenset(chr(v).lower() for _, v in av)
+            return None
+        if op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and av[0] >= 1:
+            return _prefix_literals(av[2])
+        return None
+
+    return frozenset([prefix]) if prefix else None
+
+
+def _gate_char(anchor: str) -> str:
+    """Rarest character of an anchor"""
+    return min(anchor, key=lambda char: _CHAR_RARITY.find(char))
+
+
+def _lowercase_pattern(pattern: str) -> Optional[str]:
+    """Pattern with literal characters lower-cased, for use on lower-cased text
+
+    Matching lower-cased text without IGNORECASE lets the regex engine use its
+    literal fast paths. Returns None for patterns whose escapes or inline
+    groups cannot be folded this way.
+    """
+    if "(?" in pattern:
+        return None
+    folded = []
+    index = 0
+    while index < len(pattern):
+        char = pattern[index]
+        if char == "\\":
+            escaped = pattern[index + 1:index + 2]
+            if escaped in ("x", "u", "U", "N") or escaped.isdigit():
+                return None
+            folded.append(pattern[index:index + 2])
+            index += 2
+            continue
+        folded.append(char.lower())
+        index += 1
+    return "".join(folded)
+
+
+@dataclass
+class InspectionRule:
+    """One compiled detection pattern"""
+    family: str
+    pattern: str
+    regex: "re.Pattern"
+    anchors: Optional[FrozenSet[str]]
+
+    @property
+    def label(self) -> str:
+        return f"{self.family}: {self.pattern}"
+
+
+@dataclass
+class InspectionReport:
+    """Rules that matched, grouped by the field they matched in"""
+    hits: Dict[str, List[InspectionRule]] = field(default_factory=dict)
+    scanned: int = 0
+    truncated: bool = False
+
+    @property
+    def clean(self) -> bool:
+        return not self.hits
+
+    def families(self, field_name: str) -> List[str]:
+        """Distinct rule families that matched a field"""
+        return list(dict.fromkeys(rule.family for rule in self.hits.get(field_name, [])))
+
+
+class RequestInspector:
+    """Compiled rule families evaluated over a request in one pass
+
+    All rules are compiled once, and each gets the set of literals its
+    matches must start with (e.g. ``select`` for a SQL keyword rule, ``../``
+    for traversal). A scan lower-cases every field once into one buffer and
+    looks the anchors up with C-level substring searches, skipping every
+    anchor whose rarest character is absent. Only rules whose anchors occur
+    are run: as anchored ``match`` probes at each occurrence or, for very
+    common anchors, as one search of the buffer. Rules
+    whose literals could be folded run without IGNORECASE on the lower-cased
+    buffer so the regex engine keeps its literal fast paths.
+
+    At most ``max_scan_size`` characters are inspected per request; the rest
+    is counted as truncated.
+    """
+
+    def __init__(self, rule_families: Dict[str, List[str]], max_scan_size: int = 64 * 1024):
+        self.max_scan_size = max_scan_size
+        self.rules: List[InspectionRule] = []
+        self._anchor_index: Dict[str, List[int]] = {}
+        self._anchor_gates: List[Tuple[str, str, List[int]]] = []
+        self._unanchored: List[int] = []
+
+        for family, patterns in rule_families.items():
+            for pattern in patterns:
+                try:
+                    folded = _lowercase_pattern(pattern)
+                    regex = re.compile(folded) if folded is not None else re.compile(pattern, re.IGNORECASE)
+                    anchors = _prefix_literals(sre_parse.parse(pattern, re.IGNORECASE))
+                except re.error as e:
+                    logger.error(f"Invalid inspection pattern {pattern!r}: {e}")
+                    continue
+
+                index = len(self.rules)
+                self.rules.append(InspectionRule(family, pattern, regex, anchors))
+                if anchors:
+                    for anchor in anchors:
+                        self._anchor_index.setdefault(anchor, []).append(index)
+                else:
+                    self._unanchored.append(index)
+
+        self._anchor_gates = sorted(
+            ((_gate_char(anchor), anchor, indexes) for anchor, indexes in self._anchor_index.items()),
+            key=lambda gate: gate[0]
+        )
+        self.rule_hits = [0] * len(self.rules)
+        self.stats = {"scans": 0, "chars_scanned": 0, "truncated": 0, "rules_evaluated": 0}
+
+    def scan(self, text: str, families: Optional[Iterable[str]] = None) -> List[InspectionRule]:
+        """Rules matching a single text"""
+        report = self.scan_fields([("text", text)], families)
+        return report.hits.get("text", [])
+
+    def scan_fields(
+        self,
+        fields: Iterable[Tuple[str, str]],
+        families: Optional[Iterable[str]] = None
+    ) -> InspectionReport:
+        """Scan named fields (query params, headers, body) in one pass"""
+        report = InspectionReport()
+        names: List[str] = []
+        starts: List[int] = []
+        ends: List[int] = []
+        parts: List[str] = []
+        budget = self.max_scan_size
+        offset = 0
+
+        for name, value in fields:
+            if not value:
+                continue
+            if budget <= 0:
+                report.truncated = True
+                break
+            if len(value) > budget:
+                value = value[:budget]
+                report.truncated = True
+            value = value.lower()
+            names.append(name)
+            starts.append(offset)
+            ends.append(offset + len(value))
+            parts.append(value)
+            offset += len(value) + 1
+            budget -= len(value)
+            report.scanned += len(value)
+
+        self.stats["scans"] += 1
+        self.stats["chars_scanned"] += report.scanned
+        if report.truncated:
+            self.stats["truncated"] += 1
+        if not parts:
+            return report
+
+        # Fields are scanned as one string; every match is capped at its own field's end
+        text = "\n".join(parts)
+        probes: Dict[int, List[int]] = {index: [] for index in self._unanchored}
+        full_search = set(self._unanchored)
+        present: Dict[str, bool] = {}
+        for gate, anchor, indexes in self._anchor_gates:
+            if gate not in present:
+                present[gate] = gate in text
+            if not present[gate]:
+                continue
+            count = text.count(anchor)
+            if not count:
+                continue
+            positions = None if count > _MAX_ANCHOR_PROBES else _find_all(text, anchor)
+            for index in indexes:
+                if positions is None:
+                    full_search.add(index)
+                probes.setdefault(index, []).extend(positions or ())
+
+        wanted = set(families) if families is not None else None
+        for index in sorted(probes):
+            rule = self.rules[index]
+            if wanted is not None and rule.family not in wanted:
+                continue
+
+            self.stats["rules_evaluated"] += 1
+            if index in full_search:
+                matched_fields = self._search_fields(rule, text, starts, ends)
+            else:
+                matched_fields = self._probe_fields(rule, text, starts, ends, probes[index])
+
+            for position in matched_fields:
+                report.hits.setdefault(names[position], []).append(rule)
+            if matched_fields:
+                self.rule_hits[index] += 1
+
+        return report
+
+    @staticmethod
+    def _search_fields(rule: InspectionRule, text: str, starts: List[int], ends: List[int]) -> List[int]:
+        """Fields a rule matches, one search per matching field"""
+        matched = []
+        match = rule.regex.search(text)
+        while match:
+            position = bisect_right(starts, match.start()) - 1
+            # A match running into the next field only counts if one fits inside this field
+            if match.end() <= ends[position] or rule.regex.search(text, match.start(), ends[position]):
+                matched.append(position)
+            if position + 1 >= len(starts):
+                break
+            match = rule.regex.search(text, starts[position + 1])
+        return matched
+
+    @staticmethod
+    def _probe_fields(
+        rule: InspectionRule, text: str, starts: List[int], ends: List[int], positions: List[int]
+    ) -> List[int]:
+        """Fields a rule matches, trying the regex only where an anchor occurs"""
+        matched = []
+        for offset in sorted(positions):
+            position = bisect_right(starts, offset) - 1
+            if matched and matched[-1] == position:
+                continue
+            if rule.regex.match(text, offset, ends[position]):
+                matched.append(position)
+        return matched
+
+    def get_stats(self) -> Dict[str, object]:
+        """Scan counters and per-rule hit counts"""
+        return {
+            **self.stats,
+            "rules": len(self.rules),
+            "unanchored_rules": len(self._unanchored),
+            "rule_hits": {
+                rule.label: hits for rule, hits in zip(self.rules, self.rule_hits) if hits
+            },
+        }
+
+
+def _find_all(text: str, literal: str) -> List[int]:
+    """Start offsets of every occurrence of a literal"""
+    positions = []
+    offset = text.find(literal)
+    while offset != -1:
+        positions.append(offset)
+        offset = text.find(literal, offset + 1)
+    return positions
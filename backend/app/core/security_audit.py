@@ -17,15 +17,33 @@ from urllib.parse import urlparse
 import aiohttp
 from fastapi import HTTPException, status, Request
 from .config import settings
+from .request_inspection import RequestInspector
 
 # Configure structured logging
 logger = structlog.get_logger()
 
+# Request locations each vulnerability family is checked in
+INSPECTED_LOCATIONS = {
+    "sql_injection": ("query", "body"),
+    "xss": ("query",),
+    "path_traversal": ("path",),
+    "command_injection": ("query",),
+    "ldap_injection": ("query",),
+}
+
+VULNERABILITY_SEVERITY = {
+    "command_injection": "critical",
+}
+
+# Upper bound on query, path and body characters inspected per request
+MAX_INSPECTION_SIZE = 64 * 1024
+
 class SecurityAuditor:
     """Comprehensive security auditor for OWASP compliance."""
     
     def __init__(self):
         self.vulnerability_db = self._load_vulnerability_patterns()
+        self.inspector = RequestInspector(self.vulnerability_db, max_scan_size=MAX_INSPECTION_SIZE)
         self.security_headers = {
             "X-Content-Type-Options": "nosniff",
             "X-Frame-Options": "DENY",
@@ -92,12 +110,8 @@ class SecurityAuditor:
         }
         
         try:
-            # Check for common attack patterns
-            await self._check_sql_injection(request, audit_result)
-            await self._check_xss(request, audit_result)
-            await self._check_path_traversal(request, audit_result)
-            await self._check_command_injection(request, audit_result)
-            await self._check_ldap_injection(request, audit_result)
+            # Check for common attack patterns (single pass over query, path and body)
+            await self._check_attack_patterns(request, audit_result)
             
             # Check request headers
             self._check_security_headers(request, audit_result)
@@ -124,97 +138,43 @@ class SecurityAuditor:
             audit_result["error"] = str(e)
             return audit_result
     
-    async def _check_sql_injection(self, request: Request, audit_result: Dict[str, Any]):
-        """Check for SQL injection patterns in request."""
+    async def _check_attack_patterns(self, request: Request, audit_result: Dict[str, Any]):
+        """Check query parameters, URL path and body against all vulnerability patterns."""
         try:
-            # Check query parameters
-            query_params = dict(request.query_params)
-            for param_name, param_value in query_params.items():
-                if self._matches_patterns(param_value, self.vulnerability_db["sql_injection"]):
-                    audit_result["vulnerabilities"].append({
-                        "type": "sql_injection",
-                        "parameter": param_name,
-                        "value": param_value,
-                        "severity": "high"
-                    })
+            fields = [("query", name, value) for name, value in request.query_params.items()]
+            fields.append(("path", "url_path", str(request.url.path)))
             
-            # Check form data if POST/PUT
+            # Read and decode the body once for every family that inspects it
             if request.method in ["POST", "PUT"]:
                 try:
                     body = await request.body()
                     if body:
-                        body_str = body.decode('utf-8')
-                        if self._matches_patterns(body_str, self.vulnerability_db["sql_injection"]):
-                            audit_result["vulnerabilities"].append({
-                                "type": "sql_injection",
-                                "parameter": "request_body",
-                                "value": body_str[:100] + "..." if len(body_str) > 100 else body_str,
-                                "severity": "high"
-                            })
+                        body_str = body[:MAX_INSPECTION_SIZE].decode('utf-8', 'replace')
+                        fields.append(("body", "request_body", body_str))
                 except Exception:
                     pass
-                    
-        except Exception as e:
-            logger.error(f"SQL injection check error: {e}")
-    
-    async def _check_xss(self, request: Request, audit_result: Dict[str, Any]):
-        """Check for XSS patterns in request."""
-        try:
-            query_params = dict(request.query_params)
-            for param_name, param_value in query_params.items():
-                if self._matches_patterns(param_value, self.vulnerability_db["xss"]):
-                    audit_result["vulnerabilities"].append({
-                        "type": "xss",
-                        "parameter": param_name,
-                        "value": param_value,
-                        "severity": "high"
-                    })
-        except Exception as e:
-            logger.error(f"XSS check error: {e}")
-    
-    async def _check_path_traversal(self, request: Request, audit_result: Dict[str, Any]):
-        """Check for path traversal attempts."""
-        try:
-            path = str(request.url.path)
-            if self._matches_patterns(path, self.vulnerability_db["path_traversal"]):
-                audit_result["vulnerabilities"].append({
-                    "type": "path_traversal",
-                    "parameter": "url_path",
-                    "value": path,
-                    "severity": "high"
-                })
-        except Exception as e:
-            logger.error(f"Path traversal check error: {e}")
-    
-    async def _check_command_injection(self, request: Request, audit_result: Dict[str, Any]):
-        """Check for command injection patterns."""
-        try:
-            query_params = dict(request.query_params)
-            for param_name, param_value in query_params.items():
-                if self._matches_patterns(param_value, self.vulnerability_db["command_injection"]):
-                    audit_result["vulnerabilities"].append({
-                        "type": "command_injection",
-                        "parameter": param_name,
-                        "value": param_value,
-                        "severity": "critical"
-                    })
-        except Exception as e:
-            logger.error(f"Command injection check error: {e}")
-    
-    async def _check_ldap_injection(self, request: Request, audit_result: Dict[str, Any]):
-        """Check for LDAP injection patterns."""
-        try:
-            query_params = dict(request.query_params)
-            for param_name, param_value in query_params.items():
-                if self._matches_patterns(param_value, self.vulnerability_db["ldap_injection"]):
+            
+            report = self.inspector.scan_fields(
+                (f"{location}:{name}", value) for location, name, value in fields
+            )
+            if report.clean:
+                return
+            
+            for vuln_type, locations in INSPECTED_LOCATIONS.items():
+                for location, name, value in fields:
+                    if location not in locations or vuln_type not in report.families(f"{location}:{name}"):
+                        continue
+                    if location == "body" and len(value) > 100:
+                        value = value[:100] + "..."
                     audit_result["vulnerabilities"].append({
-                        "type": "ldap_injection",
-                        "parameter": param_name,
-                        "value": param_value,
-                        "severity": "high"
+                        "type": vuln_type,
+                        "parameter": name,
+                        "value": value,
+                        "severity": VULNERABILITY_SEVERITY.get(vuln_type, "high")
                     })
+                    
         except Exception as e:
-            logger.error(f"LDAP injection check error: {e}")
+            logger.error(f"Attack pattern check error: {e}")
     
     def _check_security_headers(self, request: Request, audit_result: Dict[str, Any]):
         """Check if security headers are present and properly configured."""
@@ -340,6 +300,11 @@ class SecurityMiddleware:
             # Perform security audit
             audit_result = await self.auditor.audit_request(request)
             
+            # The audit consumed the body; replay it for the application
+            body = getattr(request, "_body", None)
+            if body is not None:
+                receive = self._replay_body(body, receive)
+            
             # Block requests with critical vulnerabilities
             critical_vulns = [v for v in audit_result["vulnerabilities"] if v["severity"] == "critical"]
             if critical_vulns:
@@ -351,6 +316,20 @@ class SecurityMiddleware:
             scope["security_audit"] = audit_result
         
         await self.app(scope, receive, send)
+    
+    @staticmethod
+    def _replay_body(body: bytes, receive):
+        """Receive callable that returns the already-read body first."""
+        replayed = False
+        
+        async def replay():
+            nonlocal replayed
+            if replayed:
+                return await receive()
+            replayed = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        
+        return replay
 
 # Initialize security auditor
 security_auditor = SecurityAuditor()
@@ -0,0 +1,179 @@
+"""
+Market Data Tick Stream
+In-process tick hub with per-subscriber filters, bounded buffers and size/time micro-batching
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .market_data_codec import SymbolRegistry, symbol_registry, to_epoch_ms
+
+logger = logging.getLogger(__name__)
+
+# (symbol id, bid, ask, last, volume, epoch ms)
+TickRow = Tuple[int, float, float, float, float, int]
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_BATCH_DELAY = 0.005
+DEFAULT_PENDING_BATCHES = 64
+
+
+class TickSubscriber:
+    """One consumer's filtered, bounded tick buffer
+
+    Producers never wait on a subscriber: at most ``max_pending_batches``
+    batches are buffered and the oldest ticks are dropped (and counted) when
+    a consumer falls behind. ``next_batch`` returns once ``max_batch_size``
+    ticks are buffered or the oldest buffered tick has waited
+    ``max_batch_delay`` seconds.
+    """
+
+    def __init__(
+        self,
+        symbol_ids: Optional[Set[int]] = None,
+        max_batch_size: int = DEFAULT_BATCH_SIZE,
+        max_batch_delay: float = DEFAULT_BATCH_DELAY,
+        max_pending_batches: int = DEFAULT_PENDING_BATCHES
+    ):
+        self.symbol_ids = symbol_ids
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_batch_delay = max(0.0, max_batch_delay)
+        self.max_pending = self.max_batch_size * max(1, max_pending_batches)
+        self._buffer: List[TickRow] = []
+        self._first_at = 0.0
+        self._ready = asyncio.Event()
+        self.closed = False
+        self.sequence = 0
+        self.dropped = 0
+        self.delivered = 0
+        self._dropped_since_batch = 0
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def offer(self, rows: List[TickRow]) -> None:
+        """Buffer ticks for this subscriber"""
+        if self.symbol_ids is not None:
+            rows = [row for row in rows if row[0] in self.symbol_ids]
+        if not rows or self.closed:
+            return
+
+        was_empty = not self._buffer
+        if was_empty:
+            self._first_at = time.monotonic()
+        self._buffer.extend(rows)
+
+        overflow = len(self._buffer) - self.max_pending
+        if overflow > 0:
+            del self._buffer[:overflow]
+            self.dropped += overflow
+            self._dropped_since_batch += overflow
+
+        if was_empty or len(self._buffer) >= self.max_batch_size:
+            self._ready.set()
+
+    async def next_batch(self) -> Tuple[List[TickRow], int]:
+        """Wait for the next batch; returns its ticks and the ticks dropped since the last one"""
+        while not self.closed:
+            if len(self._buffer) >= self.max_batch_size:
+                break
+            self._ready.clear()
+            if not self._buffer:
+                await self._ready.wait()
+                continue
+            remaining = self._first_at + self.max_batch_delay - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                await asyncio.wait_for(self._ready.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+
+        rows = self._buffer[:self.max_batch_size]
+        del self._buffer[:self.max_batch_size]
+        # Whatever is left is already overdue and goes out with the next batch
+        dropped, self._dropped_since_batch = self._dropped_since_batch, 0
+        self.sequence += 1
+        self.delivered += len(rows)
+        return rows, dropped
+
+    def close(self) -> None:
+        """Wake a waiting consumer and stop buffering"""
+        self.closed = True
+        self._ready.set()
+
+
+class TickHub:
+    """Fans ticks from market data feeds out to stream subscribers"""
+
+    def __init__(self, registry: SymbolRegistry = symbol_registry):
+        self.registry = registry
+        self.subscribers: Set[TickSubscriber] = set()
+        self.published = 0
+
+    def subscribe(self, symbols: Iterable[str] = (), **options: Any) -> TickSubscriber:
+        """Register a subscriber for some symbols (all symbols when empty)"""
+        symbols = list(symbols)
+        symbol_ids = {self.registry.get_id(symbol)[0] for symbol in symbols} if symbols else None
+        subscriber = TickSubscriber(symbol_ids, **options)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: TickSubscriber) -> None:
+        subscriber.close()
+        self.subscribers.discard(subscriber)
+
+    def to_row(self, tick: Dict[str, Any]) -> TickRow:
+        """Tick dict (symbol, bid, ask, last, volume, timestamp) as a row"""
+        return (
+            self.registry.get_id(tick["symbol"])[0],
+            float(tick.get("bid") or 0.0),
+            float(tick.get("ask") or 0.0),
+            float(tick.get("last") or 0.0),
+            float(tick.get("volume") or 0.0),
+            to_epoch_ms(tick.get("timestamp")),
+        )
+
+    def publish(self, ticks: List[Dict[str, Any]]) -> None:
+        """Publish tick dicts to every matching subscriber"""
+        self.publish_rows([self.to_row(tick) for tick in ticks])
+
+    def publish_rows(self, rows: List[TickRow]) -> None:
+        """Publish already-encoded tick rows to every matching subscriber"""
+        if not rows:
+            return
+        self.published += len(rows)
+        for subscriber in list(self.subscribers):
+            subscriber.offer(rows)
+
+    def attach(self, integration) -> None:
+        """Publish every update from a MarketDataIntegration observer"""
+        integration.observer.subscribe(lambda market_data: self.publish([market_data_to_tick(market_data)]))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hub statistics"""
+        return {
+            "subscribers": len(self.subscribers),
+            "published": self.published,
+            "buffered": sum(len(subscriber) for subscriber in self.subscribers),
+            "dropped": sum(subscriber.dropped for subscriber in self.subscribers),
+        }
+
+
+def market_data_to_tick(market_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Tick for a MarketDataIntegration feed record, keyed by commodity and exchange"""
+    depth = market_data.get("market_depth") or {}
+    return {
+        "symbol": f"{market_data['commodity']}:{market_data['exchange']}",
+        "bid": depth.get("best_bid"),
+        "ask": depth.get("best_ask"),
+        "last": market_data.get("price"),
+        "volume": market_data.get("volume"),
+        "timestamp": market_data.get("timestamp"),
+    }
+
+
+# Global tick hub instance
+tick_hub = TickHub()
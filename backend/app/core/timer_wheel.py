@@ -0,0 +1,105 @@
+"""
+Hierarchical Timer Wheel
+O(1) scheduling and cancellation of per-connection heartbeats and idle timeouts
+"""
+
+import math
+from typing import Any, Dict, Hashable, List, Tuple
+
+
+class HierarchicalTimerWheel:
+    """Hierarchical timing wheel keyed by arbitrary hashable timer keys
+
+    Level 0 has one slot per tick; each higher level covers ``slots_per_level``
+    slots of the level below. Timers are placed in the lowest level whose span
+    covers their deadline and cascade down as the wheel turns, so schedule and
+    cancel are O(1) and ``advance`` only touches timers that are due (plus the
+    occasional cascade). Deadlines beyond the top level's span are parked in
+    the top level and re-placed when their slot comes round.
+
+    The wheel is clock agnostic: callers pass monotonic seconds to ``advance``.
+    """
+
+    def __init__(self, tick_seconds: float = 1.0, slots_per_level: int = 64,
+                 levels: int = 4, start: float = 0.0):
+        if tick_seconds <= 0 or slots_per_level < 2 or levels < 1:
+            raise ValueError("Invalid timer wheel geometry")
+
+        self.tick_seconds = tick_seconds
+        self.slots_per_level = slots_per_level
+        self.levels = levels
+        self._spans = [slots_per_level ** level for level in range(levels + 1)]
+        self._wheels: List[List[Dict[Hashable, Tuple[int, Any]]]] = [
+            [{} for _ in range(slots_per_level)] for _ in range(levels)
+        ]
+        self._locations: Dict[Hashable, Tuple[int, int]] = {}
+        self._current_tick = int(start // tick_seconds)
+
+    def __len__(self) -> int:
+        return len(self._locations)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._locations
+
+    @property
+    def now(self) -> float:
+        """Wheel time in seconds (start of the current tick)"""
+        return self._current_tick * self.tick_seconds
+
+    def schedule(self, key: Hashable, delay_seconds: float, payload: Any = None) -> None:
+        """Schedule (or reschedule) a timer to fire after delay_seconds"""
+        self.cancel(key)
+        ticks = max(1, math.ceil(delay_seconds / self.tick_seconds))
+        self._place(key, self._current_tick + ticks, payload)
+
+    def cancel(self, key: Hashable) -> bool:
+        """Cancel a timer, returning whether it was scheduled"""
+        location = self._locations.pop(key, None)
+        if location is None:
+            return False
+        level, slot = location
+        del self._wheels[level][slot][key]
+        return True
+
+    def advance(self, now: float) -> List[Tuple[Hashable, Any]]:
+        """Move the wheel to ``now`` and return the (key, payload) pairs that fired"""
+        target_tick = int(now // self.tick_seconds)
+        expired: List[Tuple[Hashable, Any]] = []
+
+        while self._current_tick < target_tick:
+            self._current_tick += 1
+            tick = self._current_tick
+
+            # Cascade higher levels whose rotation boundary we just crossed
+            for level in range(1, self.levels):
+                if tick % self._spans[level]:
+                    break
+                slot = (tick // self._spans[level]) % self.slots_per_level
+                self._drain(level, slot, expired)
+
+            self._drain(0, tick % self.slots_per_level, expired)
+
+        return expired
+
+    def _drain(self, level: int, slot: int, expired: List[Tuple[Hashable, Any]]) -> None:
+        """Empty one slot, firing due timers and re-placing the rest"""
+        bucket = self._wheels[level][slot]
+        if not bucket:
+            return
+        self._wheels[level][slot] = {}
+        for key, (deadline, payload) in bucket.items():
+            del self._locations[key]
+            if deadline <= self._current_tick:
+                expired.append((key, payload))
+            else:
+                self._place(key, deadline, payload)
+
+    def _place(self, key: Hashable, deadline: int, payload: Any) -> None:
+        """Put a timer in the lowest level whose span covers its deadline"""
+        delta = deadline - self._current_tick
+        level = 0
+        while level < self.levels - 1 and delta >= self._spans[level + 1]:
+            level += 1
+        slot = (deadline // self._spans[level]) % self.slots_per_level
+        self._wheels[level][slot][key] = (deadline, payload)
+        self._locations[key] = (level, slot)
@@ -0,0 +1,347 @@
+"""
+Verified Token Cache, Revocation List and Permission Matrix
+Keeps JWT verification and RBAC checks off the signature-decode path for repeat requests
+"""
+
+import asyncio
+import hashlib
+import logging
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .config import settings
+from .websocket_fanout import (
+    SCOPE_ALL,
+    FanoutBridge,
+    RedisFanoutBridge,
+    UnixSocketFanoutBridge,
+)
+
+logger = logging.getLogger(__name__)
+
+REVOCATION_MESSAGE = "token_revoked"
+
+
+def token_digest(token: str) -> str:
+    """Stable digest identifying a token without keeping the token itself"""
+    return hashlib.blake2b(token.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class VerifiedTokenCache:
+    """Bounded LRU of token digest -> verified claims, valid until the token's exp"""
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, digest: str, now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Cached claims for a digest, or None if absent or expired"""
+        entry = self._entries.get(digest)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        claims, expires_at = entry
+        if (time.time() if now is None else now) >= expires_at:
+            del self._entries[digest]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(digest)
+        self.hits += 1
+        return claims
+
+    def put(self, digest: str, claims: Dict[str, Any], expires_at: Optional[float]) -> None:
+        """Cache verified claims until expires_at (tokens without exp are not cached)"""
+        if expires_at is None:
+            return
+        self._entries[digest] = (claims, float(expires_at))
+        self._entries.move_to_end(digest)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def discard(self, digest: str) -> None:
+        """Drop a digest from the cache"""
+        self._entries.pop(digest, None)
+
+    def clear(self) -> None:
+        """Drop every cached token"""
+        self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Cache statistics"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over hex digests
+
+    Bit positions are derived from the digest itself (double hashing on its
+    two 64-bit halves), so membership tests need no extra hashing.
+    """
+
+    def __init__(self, capacity: int = 100000, error_rate: float = 0.001):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, digest: str) -> Iterable[int]:
+        value = int(digest, 16)
+        first = value & 0xFFFFFFFFFFFFFFFF
+        second = (value >> 64) | 1
+        return ((first + i * second) % self.size for i in range(self.hash_count))
+
+    def add(self, digest: str) -> None:
+        for position in self._positions(digest):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, digest: str) -> bool:
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(digest))
+
+
+class RedisRevocationStore:
+    """Exact revocation store shared by all workers (one key per digest, expiring with the token)"""
+
+    def __init__(self, redis_url: str, prefix: str = "auth:revoked"):
+        self.redis_url = redis_url
+        self.prefix = prefix
+        self._client = None
+
+    def _get_client(self):
+        if self._client is None:
+            import redis.asyncio as aioredis
+            self._client = aioredis.from_url(self.redis_url, decode_responses=True)
+        return self._client
+
+    async def add(self, digest: str, expires_at: float) -> None:
+        ttl_ms = int((expires_at - time.time()) * 1000)
+        if ttl_ms > 0:
+            await self._get_client().set(f"{self.prefix}:{digest}", expires_at, px=ttl_ms)
+
+    async def load(self) -> Dict[str, float]:
+        """All unexpired revocations"""
+        client = self._get_client()
+        revoked = {}
+        async for key in client.scan_iter(match=f"{self.prefix}:*", count=1000):
+            value = await client.get(key)
+            if value is not None:
+                revoked[key.rsplit(":", 1)[-1]] = float(value)
+        return revoked
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+
+class RevocationList:
+    """Revoked token digests with a Bloom filter in front of the exact set
+
+    ``is_revoked`` answers from the Bloom filter for the common case (token
+    not revoked) and only consults the exact digest -> exp map on a filter
+    hit, so false positives never reject a valid token. Entries are dropped
+    once the token would have expired anyway.
+
+    When attached to a fan-out bridge, revocations are published to every
+    other worker and received ones are applied locally; an optional shared
+    store lets workers that start later load existing revocations.
+    """
+
+    def __init__(self, capacity: int = 100000, error_rate: float = 0.001):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._exact: Dict[str, float] = {}
+        self.bridge: Optional[FanoutBridge] = None
+        self.store: Optional[RedisRevocationStore] = None
+        self._pending: set = set()
+        self.bloom_hits = 0
+        self.false_positives = 0
+        self.received = 0
+
+    def __len__(self) -> int:
+        return len(self._exact)
+
+    def is_revoked(self, digest: str, now: Optional[float] = None) -> bool:
+        """Whether a token digest has been revoked"""
+        if digest not in self._bloom:
+            return False
+
+        self.bloom_hits += 1
+        expires_at = self._exact.get(digest)
+        if expires_at is None:
+            self.false_positives += 1
+            return False
+        return (time.time() if now is None else now) < expires_at
+
+    def add(self, digest: str, expires_at: float) -> None:
+        """Record a revocation locally"""
+        if digest in self._exact:
+            self._exact[digest] = max(self._exact[digest], expires_at)
+            return
+        self._exact[digest] = expires_at
+        if self._bloom.count >= self.capacity:
+            self.prune()
+        self._bloom.add(digest)
+
+    def revoke(self, digest: str, expires_at: float) -> None:
+        """Record a revocation and propagate it to other workers"""
+        self.add(digest, expires_at)
+        if self.bridge is None and self.store is None:
+            return
+        try:
+            task = asyncio.get_running_loop().create_task(self._propagate(digest, expires_at))
+        except RuntimeError:
+            logger.warning("No running event loop, revocation not propagated to other workers")
+            return
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _propagate(self, digest: str, expires_at: float) -> None:
+        try:
+            if self.store is not None:
+                await self.store.add(digest, expires_at)
+            if self.bridge is not None:
+                await self.bridge.publish(SCOPE_ALL, None, {
+                    "type": REVOCATION_MESSAGE,
+                    "digest": digest,
+                    "expires_at": expires_at,
+                })
+        except Exception as e:
+            logger.error(f"Error propagating token revocation: {e}")
+
+    async def _handle_envelope(self, envelope: Dict[str, Any]) -> None:
+        message = envelope.get("message") or {}
+        if message.get("type") == REVOCATION_MESSAGE:
+            self.add(message["digest"], float(message["expires_at"]))
+            self.received += 1
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """Drop expired revocations and rebuild the Bloom filter"""
+        now = time.time() if now is None else now
+        expired = [digest for digest, expires_at in self._exact.items() if expires_at <= now]
+        for digest in expired:
+            del self._exact[digest]
+
+        # Grow when live revocations alone would saturate the filter
+        while len(self._exact) >= self.capacity:
+            self.capacity *= 2
+        self._bloom = BloomFilter(self.capacity, self.error_rate)
+        for digest in self._exact:
+            self._bloom.add(digest)
+        return len(expired)
+
+    async def attach(self, bridge: FanoutBridge, store: Optional[RedisRevocationStore] = None) -> None:
+        """Start sharing revocations with other workers"""
+        self.bridge = bridge
+        self.store = store
+        await bridge.start(self._handle_envelope)
+        if store is not None:
+            try:
+                for digest, expires_at in (await store.load()).items():
+                    self.add(digest, expires_at)
+            except Exception as e:
+                logger.error(f"Error loading shared revocations: {e}")
+
+    async def detach(self) -> None:
+        """Stop sharing revocations"""
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+        if self.bridge is not None:
+            await self.bridge.stop()
+            self.bridge = None
+        if self.store is not None:
+            await self.store.close()
+            self.store = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Revocation list statistics"""
+        return {
+            "revoked": len(self._exact),
+            "bloom_capacity": self.capacity,
+            "bloom_hits": self.bloom_hits,
+            "false_positives": self.false_positives,
+            "received": self.received,
+            "shared": self.bridge is not None,
+        }
+
+
+class PermissionMatrix:
+    """Role x permission bitmap compiled from a role -> permissions mapping
+
+    Each permission gets one bit and each role a bitmask, so a check is two
+    dict lookups and an AND. Roles holding ``*`` allow every permission,
+    including ones not in the mapping.
+    """
+
+    WILDCARD = "*"
+
+    def __init__(self, role_permissions: Dict[str, List[str]]):
+        self.compile(role_permissions)
+
+    def compile(self, role_permissions: Dict[str, List[str]]) -> None:
+        """(Re)build the bitmap after the role mapping changes"""
+        self._bits: Dict[str, int] = {}
+        self._masks: Dict[str, int] = {}
+        self._permissions: Dict[str, Tuple[str, ...]] = {}
+        self._wildcard_roles = set()
+
+        for role, permissions in role_permissions.items():
+            mask = 0
+            for permission in permissions:
+                if permission == self.WILDCARD:
+                    self._wildcard_roles.add(role)
+                    continue
+                bit = self._bits.setdefault(permission, 1 << len(self._bits))
+                mask |= bit
+            self._masks[role] = mask
+            self._permissions[role] = tuple(permissions)
+
+    def allows(self, role: str, permission: str) -> bool:
+        """Whether a role grants a permission"""
+        if role in self._wildcard_roles:
+            return True
+        return bool(self._masks.get(role, 0) & self._bits.get(permission, 0))
+
+    def permissions(self, role: str) -> List[str]:
+        """Permissions listed for a role"""
+        return list(self._permissions.get(role, ()))
+
+
+def create_revocation_sync(backend: Optional[str] = None) -> Optional[Tuple[FanoutBridge, Optional[RedisRevocationStore]]]:
+    """Create the configured revocation bridge and shared store
+
+    Returns None when revocations stay local to each worker.
+    """
+    backend = (backend or settings.AUTH_REVOCATION_BACKEND).lower()
+
+    if backend == "unix":
+        return UnixSocketFanoutBridge(os.path.join(settings.WS_FANOUT_SOCKET_DIR, "auth")), None
+    if backend == "redis":
+        return (
+            RedisFanoutBridge(settings.REDIS_URL, channel=settings.AUTH_REVOCATION_CHANNEL),
+            RedisRevocationStore(settings.REDIS_URL),
+        )
+    if backend not in ("", "none"):
+        logger.warning(f"Unknown AUTH_REVOCATION_BACKEND '{backend}', revocations stay local")
+    return None
@@ -0,0 +1,437 @@
+"""
+WebSocket Fan-out Bridge for Multi-Worker Deployments
+Relays broadcasts between worker processes so every local socket receives them
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+from abc import ABC, abstractmethod
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from uuid import uuid4
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+FanoutHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+# Broadcast scopes understood by ConnectionManager
+SCOPE_ORGANIZATION = "organization"
+SCOPE_USER = "user"
+SCOPE_ALL = "all"
+# Market data ticks, filtered by each connection's subscriptions on delivery
+SCOPE_MARKET_DATA = "market_data"
+
+
+def default_worker_id() -> str:
+    """Build a worker identifier that is unique across hosts and processes"""
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid4().hex[:6]}"
+
+
+def presence_key(scope: str, target: str) -> str:
+    """Presence index key for an organization or user"""
+    return f"{scope}:{target}"
+
+
+class FanoutBridge(ABC):
+    """Base class for cross-process broadcast transports
+
+    A broadcast is published once; every other worker receives the envelope and
+    delivers it to its own local sockets. Envelopes published by this worker are
+    dropped on receipt because the publisher already delivered them locally.
+    """
+
+    def __init__(self, worker_id: Optional[str] = None):
+        self.worker_id = worker_id or default_worker_id()
+        self._handler: Optional[FanoutHandler] = None
+        self.published_count = 0
+        self.received_count = 0
+        self.error_count = 0
+
+    async def start(self, handler: FanoutHandler) -> None:
+        """Start receiving envelopes from other workers"""
+        self._handler = handler
+        await self._start()
+        logger.info(f"{self.__class__.__name__} started for worker {self.worker_id}")
+
+    async def stop(self) -> None:
+        """Stop receiving envelopes and release transport resources"""
+        await self._stop()
+        self._handler = None
+        logger.info(f"{self.__class__.__name__} stopped for worker {self.worker_id}")
+
+    async def publish(self, scope: str, target: Optional[str], message: Dict[str, Any]) -> None:
+        """Publish a broadcast envelope to every other worker"""
+        envelope = {
+            "origin": self.worker_id,
+            "scope": scope,
+            "target": target,
+            "message": message,
+        }
+        try:
+            await self._publish(json.dumps(envelope, default=str).encode("utf-8"))
+            self.published_count += 1
+        except Exception as e:
+            logger.error(f"Fan-out publish failed for {scope}:{target}: {e}")
+            self.error_count += 1
+
+    async def _dispatch(self, data: bytes) -> None:
+        """Decode an incoming envelope and hand it to the manager"""
+        try:
+            envelope = json.loads(data)
+        except (ValueError, UnicodeDecodeError):
+            logger.warning("Dropping malformed fan-out envelope")
+            self.error_count += 1
+            return
+
+        if envelope.get("origin") == self.worker_id or self._handler is None:
+            return
+
+        self.received_count += 1
+        try:
+            await self._handler(envelope)
+        except Exception as e:
+            logger.error(f"Fan-out handler failed: {e}")
+            self.error_count += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get bridge statistics"""
+        return {
+            "backend": self.__class__.__name__,
+            "worker_id": self.worker_id,
+            "published": self.published_count,
+            "received": self.received_count,
+            "errors": self.error_count,
+        }
+
+    @abstractmethod
+    async def _start(self) -> None:
+        """Transport specific startup"""
+
+    @abstractmethod
+    async def _stop(self) -> None:
+        """Transport specific shutdown"""
+
+    @abstractmethod
+    async def _publish(self, data: bytes) -> None:
+        """Transport specific publish of an encoded envelope"""
+
+
+class InProcessFanoutHub:
+    """Shared hub connecting in-process bridges (single-process runs and tests)"""
+
+    def __init__(self):
+        self.bridges: List["InProcessFanoutBridge"] = []
+
+
+class InProcessFanoutBridge(FanoutBridge):
+    """Fan-out bridge between managers living in the same process"""
+
+    def __init__(self, hub: InProcessFanoutHub, worker_id: Optional[str] = None):
+        super().__init__(worker_id)
+        self.hub = hub
+
+    async def _start(self) -> None:
+        self.hub.bridges.append(self)
+
+    async def _stop(self) -> None:
+        if self in self.hub.bridges:
+            self.hub.bridges.remove(self)
+
+    async def _publish(self, data: bytes) -> None:
+        for bridge in list(self.hub.bridges):
+            if bridge is not self:
+                await bridge._dispatch(data)
+
+
+class _DatagramReceiver(asyncio.DatagramProtocol):
+    """Datagram protocol feeding received envelopes into a bridge"""
+
+    def __init__(self, bridge: "UnixSocketFanoutBridge"):
+        self.bridge = bridge
+
+    def datagram_received(self, data: bytes, addr: Any) -> None:
+        asyncio.ensure_future(self.bridge._dispatch(data))
+
+    def error_received(self, exc: Exception) -> None:
+        logger.warning(f"Unix fan-out socket error: {exc}")
+        self.bridge.error_count += 1
+
+
+class UnixSocketFanoutBridge(FanoutBridge):
+    """Fan-out bridge for workers on one host using Unix datagram sockets
+
+    Every worker binds ``<socket_dir>/<worker_id>.sock``; publishing sends one
+    datagram to each peer socket found in the directory. Sockets left behind by
+    dead workers are removed on the first failed send. Envelopes are bounded by
+    the kernel datagram limit (``net.core.wmem_default``, ~200KB on Linux).
+
+    There is no presence index in this mode: every organization and user
+    broadcast is sent to every peer, which filters it against its own sockets.
+    """
+
+    SOCKET_SUFFIX = ".sock"
+
+    def __init__(self, socket_dir: str, worker_id: Optional[str] = None):
+        super().__init__(worker_id)
+        self.socket_dir = socket_dir
+        self.socket_path = os.path.join(socket_dir, f"{self.worker_id}{self.SOCKET_SUFFIX}")
+        self._transport: Optional[asyncio.DatagramTransport] = None
+        self._send_socket: Optional[socket.socket] = None
+
+    async def _start(self) -> None:
+        os.makedirs(self.socket_dir, exist_ok=True)
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+        loop = asyncio.get_running_loop()
+        self._transport, _ = await loop.create_datagram_endpoint(
+            lambda: _DatagramReceiver(self),
+            local_addr=self.socket_path,
+            family=socket.AF_UNIX,
+        )
+        self._send_socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._send_socket.setblocking(False)
+
+    async def _stop(self) -> None:
+        if self._transport:
+            self._transport.close()
+            self._transport = None
+        if self._send_socket:
+            self._send_socket.close()
+            self._send_socket = None
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def _peer_paths(self) -> List[str]:
+        """List sockets of the other workers sharing the directory"""
+        try:
+            names = os.listdir(self.socket_dir)
+        except FileNotFoundError:
+            return []
+        return [
+            os.path.join(self.socket_dir, name)
+            for name in names
+            if name.endswith(self.SOCKET_SUFFIX)
+            and os.path.join(self.socket_dir, name) != self.socket_path
+        ]
+
+    async def _publish(self, data: bytes) -> None:
+        if self._send_socket is None:
+            raise RuntimeError("Unix fan-out bridge is not started")
+
+        for path in self._peer_paths():
+            try:
+                self._send_socket.sendto(data, path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Peer worker exited without cleaning up its socket
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+            except BlockingIOError:
+                logger.warning(f"Fan-out peer {path} is not draining, dropping envelope")
+                self.error_count += 1
+
+
+class RedisFanoutBridge(FanoutBridge):
+    """Fan-out bridge for workers across hosts using Redis pub/sub"""
+
+    def __init__(self, redis_url: str, channel: str = "ws:fanout", worker_id: Optional[str] = None):
+        super().__init__(worker_id)
+        self.redis_url = redis_url
+        self.channel = channel
+        self._client = None
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+
+    async def _start(self) -> None:
+        import redis.asyncio as redis
+
+        self._client = redis.from_url(self.redis_url)
+        self._pubsub = self._client.pubsub()
+        await self._pubsub.subscribe(self.channel)
+        self._listener = asyncio.create_task(self._listen())
+
+    async def _listen(self) -> None:
+        """Read envelopes from the subscribed channel"""
+        while True:
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message and message.get("type") == "message":
+                    await self._dispatch(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Redis fan-out listener error: {e}")
+                self.error_count += 1
+                await asyncio.sleep(1)
+
+    async def _stop(self) -> None:
+        if self._listener:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        if self._pubsub:
+            await self._pubsub.unsubscribe(self.channel)
+            await self._pubsub.close()
+            self._pubsub = None
+        if self._client:
+            await self._client.close()
+            self._client = None
+
+    async def _publish(self, data: bytes) -> None:
+        if self._client is None:
+            raise RuntimeError("Redis fan-out bridge is not started")
+        await self._client.publish(self.channel, data)
+
+
+class PresenceIndex:
+    """Tracks which workers hold connections for each organization and user
+
+    The in-memory index only sees the workers that share it; use
+    ``RedisPresenceIndex`` to share presence between processes.
+    """
+
+    def __init__(self, ttl_seconds: float = 0):
+        # Seconds a worker stays listed without a heartbeat (0: listed until cleared)
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[str, Dict[str, int]] = {}
+
+    async def heartbeat(self, worker_id: str) -> None:
+        """Mark a worker alive for another ``ttl_seconds``
+
+        In-memory entries die with the process that owns them, so there is
+        nothing to expire.
+        """
+
+    async def add(self, key: str, worker_id: str) -> None:
+        """Record one more connection for key on worker"""
+        workers = self._entries.setdefault(key, {})
+        workers[worker_id] = workers.get(worker_id, 0) + 1
+
+    async def remove(self, key: str, worker_id: str) -> None:
+        """Record one connection fewer for key on worker"""
+        workers = self._entries.get(key)
+        if not workers or worker_id not in workers:
+            return
+        workers[worker_id] -= 1
+        if workers[worker_id] <= 0:
+            del workers[worker_id]
+        if not workers:
+            del self._entries[key]
+
+    async def workers(self, key: str) -> Set[str]:
+        """Workers currently holding at least one connection for key"""
+        return set(self._entries.get(key, {}))
+
+    async def count(self, key: str) -> int:
+        """Connections for key across all workers"""
+        return sum(self._entries.get(key, {}).values())
+
+    async def clear_worker(self, worker_id: str) -> None:
+        """Drop every entry owned by a worker (on shutdown)"""
+        for key in list(self._entries):
+            workers = self._entries[key]
+            workers.pop(worker_id, None)
+            if not workers:
+                del self._entries[key]
+
+
+class RedisPresenceIndex(PresenceIndex):
+    """Presence index shared between workers through Redis hashes
+
+    Each worker also owns an expiring ``<prefix>:worker:<worker_id>`` key that
+    it refreshes with ``heartbeat``. Hash entries of workers whose key has
+    expired (a crashed or killed process never calls ``clear_worker``) are
+    ignored and deleted by the next lookup.
+    """
+
+    def __init__(self, redis_url: str, prefix: str = "ws:presence", ttl_seconds: float = 30):
+        super().__init__(ttl_seconds)
+        self.redis_url = redis_url
+        self.prefix = prefix
+        self._client = None
+        self._owned_keys: Set[str] = set()
+
+    def _get_client(self):
+        if self._client is None:
+            import redis.asyncio as redis
+            self._client = redis.from_url(self.redis_url, decode_responses=True)
+        return self._client
+
+    def _hash_key(self, key: str) -> str:
+        return f"{self.prefix}:{key}"
+
+    def _alive_key(self, worker_id: str) -> str:
+        return f"{self.prefix}:worker:{worker_id}"
+
+    async def heartbeat(self, worker_id: str) -> None:
+        await self._get_client().set(self._alive_key(worker_id), 1, px=int(self.ttl_seconds * 1000))
+
+    async def _live_entries(self, key: str) -> Dict[str, int]:
+        """Connection counts for key of workers whose heartbeat has not expired"""
+        client = self._get_client()
+        entries = await client.hgetall(self._hash_key(key))
+        if not entries:
+            return {}
+
+        workers = list(entries)
+        alive = await client.mget([self._alive_key(worker) for worker in workers])
+        dead = [worker for worker, flag in zip(workers, alive) if flag is None]
+        if dead:
+            await client.hdel(self._hash_key(key), *dead)
+        return {worker: int(entries[worker]) for worker, flag in zip(workers, alive) if flag is not None}
+
+    async def add(self, key: str, worker_id: str) -> None:
+        await self._get_client().hincrby(self._hash_key(key), worker_id, 1)
+        self._owned_keys.add(key)
+
+    async def remove(self, key: str, worker_id: str) -> None:
+        client = self._get_client()
+        remaining = await client.hincrby(self._hash_key(key), worker_id, -1)
+        if remaining <= 0:
+            await client.hdel(self._hash_key(key), worker_id)
+            self._owned_keys.discard(key)
+
+    async def workers(self, key: str) -> Set[str]:
+        entries = await self._live_entries(key)
+        return {worker for worker, count in entries.items() if count > 0}
+
+    async def count(self, key: str) -> int:
+        entries = await self._live_entries(key)
+        return sum(max(count, 0) for count in entries.values())
+
+    async def clear_worker(self, worker_id: str) -> None:
+        client = self._get_client()
+        for key in list(self._owned_keys):
+            await client.hdel(self._hash_key(key), worker_id)
+        self._owned_keys.clear()
+        await client.delete(self._alive_key(worker_id))
+
+
+def create_fanout(backend: Optional[str] = None) -> Optional[Tuple[FanoutBridge, Optional[PresenceIndex]]]:
+    """Create the configured fan-out bridge and presence index
+
+    Returns None when fan-out is disabled (single worker deployments). The
+    unix backend has no presence index, so its broadcasts always go to every
+    peer on the host.
+    """
+    backend = (backend or settings.WS_FANOUT_BACKEND).lower()
+
+    if backend == "unix":
+        return UnixSocketFanoutBridge(settings.WS_FANOUT_SOCKET_DIR), None
+    if backend == "redis":
+        return (
+            RedisFanoutBridge(settings.REDIS_URL, channel=settings.WS_FANOUT_CHANNEL),
+            RedisPresenceIndex(settings.REDIS_URL, ttl_seconds=settings.WS_PRESENCE_TTL_SECONDS),
+        )
+    if backend not in ("", "none"):
+        logger.warning(f"Unknown WS_FANOUT_BACKEND '{backend}', fan-out disabled")
+    return None
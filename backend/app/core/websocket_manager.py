@@ -6,6 +6,7 @@ Provides real-time updates and offline-first capabilities
 import asyncio
 import json
 import logging
+import time
 from typing import Dict, List, Set, Optional, Any, Callable
 from datetime import datetime
 from uuid import uuid4
@@ -13,13 +14,27 @@ import weakref
 
 from fastapi import WebSocket, WebSocketDisconnect
 from .event_bus import EventType, BaseEvent
+from .instrumentation import instrument
+from .change_log import ChangeLog, change_log, sync_scope
+from .market_data_codec import BINARY_SUBPROTOCOL, DeltaEncoder, symbol_registry
+from .timer_wheel import HierarchicalTimerWheel
+from .websocket_fanout import (
+    FanoutBridge,
+    PresenceIndex,
+    SCOPE_ALL,
+    SCOPE_MARKET_DATA,
+    SCOPE_ORGANIZATION,
+    SCOPE_USER,
+    presence_key,
+)
 
 logger = logging.getLogger(__name__)
 
 class ConnectionManager:
     """Manages WebSocket connections and provides real-time updates"""
     
-    def __init__(self):
+    def __init__(self, heartbeat_interval: float = 30.0, idle_timeout: float = 30 * 60.0,
+                 sync_log: Optional[ChangeLog] = None):
         self.active_connections: Dict[str, WebSocket] = {}
         self.organization_connections: Dict[str, Set[str]] = {}
         self.user_connections: Dict[str, Set[str]] = {}
@@ -27,6 +42,25 @@ class ConnectionManager:
         self.message_handlers: Dict[str, Callable] = {}
         self.offline_queue: Dict[str, List[Dict[str, Any]]] = {}
         
+        # Versioned change log served to reconnecting clients as deltas
+        self.change_log = sync_log or change_log
+        self.max_sync_page_size = 1000
+        
+        # Binary market data encoders for connections that negotiated the subprotocol
+        self.market_data_encoders: Dict[str, DeltaEncoder] = {}
+        
+        # Heartbeat and idle timers, one wheel entry per connection and kind, plus
+        # this worker's presence renewal while fan-out is attached
+        self.heartbeat_interval = heartbeat_interval
+        self.idle_timeout = idle_timeout
+        self.timer_wheel = HierarchicalTimerWheel(tick_seconds=1.0, start=time.monotonic())
+        self.timer_stats = {"expired": 0, "pinged": 0, "reaped": 0}
+        self.heartbeat_task: Optional[asyncio.Task] = None
+        
+        # Cross-worker fan-out (optional, see attach_fanout)
+        self.fanout_bridge: Optional[FanoutBridge] = None
+        self.presence: Optional[PresenceIndex] = None
+        
         # Performance metrics
         self.connection_count = 0
         self.message_count = 0
@@ -38,15 +72,23 @@ class ConnectionManager:
     def _register_default_handlers(self):
         """Register default message handlers"""
         self.register_handler("ping", self._handle_ping)
+        self.register_handler("pong", self._handle_pong)
         self.register_handler("subscribe", self._handle_subscribe)
         self.register_handler("unsubscribe", self._handle_unsubscribe)
         self.register_handler("sync_request", self._handle_sync_request)
         self.register_handler("offline_data", self._handle_offline_data)
+        self.register_handler("market_data_resync", self._handle_market_data_resync)
     
     async def connect(self, websocket: WebSocket, user_id: str, organization_id: str) -> str:
         """Accept a new WebSocket connection"""
         try:
-            await websocket.accept()
+            # Opt-in binary market data frames via Sec-WebSocket-Protocol
+            scope = getattr(websocket, "scope", None) or {}
+            binary_market_data = BINARY_SUBPROTOCOL in scope.get("subprotocols", [])
+            if binary_market_data:
+                await websocket.accept(subprotocol=BINARY_SUBPROTOCOL)
+            else:
+                await websocket.accept()
             
             # Generate connection ID
             connection_id = str(uuid4())
@@ -59,8 +101,13 @@ class ConnectionManager:
                 "connected_at": datetime.utcnow(),
                 "last_activity": datetime.utcnow(),
                 "subscriptions": set(),
-                "is_online": True
+                "is_online": True,
+                "binary_market_data": binary_market_data,
+                "last_seen": time.monotonic(),
+                "awaiting_pong": False
             }
+            if binary_market_data:
+                self.market_data_encoders[connection_id] = DeltaEncoder(symbol_registry)
             
             # Add to organization and user mappings
             if organization_id not in self.organization_connections:
@@ -73,6 +120,11 @@ class ConnectionManager:
             
             self.connection_count += 1
             
+            self.timer_wheel.schedule((connection_id, "heartbeat"), self.heartbeat_interval)
+            self.timer_wheel.schedule((connection_id, "idle"), self.idle_timeout)
+            
+            await self._update_presence(user_id, organization_id, joined=True)
+            
             # Send welcome message
             await self.send_personal_message(connection_id, {
                 "type": "connection_established",
@@ -109,15 +161,22 @@ class ConnectionManager:
                     if not self.organization_connections[organization_id]:
                         del self.organization_connections[organization_id]
                 
-                # Close websocket
-                await websocket.close()
-                
-                # Clean up
+                # Clean up before closing: a dead socket raises on close and must not stay registered
                 del self.active_connections[connection_id]
                 del self.connection_metadata[connection_id]
+                self.market_data_encoders.pop(connection_id, None)
+                self.timer_wheel.cancel((connection_id, "heartbeat"))
+                self.timer_wheel.cancel((connection_id, "idle"))
                 
                 self.connection_count -= 1
                 
+                try:
+                    await websocket.close()
+                except Exception as e:
+                    logger.debug(f"Closing WebSocket connection {connection_id} failed: {e}")
+                
+                await self._update_presence(user_id, organization_id, joined=False)
+                
                 logger.info(f"WebSocket connection {connection_id} disconnected")
                 
         except Exception as e:
@@ -141,8 +200,87 @@ class ConnectionManager:
             logger.error(f"Error sending personal message to {connection_id}: {e}")
             self.error_count += 1
     
+    async def send_market_data(self, connection_id: str, ticks: List[Dict[str, Any]]):
+        """Send market data ticks as a binary delta frame or a JSON message"""
+        try:
+            websocket = self.active_connections.get(connection_id)
+            if websocket is None or not ticks:
+                return
+            
+            encoder = self.market_data_encoders.get(connection_id)
+            if encoder is None:
+                await self.send_personal_message(connection_id, {
+                    "type": "market_data",
+                    "ticks": [
+                        {**tick, "timestamp": tick["timestamp"].isoformat()}
+                        if isinstance(tick.get("timestamp"), datetime) else tick
+                        for tick in ticks
+                    ],
+                    "timestamp": datetime.utcnow().isoformat()
+                })
+                return
+            
+            for frame in encoder.encode_frames(ticks):
+                if frame.new_symbols:
+                    await self.send_personal_message(connection_id, {
+                        "type": "symbol_map",
+                        "symbols": frame.new_symbols
+                    })
+                await websocket.send_bytes(frame.payload)
+                self.message_count += 1
+            
+        except Exception as e:
+            logger.error(f"Error sending market data to {connection_id}: {e}")
+            self.error_count += 1
+    
+    async def broadcast_market_data(self, ticks: List[Dict[str, Any]]):
+        """Send ticks to connections subscribed to market_data:<symbol> or market_data:* on every worker
+        
+        Binary clients get delta frames, the others a JSON market_data message.
+        """
+        if not ticks:
+            return
+        await self._broadcast_local_market_data(ticks)
+        await self._publish_fanout(SCOPE_MARKET_DATA, None, {"ticks": ticks})
+    
+    @instrument("market_data_fanout", batch=lambda self, ticks: len(ticks))
+    async def _broadcast_local_market_data(self, ticks: List[Dict[str, Any]]):
+        """Send ticks to this worker's subscribed connections"""
+        for connection_id, metadata in list(self.connection_metadata.items()):
+            subscriptions = metadata.get("subscriptions", set())
+            if "market_data:*" in subscriptions:
+                selected = ticks
+            else:
+                selected = [tick for tick in ticks if f"market_data:{tick['symbol']}" in subscriptions]
+            if selected:
+                await self.send_market_data(connection_id, selected)
+    
     async def broadcast_to_organization(self, organization_id: str, message: Dict[str, Any]):
-        """Broadcast a message to all connections in an organization"""
+        """Broadcast a message to all connections in an organization on every worker"""
+        await self._broadcast_local_organization(organization_id, message)
+        await self._publish_fanout(SCOPE_ORGANIZATION, organization_id, message)
+    
+    async def broadcast_to_user(self, user_id: str, message: Dict[str, Any]):
+        """Broadcast a message to all connections of a specific user on every worker"""
+        await self._broadcast_local_user(user_id, message)
+        await self._publish_fanout(SCOPE_USER, user_id, message)
+    
+    async def broadcast_to_all(self, message: Dict[str, Any]):
+        """Broadcast a message to all active connections on every worker
+        
+        Market data messages (``type`` "market_data" with ``ticks``) go through
+        ``broadcast_market_data`` instead, so they honour subscriptions and
+        binary clients.
+        """
+        if message.get("type") == "market_data" and isinstance(message.get("ticks"), list):
+            await self.broadcast_market_data(message["ticks"])
+            return
+        await self._broadcast_local_all(message)
+        await self._publish_fanout(SCOPE_ALL, None, message)
+    
+    @instrument("websocket_fanout", batch=lambda self, organization_id, message: len(self.organization_connections.get(organization_id, ())))
+    async def _broadcast_local_organization(self, organization_id: str, message: Dict[str, Any]):
+        """Broadcast a message to this worker's connections in an organization"""
         try:
             if organization_id in self.organization_connections:
                 connection_ids = self.organization_connections[organization_id].copy()
@@ -155,8 +293,9 @@ class ConnectionManager:
             logger.error(f"Error broadcasting to organization {organization_id}: {e}")
             self.error_count += 1
     
-    async def broadcast_to_user(self, user_id: str, message: Dict[str, Any]):
-        """Broadcast a message to all connections of a specific user"""
+    @instrument("websocket_fanout", batch=lambda self, user_id, message: len(self.user_connections.get(user_id, ())))
+    async def _broadcast_local_user(self, user_id: str, message: Dict[str, Any]):
+        """Broadcast a message to this worker's connections of a specific user"""
         try:
             if user_id in self.user_connections:
                 connection_ids = self.user_connections[user_id].copy()
@@ -169,8 +308,9 @@ class ConnectionManager:
             logger.error(f"Error broadcasting to user {user_id}: {e}")
             self.error_count += 1
     
-    async def broadcast_to_all(self, message: Dict[str, Any]):
-        """Broadcast a message to all active connections"""
+    @instrument("websocket_fanout", batch=lambda self, message: len(self.active_connections))
+    async def _broadcast_local_all(self, message: Dict[str, Any]):
+        """Broadcast a message to all of this worker's active connections"""
         try:
             connection_ids = list(self.active_connections.keys())
             for connection_id in connection_ids:
@@ -182,12 +322,113 @@ class ConnectionManager:
             logger.error(f"Error broadcasting to all connections: {e}")
             self.error_count += 1
     
+    async def attach_fanout(self, bridge: FanoutBridge, presence: Optional[PresenceIndex] = None):
+        """Relay broadcasts through a fan-out bridge so they reach every worker"""
+        self.fanout_bridge = bridge
+        self.presence = presence
+        await bridge.start(self._handle_fanout_envelope)
+        
+        # Register connections accepted before the bridge was attached
+        if presence:
+            await self._refresh_presence()
+            for metadata in self.connection_metadata.values():
+                await self._update_presence(metadata["user_id"], metadata["organization_id"], joined=True)
+    
+    async def detach_fanout(self):
+        """Stop relaying broadcasts and withdraw this worker from the presence index"""
+        bridge, presence = self.fanout_bridge, self.presence
+        self.fanout_bridge = None
+        self.presence = None
+        
+        if presence and bridge:
+            self.timer_wheel.cancel((bridge.worker_id, "presence"))
+            try:
+                await presence.clear_worker(bridge.worker_id)
+            except Exception as e:
+                logger.error(f"Error clearing presence for worker {bridge.worker_id}: {e}")
+        if bridge:
+            await bridge.stop()
+    
+    async def get_presence_count(self, scope: str, target: str) -> int:
+        """Connections for an organization or user across all workers"""
+        if self.presence:
+            return await self.presence.count(presence_key(scope, target))
+        
+        local = self.organization_connections if scope == SCOPE_ORGANIZATION else self.user_connections
+        return len(local.get(target, ()))
+    
+    async def _update_presence(self, user_id: str, organization_id: str, joined: bool):
+        """Record a connection joining or leaving in the presence index"""
+        if not (self.presence and self.fanout_bridge):
+            return
+        
+        worker_id = self.fanout_bridge.worker_id
+        update = self.presence.add if joined else self.presence.remove
+        try:
+            await update(presence_key(SCOPE_ORGANIZATION, organization_id), worker_id)
+            await update(presence_key(SCOPE_USER, user_id), worker_id)
+        except Exception as e:
+            logger.error(f"Error updating WebSocket presence: {e}")
+    
+    async def _refresh_presence(self):
+        """Renew this worker's presence heartbeat and schedule the next renewal on the timer wheel"""
+        if not (self.presence and self.fanout_bridge):
+            return
+        
+        worker_id = self.fanout_bridge.worker_id
+        try:
+            await self.presence.heartbeat(worker_id)
+        except Exception as e:
+            logger.error(f"Error refreshing WebSocket presence: {e}")
+        if self.presence.ttl_seconds:
+            # Three renewals per TTL so one slow round trip does not expire the worker
+            self.timer_wheel.schedule((worker_id, "presence"), self.presence.ttl_seconds / 3)
+    
+    async def _publish_fanout(self, scope: str, target: Optional[str], message: Dict[str, Any]):
+        """Publish a broadcast to other workers unless none of them needs it"""
+        if not self.fanout_bridge:
+            return
+        
+        if self.presence and target is not None:
+            try:
+                workers = await self.presence.workers(presence_key(scope, target))
+                if not workers - {self.fanout_bridge.worker_id}:
+                    return
+            except Exception as e:
+                # Presence is an optimisation only; fall through and publish
+                logger.warning(f"Presence lookup failed, publishing anyway: {e}")
+        
+        await self.fanout_bridge.publish(scope, target, message)
+    
+    async def _handle_fanout_envelope(self, envelope: Dict[str, Any]):
+        """Deliver a broadcast published by another worker to local sockets"""
+        scope = envelope.get("scope")
+        target = envelope.get("target")
+        message = envelope.get("message", {})
+        
+        if scope == SCOPE_ORGANIZATION:
+            await self._broadcast_local_organization(target, message)
+        elif scope == SCOPE_USER:
+            await self._broadcast_local_user(target, message)
+        elif scope == SCOPE_ALL:
+            await self._broadcast_local_all(message)
+        elif scope == SCOPE_MARKET_DATA:
+            await self._broadcast_local_market_data(message.get("ticks", []))
+        else:
+            logger.warning(f"Unknown fan-out scope: {scope}")
+    
     async def handle_message(self, connection_id: str, message: str):
         """Handle incoming WebSocket messages"""
         try:
             if connection_id not in self.active_connections:
                 return
             
+            # Any inbound frame proves the client is alive
+            metadata = self.connection_metadata.get(connection_id)
+            if metadata:
+                metadata["last_seen"] = time.monotonic()
+                metadata["awaiting_pong"] = False
+            
             # Parse message
             try:
                 data = json.loads(message)
@@ -239,6 +480,20 @@ class ConnectionManager:
             "connection_id": connection_id
         })
     
+    async def _handle_market_data_resync(self, connection_id: str, data: Dict[str, Any]):
+        """Handle a binary client asking for a full snapshot on the next frame"""
+        encoder = self.market_data_encoders.get(connection_id)
+        if encoder:
+            encoder.reset()
+        await self.send_personal_message(connection_id, {
+            "type": "market_data_resync_ack",
+            "binary": encoder is not None,
+            "timestamp": datetime.utcnow().isoformat()
+        })
+    
+    async def _handle_pong(self, connection_id: str, data: Dict[str, Any]):
+        """Handle heartbeat replies (liveness is recorded in handle_message)"""
+    
     async def _handle_subscribe(self, connection_id: str, data: Dict[str, Any]):
         """Handle subscription requests"""
         try:
@@ -309,19 +564,49 @@ class ConnectionManager:
             })
     
     async def _handle_sync_request(self, connection_id: str, data: Dict[str, Any]):
-        """Handle synchronization requests"""
+        """Handle synchronization requests
+        
+        The client sends the last version it applied (``last_version``) and the
+        ``epoch`` it came from for its user or organization scope and receives
+        one page of compacted changes. It repeats the request with
+        ``to_version`` until ``has_more`` is false. A different epoch (another
+        worker or a restart) answers with a full resync.
+        """
         try:
             sync_type = data.get("sync_type")
-            last_sync = data.get("last_sync")
+            scope_kind = data.get("scope", "user")
+            metadata = self.connection_metadata.get(connection_id, {})
+            target = metadata.get("organization_id") if scope_kind == "organization" else metadata.get("user_id")
+            if scope_kind not in ("user", "organization") or not target:
+                await self.send_personal_message(connection_id, {
+                    "type": "sync_error",
+                    "message": "scope must be 'user' or 'organization'",
+                    "timestamp": datetime.utcnow().isoformat()
+                })
+                return
+            
+            if not sync_type or sync_type == "all":
+                entity_types = None
+            elif isinstance(sync_type, list):
+                entity_types = sync_type
+            else:
+                entity_types = [sync_type]
+            page_size = max(1, min(int(data.get("page_size", 200)), self.max_sync_page_size))
+            
+            page = self.change_log.get_page(
+                sync_scope(scope_kind, target),
+                since_version=int(data.get("last_version") or 0),
+                limit=page_size,
+                entity_types=entity_types,
+                epoch=data.get("epoch")
+            )
             
-            # For now, send a simple sync response
-            # In production, implement proper data synchronization
             await self.send_personal_message(connection_id, {
                 "type": "sync_response",
                 "sync_type": sync_type,
-                "last_sync": last_sync,
+                "last_sync": data.get("last_sync"),
                 "current_sync": datetime.utcnow().isoformat(),
-                "data": {},
+                **page,
                 "timestamp": datetime.utcnow().isoformat()
             })
             
@@ -365,20 +650,64 @@ class ConnectionManager:
         except Exception as e:
             logger.error(f"Error handling offline data: {e}")
     
+    async def record_change(
+        self,
+        entity_type: str,
+        entity_id: str,
+        data: Optional[Dict[str, Any]] = None,
+        user_id: Optional[str] = None,
+        organization_id: Optional[str] = None,
+        operation: str = "upsert"
+    ) -> Dict[str, int]:
+        """Record an entity change and tell online clients a delta is available"""
+        versions = {}
+        for kind, target in (("user", user_id), ("organization", organization_id)):
+            if not target:
+                continue
+            version = self.change_log.record(sync_scope(kind, target), entity_type, entity_id, data, operation)
+            versions[kind] = version
+            
+            notice = {
+                "type": "sync_available",
+                "scope": kind,
+                "entity_type": entity_type,
+                "epoch": self.change_log.epoch,
+                "current_version": version,
+                "timestamp": datetime.utcnow().isoformat()
+            }
+            if kind == "user":
+                await self.broadcast_to_user(target, notice)
+            else:
+                await self.broadcast_to_organization(target, notice)
+        return versions
+    
     async def process_offline_queue(self, user_id: str):
-        """Process offline queue for a specific user"""
+        """Process offline queue for a specific user
+        
+        Offline writes that identify an entity (``entity_type``/``entity_id``)
+        are applied to the user's change log so other devices pick them up on
+        their next delta sync.
+        """
         try:
             if user_id not in self.offline_queue:
                 return
             
             offline_items = self.offline_queue[user_id]
             processed_items = []
+            scope = sync_scope("user", user_id)
             
             for item in offline_items:
                 if not item["processed"]:
                     try:
-                        # Process offline data
-                        # In production, implement proper offline data processing
+                        payload = item["data"]
+                        if payload.get("entity_type") and payload.get("entity_id"):
+                            self.change_log.record(
+                                scope,
+                                payload["entity_type"],
+                                payload["entity_id"],
+                                payload.get("payload"),
+                                payload.get("operation", "upsert")
+                            )
                         item["processed"] = True
                         item["processed_at"] = datetime.utcnow().isoformat()
                         processed_items.append(item)
@@ -399,6 +728,8 @@ class ConnectionManager:
                     await self.send_personal_message(connection_id, {
                         "type": "offline_data_processed",
                         "processed_count": len(processed_items),
+                        "epoch": self.change_log.epoch,
+                        "current_version": self.change_log.current_version(scope),
                         "timestamp": datetime.utcnow().isoformat()
                     })
             
@@ -414,7 +745,10 @@ class ConnectionManager:
             "user_connections": len(self.user_connections),
             "total_messages": self.message_count,
             "total_errors": self.error_count,
-            "offline_queue_size": sum(len(queue) for queue in self.offline_queue.values())
+            "offline_queue_size": sum(len(queue) for queue in self.offline_queue.values()),
+            "binary_market_data_connections": len(self.market_data_encoders),
+            "fanout": self.fanout_bridge.get_stats() if self.fanout_bridge else None,
+            "timers": {**self.timer_stats, "scheduled": len(self.timer_wheel)}
         }
     
     def get_connection_info(self, connection_id: str) -> Optional[Dict[str, Any]]:
@@ -425,8 +759,85 @@ class ConnectionManager:
             return metadata
         return None
     
+    async def run_timers(self, now: Optional[float] = None) -> Dict[str, int]:
+        """Fire due heartbeat, idle and presence timers without scanning every connection
+        
+        Timers are not moved on each inbound message; when one fires, the
+        connection's last_seen decides whether to ping, reap or reschedule for
+        the remaining time.
+        """
+        now = time.monotonic() if now is None else now
+        fired = {"expired": 0, "pinged": 0, "reaped": 0}
+        
+        for (connection_id, kind), _ in self.timer_wheel.advance(now):
+            fired["expired"] += 1
+            if kind == "presence":
+                await self._refresh_presence()
+                continue
+            metadata = self.connection_metadata.get(connection_id)
+            if metadata is None:
+                continue
+            
+            idle = now - metadata["last_seen"]
+            if kind == "heartbeat":
+                if metadata["awaiting_pong"] and idle >= self.heartbeat_interval:
+                    # Previous heartbeat went unanswered for a full interval
+                    await self.disconnect(connection_id)
+                    fired["reaped"] += 1
+                    continue
+                if idle >= self.heartbeat_interval:
+                    metadata["awaiting_pong"] = True
+                    await self.send_personal_message(connection_id, {
+                        "type": "heartbeat",
+                        "timestamp": datetime.utcnow().isoformat()
+                    })
+                    fired["pinged"] += 1
+                    self.timer_wheel.schedule((connection_id, "heartbeat"), self.heartbeat_interval)
+                else:
+                    self.timer_wheel.schedule((connection_id, "heartbeat"), self.heartbeat_interval - idle)
+            elif kind == "idle":
+                if idle >= self.idle_timeout:
+                    await self.disconnect(connection_id)
+                    fired["reaped"] += 1
+                else:
+                    self.timer_wheel.schedule((connection_id, "idle"), self.idle_timeout - idle)
+        
+        for key, value in fired.items():
+            self.timer_stats[key] += value
+        if fired["reaped"]:
+            logger.info(f"Reaped {fired['reaped']} dead or idle WebSocket connections")
+        return fired
+    
+    async def start_heartbeat(self):
+        """Start the background task turning the timer wheel"""
+        if self.heartbeat_task and not self.heartbeat_task.done():
+            return
+        self.heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+    
+    async def stop_heartbeat(self):
+        """Stop the background timer task"""
+        if self.heartbeat_task:
+            self.heartbeat_task.cancel()
+            try:
+                await self.heartbeat_task
+            except asyncio.CancelledError:
+                pass
+            self.heartbeat_task = None
+    
+    async def _heartbeat_loop(self):
+        """Turn the timer wheel once per tick"""
+        while True:
+            try:
+                await asyncio.sleep(self.timer_wheel.tick_seconds)
+                await self.run_timers()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error running WebSocket timers: {e}")
+                self.error_count += 1
+    
     async def cleanup_inactive_connections(self, max_inactive_minutes: int = 30):
-        """Clean up inactive connections"""
+        """Clean up inactive connections with a full scan (manual sweep; the timer wheel handles routine reaping)"""
         try:
             current_time = datetime.utcnow()
             inactive_connections = []
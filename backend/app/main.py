@@ -5,9 +5,7 @@ import warnings
 import os
 import asyncio
 import sys
-import threading
 from contextlib import asynccontextmanager
-from collections import defaultdict
 from typing import Optional, Dict, Any
 from datetime import datetime, timezone
 
@@ -29,6 +27,9 @@ from .api.v1.enhanced_trade_lifecycle import router as enhanced_trade_router
 from .api.v1.websocket import router as websocket_router
 from .schemas.user import User
 from .core.security import verify_token
+from .middleware.pipeline import RequestContext, RequestPipeline
+from .core.lazy_loading import service_registry
+from .core.model_store import preload_for_fork
 
 # Database session is now properly imported from db.session
 
@@ -61,51 +62,6 @@ else:
 # Configure structured logging
 logger = structlog.get_logger()
 
-class RateLimitMiddleware:
-    """Rate limiting middleware for API endpoints"""
-    
-    def __init__(self, requests_per_minute: int = 100):
-        self.requests_per_minute = requests_per_minute
-        self.requests = defaultdict(list)
-        self.lock = threading.Lock()
-    
-    async def __call__(self, request: Request, call_next):
-        # Get client IP
-        client_ip = request.client.host if request.client else "unknown"
-        
-        current_time = time.time()
-        
-        with self.lock:
-            # Clean old requests (older than 1 minute)
-            self.requests[client_ip] = [
-                req_time for req_time in self.requests[client_ip]
-                if current_time - req_time < 60
-            ]
-            
-            # Check rate limit
-            if len(self.requests[client_ip]) >= self.requests_per_minute:
-                logger.warning(f"Rate limit exceeded for {client_ip}")
-                # Track rate limit violations
-                try:
-                    rate_limit_exceeded_total.labels(client_ip=client_ip).inc()
-                except Exception as e:
-                    logger.warning(f"Failed to track rate limit metric: {e}")
-                
-                raise HTTPException(
-                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                    detail="Rate limit exceeded. Please try again later."
-                )
-            
-            # Add current request
-            self.requests[client_ip].append(current_time)
-        
-        # Process request
-        response = await call_next(request)
-        return response
-
-# Initialize rate limiting middleware
-rate_limit_middleware = RateLimitMiddleware(requests_per_minute=100)
-
 # Initialize Prometheus metrics
 http_requests_total = Counter('http_requests_total', 'Total HTTP requests', ['method', 'endpoint', 'status'])
 http_request_duration_seconds = Histogram('http_request_duration_seconds', 'HTTP request duration in seconds', ['method', 'endpoint'])
@@ -174,6 +130,37 @@ async def lifespan(app: FastAPI):
     await event_bus.start()
     log_message("Event bus started")
     
+    # Feed trade lifecycle events into the offline-sync change log
+    from app.core.change_log import TradeChangeLogHandler, change_log
+    trade_change_handler = TradeChangeLogHandler(change_log)
+    for event_type in TradeChangeLogHandler.EVENT_TYPES:
+        event_bus.subscribe(event_type, trade_change_handler)
+    
+    # Relay WebSocket broadcasts across workers when configured
+    from app.core.websocket_manager import connection_manager
+    from app.core.websocket_fanout import create_fanout
+    fanout = create_fanout()
+    if fanout:
+        await connection_manager.attach_fanout(*fanout)
+        log_message(f"WebSocket fan-out started ({settings.WS_FANOUT_BACKEND})")
+    await connection_manager.start_heartbeat()
+    log_message("WebSocket heartbeat timers started")
+    
+    # Share JWT revocations across workers when configured
+    from app.core.jwt_auth import auth_manager
+    from app.core.token_cache import create_revocation_sync
+    revocation_sync = create_revocation_sync()
+    if revocation_sync:
+        await auth_manager.revocations.attach(*revocation_sync)
+        log_message(f"JWT revocation sharing started ({settings.AUTH_REVOCATION_BACKEND})")
+    
+    # Import heavy services off the request path once the app is accepting traffic; after a
+    # preload this builds the services that are not fork-safe, in this worker
+    warmup_task = None
+    if settings.SERVICE_WARMUP in ("background", "preload"):
+        warmup_task = asyncio.create_task(service_registry.warmup())
+    service_registry.mark_ready()
+    
     log_message("QuantaEnergi backend started successfully")
     
     yield
@@ -181,6 +168,17 @@ async def lifespan(app: FastAPI):
     # Shutdown
     log_message("Shutting down QuantaEnergi backend...")
     
+    if warmup_task and not warmup_task.done():
+        warmup_task.cancel()
+    
+    # Stop WebSocket timers and fan-out
+    from app.core.websocket_manager import connection_manager
+    await connection_manager.stop_heartbeat()
+    await connection_manager.detach_fanout()
+    
+    from app.core.jwt_auth import auth_manager
+    await auth_manager.revocations.detach()
+    
     # Stop event bus
     from app.core.event_bus import event_bus
     await event_bus.stop()
@@ -256,7 +254,19 @@ app = FastAPI(
     lifespan=lifespan
 )
 
-# Add CORS middleware
+# Client identity, auth claims, rate limiting and security inspection in one ASGI hop
+def record_request_metrics(context: RequestContext, status_code: int):
+    """Update request metrics once the pipeline has finished a request"""
+    http_requests_total.labels(method=context.method, endpoint=context.path, status=status_code).inc()
+    http_request_duration_seconds.labels(method=context.method, endpoint=context.path).observe(
+        time.perf_counter() - context.started_at
+    )
+    if context.rejected_by == "rate_limit":
+        rate_limit_exceeded_total.labels(client_ip=context.client_ip).inc()
+
+app.add_middleware(RequestPipeline, on_complete=record_request_metrics)
+
+# Add CORS middleware (added last, so it is outermost and also covers pipeline rejections)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.ALLOWED_ORIGINS,
@@ -265,79 +275,40 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Add rate limiting middleware
-app.middleware("http")(rate_limit_middleware)
-
-# Add security middleware
-# from app.middleware.security import security_middleware_func  # Commented out for now
-# app.middleware("http")(security_middleware_func)
-
-# Add monitoring middleware
-@app.middleware("http")
-async def monitoring_middleware(request: Request, call_next):
-    """Middleware to track HTTP requests and update metrics"""
-    start_time = time.time()
-    
-    # Track request start
-    method = request.method
-    endpoint = request.url.path
-    
-    try:
-        # Process request
-        response = await call_next(request)
-        
-        # Update metrics on success
-        http_requests_total.labels(method=method, endpoint=endpoint, status=response.status_code).inc()
-        http_request_duration_seconds.labels(method=method, endpoint=endpoint).observe(time.time() - start_time)
-        
-        return response
-        
-    except Exception as e:
-        # Update metrics on error
-        http_requests_total.labels(method=method, endpoint=endpoint, status=500).inc()
-        http_request_duration_seconds.labels(method=method, endpoint=endpoint).observe(time.time() - start_time)
-        
-        # Re-raise the exception
-        raise
-
 # Include authentication router
 app.include_router(auth_router)
 
-# Include new ETRM/CTRM API routers
-from .api.v1.trade_lifecycle import router as trade_lifecycle_router
-from .api.v1.credit_management import router as credit_management_router
-from .api.v1.regulatory_compliance import router as regulatory_compliance_router
-from .api.v1.risk_analytics import router as risk_analytics_router
-from .api.v1.supply_chain import router as supply_chain_router
-from .api.v1.options import router as options_router
-from .api.v1.quantum_risk import router as quantum_risk_router
-from .api.v1.logistics import router as logistics_router
-from .api.v1.market_intelligence import router as market_intelligence_router
-from .api.v1.digital_autonomous import router as digital_autonomous_router
-from .api.v1.agi_quantum import router as agi_quantum_router
-from .api.v1.blockchain_carbon import router as blockchain_carbon_router
-from .api.v1.health import router as health_router
-from .api.v1.metrics import router as metrics_router
-
-app.include_router(trade_lifecycle_router, prefix="/api/v1")
-app.include_router(credit_management_router, prefix="/api/v1")
-app.include_router(regulatory_compliance_router, prefix="/api/v1")
-app.include_router(risk_analytics_router, prefix="/api/v1")
-app.include_router(supply_chain_router, prefix="/api/v1")
-app.include_router(options_router, prefix="/api/v1")
-app.include_router(quantum_risk_router, prefix="/api/v1")
-app.include_router(logistics_router, prefix="/api/v1")
-app.include_router(market_intelligence_router, prefix="/api/v1")
-app.include_router(digital_autonomous_router, prefix="/api/v1")
-app.include_router(agi_quantum_router, prefix="/api/v1")
-app.include_router(blockchain_carbon_router, prefix="/api/v1")
-app.include_router(health_router, prefix="/api/v1")
-app.include_router(metrics_router, prefix="/api/v1")
+# Include new ETRM/CTRM API routers (import times feed /api/v1/health/startup;
+# heavy services behind them are LazyService proxies loaded on first use or warmup)
+V1_ROUTERS = [
+    "trade_lifecycle",
+    "credit_management",
+    "regulatory_compliance",
+    "risk_analytics",
+    "supply_chain",
+    "options",
+    "quantum_risk",
+    "logistics",
+    "market_intelligence",
+    "digital_autonomous",
+    "agi_quantum",
+    "blockchain_carbon",
+    "health",
+    "metrics",
+]
+
+for router_name in V1_ROUTERS:
+    router_module = service_registry.import_module(f"app.api.v1.{router_name}")
+    app.include_router(router_module.router, prefix="/api/v1")
 
 # Enhanced trade lifecycle and WebSocket routers
 app.include_router(enhanced_trade_router, prefix="/api/v1")
 app.include_router(websocket_router, prefix="/api/v1")
 
+# Preload mode (gunicorn preload_app): models and services are loaded here, in the
+# master, and inherited copy-on-write by every forked worker
+preload_for_fork()
+
 # Include disruptive features router
 # app.include_router(disruptive_router)  # Commented out for now
 
@@ -16,6 +16,9 @@ import logging
 import asyncio
 from functools import wraps
 
+from ..core.jwt_auth import auth_manager
+from ..core.token_cache import token_digest
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -39,7 +42,8 @@ class AuthenticationService:
     def __init__(self):
         self.active_tokens = {}  # In production, use Redis
         self.rate_limit_store = {}  # In production, use Redis
-        self.blacklisted_tokens = set()  # In production, use Redis
+        # Revoked token digests, shared with the JWT manager and across workers
+        self.revocations = auth_manager.revocations
     
     def create_access_token(self, data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
         """Create JWT access token"""
@@ -90,8 +94,8 @@ class AuthenticationService:
     def verify_token(self, token: str) -> Dict[str, Any]:
         """Verify JWT token"""
         try:
-            # Check if token is blacklisted
-            if token in self.blacklisted_tokens:
+            # Check if token is revoked
+            if self.revocations.is_revoked(token_digest(token)):
                 raise HTTPException(
                     status_code=status.HTTP_401_UNAUTHORIZED,
                     detail="Token has been revoked"
@@ -123,6 +127,8 @@ class AuthenticationService:
             
             return payload
             
+        except HTTPException:
+            raise
         except jwt.ExpiredSignatureError:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -146,7 +152,13 @@ class AuthenticationService:
             if token in self.active_tokens:
                 del self.active_tokens[token]
             
-            self.blacklisted_tokens.add(token)
+            # Keep the revocation until the token would have expired anyway
+            try:
+                expires_at = float(jwt.decode(token, options={"verify_signature": False})["exp"])
+            except (jwt.InvalidTokenError, KeyError, TypeError, ValueError):
+                expires_at = time.time() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS).total_seconds()
+            
+            self.revocations.revoke(token_digest(token), expires_at)
             return True
             
         except Exception as e:
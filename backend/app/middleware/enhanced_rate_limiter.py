@@ -12,14 +12,17 @@ import time
 import asyncio
 import logging
 from typing import Dict, Optional, Callable
-from collections import defaultdict, deque
 from datetime import datetime, timedelta
 import redis
 import json
 
+from .rate_limit_engine import RateLimitEngine, LocalGCRABackend
+
 logger = logging.getLogger(__name__)
 
-# Redis connection for distributed rate limiting
+REDIS_URL = "redis://localhost:6379"
+
+# Redis connection probe for distributed rate limiting
 try:
     redis_client = redis.Redis(host='localhost', port=6379, decode_responses=True)
     redis_client.ping()
@@ -31,7 +34,7 @@ except:
 # Create SlowAPI limiter
 limiter = Limiter(
     key_func=get_remote_address,
-    storage_uri="redis://localhost:6379" if REDIS_AVAILABLE else "memory://",
+    storage_uri=REDIS_URL if REDIS_AVAILABLE else "memory://",
     enabled=True
 )
 
@@ -42,6 +45,9 @@ class EnhancedRateLimiter:
         self.redis_available = REDIS_AVAILABLE
         self.redis_client = redis_client
         
+        # Async engine: one Lua round trip per decision, local leases in front
+        self.engine = RateLimitEngine(redis_url=REDIS_URL if REDIS_AVAILABLE else None)
+        
         # Rate limit configurations
         self.rate_limits = {
             "default": {"requests": 100, "window": 3600},  # 100 requests per hour
@@ -60,8 +66,8 @@ class EnhancedRateLimiter:
             "admin": {"requests": 10000, "window": 3600},
         }
         
-        # In-memory fallback storage
-        self.memory_storage = defaultdict(lambda: defaultdict(deque))
+        # In-memory fallback storage (one TAT per key)
+        self.memory_storage = LocalGCRABackend()
         
         # Cleanup task
         self.cleanup_task = None
@@ -81,23 +87,10 @@ class EnhancedRateLimiter:
         while True:
             try:
                 await asyncio.sleep(300)  # Cleanup every 5 minutes
-                now = time.time()
                 
-                # Clean up memory storage
-                for key in list(self.memory_storage.keys()):
-                    for limit_type in list(self.memory_storage[key].keys()):
-                        # Remove expired entries
-                        while (self.memory_storage[key][limit_type] and 
-                               self.memory_storage[key][limit_type][0] < now - 3600):
-                            self.memory_storage[key][limit_type].popleft()
-                        
-                        # Remove empty entries
-                        if not self.memory_storage[key][limit_type]:
-                            del self.memory_storage[key][limit_type]
-                    
-                    # Remove empty keys
-                    if not self.memory_storage[key]:
-                        del self.memory_storage[key]
+                # Drop keys that are back to a full budget and expired leases
+                self.memory_storage.prune()
+                self.engine.prune()
                         
             except Exception as e:
                 logger.error(f"Rate limiter cleanup error: {e}")
@@ -161,51 +154,10 @@ class EnhancedRateLimiter:
                                     client_id: str, 
                                     limit_type: str, 
                                     limits: Dict) -> Dict:
-        """Check rate limit using Redis"""
+        """Check rate limit using the Redis GCRA script (falls back to memory inside the engine)"""
         try:
             key = f"rate_limit:{client_id}:{limit_type}"
-            now = time.time()
-            window_start = now - limits["window"]
-            
-            # Use Redis pipeline for atomic operations
-            pipe = self.redis_client.pipeline()
-            
-            # Remove expired entries
-            pipe.zremrangebyscore(key, 0, window_start)
-            
-            # Count current requests
-            pipe.zcard(key)
-            
-            # Add current request
-            pipe.zadd(key, {str(now): now})
-            
-            # Set expiration
-            pipe.expire(key, limits["window"])
-            
-            results = pipe.execute()
-            current_requests = results[1]
-            
-            # Check if limit exceeded
-            if current_requests >= limits["requests"]:
-                # Get oldest request time for reset calculation
-                oldest_requests = self.redis_client.zrange(key, 0, 0, withscores=True)
-                reset_time = int(oldest_requests[0][1] + limits["window"]) if oldest_requests else int(now + limits["window"])
-                
-                return {
-                    "allowed": False,
-                    "remaining": 0,
-                    "reset_time": reset_time,
-                    "limit": limits["requests"],
-                    "window": limits["window"]
-                }
-            else:
-                return {
-                    "allowed": True,
-                    "remaining": limits["requests"] - current_requests - 1,
-                    "reset_time": int(now + limits["window"]),
-                    "limit": limits["requests"],
-                    "window": limits["window"]
-                }
+            return await self.engine.check(key, limits["requests"], limits["window"])
                 
         except Exception as e:
             logger.error(f"Redis rate limit error: {e}")
@@ -216,45 +168,30 @@ class EnhancedRateLimiter:
                                      client_id: str, 
                                      limit_type: str, 
                                      limits: Dict) -> Dict:
-        """Check rate limit using in-memory storage"""
+        """Check rate limit using in-memory GCRA state"""
         try:
             now = time.time()
-            window_start = now - limits["window"]
-            
-            # Get or create client storage
-            client_storage = self.memory_storage[client_id]
-            
-            # Clean expired entries
-            while (client_storage[limit_type] and 
-                   client_storage[limit_type][0] < window_start):
-                client_storage[limit_type].popleft()
-            
-            # Check current count
-            current_requests = len(client_storage[limit_type])
+            key = f"rate_limit:{client_id}:{limit_type}"
+            granted, remaining, retry_after, reset_time = self.memory_storage.acquire(
+                key, limits["requests"], limits["window"], 1, now
+            )
             
-            if current_requests >= limits["requests"]:
-                # Calculate reset time
-                oldest_request = client_storage[limit_type][0] if client_storage[limit_type] else now
-                reset_time = int(oldest_request + limits["window"])
-                
+            if not granted:
                 return {
                     "allowed": False,
                     "remaining": 0,
-                    "reset_time": reset_time,
-                    "limit": limits["requests"],
-                    "window": limits["window"]
-                }
-            else:
-                # Add current request
-                client_storage[limit_type].append(now)
-                
-                return {
-                    "allowed": True,
-                    "remaining": limits["requests"] - current_requests - 1,
-                    "reset_time": int(now + limits["window"]),
+                    "reset_time": int(now + retry_after) + 1,
                     "limit": limits["requests"],
                     "window": limits["window"]
                 }
+            
+            return {
+                "allowed": True,
+                "remaining": remaining,
+                "reset_time": int(reset_time),
+                "limit": limits["requests"],
+                "window": limits["window"]
+            }
                 
         except Exception as e:
             logger.error(f"Memory rate limit error: {e}")
@@ -0,0 +1,333 @@
+"""
+Request Pipeline Middleware
+Single pure-ASGI hop resolving client identity, auth claims, rate limit and security inspection once per request
+"""
+
+import time
+import logging
+from datetime import datetime
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+from fastapi.responses import JSONResponse
+from prometheus_client import Counter, Histogram
+
+from ..core.config import settings
+from ..core.jwt_auth import JWTAuthManager, auth_manager
+from .enhanced_rate_limiter import enhanced_rate_limiter
+from .rate_limit_engine import RateLimitEngine
+from .security import SecurityMiddleware, security_middleware
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("identity", "auth", "rate_limit", "security")
+
+# Methods whose body is read and inspected
+BODY_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+middleware_stage_duration_seconds = Histogram(
+    'middleware_stage_duration_seconds',
+    'Request pipeline stage duration in seconds',
+    ['stage'],
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+)
+middleware_rejections_total = Counter(
+    'middleware_rejections_total',
+    'Requests rejected by the request pipeline',
+    ['stage']
+)
+
+
+@dataclass
+class RequestContext:
+    """Per-request state resolved once by the pipeline, available as ``request.state.request_context``"""
+    client_ip: str
+    method: str
+    path: str
+    client_id: str = ""
+    token: Optional[str] = None
+    claims: Optional[Dict[str, Any]] = None
+    auth_error: Optional[str] = None
+    rate_limit: Optional[Dict[str, Any]] = None
+    inspection: Dict[str, List[str]] = field(default_factory=dict)
+    body: bytes = b""
+    rejected_by: Optional[str] = None
+    timings: Dict[str, float] = field(default_factory=dict)
+    started_at: float = field(default_factory=time.perf_counter)
+
+    @property
+    def user_id(self) -> Optional[str]:
+        return self.claims.get("user_id") if self.claims else None
+
+    @property
+    def authenticated(self) -> bool:
+        return self.claims is not None
+
+
+class _Rejection(Exception):
+    """Raised by a stage to answer the request without calling the app"""
+
+    def __init__(self, status_code: int, content: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+
+
+class RequestPipeline:
+    """Pure ASGI middleware running every request check in one hop
+
+    Each stage works on the same ``Request`` and ``RequestContext``, so
+    headers are parsed, the client identified, the bearer token verified and
+    the body read once. Stage latencies are exported to the
+    ``middleware_stage_duration_seconds`` histogram, and ``on_complete`` is
+    called with the context and status code once the response has started.
+    """
+
+    def __init__(
+        self,
+        app,
+        auth: Optional[JWTAuthManager] = None,
+        engine: Optional[RateLimitEngine] = None,
+        security: Optional[SecurityMiddleware] = None,
+        requests_per_minute: Optional[int] = None,
+        rate_limiting: Optional[bool] = None,
+        on_complete: Optional[Callable[[RequestContext, int], None]] = None
+    ):
+        self.app = app
+        self.auth = auth or auth_manager
+        self.engine = engine or enhanced_rate_limiter.engine
+        self.security = security or security_middleware
+        self.requests_per_minute = requests_per_minute or settings.RATE_LIMIT_PER_MINUTE
+        self.rate_limiting = settings.ENABLE_RATE_LIMITING if rate_limiting is None else rate_limiting
+        self.on_complete = on_complete
+        self._security_headers = [
+            (name.lower().encode("latin-1"), value.encode("latin-1"))
+            for name, value in self.security.add_security_headers(JSONResponse({})).headers.items()
+            if name.lower() not in ("content-length", "content-type")
+        ]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope, receive)
+        context = RequestContext(
+            client_ip=self.security.get_client_ip(request),
+            method=request.method,
+            path=request.url.path,
+        )
+        scope.setdefault("state", {})["request_context"] = context
+
+        try:
+            for stage, run in (
+                ("identity", self._identity_stage),
+                ("auth", self._auth_stage),
+                ("rate_limit", self._rate_limit_stage),
+                ("security", self._security_stage),
+            ):
+                started = time.perf_counter()
+                try:
+                    await run(request, context)
+                finally:
+                    elapsed = time.perf_counter() - started
+                    context.timings[stage] = elapsed
+                    middleware_stage_duration_seconds.labels(stage=stage).observe(elapsed)
+        except _Rejection as rejection:
+            middleware_rejections_total.labels(stage=context.rejected_by).inc()
+            response = JSONResponse(rejection.content, rejection.status_code, rejection.headers)
+            await response(scope, receive, send)
+            self._complete(context, rejection.status_code)
+            return
+
+        if context.method in BODY_METHODS:
+            # The security stage consumed the body, hand it to the app again
+            receive = self._replay_receive(context.body, request.receive)
+        response_status = 500
+
+        async def send_with_headers(message):
+            nonlocal response_status
+            if message["type"] == "http.response.start":
+                response_status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + self._response_headers(message, context)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        except Exception as e:
+            self.security.log_security_event('request_error', {
+                'ip': context.client_ip,
+                'path': context.path,
+                'error': str(e)
+            })
+            raise
+        finally:
+            self._complete(context, response_status)
+
+    async def _identity_stage(self, request: Request, context: RequestContext) -> None:
+        """Bearer token and blocked-IP check"""
+        authorization = request.headers.get("authorization", "")
+        if authorization[:7].lower() == "bearer ":
+            context.token = authorization[7:].strip() or None
+
+        if self.security.is_ip_blocked(context.client_ip):
+            self._reject(context, "identity", status.HTTP_403_FORBIDDEN, {
+                'error': 'Access denied',
+                'message': 'IP address is blocked',
+            })
+
+    async def _auth_stage(self, request: Request, context: RequestContext) -> None:
+        """Verify the bearer token once; endpoints still decide whether auth is required"""
+        if context.token:
+            try:
+                context.claims = self.auth.verify_token(context.token)
+            except HTTPException as e:
+                context.auth_error = e.detail
+        context.client_id = f"user:{context.user_id}" if context.user_id else f"ip:{context.client_ip}"
+
+    async def _rate_limit_stage(self, request: Request, context: RequestContext) -> None:
+        """One rate limit decision per client"""
+        if not self.rate_limiting:
+            return
+        try:
+            context.rate_limit = await self.engine.check(
+                f"rate_limit:{context.client_id}:pipeline", self.requests_per_minute, 60
+            )
+        except Exception as e:
+            # Fail open, as the other limiters do
+            logger.error(f"Rate limit check error: {e}")
+            return
+
+        if not context.rate_limit["allowed"]:
+            logger.warning(f"Rate limit exceeded for {context.client_id}")
+            self._reject(context, "rate_limit", status.HTTP_429_TOO_MANY_REQUESTS, {
+                "error": "Rate limit exceeded",
+                "message": "Rate limit exceeded. Please try again later.",
+                "retry_after": max(0, context.rate_limit["reset_time"] - int(time.time())),
+            }, enhanced_rate_limiter.get_rate_limit_headers(context.rate_limit))
+
+    async def _security_stage(self, request: Request, context: RequestContext) -> None:
+        """Size check, then headers, query parameters and body inspected in one pass"""
+        if not self.security.validate_request_size(request):
+            self.security.track_suspicious_request(context.client_ip, {
+                'reason': 'request_too_large',
+                'path': context.path
+            })
+            self._reject(context, "security", status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, {
+                'error': 'Request too large',
+                'message': 'Request size exceeds maximum allowed',
+            })
+
+        if context.method in BODY_METHODS:
+            context.body = await self._read_body(request, context)
+
+        context.inspection = self.security.inspect_request(request, context.body)
+        for section, reason in (
+            ('headers', 'suspicious_headers'),
+            ('query_params', 'suspicious_query_params'),
+            ('body', 'suspicious_body'),
+        ):
+            issues = context.inspection[section]
+            if issues:
+                self._report(context, reason, {'issues': issues})
+
+        # Tooling user agents (curl, python-requests, bots) are ordinary traffic on their own:
+        # logged, but only inspection hits count towards blocking the client
+        user_agent = request.headers.get('user-agent', '')
+        if self.security.is_suspicious_user_agent(user_agent):
+            self.security.log_security_event('suspicious_user_agent', {
+                'ip': context.client_ip,
+                'path': context.path,
+                'user_agent': user_agent
+            })
+
+    async def _read_body(self, request: Request, context: RequestContext) -> bytes:
+        """Read the whole body, rejecting it once it passes the size limit"""
+        limit = self.security.config['max_request_size']
+        chunks = []
+        size = 0
+        while True:
+            message = await request.receive()
+            if message["type"] != "http.request":
+                break
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > limit:
+                self._reject(context, "security", status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, {
+                    'error': 'Request too large',
+                    'message': 'Request size exceeds maximum allowed',
+                })
+            chunks.append(chunk)
+            if not message.get("more_body", False):
+                break
+        return b"".join(chunks)
+
+    @staticmethod
+    def _replay_receive(body: bytes, receive) -> Callable[[], Awaitable[Dict[str, Any]]]:
+        """Receive callable handing the buffered body to the app once"""
+        replayed = False
+
+        async def replay():
+            nonlocal replayed
+            if replayed:
+                # Later receives (disconnect detection) go to the server
+                return await receive()
+            replayed = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        return replay
+
+    def _report(self, context: RequestContext, reason: str, details: Dict[str, Any]) -> None:
+        """Track and log a suspicious request without rejecting it"""
+        self.security.track_suspicious_request(context.client_ip, {
+            'reason': reason,
+            'path': context.path,
+            **details
+        })
+        self.security.log_security_event(reason, {
+            'ip': context.client_ip,
+            'path': context.path,
+            **details
+        })
+
+    @staticmethod
+    def _reject(
+        context: RequestContext,
+        stage: str,
+        status_code: int,
+        content: Dict[str, Any],
+        headers: Optional[Dict[str, str]] = None
+    ) -> None:
+        context.rejected_by = stage
+        content.setdefault('timestamp', datetime.now().isoformat())
+        raise _Rejection(status_code, content, headers)
+
+    def _response_headers(self, message: Dict[str, Any], context: RequestContext) -> List[Tuple[bytes, bytes]]:
+        """Rate limit headers, plus security headers on JSON responses"""
+        headers = []
+        if context.rate_limit:
+            headers.extend(
+                (name.lower().encode("latin-1"), value.encode("latin-1"))
+                for name, value in enhanced_rate_limiter.get_rate_limit_headers(context.rate_limit).items()
+            )
+        content_type = next(
+            (value for name, value in message.get("headers", []) if name.lower() == b"content-type"),
+            b""
+        )
+        if content_type.startswith(b"application/json"):
+            headers.extend(self._security_headers)
+        return headers
+
+    def _complete(self, context: RequestContext, status_code: int) -> None:
+        if self.on_complete is None:
+            return
+        try:
+            self.on_complete(context, status_code)
+        except Exception as e:
+            logger.warning(f"Request pipeline completion hook failed: {e}")
+
+
+def get_request_context(request: Request) -> Optional[RequestContext]:
+    """Context resolved by the pipeline for a request, if it ran"""
+    return request.scope.get("state", {}).get("request_context")
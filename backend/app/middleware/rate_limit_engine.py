@@ -0,0 +1,243 @@
+"""
+Rate Limit Engine
+GCRA decisions in one atomic Redis Lua script with a local lease pre-check and O(1) memory fallback
+"""
+
+import math
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# GCRA with leases. Stores only the theoretical arrival time (TAT) per key.
+#   KEYS[1] = bucket key
+#   ARGV    = now ms, emission interval ms, window ms, requested tokens, refunded tokens
+# Refunded tokens are unused tokens of an expired lease, given back before deciding.
+# Returns {granted, remaining, retry_after ms, tat ms}
+GCRA_LUA = """
+local now = tonumber(ARGV[1])
+local emission = tonumber(ARGV[2])
+local window = tonumber(ARGV[3])
+local requested = tonumber(ARGV[4])
+local refund = tonumber(ARGV[5] or 0)
+
+local tat = tonumber(redis.call('GET', KEYS[1]) or now) - refund * emission
+if tat < now then
+    tat = now
+end
+
+local available = math.floor((window - (tat - now)) / emission)
+if available < 1 then
+    if refund > 0 then
+        redis.call('SET', KEYS[1], string.format('%.3f', tat), 'PX', math.max(1, math.ceil(tat - now)))
+    end
+    return {0, 0, math.ceil(tat + emission - window - now), math.ceil(tat)}
+end
+
+local granted = math.min(requested, available)
+tat = tat + granted * emission
+redis.call('SET', KEYS[1], string.format('%.3f', tat), 'PX', math.ceil(tat - now))
+return {granted, available - granted, 0, math.ceil(tat)}
+"""
+
+# Decision tuple: (granted, remaining, retry_after seconds, reset epoch seconds)
+Decision = Tuple[int, int, float, float]
+
+
+class LocalGCRABackend:
+    """In-process GCRA keeping a single float per key
+
+    ``max_keys`` bounds memory; keys are kept in least-recently-updated order
+    and the oldest is dropped when the bound is reached.
+    """
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._tat: "OrderedDict[str, float]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._tat)
+
+    def acquire(self, key: str, limit: int, window: float, requested: int = 1,
+                now: Optional[float] = None) -> Decision:
+        """Take up to ``requested`` tokens for a key"""
+        now = time.time() if now is None else now
+        emission = window / limit
+        tat = max(self._tat.get(key, now), now)
+
+        available = int((window - (tat - now)) // emission)
+        if available < 1:
+            return 0, 0, tat + emission - window - now, tat
+
+        granted = min(requested, available)
+        tat += granted * emission
+        self._tat.pop(key, None)
+        self._tat[key] = tat
+        while len(self._tat) > self.max_keys:
+            self._tat.popitem(last=False)
+        return granted, available - granted, 0.0, tat
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """Drop keys whose TAT has passed (they are back to a full budget)"""
+        now = time.time() if now is None else now
+        expired = [key for key, tat in self._tat.items() if tat <= now]
+        for key in expired:
+            del self._tat[key]
+        return len(expired)
+
+
+class RedisGCRABackend:
+    """GCRA evaluated atomically in Redis over an async connection pool"""
+
+    def __init__(self, redis_url: str, max_connections: int = 20):
+        import redis.asyncio as aioredis
+
+        self.pool = aioredis.ConnectionPool.from_url(redis_url, max_connections=max_connections)
+        self.client = aioredis.Redis(connection_pool=self.pool)
+        self.script = self.client.register_script(GCRA_LUA)
+
+    async def acquire(self, key: str, limit: int, window: float, requested: int = 1,
+                      now: Optional[float] = None, refund: int = 0) -> Decision:
+        """Return ``refund`` unused tokens and take up to ``requested`` for a key in one round trip"""
+        now = time.time() if now is None else now
+        now_ms = int(now * 1000)
+        granted, remaining, retry_after_ms, tat_ms = await self.script(
+            keys=[key],
+            args=[now_ms, window * 1000 / limit, int(window * 1000), requested, refund],
+        )
+        return int(granted), int(remaining), int(retry_after_ms) / 1000, int(tat_ms) / 1000
+
+    async def close(self) -> None:
+        """Release pooled connections"""
+        await self.pool.disconnect()
+
+
+class RateLimitEngine:
+    """Rate limit decisions with a local lease in front of the shared backend
+
+    When Redis is configured, a request for a key that is well under its
+    limit leases a small batch of tokens (``lease_fraction`` of the limit,
+    at most ``max_lease``) in the same script call. Following requests are
+    served from the lease without touching Redis until it is used up or
+    ``lease_ttl`` seconds pass. Tokens left in an expired lease are handed
+    back to Redis in the next script call for that key, so leasing never
+    over-admits and only under-admits while a lease is live. Limits too
+    small to lease are always checked in Redis.
+
+    If Redis errors, decisions fall back to the local GCRA backend and Redis
+    is retried after ``redis_retry_interval`` seconds.
+    """
+
+    def __init__(
+        self,
+        redis_url: Optional[str] = None,
+        lease_fraction: float = 0.05,
+        max_lease: int = 50,
+        lease_ttl: float = 1.0,
+        max_local_keys: int = 100000,
+        redis_retry_interval: float = 30.0,
+        max_connections: int = 20
+    ):
+        self.lease_fraction = lease_fraction
+        self.max_lease = max_lease
+        self.lease_ttl = lease_ttl
+        self.max_local_keys = max_local_keys
+        self.redis_retry_interval = redis_retry_interval
+        self.local = LocalGCRABackend(max_keys=max_local_keys)
+        self.redis: Optional[RedisGCRABackend] = None
+        if redis_url:
+            try:
+                self.redis = RedisGCRABackend(redis_url, max_connections=max_connections)
+            except Exception as e:
+                logger.error(f"Redis rate limit backend unavailable: {e}")
+
+        # key -> [tokens left, lease expiry, remaining at lease time, reset time]
+        self._leases: "OrderedDict[str, list]" = OrderedDict()
+        self._redis_retry_at = 0.0
+        self.stats = {"local_hits": 0, "redis_calls": 0, "local_fallbacks": 0, "denied": 0, "refunded": 0}
+
+    @property
+    def redis_active(self) -> bool:
+        """Whether decisions currently go to Redis"""
+        return self.redis is not None and time.time() >= self._redis_retry_at
+
+    def lease_size(self, limit: int) -> int:
+        """Tokens to lease per backend call for a given limit"""
+        return max(1, min(self.max_lease, int(limit * self.lease_fraction)))
+
+    async def check(self, key: str, limit: int, window: float) -> Dict[str, Any]:
+        """Admit or reject one request for a key"""
+        now = time.time()
+
+        refund = 0
+        lease = self._leases.get(key)
+        if lease is not None:
+            if lease[0] > 0 and lease[1] > now:
+                lease[0] -= 1
+                self.stats["local_hits"] += 1
+                return self._result(True, lease[2] + lease[0], lease[3], limit, window)
+            refund = lease[0]
+            del self._leases[key]
+
+        if self.redis_active:
+            try:
+                self.stats["redis_calls"] += 1
+                decision = await self.redis.acquire(key, limit, window, self.lease_size(limit), now, refund)
+                self.stats["refunded"] += refund
+            except Exception as e:
+                logger.error(f"Redis rate limit error, using local backend: {e}")
+                self._redis_retry_at = now + self.redis_retry_interval
+                self.stats["local_fallbacks"] += 1
+                decision = self.local.acquire(key, limit, window, 1, now)
+        else:
+            decision = self.local.acquire(key, limit, window, 1, now)
+
+        granted, remaining, retry_after, reset_time = decision
+        if not granted:
+            self.stats["denied"] += 1
+            return self._result(False, 0, now + retry_after, limit, window)
+
+        if granted > 1:
+            self._leases[key] = [granted - 1, now + self.lease_ttl, remaining, reset_time]
+            while len(self._leases) > self.max_local_keys:
+                self._leases.popitem(last=False)
+
+        return self._result(True, remaining + granted - 1, reset_time, limit, window)
+
+    def prune(self) -> int:
+        """Drop expired leases and idle local keys
+
+        An expired lease with unused tokens is kept until its bucket would be
+        full again anyway, so the tokens can still be refunded.
+        """
+        now = time.time()
+        expired = [key for key, lease in self._leases.items() if lease[1] <= now and (lease[0] == 0 or lease[3] <= now)]
+        for key in expired:
+            del self._leases[key]
+        return len(expired) + self.local.prune(now)
+
+    async def close(self) -> None:
+        """Close the Redis connection pool"""
+        if self.redis is not None:
+            await self.redis.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Engine statistics"""
+        return {
+            **self.stats,
+            "backend": "redis" if self.redis_active else "memory",
+            "active_leases": len(self._leases),
+            "local_keys": len(self.local),
+        }
+
+    @staticmethod
+    def _result(allowed: bool, remaining: int, reset_time: float, limit: int, window: float) -> Dict[str, Any]:
+        return {
+            "allowed": allowed,
+            "remaining": max(0, int(remaining)),
+            "reset_time": int(math.ceil(reset_time)),
+            "limit": limit,
+            "window": window,
+        }
@@ -16,6 +16,8 @@ from datetime import datetime, timedelta
 import logging
 from functools import wraps
 
+from ..core.request_inspection import InspectionReport, RequestInspector
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -37,6 +39,21 @@ class SecurityMiddleware:
             'block_duration_minutes': 60,
             'max_suspicious_requests': 10,
             'csrf_token_expiry_hours': 24,
+            'max_inspection_size': 64 * 1024,  # 64KB of query, headers and body per request
+            # Body media types pattern inspected besides text/*, *+json and *+xml; other
+            # bodies (file uploads, binary payloads) are size checked only
+            'inspected_body_types': {
+                'application/json', 'application/x-www-form-urlencoded',
+                'application/xml', 'multipart/form-data',
+            },
+        }
+        
+        # Standard headers whose normal values (*/*, q=0.9, base64 tokens, cookies) trip the
+        # injection patterns; they are still size checked but not pattern inspected
+        self.uninspected_headers = {
+            'accept', 'accept-encoding', 'accept-language', 'authorization', 'cache-control',
+            'connection', 'content-length', 'content-type', 'cookie', 'host', 'if-match',
+            'if-modified-since', 'if-none-match', 'origin', 'pragma', 'referer', 'user-agent',
         }
         
         # OWASP Top 10 patterns
@@ -110,6 +127,12 @@ class SecurityMiddleware:
             ]
         }
         
+        # All pattern families compiled once and evaluated in a single pass
+        self.inspector = RequestInspector(
+            self.malicious_patterns,
+            max_scan_size=self.config['max_inspection_size']
+        )
+        
         # Suspicious user agents
         self.suspicious_user_agents = [
             'sqlmap', 'nikto', 'nmap', 'masscan', 'zap', 'burp',
@@ -142,15 +165,7 @@ class SecurityMiddleware:
     
     def detect_malicious_patterns(self, text: str) -> List[str]:
         """Detect malicious patterns in text"""
-        detected = []
-        text_lower = text.lower()
-        
-        for category, patterns in self.malicious_patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, text_lower, re.IGNORECASE):
-                    detected.append(f"{category}: {pattern}")
-        
-        return detected
+        return [rule.label for rule in self.inspector.scan(text)]
     
     def is_suspicious_user_agent(self, user_agent: str) -> bool:
         """Check if user agent is suspicious"""
@@ -170,6 +185,13 @@ class SecurityMiddleware:
     
     def validate_headers(self, request: Request) -> List[str]:
         """Validate request headers"""
+        issues = self._check_header_limits(request)
+        report = self.inspector.scan_fields(self._header_fields(request))
+        issues.extend(self._pattern_issues(report))
+        return issues
+    
+    def _check_header_limits(self, request: Request) -> List[str]:
+        """Header count, size and suspicious header checks"""
         issues = []
         
         # Check header count
@@ -182,33 +204,99 @@ class SecurityMiddleware:
             if header in request.headers:
                 issues.append(f"Suspicious header: {header}")
         
-        # Check header values for malicious patterns
         for name, value in request.headers.items():
             if len(value) > self.config['max_headers_size']:
                 issues.append(f"Header {name} too large")
-            
-            malicious = self.detect_malicious_patterns(value)
-            if malicious:
-                issues.extend([f"Malicious pattern in {name}: {m}" for m in malicious])
         
         return issues
     
     def validate_query_params(self, request: Request) -> List[str]:
         """Validate query parameters"""
+        issues = self._check_query_limits(request)
+        report = self.inspector.scan_fields(self._query_fields(request))
+        issues.extend(self._pattern_issues(report))
+        return issues
+    
+    def _check_query_limits(self, request: Request) -> List[str]:
+        """Query parameter count and size checks"""
         issues = []
         
         # Check parameter count
         if len(request.query_params) > self.config['max_query_params']:
             issues.append("Too many query parameters")
         
-        # Check parameter values
         for name, value in request.query_params.items():
             if len(value) > 1000:  # Max parameter value length
                 issues.append(f"Query parameter {name} too large")
-            
-            malicious = self.detect_malicious_patterns(value)
-            if malicious:
-                issues.extend([f"Malicious pattern in query param {name}: {m}" for m in malicious])
+        
+        return issues
+    
+    def _header_fields(self, request: Request) -> List[tuple]:
+        """Header values as named inspection fields, leaving out standard protocol headers"""
+        return [
+            (name, value) for name, value in request.headers.items()
+            if name not in self.uninspected_headers and not name.startswith('sec-')
+        ]
+    
+    def _query_fields(self, request: Request) -> List[tuple]:
+        """Query parameter values as named inspection fields"""
+        return [(f"query param {name}", value) for name, value in request.query_params.items()]
+    
+    def _pattern_issues(self, report: InspectionReport) -> List[str]:
+        """Issue messages for every rule that matched"""
+        return [
+            f"Malicious pattern in {field_name}: {rule.label}"
+            for field_name, rules in report.hits.items()
+            for rule in rules
+        ]
+    
+    async def read_body(self, request: Request) -> bytes:
+        """Read the request body once and make it replayable for the endpoint"""
+        body = await request.body()
+        original_receive = request._receive
+        replayed = False
+        
+        async def receive():
+            nonlocal replayed
+            if replayed:
+                # Later receives (disconnect detection) go to the server
+                return await original_receive()
+            replayed = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+        
+        request._receive = receive
+        return body
+    
+    def inspects_body(self, request: Request) -> bool:
+        """Whether the body's content type is text the injection patterns apply to"""
+        media_type = request.headers.get('content-type', '').split(';', 1)[0].strip().lower()
+        return (
+            not media_type
+            or media_type.startswith('text/')
+            or media_type.endswith(('+json', '+xml'))
+            or media_type in self.config['inspected_body_types']
+        )
+    
+    def inspect_request(self, request: Request, body: bytes = b"") -> Dict[str, List[str]]:
+        """Validate headers, query parameters and body with one inspection pass"""
+        fields = self._query_fields(request) + self._header_fields(request)
+        if body and self.inspects_body(request):
+            fields.append(("request body", body[:self.config['max_inspection_size']].decode('utf-8', 'replace')))
+        
+        report = self.inspector.scan_fields(fields)
+        issues = {
+            'headers': self._check_header_limits(request),
+            'query_params': self._check_query_limits(request),
+            'body': [],
+        }
+        for field_name, rules in report.hits.items():
+            if field_name == "request body":
+                section = 'body'
+            elif field_name.startswith("query param "):
+                section = 'query_params'
+            else:
+                section = 'headers'
+            issues[section].extend(f"Malicious pattern in {field_name}: {rule.label}" for rule in rules)
         
         return issues
     
@@ -336,8 +424,11 @@ async def security_middleware_func(request: Request, call_next):
             }
         )
     
-    # Validate headers
-    header_issues = security_middleware.validate_headers(request)
+    # Read the body once, then validate headers, query parameters and body in one pass
+    body = await security_middleware.read_body(request)
+    inspection = security_middleware.inspect_request(request, body)
+    
+    header_issues = inspection['headers']
     if header_issues:
         security_middleware.track_suspicious_request(client_ip, {
             'reason': 'suspicious_headers',
@@ -350,8 +441,7 @@ async def security_middleware_func(request: Request, call_next):
             'path': request.url.path
         })
     
-    # Validate query parameters
-    query_issues = security_middleware.validate_query_params(request)
+    query_issues = inspection['query_params']
     if query_issues:
         security_middleware.track_suspicious_request(client_ip, {
             'reason': 'suspicious_query_params',
@@ -364,6 +454,19 @@ async def security_middleware_func(request: Request, call_next):
             'path': request.url.path
         })
     
+    body_issues = inspection['body']
+    if body_issues:
+        security_middleware.track_suspicious_request(client_ip, {
+            'reason': 'suspicious_body',
+            'issues': body_issues,
+            'path': request.url.path
+        })
+        security_middleware.log_security_event('suspicious_body', {
+            'ip': client_ip,
+            'issues': body_issues,
+            'path': request.url.path
+        })
+    
     # Check user agent
     user_agent = request.headers.get('user-agent', '')
     if security_middleware.is_suspicious_user_agent(user_agent):
@@ -453,7 +556,8 @@ async def get_security_stats():
         'blocked_ips': len(security_middleware.blocked_ips),
         'suspicious_requests': len(security_middleware.suspicious_requests),
         'active_csrf_tokens': len(security_middleware.csrf_tokens),
-        'config': security_middleware.config
+        'config': security_middleware.config,
+        'inspection': security_middleware.inspector.get_stats()
     }
 
 async def unblock_ip(ip: str):
@@ -13,6 +13,8 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 import asyncio
 import threading
 
+from ..core.instrumentation import instrument
+
 logger = logging.getLogger(__name__)
 
 class AdvancedRiskAnalytics:
@@ -24,6 +26,7 @@ class AdvancedRiskAnalytics:
         self.scenario_cache = {}
         self.risk_counter = 1000
         
+    @instrument("var_monte_carlo")
     async def calculate_var_monte_carlo(
         self, 
         portfolio_data: Dict[str, Any], 
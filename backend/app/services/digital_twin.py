@@ -7,6 +7,8 @@ PRODUCTION READY IMPLEMENTATION
 from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime, timedelta
 import json
+import os
+import sys
 import numpy as np
 import pandas as pd
 from sklearn.ensemble import RandomForestRegressor, IsolationForest
@@ -29,6 +31,13 @@ except ImportError:
     REDIS_AVAILABLE = False
     print("Warning: Redis not available, using in-memory storage")
 
+# Columnar sensor ingestion shared with the IoT integration service
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..', 'shared', 'services'))
+try:
+    from iot_integration_service import iot_integration_service
+except ImportError:
+    iot_integration_service = None
+
 class GlobalEnergyDigitalTwin:
     """
     Production-ready Global Energy Digital Twin with real IoT integration
@@ -83,6 +92,8 @@ class GlobalEnergyDigitalTwin:
         client.subscribe("energy/market/+/volume")
         client.subscribe("energy/supply/+/production")
         client.subscribe("energy/demand/+/consumption")
+        # High-rate sensor readings: sensors/<site>/<sensor_type>
+        client.subscribe("sensors/+/+")
     
     def _on_mqtt_message(self, client, userdata, msg):
         """MQTT message callback"""
@@ -90,6 +101,11 @@ class GlobalEnergyDigitalTwin:
             topic = msg.topic
             payload = json.loads(msg.payload.decode())
             
+            if topic.startswith("sensors/"):
+                # Batched into the columnar buffers instead of one Redis write and twin update per reading
+                self._ingest_sensor_reading(topic, payload)
+                return
+            
             # Store real-time data
             if REDIS_AVAILABLE:
                 self.redis_client.setex(f"iot:{topic}", 3600, json.dumps(payload))
@@ -100,6 +116,16 @@ class GlobalEnergyDigitalTwin:
         except Exception as e:
             print(f"MQTT message processing error: {e}")
     
+    def _ingest_sensor_reading(self, topic: str, payload: Any):
+        """Queue a sensors/<site>/<sensor_type> reading for columnar ingestion"""
+        if iot_integration_service is None:
+            return
+        _, site, sensor_type = topic.split('/', 2)
+        if isinstance(payload, dict):
+            iot_integration_service.ingestion.submit(sensor_type, site, payload["value"], payload.get("timestamp"))
+        else:
+            iot_integration_service.ingestion.submit(sensor_type, site, payload)
+    
     def _update_twin_with_iot_data(self, topic: str, data: Dict[str, Any]):
         """Update digital twin with real-time IoT data"""
         try:
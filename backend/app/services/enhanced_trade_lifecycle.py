@@ -10,6 +10,7 @@ from typing import Dict, List, Optional, Any, Tuple
 from uuid import uuid4
 import json
 
+from ..core.instrumentation import instrument
 from ..core.event_bus import event_bus, EventType, create_event, publish_event
 from ..schemas.trade import (
     TradeCreate, TradeUpdate, TradeResponse, TradeStatusResponse,
@@ -89,6 +90,7 @@ class EnhancedTradeLifecycleService:
             org = Organization(**org_data)
             self.organizations[org_data["id"]] = org
     
+    @instrument("trade_capture")
     async def capture_trade(self, trade_data: TradeCreate, user_id: str, organization_id: str) -> TradeResponse:
         """
         Capture a new trade with event publishing
@@ -379,6 +381,7 @@ class EnhancedTradeLifecycleService:
             logger.error(f"Error allocating trade {trade_id}: {e}")
             raise
     
+    @instrument("trade_settlement")
     async def settle_trade(self, trade_id: str, user_id: str, settlement_data: Dict[str, Any]) -> TradeSettlement:
         """
         Settle an allocated trade
@@ -15,6 +15,16 @@ import random
 
 logger = logging.getLogger(__name__)
 
+# Commodity/exchange pairs polled by the gRPC tick server and the market data task
+DEFAULT_FEEDS = [
+    ("crude_oil", "ICE"),
+    ("crude_oil", "CME"),
+    ("natural_gas", "CME"),
+    ("electricity", "EEX"),
+    ("carbon_credit", "ICE"),
+    ("coal", "ICE"),
+]
+
 class MarketFeed(Enum):
     """Market feed enumeration"""
     BLOOMBERG = "bloomberg"
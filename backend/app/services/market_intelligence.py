@@ -20,9 +20,18 @@ try:
 except ImportError:
     SKLEARN_AVAILABLE = False
     print("Warning: sklearn not available, using fallback ML")
+import os
+import sys
 import warnings
 warnings.filterwarnings('ignore')
 
+# Streaming anomaly detector shared with the forecasting service
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..', 'shared', 'services'))
+try:
+    from anomaly_detection import StreamingAnomalyDetector
+except ImportError:
+    StreamingAnomalyDetector = None
+
 # Market data imports for production
 try:
     import yfinance as yf
@@ -52,6 +61,8 @@ class GlobalMarketIntelligenceNetwork:
         self.regulatory_updates = []
         self.last_data_update = datetime.now()
         self.ai_models = self._initialize_ai_models()
+        # Per-symbol price state; ticks arrive irregularly, so no seasonal slots
+        self.anomaly_detector = StreamingAnomalyDetector(season_length=0) if StreamingAnomalyDetector else None
     
     def _initialize_data_feeds(self):
         """Initialize market data feeds"""
@@ -406,7 +417,12 @@ class GlobalMarketIntelligenceNetwork:
                             # Use AI model to detect anomalies
                             anomaly_score = self._detect_anomaly_ai(features)
                             
-                            is_anomaly = anomaly_score > threshold
+                            # Score the price against the symbol's own history as well
+                            streaming = None
+                            if self.anomaly_detector is not None and symbol_data.get('price', 0) > 0:
+                                streaming = self.anomaly_detector.update(symbol, symbol_data['price'])
+                            
+                            is_anomaly = anomaly_score > threshold or bool(streaming and streaming["is_anomaly"])
                             
                             anomalies[symbol] = {
                                 "symbol": symbol,
@@ -414,6 +430,7 @@ class GlobalMarketIntelligenceNetwork:
                                 "anomaly_score": round(anomaly_score, 3),
                                 "threshold": threshold,
                                 "features": features,
+                                "streaming": streaming,
                                 "detection_timestamp": datetime.now().isoformat()
                             }
                             
@@ -8,6 +8,8 @@ from datetime import datetime, timedelta
 import math
 import logging
 
+from ..core.instrumentation import instrument
+
 logger = logging.getLogger(__name__)
 
 
@@ -19,6 +21,7 @@ class MarketRiskEngine:
         self.time_horizons = [1, 5, 10, 30]  # days
         self.historical_data = {}  # In-memory storage for stubs
         
+    @instrument("var", batch=lambda self, positions, *args, **kwargs: len(positions or ()))
     def calculate_var(self, positions: List[Dict[str, Any]], confidence_level: float = 0.95, 
                      time_horizon: int = 1) -> Dict[str, Any]:
         """
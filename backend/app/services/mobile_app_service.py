@@ -8,12 +8,16 @@ from datetime import datetime, timedelta
 import logging
 import asyncio
 import json
+import os
 import uuid
 from enum import Enum
 from fastapi import HTTPException
 import hashlib
 import base64
 
+from ..core.change_log import ChangeLog, change_log, sync_scope
+from ..core.config import settings
+
 logger = logging.getLogger(__name__)
 
 class NotificationType(Enum):
@@ -34,15 +38,23 @@ class SyncStatus(Enum):
     CONFLICT = "conflict"
 
 class MobileAppService:
-    """Service for mobile application functionality and optimization"""
+    """Service for mobile application functionality and optimization
+    
+    Push tokens are also written to ``token_dir`` (one file per device), so
+    notification workers in other processes can deliver to devices that
+    registered through the API.
+    """
     
-    def __init__(self):
+    def __init__(self, sync_log: Optional[ChangeLog] = None, token_dir: Optional[str] = None):
         self.registered_devices = {}
         self.push_tokens = {}
+        self.token_dir = token_dir or settings.PUSH_TOKEN_DIR
         self.notification_queue = []
         self.sync_sessions = {}
+        self.sync_pages = {}
         self.offline_data_cache = {}
         self.device_counter = 1000
+        self.change_log = sync_log or change_log
         
         # Mobile-specific configurations
         self.mobile_configs = {
@@ -106,6 +118,7 @@ class MobileAppService:
                     "last_active": datetime.now().isoformat(),
                     "push_enabled": device_info.get("push_enabled", True),
                     "offline_sync_enabled": device_info.get("offline_sync_enabled", True),
+                    "user_id": device_info.get("user_id"),
                     "metadata": device_info.get("metadata", {})
                 }
                 
@@ -118,6 +131,8 @@ class MobileAppService:
                     "market_data": [],
                     "notifications": [],
                     "last_sync": None,
+                    "last_version": 0,
+                    "epoch": None,
                     "cache_size_mb": 0
                 }
             
@@ -164,6 +179,7 @@ class MobileAppService:
                 "last_used": datetime.now().isoformat(),
                 "status": "active"
             }
+            self._persist_push_token(device_id, self.push_tokens[device_id])
             
             # Update device
             device = self.registered_devices[device_id]
@@ -181,6 +197,35 @@ class MobileAppService:
             logger.error(f"Push token registration failed: {str(e)}")
             raise HTTPException(status_code=500, detail=str(e))
     
+    def _push_token_path(self, device_id: str) -> str:
+        # Device ids come from clients, so the file name is a digest rather than the id itself
+        return os.path.join(self.token_dir, f"{hashlib.sha256(device_id.encode()).hexdigest()}.json")
+    
+    def _persist_push_token(self, device_id: str, token_info: Dict[str, Any]):
+        """Write a device's push token where notification workers can read it"""
+        try:
+            os.makedirs(self.token_dir, exist_ok=True)
+            path = self._push_token_path(device_id)
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, "w") as handle:
+                json.dump({"device_id": device_id, **token_info}, handle)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.warning(f"Push token for device {device_id} not persisted: {e}")
+    
+    def _push_token(self, device_id: str) -> Optional[Dict[str, Any]]:
+        """Push token of a device, from memory or as persisted by the process it registered with"""
+        token_info = self.push_tokens.get(device_id)
+        if token_info is None:
+            try:
+                with open(self._push_token_path(device_id)) as handle:
+                    token_info = json.load(handle)
+            except (OSError, ValueError):
+                return None
+            token_info.pop("device_id", None)
+            self.push_tokens[device_id] = token_info
+        return token_info
+    
     async def send_push_notification(
         self, 
         device_ids: List[str],
@@ -226,10 +271,17 @@ class MobileAppService:
             # Add to notification queue
             self.notification_queue.append(notification)
             
+            # Version the notification for devices that are offline
+            for device_id in device_ids:
+                if device_id in self.registered_devices:
+                    self.change_log.record(
+                        self._sync_scope(device_id), "notifications", notification_id, notification
+                    )
+            
             # Send to each device
             results = []
             for device_id in device_ids:
-                if device_id in self.push_tokens:
+                if self._push_token(device_id):
                     result = await self._send_to_device(device_id, notification)
                     results.append({
                         "device_id": device_id,
@@ -243,11 +295,14 @@ class MobileAppService:
                         "message": "Push token not found"
                     })
             
-            logger.info(f"Push notification sent: {notification_id} to {len(device_ids)} devices")
+            sent = sum(1 for result in results if result["status"] == "success")
+            logger.info(f"Push notification sent: {notification_id} to {sent}/{len(device_ids)} devices")
             
             return {
                 "success": True,
                 "notification_id": notification_id,
+                "sent": sent,
+                "failed": len(results) - sent,
                 "results": results
             }
             
@@ -328,9 +383,18 @@ class MobileAppService:
             if device_id in self.sync_sessions and self.sync_sessions[device_id]["status"] == SyncStatus.IN_PROGRESS.value:
                 raise HTTPException(status_code=409, detail="Sync already in progress")
             
+            # Drop pages of the device's previous session
+            if device_id in self.sync_sessions:
+                self.sync_pages.pop(self.sync_sessions[device_id]["session_id"], None)
+            
             # Generate sync session ID
             session_id = str(uuid.uuid4())
             
+            # Resume from the version the device last acknowledged unless it says otherwise
+            cache = self.offline_data_cache.get(device_id, {})
+            from_version = int(sync_config.get("last_version", cache.get("last_version", 0)) or 0)
+            epoch = sync_config.get("epoch", cache.get("epoch"))
+            
             # Create sync session
             sync_session = {
                 "session_id": session_id,
@@ -338,9 +402,14 @@ class MobileAppService:
                 "status": SyncStatus.IN_PROGRESS.value,
                 "started_at": datetime.now().isoformat(),
                 "config": sync_config,
+                "from_version": from_version,
+                "to_version": from_version,
+                "epoch": epoch,
+                "full_resync": False,
                 "progress": 0,
                 "total_items": 0,
                 "synced_items": 0,
+                "total_pages": 0,
                 "errors": []
             }
             
@@ -361,29 +430,56 @@ class MobileAppService:
             logger.error(f"Offline sync start failed: {str(e)}")
             raise HTTPException(status_code=500, detail=str(e))
     
+    def _sync_scope(self, device_id: str) -> str:
+        """Change log scope for a device: its user if known, else the device itself"""
+        user_id = self.registered_devices.get(device_id, {}).get("user_id")
+        return sync_scope("user", user_id) if user_id else sync_scope("device", device_id)
+    
     async def _perform_offline_sync(self, device_id: str, session_id: str):
-        """Perform offline data synchronization"""
+        """Perform offline data synchronization
+        
+        Builds compacted delta pages (latest state per entity since the
+        device's last acknowledged version) of ``sync_batch_size`` changes each.
+        The device downloads them with ``get_sync_page``. A version from
+        another change log epoch starts over with a full resync.
+        """
         
         try:
             sync_session = self.sync_sessions[device_id]
-            
-            # Simulate sync process
-            sync_steps = [
-                ("trades", 0.3),
-                ("positions", 0.5),
-                ("market_data", 0.7),
-                ("notifications", 0.9),
-                ("finalization", 1.0)
-            ]
-            
-            for step_name, progress in sync_steps:
-                await asyncio.sleep(1)  # Simulate processing time
+            scope = self._sync_scope(device_id)
+            data_types = sync_session["config"].get("data_types")
+            page_size = self.mobile_configs["sync_batch_size"]
+            
+            pages = []
+            since_version = sync_session["from_version"]
+            epoch = sync_session["epoch"]
+            while True:
+                page = self.change_log.get_page(scope, since_version, page_size, data_types, epoch)
+                pages.append(page)
+                
+                if len(pages) == 1:
+                    sync_session["full_resync"] = page["full_resync"]
+                    sync_session["from_version"] = page["from_version"]
+                    sync_session["total_items"] = self.change_log.count_since(
+                        scope, page["from_version"], data_types
+                    )
                 
-                sync_session["progress"] = progress
-                sync_session["synced_items"] += 10
+                sync_session["synced_items"] += len(page["changes"])
+                sync_session["progress"] = (
+                    sync_session["synced_items"] / sync_session["total_items"]
+                    if sync_session["total_items"] else 1.0
+                )
                 
-                # Update session
-                self.sync_sessions[device_id] = sync_session
+                if not page["has_more"]:
+                    break
+                since_version = page["to_version"]
+                epoch = page["epoch"]
+                await asyncio.sleep(0)  # Yield between pages
+            
+            self.sync_pages[session_id] = pages
+            sync_session["total_pages"] = len(pages)
+            sync_session["to_version"] = pages[-1]["to_version"]
+            sync_session["epoch"] = pages[-1]["epoch"]
             
             # Mark sync as completed
             sync_session["status"] = SyncStatus.COMPLETED.value
@@ -434,6 +530,49 @@ class MobileAppService:
             logger.error(f"Sync status retrieval failed: {str(e)}")
             raise HTTPException(status_code=500, detail=str(e))
     
+    async def get_sync_page(self, device_id: str, session_id: str, page_index: int = 0) -> Dict[str, Any]:
+        """
+        Get one page of delta changes produced by a sync session
+        
+        Args:
+            device_id: Device identifier
+            session_id: Sync session identifier
+            page_index: Zero-based page number
+            
+        Returns:
+            Dict with the page; fetching the last page acknowledges its version
+        """
+        try:
+            sync_session = self.sync_sessions.get(device_id)
+            if not sync_session or sync_session["session_id"] != session_id:
+                raise HTTPException(status_code=404, detail="Sync session not found")
+            
+            pages = self.sync_pages.get(session_id)
+            if pages is None:
+                raise HTTPException(status_code=409, detail="Sync session not ready")
+            if not 0 <= page_index < len(pages):
+                raise HTTPException(status_code=404, detail="Sync page not found")
+            
+            page = pages[page_index]
+            is_last = page_index == len(pages) - 1
+            if is_last and device_id in self.offline_data_cache:
+                self.offline_data_cache[device_id]["last_version"] = page["to_version"]
+                self.offline_data_cache[device_id]["epoch"] = page["epoch"]
+            
+            return {
+                "success": True,
+                "page_index": page_index,
+                "total_pages": len(pages),
+                "is_last": is_last,
+                "page": page
+            }
+            
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Sync page retrieval failed: {str(e)}")
+            raise HTTPException(status_code=500, detail=str(e))
+    
     async def get_mobile_optimized_data(
         self, 
         device_id: str,
@@ -850,3 +989,7 @@ class MobileAppService:
         except Exception as e:
             logger.error(f"System mobile analytics retrieval failed: {str(e)}")
             raise HTTPException(status_code=500, detail=str(e))
+
+
+# Global mobile app service instance
+mobile_app_service = MobileAppService()
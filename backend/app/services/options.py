@@ -7,6 +7,8 @@ from typing import Dict, List, Any, Optional
 from datetime import datetime, timedelta
 import logging
 
+from ..core.instrumentation import instrument
+
 logger = logging.getLogger(__name__)
 
 
@@ -17,6 +19,7 @@ class OptionsEngine:
         self.supported_commodities = ["crude_oil", "natural_gas", "refined_products"]
         self.islamic_structures = ["arbun", "salam", "istisna"]
     
+    @instrument("option_pricing")
     def price_option(self, option_spec: Dict[str, Any]) -> Dict[str, Any]:
         """
         Price an option using Black-Scholes or Islamic-compliant models
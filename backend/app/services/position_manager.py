@@ -7,6 +7,8 @@ from typing import Dict, List, Any, Optional
 from datetime import datetime, timedelta
 import logging
 
+from ..core.instrumentation import instrument
+
 logger = logging.getLogger(__name__)
 
 
@@ -190,6 +192,7 @@ class PositionManager:
             logger.error(f"Position calculation failed: {str(e)}")
             raise
     
+    @instrument("mtm", batch=lambda self, positions: len(positions))
     def mark_to_market(self, positions: List[Dict[str, Any]]) -> float:
         """
         Calculate mark-to-market value for positions using multithreading
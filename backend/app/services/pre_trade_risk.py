@@ -0,0 +1,119 @@
+"""
+Pre-Trade Risk Checker
+Accept/reject decisions with reason codes from the risk, credit and compliance services
+"""
+
+import logging
+from typing import Any, Dict, List, Optional
+
+from .compliance_engine import ComplianceEngine
+from .credit_manager import CreditManager
+from .risk_manager import RiskManager
+
+logger = logging.getLogger(__name__)
+
+# Reason codes (mirrored by the RejectReason enum in proto/risk.proto)
+INVALID_ORDER = "INVALID_ORDER"
+SIZE_LIMIT = "SIZE_LIMIT"
+RISK_SCORE = "RISK_SCORE"
+NO_CREDIT_LIMIT = "NO_CREDIT_LIMIT"
+INSUFFICIENT_CREDIT = "INSUFFICIENT_CREDIT"
+POSITION_LIMIT = "POSITION_LIMIT"
+CONCENTRATION_LIMIT = "CONCENTRATION_LIMIT"
+INTERNAL_ERROR = "INTERNAL_ERROR"
+
+COMPLIANCE_REASONS = {
+    "max_single_position": POSITION_LIMIT,
+    "max_portfolio_concentration": CONCENTRATION_LIMIT,
+}
+
+
+class PreTradeRiskChecker:
+    """Runs an order through risk assessment, credit availability and position compliance
+
+    An order is accepted only when no check produces a reason code. Every
+    check runs, so a rejection lists all failed checks at once.
+    """
+
+    def __init__(
+        self,
+        risk_manager: Optional[RiskManager] = None,
+        credit_manager: Optional[CreditManager] = None,
+        compliance_engine: Optional[ComplianceEngine] = None,
+        max_risk_score: float = 0.6
+    ):
+        self.risk_manager = risk_manager or RiskManager()
+        self.credit_manager = credit_manager or CreditManager()
+        self.compliance_engine = compliance_engine or ComplianceEngine()
+        self.max_risk_score = max_risk_score
+        self.stats = {"checked": 0, "accepted": 0, "rejected": 0, "errors": 0}
+
+    async def check_order(self, order: Dict[str, Any]) -> Dict[str, Any]:
+        """Check one proposed order"""
+        result = {
+            "order_id": order.get("order_id", ""),
+            "accepted": False,
+            "reasons": [],
+            "risk_score": 0.0,
+            "risk_level": "",
+            "available_credit": 0.0,
+        }
+        self.stats["checked"] += 1
+
+        quantity = order.get("quantity") or 0
+        price = order.get("price") or 0
+        counterparty_id = order.get("counterparty_id") or ""
+        if quantity <= 0 or price <= 0 or not counterparty_id or not order.get("commodity"):
+            return self._finish(result, [INVALID_ORDER])
+
+        try:
+            reasons: List[str] = []
+            trade_value = quantity * price
+
+            assessment = await self.risk_manager.assess_trade_risk({
+                "quantity": quantity,
+                "price": price,
+                "commodity": order["commodity"],
+                "counterparty": counterparty_id,
+            })
+            result["risk_score"] = assessment["risk_score"]
+            result["risk_level"] = assessment["risk_level"]
+            if assessment["limit_checks"].get("size_limit", {}).get("exceeded"):
+                reasons.append(SIZE_LIMIT)
+            if assessment["risk_score"] >= self.max_risk_score:
+                reasons.append(RISK_SCORE)
+
+            # Checked up front: an unknown counterparty is a rejection, not an error
+            if counterparty_id not in self.credit_manager.credit_limits:
+                reasons.append(NO_CREDIT_LIMIT)
+            else:
+                credit = await self.credit_manager.check_credit_availability(counterparty_id, trade_value)
+                result["available_credit"] = credit["available_credit"]
+                if not credit["can_execute"]:
+                    reasons.append(INSUFFICIENT_CREDIT)
+
+            compliance = self.compliance_engine.check_position_compliance(
+                [{"position_id": result["order_id"], "notional_value": trade_value}],
+                order.get("portfolio_value") or 0
+            )
+            for violation in compliance["violations"]:
+                reason = COMPLIANCE_REASONS.get(violation["rule"])
+                if reason and reason not in reasons:
+                    reasons.append(reason)
+
+            return self._finish(result, reasons)
+
+        except Exception as e:
+            logger.error(f"Pre-trade risk check failed for order {result['order_id']}: {e}")
+            self.stats["errors"] += 1
+            return self._finish(result, [INTERNAL_ERROR])
+
+    def _finish(self, result: Dict[str, Any], reasons: List[str]) -> Dict[str, Any]:
+        result["reasons"] = reasons
+        result["accepted"] = not reasons
+        self.stats["accepted" if result["accepted"] else "rejected"] += 1
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Check counters"""
+        return dict(self.stats)
@@ -0,0 +1,40 @@
+"""
+Celery Task Modules
+Task packages routed by app.core.celery_app, one module per queue
+"""
+
+import asyncio
+import concurrent.futures
+from typing import Any, Coroutine
+
+from celery.result import allow_join_result
+
+
+def run_async(coroutine: Coroutine) -> Any:
+    """Run a service coroutine from a synchronous task
+
+    Worker processes have no running loop, so asyncio.run is used; in eager
+    mode a task may be called from inside a running loop (e.g. an API handler
+    or async test), in which case the coroutine runs on a helper thread.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coroutine).result()
+
+
+def replace_with(task, signature) -> Any:
+    """``task.replace(signature)`` that also works in eager mode
+
+    Replacing freezes the signature, and freezing a chord subscribes to the
+    result backend; eager runs have no backend, so the workflow is applied
+    in-process instead.
+    """
+    if task.request.is_eager:
+        # Eager results are already complete, so joining them cannot block a worker
+        with allow_join_result():
+            return signature.apply().get()
+    return task.replace(signature)
@@ -0,0 +1,39 @@
+"""
+Market Data Tasks
+Periodic refresh of the real-time market data feeds
+"""
+
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from app.core.celery_app import celery_app
+from app.services.market_data_integration import DEFAULT_FEEDS, MarketDataIntegration
+
+from . import run_async
+
+logger = logging.getLogger(__name__)
+
+
+async def _fetch_feeds(feeds: List[List[str]]) -> List[Dict[str, Any]]:
+    integration = MarketDataIntegration()
+    updates = []
+    for commodity, exchange in feeds:
+        try:
+            updates.append(await integration.fetch_real_time_feed(commodity, exchange))
+        except Exception as e:
+            logger.error(f"Market data update failed for {commodity}:{exchange}: {e}")
+    return updates
+
+
+@celery_app.task
+def update_market_data(feeds: Optional[List[List[str]]] = None) -> Dict[str, Any]:
+    """Refresh (commodity, exchange) feeds, all default feeds when none are given"""
+    feeds = feeds or DEFAULT_FEEDS
+    updates = run_async(_fetch_feeds(feeds))
+    return {
+        "status": "success" if len(updates) == len(feeds) else "partial",
+        "updated_symbols": len(updates),
+        "prices": {f"{update['commodity']}:{update['exchange']}": update["price"] for update in updates},
+        "timestamp": datetime.utcnow().isoformat()
+    }
@@ -0,0 +1,47 @@
+"""
+Notification Tasks
+Push notification delivery off the request path
+"""
+
+import logging
+from datetime import datetime
+from typing import Any, Dict
+
+from app.core.celery_app import celery_app
+from app.services.mobile_app_service import mobile_app_service
+
+from . import run_async
+
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task
+def send_notification(notification_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Send a push notification to the devices in ``device_ids``
+
+    The status is "success" when every device was reached, "partial" when
+    only some were and "failed" when none were (e.g. no push token).
+    """
+    data = dict(notification_data)
+    device_ids = data.pop("device_ids", [])
+    try:
+        result = run_async(mobile_app_service.send_push_notification(device_ids, data))
+        if result["sent"] and not result["failed"]:
+            status = "success"
+        else:
+            status = "partial" if result["sent"] else "failed"
+        return {
+            "status": status,
+            "notification_id": result.get("notification_id"),
+            "sent": result["sent"],
+            "failed": result["failed"],
+            "results": result["results"],
+            "timestamp": datetime.utcnow().isoformat()
+        }
+    except Exception as e:
+        logger.error(f"Notification delivery failed: {e}")
+        return {
+            "status": "error",
+            "error": str(getattr(e, "detail", e)),
+            "timestamp": datetime.utcnow().isoformat()
+        }
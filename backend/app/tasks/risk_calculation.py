@@ -0,0 +1,257 @@
+"""
+Portfolio Risk Calculation Tasks
+Portfolio VaR and stress runs split by book into chunked subtasks and combined with a chord
+"""
+
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from celery import chord
+
+from app.core.blob_store import blob_store
+from app.core.celery_app import celery_app, discard_task_blobs
+from app.core.config import settings
+
+from . import replace_with
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BOOK = "default"
+DEFAULT_CORRELATION = 0.7
+DEFAULT_VOLATILITY = 0.2
+
+
+def split_by_book(positions: List[Dict[str, Any]], chunk_size: int) -> List[Tuple[str, List[Dict[str, Any]]]]:
+    """Group positions by book, splitting large books into chunks of at most chunk_size"""
+    books: Dict[str, List[Dict[str, Any]]] = {}
+    for position in positions:
+        books.setdefault(str(position.get("book") or DEFAULT_BOOK), []).append(position)
+
+    chunks = []
+    for book, book_positions in books.items():
+        for start in range(0, len(book_positions), chunk_size):
+            chunks.append((book, book_positions[start:start + chunk_size]))
+    return chunks
+
+
+def generate_scenarios(
+    portfolio_data: Dict[str, Any],
+    time_horizon: int,
+    num_simulations: int,
+    seed: Optional[int] = None
+) -> Tuple[List[str], np.ndarray]:
+    """Correlated commodity returns shared by every chunk (simulations x risk factors)
+
+    Volatility and expected return per commodity come from ``market_data``,
+    falling back to the average over its positions; ``correlations`` is a
+    nested ``{commodity: {commodity: rho}}`` mapping.
+    """
+    positions = portfolio_data.get("positions", [])
+    market_data = portfolio_data.get("market_data", {})
+    correlations = portfolio_data.get("correlations", {})
+    factors = sorted({str(position.get("commodity", "unknown")) for position in positions})
+
+    volatilities = np.empty(len(factors))
+    mean_returns = np.empty(len(factors))
+    for index, factor in enumerate(factors):
+        factor_positions = [p for p in positions if str(p.get("commodity", "unknown")) == factor]
+        factor_data = market_data.get(factor, {})
+        volatilities[index] = factor_data.get(
+            "volatility", np.mean([p.get("volatility", DEFAULT_VOLATILITY) for p in factor_positions])
+        )
+        mean_returns[index] = factor_data.get(
+            "expected_return", np.mean([p.get("expected_return", 0.0) for p in factor_positions])
+        )
+
+    correlation = np.full((len(factors), len(factors)), DEFAULT_CORRELATION)
+    np.fill_diagonal(correlation, 1.0)
+    for i, first in enumerate(factors):
+        for j, second in enumerate(factors):
+            rho = correlations.get(first, {}).get(second)
+            if rho is not None and i != j:
+                correlation[i, j] = correlation[j, i] = rho
+
+    try:
+        cholesky = np.linalg.cholesky(correlation)
+    except np.linalg.LinAlgError:
+        # Fallback to independent factors if the matrix is not positive definite
+        cholesky = np.eye(len(factors))
+
+    rng = np.random.default_rng(seed)
+    shocks = rng.standard_normal((num_simulations, len(factors))) @ cholesky.T
+    returns = shocks * volatilities * np.sqrt(time_horizon) + mean_returns * time_horizon
+    return factors, returns
+
+
+def build_portfolio_risk_workflow(
+    portfolio_data: Dict[str, Any],
+    confidence_level: float = 0.95,
+    time_horizon: int = 1,
+    num_simulations: int = 10000,
+    stress_scenarios: Optional[List[Dict[str, Any]]] = None,
+    chunk_size: Optional[int] = None,
+    seed: Optional[int] = None
+):
+    """Chord of per-book chunk tasks reduced by aggregate_portfolio_risk
+
+    The scenario matrix is generated once (or taken from ``scenario_returns``
+    with its ``factors``) and stored in the blob store; chunk tasks receive its
+    key and write their P&L vectors under keys chosen here, so only small
+    messages go through the broker and result backend. If a chunk fails the
+    reduce step never runs, and its error callback deletes the arrays instead.
+    """
+    positions = portfolio_data.get("positions", [])
+    if portfolio_data.get("scenario_returns") is not None:
+        # Caller-supplied scenario matrix (simulations x factors), e.g. historical returns
+        factors = list(portfolio_data["factors"])
+        returns = np.asarray(portfolio_data["scenario_returns"], dtype=float)
+    else:
+        factors, returns = generate_scenarios(portfolio_data, time_horizon, num_simulations, seed)
+    scenario_key = blob_store.put_array(returns, prefix="risk_scenarios")
+
+    chunks = split_by_book(positions, chunk_size or settings.RISK_CHUNK_SIZE)
+    pnl_keys = [blob_store.new_key("risk_pnl") for _ in chunks]
+    header = [
+        evaluate_book_chunk.s(book, chunk, scenario_key, factors, stress_scenarios or [], pnl_key)
+        for (book, chunk), pnl_key in zip(chunks, pnl_keys)
+    ]
+    body = aggregate_portfolio_risk.s(
+        scenario_key=scenario_key,
+        confidence_level=confidence_level,
+        time_horizon=time_horizon,
+        num_simulations=returns.shape[0]
+    )
+    body.link_error(discard_task_blobs.si(scenario_key, *pnl_keys))
+    return chord(header, body)
+
+
+@celery_app.task(bind=True)
+def calculate_portfolio_risk(
+    self,
+    portfolio_data: Optional[Dict[str, Any]] = None,
+    confidence_level: float = 0.95,
+    time_horizon: int = 1,
+    num_simulations: int = 10000,
+    stress_scenarios: Optional[List[Dict[str, Any]]] = None,
+    chunk_size: Optional[int] = None,
+    seed: Optional[int] = None
+):
+    """Run portfolio VaR and stress tests across workers; the result is the chord's aggregate"""
+    if not portfolio_data or not portfolio_data.get("positions"):
+        return {
+            "status": "skipped",
+            "reason": "No positions provided",
+            "timestamp": datetime.utcnow().isoformat()
+        }
+
+    workflow = build_portfolio_risk_workflow(
+        portfolio_data, confidence_level, time_horizon, num_simulations, stress_scenarios, chunk_size, seed
+    )
+    return replace_with(self, workflow)
+
+
+@celery_app.task
+def evaluate_book_chunk(
+    book: str,
+    positions: List[Dict[str, Any]],
+    scenario_key: str,
+    factors: List[str],
+    stress_scenarios: List[Dict[str, Any]],
+    pnl_key: Optional[str] = None
+) -> Dict[str, Any]:
+    """Simulated P&L and stress impacts for one chunk of a book"""
+    returns = blob_store.get_array(scenario_key)
+    factor_index = {factor: index for index, factor in enumerate(factors)}
+
+    exposures = np.zeros(len(factors))
+    for position in positions:
+        exposures[factor_index[str(position.get("commodity", "unknown"))]] += position.get("notional_value", 0)
+
+    # Only the columns this chunk is exposed to are read from the mapped matrix
+    used = np.flatnonzero(exposures)
+    pnl = np.asarray(returns[:, used]) @ exposures[used] if used.size else np.zeros(returns.shape[0])
+
+    stress = {}
+    for scenario in stress_scenarios:
+        shocks = scenario.get("market_shocks", {})
+        stress[scenario.get("name", "Unknown Scenario")] = float(sum(
+            position.get("notional_value", 0) * (shocks.get(position.get("commodity", "unknown"), 1.0) - 1.0)
+            for position in positions
+        ))
+
+    return {
+        "book": book,
+        "positions": len(positions),
+        "exposure": float(exposures.sum()),
+        "pnl_key": blob_store.put_array(pnl, prefix="risk_pnl", key=pnl_key),
+        "stress": stress,
+    }
+
+
+@celery_app.task
+def aggregate_portfolio_risk(
+    chunk_results: List[Dict[str, Any]],
+    scenario_key: str,
+    confidence_level: float = 0.95,
+    time_horizon: int = 1,
+    num_simulations: int = 10000,
+    cleanup: bool = True
+) -> Dict[str, Any]:
+    """Chord reduce step: portfolio and per-book VaR, expected shortfall and stress totals"""
+    percentile = (1 - confidence_level) * 100
+    total = None
+    books: Dict[str, Dict[str, Any]] = {}
+    stress: Dict[str, float] = {}
+
+    try:
+        for result in chunk_results:
+            pnl = blob_store.get_array(result["pnl_key"], mmap=False)
+            total = pnl.copy() if total is None else total + pnl
+
+            book = books.setdefault(result["book"], {"pnl": None, "positions": 0, "exposure": 0.0, "chunks": 0})
+            book["pnl"] = pnl if book["pnl"] is None else book["pnl"] + pnl
+            book["positions"] += result["positions"]
+            book["exposure"] += result["exposure"]
+            book["chunks"] += 1
+
+            for name, impact in result["stress"].items():
+                stress[name] = stress.get(name, 0.0) + impact
+    finally:
+        if cleanup:
+            blob_store.delete(scenario_key, *(result["pnl_key"] for result in chunk_results))
+
+    var_value, expected_shortfall = _tail_metrics(total, percentile)
+    book_metrics = {}
+    for name, book in books.items():
+        book_var, book_es = _tail_metrics(book.pop("pnl"), percentile)
+        book_metrics[name] = {**book, "var_value": book_var, "expected_shortfall": book_es}
+
+    impacts = list(stress.values())
+    return {
+        "status": "success",
+        "var_value": var_value,
+        "expected_shortfall": expected_shortfall,
+        "confidence_level": confidence_level,
+        "time_horizon": time_horizon,
+        "num_simulations": num_simulations,
+        "books": book_metrics,
+        # Sum of standalone book VaRs minus portfolio VaR (losses are negative)
+        "diversification_benefit": var_value - sum(book["var_value"] for book in book_metrics.values()),
+        "stress_results": {
+            "scenarios": stress,
+            "worst_case_impact": min(impacts) if impacts else 0.0,
+            "scenarios_with_losses": len([impact for impact in impacts if impact < 0]),
+        },
+        "chunks": len(chunk_results),
+        "method": "monte_carlo",
+        "calculated_at": datetime.utcnow().isoformat()
+    }
+
+
+def _tail_metrics(pnl: np.ndarray, percentile: float) -> Tuple[float, float]:
+    """VaR (as a P&L percentile, negative for losses) and expected shortfall"""
+    var_value = float(np.percentile(pnl, percentile))
+    tail = pnl[pnl <= var_value]
+    return var_value, float(tail.mean()) if tail.size else var_value
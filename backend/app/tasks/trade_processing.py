@@ -0,0 +1,74 @@
+"""
+Trade Processing Tasks
+Trade capture on workers, with large batches split into chunks and summarised by a chord
+"""
+
+import logging
+from datetime import datetime
+from typing import Any, Dict, List
+
+from celery import chord
+
+from app.core.celery_app import celery_app
+from app.schemas.trade import TradeCreate
+from app.services.enhanced_trade_lifecycle import EnhancedTradeLifecycleService
+
+from . import replace_with, run_async
+
+logger = logging.getLogger(__name__)
+
+TRADE_CHUNK_SIZE = 100
+
+
+async def _capture_trades(trades: List[Dict[str, Any]], user_id: str, organization_id: str) -> List[Dict[str, Any]]:
+    service = EnhancedTradeLifecycleService()
+    results = []
+    for trade_data in trades:
+        try:
+            trade = await service.capture_trade(TradeCreate(**trade_data), user_id, organization_id)
+            results.append({"status": "success", "trade_id": trade.trade_id})
+        except Exception as e:
+            logger.error(f"Trade capture failed: {e}")
+            results.append({"status": "error", "error": str(e)})
+    return results
+
+
+@celery_app.task
+def process_trade(trade_data: Dict[str, Any], user_id: str, organization_id: str) -> Dict[str, Any]:
+    """Capture a single trade"""
+    result = run_async(_capture_trades([trade_data], user_id, organization_id))[0]
+    return {**result, "timestamp": datetime.utcnow().isoformat()}
+
+
+@celery_app.task
+def process_trade_chunk(trades: List[Dict[str, Any]], user_id: str, organization_id: str) -> List[Dict[str, Any]]:
+    """Capture one chunk of a trade batch"""
+    return run_async(_capture_trades(trades, user_id, organization_id))
+
+
+@celery_app.task
+def summarize_trade_batch(chunk_results: List[List[Dict[str, Any]]]) -> Dict[str, Any]:
+    """Chord reduce step for process_trade_batch"""
+    results = [result for chunk in chunk_results for result in chunk]
+    succeeded = [result["trade_id"] for result in results if result["status"] == "success"]
+    return {
+        "status": "success" if len(succeeded) == len(results) else "partial",
+        "processed": len(results),
+        "succeeded": len(succeeded),
+        "failed": len(results) - len(succeeded),
+        "trade_ids": succeeded,
+        "errors": [result["error"] for result in results if result["status"] == "error"],
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+
+@celery_app.task(bind=True)
+def process_trade_batch(self, trades: List[Dict[str, Any]], user_id: str, organization_id: str, chunk_size: int = TRADE_CHUNK_SIZE):
+    """Capture a batch of trades in parallel chunks"""
+    header = [
+        process_trade_chunk.s(trades[start:start + chunk_size], user_id, organization_id)
+        for start in range(0, len(trades), chunk_size)
+    ]
+    if not header:
+        return summarize_trade_batch([])
+    return replace_with(self, chord(header, summarize_trade_batch.s()))
@@ -1,8 +1,9 @@
-﻿import grpc
-from concurrent import futures
+﻿import asyncio
+import grpc
 import sys
 import os
 import logging
+from typing import List, Optional, Set
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -11,25 +12,128 @@ sys.path.append(os.path.join(os.path.dirname(__file__), 'proto'))
 import energy_pb2
 import energy_pb2_grpc
 
+from app.core.config import settings
+from app.core.tick_stream import TickHub, TickRow, TickSubscriber, tick_hub
+from app.services.market_data_integration import DEFAULT_FEEDS, MarketDataIntegration
+from risk_service import RiskCheckService, risk_pb2_grpc
+
+
+class TickBatchBuilder:
+    """Builds column-wise TickBatch messages for one stream"""
+
+    def __init__(self, hub: TickHub):
+        self.hub = hub
+        self.sent_symbols: Set[int] = set()
+
+    def build(self, sequence: int, rows: List[TickRow], dropped: int = 0) -> energy_pb2.TickBatch:
+        batch = energy_pb2.TickBatch(sequence=sequence, dropped=dropped)
+        if not rows:
+            return batch
+
+        symbol_ids, bids, asks, lasts, volumes, timestamps = zip(*rows)
+        batch.symbol_ids.extend(symbol_ids)
+        batch.bids.extend(bids)
+        batch.asks.extend(asks)
+        batch.lasts.extend(lasts)
+        batch.volumes.extend(volumes)
+        batch.timestamps.extend(timestamps)
+
+        for symbol_id in set(symbol_ids) - self.sent_symbols:
+            batch.symbols[symbol_id] = self.hub.registry.get_symbol(symbol_id) or ""
+            self.sent_symbols.add(symbol_id)
+        return batch
+
+
 class EnergyService(energy_pb2_grpc.EnergyServiceServicer):
-    def StreamEnergyData(self, request, context):
+    def __init__(self, hub: Optional[TickHub] = None):
+        self.hub = hub or tick_hub
+        self.batch_size = settings.GRPC_TICK_BATCH_SIZE
+        self.batch_delay_ms = settings.GRPC_TICK_BATCH_DELAY_MS
+        self.pending_batches = settings.GRPC_TICK_MAX_PENDING_BATCHES
+
+    def _subscribe(self, symbols: List[str], batch_size: int = 0, batch_delay_ms: int = 0, pending_batches: int = 0) -> TickSubscriber:
+        """Subscribe with the stream's batching options, 0 meaning the server default"""
+        return self.hub.subscribe(
+            symbols,
+            max_batch_size=batch_size or self.batch_size,
+            max_batch_delay=(batch_delay_ms or self.batch_delay_ms) / 1000,
+            max_pending_batches=pending_batches or self.pending_batches,
+        )
+
+    async def StreamTicks(self, request, context):
+        subscriber = self._subscribe(
+            list(request.symbols),
+            request.max_batch_size,
+            request.max_batch_delay_ms,
+            request.max_pending_batches,
+        )
+        builder = TickBatchBuilder(self.hub)
+        logger.info(f"Tick stream opened for {context.peer()} ({len(request.symbols) or 'all'} symbols)")
         try:
-            for i in range(5):
-                price = 75.0 + i
-                yield energy_pb2.EnergyResponse(price=price)
-                logger.info(f"Sent price: {price}")
+            while not subscriber.closed:
+                rows, dropped = await subscriber.next_batch()
+                if rows or dropped:
+                    # Awaiting the write applies HTTP/2 flow control; ticks keep
+                    # buffering (bounded) in the subscriber meanwhile
+                    yield builder.build(subscriber.sequence, rows, dropped)
+        except Exception as e:
+            logger.error(f"Error in StreamTicks: {e}")
+            await context.abort(grpc.StatusCode.INTERNAL, f"Error: {e}")
+        finally:
+            self.hub.unsubscribe(subscriber)
+            logger.info(f"Tick stream closed for {context.peer()} ({subscriber.delivered} ticks, {subscriber.dropped} dropped)")
+
+    async def StreamEnergyData(self, request, context):
+        """Last prices for every exchange of one commodity"""
+        symbols = [f"{commodity}:{exchange}" for commodity, exchange in DEFAULT_FEEDS if commodity == request.source]
+        if not symbols:
+            await context.abort(grpc.StatusCode.NOT_FOUND, f"Unknown source: {request.source}")
+        subscriber = self._subscribe(symbols)
+        try:
+            while not subscriber.closed:
+                rows, _ = await subscriber.next_batch()
+                for row in rows:
+                    yield energy_pb2.EnergyResponse(price=row[3])
         except Exception as e:
             logger.error(f"Error in StreamEnergyData: {e}")
-            context.set_details(f"Error: {e}")
-            context.set_code(grpc.StatusCode.INTERNAL)
+            await context.abort(grpc.StatusCode.INTERNAL, f"Error: {e}")
+        finally:
+            self.hub.unsubscribe(subscriber)
+
+
+async def feed_market_data(integration: MarketDataIntegration, interval: float):
+    """Poll MarketDataIntegration; every fetch is published to the hub by its observer"""
+    while True:
+        try:
+            await asyncio.gather(*(
+                integration.fetch_real_time_feed(commodity, exchange)
+                for commodity, exchange in DEFAULT_FEEDS
+            ))
+        except Exception as e:
+            logger.error(f"Market data feed error: {e}")
+        await asyncio.sleep(interval)
+
+
+async def serve():
+    server = grpc.aio.server(options=[
+        ('grpc.max_send_message_length', 16 * 1024 * 1024),
+        ('grpc.http2.write_buffer_size', 1024 * 1024),
+    ])
+    energy_pb2_grpc.add_EnergyServiceServicer_to_server(EnergyService(tick_hub), server)
+    risk_pb2_grpc.add_RiskCheckServicer_to_server(RiskCheckService(), server)
+    server.add_insecure_port(settings.GRPC_BIND_ADDRESS)
+
+    integration = MarketDataIntegration()
+    tick_hub.attach(integration)
+    feed = asyncio.create_task(feed_market_data(integration, settings.GRPC_FEED_INTERVAL_MS / 1000))
 
-def serve():
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
-    energy_pb2_grpc.add_EnergyServiceServicer_to_server(EnergyService(), server)
-    server.add_insecure_port('127.0.0.1:50052')
-    logger.info("Starting gRPC server on 127.0.0.1:50052")
-    server.start()
-    server.wait_for_termination()
+    logger.info(f"Starting gRPC server on {settings.GRPC_BIND_ADDRESS}")
+    await server.start()
+    try:
+        await server.wait_for_termination()
+    finally:
+        feed.cancel()
+        await server.stop(grace=5)
 
 if __name__ == '__main__':
-    serve()
+    asyncio.run(serve())
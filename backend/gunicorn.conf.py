@@ -0,0 +1,19 @@
+"""
+Gunicorn Configuration
+Uvicorn workers forked from a preloading master so models and services are shared copy-on-write
+"""
+
+import os
+
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+worker_class = "uvicorn.workers.UvicornWorker"
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "100"))
+
+# Import the app in the master; with SERVICE_WARMUP=preload, the app module (main.py or
+# app.main) calls preload_for_fork() to load model artifacts and fork-safe lazy services
+# there and freeze the GC before workers fork. Services that start threads or open
+# connections are only imported there; each worker builds them in its own warmup
+preload_app = True
+os.environ.setdefault("SERVICE_WARMUP", "preload")
@@ -23,6 +23,7 @@ from app.api.energy_data import router as energy_data_router
 from app.api.admin import router as admin_router
 from app.schemas.user import User
 from app.core.security import verify_token
+from app.core.model_store import preload_for_fork
 
 # Configure structured logging
 logger = structlog.get_logger()
@@ -60,6 +61,10 @@ app.include_router(auth_router)
 app.include_router(energy_data_router)
 app.include_router(admin_router)
 
+# Preload mode (gunicorn preload_app, see gunicorn.conf.py): model artifacts are loaded
+# here, in the master, and inherited copy-on-write by every forked worker
+preload_for_fork()
+
 # Create database tables on startup
 @app.on_event("startup")
 async def startup_event():
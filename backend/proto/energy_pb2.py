@@ -1,12 +1,22 @@
 # -*- coding: utf-8 -*-
 # Generated by the protocol buffer compiler.  DO NOT EDIT!
+# NO CHECKED-IN PROTOBUF GENCODE
 # source: energy.proto
-# Protobuf Python Version: 5.26.1
+# Protobuf Python Version: 7.35.1
 """Generated protocol buffer code."""
 from google.protobuf import descriptor as _descriptor
 from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import runtime_version as _runtime_version
 from google.protobuf import symbol_database as _symbol_database
 from google.protobuf.internal import builder as _builder
+_runtime_version.ValidateProtobufRuntimeVersion(
+    _runtime_version.Domain.PUBLIC,
+    7,
+    35,
+    1,
+    '',
+    'energy.proto'
+)
 # @@protoc_insertion_point(imports)
 
 _sym_db = _symbol_database.Default()
@@ -14,17 +24,25 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0c\x65nergy.proto\"\x1f\n\rEnergyRequest\x12\x0e\n\x06source\x18\x01 \x01(\t\"\x1f\n\x0e\x45nergyResponse\x12\r\n\x05price\x18\x01 \x01(\x02\x32\x46\n\rEnergyService\x12\x35\n\x10StreamEnergyData\x12\x0e.EnergyRequest\x1a\x0f.EnergyResponse0\x01\x62\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0c\x65nergy.proto\"\x1f\n\rEnergyRequest\x12\x0e\n\x06source\x18\x01 \x01(\t\"\x1f\n\x0e\x45nergyResponse\x12\r\n\x05price\x18\x01 \x01(\x02\"t\n\x10TickSubscription\x12\x0f\n\x07symbols\x18\x01 \x03(\t\x12\x16\n\x0emax_batch_size\x18\x02 \x01(\r\x12\x1a\n\x12max_batch_delay_ms\x18\x03 \x01(\r\x12\x1b\n\x13max_pending_batches\x18\x04 \x01(\r\"\xec\x01\n\tTickBatch\x12\x10\n\x08sequence\x18\x01 \x01(\x04\x12\x12\n\nsymbol_ids\x18\x02 \x03(\r\x12\x0c\n\x04\x62ids\x18\x03 \x03(\x01\x12\x0c\n\x04\x61sks\x18\x04 \x03(\x01\x12\r\n\x05lasts\x18\x05 \x03(\x01\x12\x0f\n\x07volumes\x18\x06 \x03(\x01\x12\x12\n\ntimestamps\x18\x07 \x03(\x03\x12(\n\x07symbols\x18\x08 \x03(\x0b\x32\x17.TickBatch.SymbolsEntry\x12\x0f\n\x07\x64ropped\x18\t \x01(\x04\x1a.\n\x0cSymbolsEntry\x12\x0b\n\x03key\x18\x01 \x01(\r\x12\r\n\x05value\x18\x02 \x01(\t:\x02\x38\x01\x32v\n\rEnergyService\x12\x35\n\x10StreamEnergyData\x12\x0e.EnergyRequest\x1a\x0f.EnergyResponse0\x01\x12.\n\x0bStreamTicks\x12\x11.TickSubscription\x1a\n.TickBatch0\x01\x62\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
 _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'energy_pb2', _globals)
 if not _descriptor._USE_C_DESCRIPTORS:
   DESCRIPTOR._loaded_options = None
+  _globals['_TICKBATCH_SYMBOLSENTRY']._loaded_options = None
+  _globals['_TICKBATCH_SYMBOLSENTRY']._serialized_options = b'8\001'
   _globals['_ENERGYREQUEST']._serialized_start=16
   _globals['_ENERGYREQUEST']._serialized_end=47
   _globals['_ENERGYRESPONSE']._serialized_start=49
   _globals['_ENERGYRESPONSE']._serialized_end=80
-  _globals['_ENERGYSERVICE']._serialized_start=82
-  _globals['_ENERGYSERVICE']._serialized_end=152
+  _globals['_TICKSUBSCRIPTION']._serialized_start=82
+  _globals['_TICKSUBSCRIPTION']._serialized_end=198
+  _globals['_TICKBATCH']._serialized_start=201
+  _globals['_TICKBATCH']._serialized_end=437
+  _globals['_TICKBATCH_SYMBOLSENTRY']._serialized_start=391
+  _globals['_TICKBATCH_SYMBOLSENTRY']._serialized_end=437
+  _globals['_ENERGYSERVICE']._serialized_start=439
+  _globals['_ENERGYSERVICE']._serialized_end=557
 # @@protoc_insertion_point(module_scope)
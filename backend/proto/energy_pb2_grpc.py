@@ -5,10 +5,8 @@ import warnings
 
 import energy_pb2 as energy__pb2
 
-GRPC_GENERATED_VERSION = '1.64.1'
+GRPC_GENERATED_VERSION = '1.84.0'
 GRPC_VERSION = grpc.__version__
-EXPECTED_ERROR_RELEASE = '1.65.0'
-SCHEDULED_RELEASE_DATE = 'June 25, 2024'
 _version_not_supported = False
 
 try:
@@ -18,19 +16,16 @@ except ImportError:
     _version_not_supported = True
 
 if _version_not_supported:
-    warnings.warn(
+    raise RuntimeError(
         f'The grpc package installed is at version {GRPC_VERSION},'
-        + f' but the generated code in energy_pb2_grpc.py depends on'
+        + ' but the generated code in energy_pb2_grpc.py depends on'
         + f' grpcio>={GRPC_GENERATED_VERSION}.'
         + f' Please upgrade your grpc module to grpcio>={GRPC_GENERATED_VERSION}'
         + f' or downgrade your generated code using grpcio-tools<={GRPC_VERSION}.'
-        + f' This warning will become an error in {EXPECTED_ERROR_RELEASE},'
-        + f' scheduled for release on {SCHEDULED_RELEASE_DATE}.',
-        RuntimeWarning
     )
 
 
-class EnergyServiceStub(object):
+class EnergyServiceStub:
     """Missing associated documentation comment in .proto file."""
 
     def __init__(self, channel):
@@ -44,9 +39,14 @@ class EnergyServiceStub(object):
                 request_serializer=energy__pb2.EnergyRequest.SerializeToString,
                 response_deserializer=energy__pb2.EnergyResponse.FromString,
                 _registered_method=True)
+        self.StreamTicks = channel.unary_stream(
+                '/EnergyService/StreamTicks',
+                request_serializer=energy__pb2.TickSubscription.SerializeToString,
+                response_deserializer=energy__pb2.TickBatch.FromString,
+                _registered_method=True)
 
 
-class EnergyServiceServicer(object):
+class EnergyServiceServicer:
     """Missing associated documentation comment in .proto file."""
 
     def StreamEnergyData(self, request, context):
@@ -55,6 +55,13 @@ class EnergyServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def StreamTicks(self, request, context):
+        """Batched market-data ticks for internal consumers (risk, algo engines)
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_EnergyServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -63,6 +70,11 @@ def add_EnergyServiceServicer_to_server(servicer, server):
                     request_deserializer=energy__pb2.EnergyRequest.FromString,
                     response_serializer=energy__pb2.EnergyResponse.SerializeToString,
             ),
+            'StreamTicks': grpc.unary_stream_rpc_method_handler(
+                    servicer.StreamTicks,
+                    request_deserializer=energy__pb2.TickSubscription.FromString,
+                    response_serializer=energy__pb2.TickBatch.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'EnergyService', rpc_method_handlers)
@@ -71,7 +83,7 @@ def add_EnergyServiceServicer_to_server(servicer, server):
 
 
  # This class is part of an EXPERIMENTAL API.
-class EnergyService(object):
+class EnergyService:
     """Missing associated documentation comment in .proto file."""
 
     @staticmethod
@@ -100,3 +112,30 @@ class EnergyService(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def StreamTicks(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/EnergyService/StreamTicks',
+            energy__pb2.TickSubscription.SerializeToString,
+            energy__pb2.TickBatch.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
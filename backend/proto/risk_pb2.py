@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# NO CHECKED-IN PROTOBUF GENCODE
+# source: risk.proto
+# Protobuf Python Version: 7.35.1
+"""Generated protocol buffer code."""
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import runtime_version as _runtime_version
+from google.protobuf import symbol_database as _symbol_database
+from google.protobuf.internal import builder as _builder
+_runtime_version.ValidateProtobufRuntimeVersion(
+    _runtime_version.Domain.PUBLIC,
+    7,
+    35,
+    1,
+    '',
+    'risk.proto'
+)
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\nrisk.proto\"\x84\x01\n\nOrderCheck\x12\x10\n\x08order_id\x18\x01 \x01(\t\x12\x17\n\x0f\x63ounterparty_id\x18\x02 \x01(\t\x12\x11\n\tcommodity\x18\x03 \x01(\t\x12\x10\n\x08quantity\x18\x04 \x01(\x01\x12\r\n\x05price\x18\x05 \x01(\x01\x12\x17\n\x0fportfolio_value\x18\x06 \x01(\x01\"\xa7\x01\n\x0b\x43heckResult\x12\x10\n\x08order_id\x18\x01 \x01(\t\x12\x10\n\x08\x61\x63\x63\x65pted\x18\x02 \x01(\x08\x12\x1e\n\x07reasons\x18\x03 \x03(\x0e\x32\r.RejectReason\x12\x12\n\nrisk_score\x18\x04 \x01(\x01\x12\x12\n\nrisk_level\x18\x05 \x01(\t\x12\x18\n\x10\x61vailable_credit\x18\x06 \x01(\x01\x12\x12\n\nlatency_us\x18\x07 \x01(\r*\xc8\x01\n\x0cRejectReason\x12\x16\n\x12REASON_UNSPECIFIED\x10\x00\x12\x11\n\rINVALID_ORDER\x10\x01\x12\x0e\n\nSIZE_LIMIT\x10\x02\x12\x0e\n\nRISK_SCORE\x10\x03\x12\x13\n\x0fNO_CREDIT_LIMIT\x10\x04\x12\x17\n\x13INSUFFICIENT_CREDIT\x10\x05\x12\x12\n\x0ePOSITION_LIMIT\x10\x06\x12\x17\n\x13\x43ONCENTRATION_LIMIT\x10\x07\x12\x12\n\x0eINTERNAL_ERROR\x10\x08\x32\x39\n\tRiskCheck\x12,\n\x0b\x43heckOrders\x12\x0b.OrderCheck\x1a\x0c.CheckResult(\x01\x30\x01\x62\x06proto3')
+
+_globals = globals()
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'risk_pb2', _globals)
+if not _descriptor._USE_C_DESCRIPTORS:
+  DESCRIPTOR._loaded_options = None
+  _globals['_REJECTREASON']._serialized_start=320
+  _globals['_REJECTREASON']._serialized_end=520
+  _globals['_ORDERCHECK']._serialized_start=15
+  _globals['_ORDERCHECK']._serialized_end=147
+  _globals['_CHECKRESULT']._serialized_start=150
+  _globals['_CHECKRESULT']._serialized_end=317
+  _globals['_RISKCHECK']._serialized_start=522
+  _globals['_RISKCHECK']._serialized_end=579
+# @@protoc_insertion_point(module_scope)
@@ -0,0 +1,100 @@
+# Generated by the gRPC Python protocol compiler plugin. DO NOT EDIT!
+"""Client and server classes corresponding to protobuf-defined services."""
+import grpc
+import warnings
+
+import risk_pb2 as risk__pb2
+
+GRPC_GENERATED_VERSION = '1.84.0'
+GRPC_VERSION = grpc.__version__
+_version_not_supported = False
+
+try:
+    from grpc._utilities import first_version_is_lower
+    _version_not_supported = first_version_is_lower(GRPC_VERSION, GRPC_GENERATED_VERSION)
+except ImportError:
+    _version_not_supported = True
+
+if _version_not_supported:
+    raise RuntimeError(
+        f'The grpc package installed is at version {GRPC_VERSION},'
+        + ' but the generated code in risk_pb2_grpc.py depends on'
+        + f' grpcio>={GRPC_GENERATED_VERSION}.'
+        + f' Please upgrade your grpc module to grpcio>={GRPC_GENERATED_VERSION}'
+        + f' or downgrade your generated code using grpcio-tools<={GRPC_VERSION}.'
+    )
+
+
+class RiskCheckStub:
+    """Pre-trade risk checks for internal callers (algo engines) over one long-lived stream
+    """
+
+    def __init__(self, channel):
+        """Constructor.
+
+        Args:
+            channel: A grpc.Channel.
+        """
+        self.CheckOrders = channel.stream_stream(
+                '/RiskCheck/CheckOrders',
+                request_serializer=risk__pb2.OrderCheck.SerializeToString,
+                response_deserializer=risk__pb2.CheckResult.FromString,
+                _registered_method=True)
+
+
+class RiskCheckServicer:
+    """Pre-trade risk checks for internal callers (algo engines) over one long-lived stream
+    """
+
+    def CheckOrders(self, request_iterator, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+
+def add_RiskCheckServicer_to_server(servicer, server):
+    rpc_method_handlers = {
+            'CheckOrders': grpc.stream_stream_rpc_method_handler(
+                    servicer.CheckOrders,
+                    request_deserializer=risk__pb2.OrderCheck.FromString,
+                    response_serializer=risk__pb2.CheckResult.SerializeToString,
+            ),
+    }
+    generic_handler = grpc.method_handlers_generic_handler(
+            'RiskCheck', rpc_method_handlers)
+    server.add_generic_rpc_handlers((generic_handler,))
+    server.add_registered_method_handlers('RiskCheck', rpc_method_handlers)
+
+
+ # This class is part of an EXPERIMENTAL API.
+class RiskCheck:
+    """Pre-trade risk checks for internal callers (algo engines) over one long-lived stream
+    """
+
+    @staticmethod
+    def CheckOrders(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_stream(
+            request_iterator,
+            target,
+            '/RiskCheck/CheckOrders',
+            risk__pb2.OrderCheck.SerializeToString,
+            risk__pb2.CheckResult.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
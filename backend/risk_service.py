@@ -0,0 +1,50 @@
+import time
+import grpc
+import sys
+import os
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+sys.path.append(os.path.join(os.path.dirname(__file__), 'proto'))
+import risk_pb2
+import risk_pb2_grpc
+
+from app.services.pre_trade_risk import PreTradeRiskChecker
+
+
+class RiskCheckService(risk_pb2_grpc.RiskCheckServicer):
+    """Bidirectional pre-trade risk stream; one result per order, in order"""
+
+    def __init__(self, checker: Optional[PreTradeRiskChecker] = None):
+        self.checker = checker or PreTradeRiskChecker()
+
+    async def CheckOrders(self, request_iterator, context):
+        checked = 0
+        try:
+            async for order in request_iterator:
+                started = time.perf_counter()
+                result = await self.checker.check_order({
+                    "order_id": order.order_id,
+                    "counterparty_id": order.counterparty_id,
+                    "commodity": order.commodity,
+                    "quantity": order.quantity,
+                    "price": order.price,
+                    "portfolio_value": order.portfolio_value,
+                })
+                checked += 1
+                yield risk_pb2.CheckResult(
+                    order_id=result["order_id"],
+                    accepted=result["accepted"],
+                    reasons=[risk_pb2.RejectReason.Value(reason) for reason in result["reasons"]],
+                    risk_score=result["risk_score"],
+                    risk_level=result["risk_level"],
+                    available_credit=result["available_credit"],
+                    latency_us=int((time.perf_counter() - started) * 1_000_000),
+                )
+        except Exception as e:
+            logger.error(f"Error in CheckOrders: {e}")
+            await context.abort(grpc.StatusCode.INTERNAL, f"Error: {e}")
+        finally:
+            logger.info(f"Risk check stream closed for {context.peer()} ({checked} orders)")
@@ -0,0 +1,53 @@
+"""
+Shared test fixtures
+Hourly commodity history and a forecasting service working in a temporary directory
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Add shared services to path for imports
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'shared', 'services'))
+
+
+def make_hourly_history(hours: int = 120, base_price: float = 80.0, offset: int = 0, seed=None, start=None):
+    """Hourly observations: prices cycle over 10 hours above ``base_price``, volumes over 20 hours
+
+    The series starts ``hours`` before the current hour unless ``start`` is
+    given; ``offset`` moves the start and the cycles on by that many hours,
+    so a later window continues an earlier one. ``seed`` adds price noise.
+    """
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp.now().floor("h") - pd.Timedelta(hours=hours) if start is None else pd.Timestamp(start)
+    start += pd.Timedelta(hours=offset)
+    return [
+        {
+            "timestamp": (start + pd.Timedelta(hours=i)).isoformat(),
+            "price": base_price + ((offset + i) % 10) * 0.5 + (rng.normal(0, 0.1) if seed is not None else 0.0),
+            "volume": 100.0 + ((offset + i) % 20) * 10
+        }
+        for i in range(hours)
+    ]
+
+
+@pytest.fixture
+def hourly_history():
+    """Factory for hourly price/volume histories (see make_hourly_history)"""
+    return make_hourly_history
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    """ForecastingService writing its models under a temporary working directory"""
+    try:
+        from forecasting_service import ForecastingService
+    except ImportError:
+        pytest.skip("Forecasting service not available")
+    monkeypatch.chdir(tmp_path)
+    service = ForecastingService()
+    yield service
+    service.training.shutdown()
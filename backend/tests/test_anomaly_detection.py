@@ -0,0 +1,115 @@
+"""
+Test streaming anomaly detection
+Tests incremental per-series scoring, seasonal baselines, vectorized batches and backfill
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+import sys
+import os
+
+# Add shared services to path for imports
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'shared', 'services'))
+
+from anomaly_detection import StreamingAnomalyDetector
+
+
+def seasonal_prices(hours: int = 24 * 30, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    timestamps = pd.date_range("2026-01-01", periods=hours, freq="h")
+    prices = 80 + 5 * np.sin(2 * np.pi * np.arange(hours) / 24) + rng.normal(0, 0.5, hours)
+    return timestamps, prices
+
+
+class TestStreamingScores:
+    """Test tick-by-tick scoring"""
+
+    def test_spike_flagged_against_daily_pattern(self):
+        """Test a spike much smaller than the daily swing is caught once the seasonal baseline is learned"""
+        timestamps, prices = seasonal_prices()
+        prices[500] += 6
+        detector = StreamingAnomalyDetector()
+
+        results = [detector.update("crude_oil", price, timestamp) for price, timestamp in zip(prices, timestamps)]
+
+        assert results[500]["is_anomaly"]
+        assert results[500]["score"] > 10
+        assert sum(result["is_anomaly"] for result in results) <= 3
+        assert detector.get_state("crude_oil")["robust_sigma"] == pytest.approx(0.5, rel=0.3)
+
+    def test_spike_does_not_widen_band(self):
+        """Test anomalous ticks are clipped before they update the state"""
+        detector = StreamingAnomalyDetector(season_length=0)
+        rng = np.random.default_rng(1)
+        for value in rng.normal(100, 1, 200):
+            detector.update("sensor", value)
+        sigma = detector.get_state("sensor")["sigma"]
+
+        assert detector.update("sensor", 1000.0)["is_anomaly"]
+        assert detector.get_state("sensor")["sigma"] < 2 * sigma
+        assert detector.update("sensor", 108.0)["is_anomaly"]
+
+    def test_no_scores_during_warmup(self):
+        """Test the first ticks of a series are never flagged"""
+        detector = StreamingAnomalyDetector(warmup=5, season_length=0)
+        results = [detector.update("new", value) for value in [1.0, 50.0, -30.0, 2.0, 1.0]]
+
+        assert not any(result["is_anomaly"] for result in results)
+        assert results[-1]["observations"] == 5
+
+
+class TestBatchScoring:
+    """Test vectorized updates and backfill"""
+
+    def test_update_many_matches_single_updates(self):
+        """Test one batch per tick across series gives the same scores as per-series updates"""
+        rng = np.random.default_rng(2)
+        values = rng.normal(50, 2, (100, 40))
+        names = [f"meter_{index}" for index in range(40)]
+        batched = StreamingAnomalyDetector(season_length=0)
+        single = StreamingAnomalyDetector(season_length=0)
+
+        for row in values:
+            scores = batched.update_many(names, row)["score"]
+            expected = [single.update(name, value)["score"] for name, value in zip(names, row)]
+            np.testing.assert_allclose(scores, expected, atol=1e-4)
+
+    def test_repeated_series_applied_in_order(self):
+        """Test a batch with two ticks for one series applies both"""
+        detector = StreamingAnomalyDetector(season_length=0)
+        result = detector.update_many(["a", "a", "b"], [1.0, 3.0, 5.0])
+
+        assert detector.get_state("a")["observations"] == 2
+        assert detector.get_state("a")["last_value"] == 3.0
+        np.testing.assert_allclose(result["expected"], [1.0, 1.0, 5.0])
+
+    def test_backfill_matches_streaming(self):
+        """Test replaying history scores each point as live updates would have"""
+        timestamps, prices = seasonal_prices(24 * 10)
+        live = StreamingAnomalyDetector()
+        scores = [live.update("crude_oil", price, timestamp)["score"] for price, timestamp in zip(prices, timestamps)]
+
+        replayed = StreamingAnomalyDetector()
+        single = replayed.backfill("crude_oil", prices, timestamps)
+        several = StreamingAnomalyDetector().backfill(["crude_oil", "shifted"], np.column_stack([prices, prices + 10]), timestamps)
+
+        np.testing.assert_allclose(single["score"], scores, atol=1e-4)
+        np.testing.assert_allclose(several["score"][:, 0], single["score"], atol=1e-9)
+        assert replayed.get_state("crude_oil")["observations"] == len(prices)
+
+    def test_backfill_shape_checked(self):
+        """Test a value matrix must have one column per series"""
+        with pytest.raises(ValueError):
+            StreamingAnomalyDetector().backfill(["a", "b"], np.zeros((10, 3)))
+
+    def test_state_grows_with_series(self):
+        """Test thousands of series fit in preallocated arrays that double as needed"""
+        detector = StreamingAnomalyDetector(capacity=16)
+        names = [f"sensor_{index}" for index in range(3000)]
+        detector.update_many(names, np.ones(3000))
+
+        stats = detector.get_stats()
+        assert stats["series"] == 3000
+        assert stats["capacity"] == 4096
+        assert stats["ticks"] == 3000
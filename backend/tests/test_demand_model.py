@@ -0,0 +1,169 @@
+"""
+Test demand model
+Tests batched per-site demand regressions, coefficient caching and region-wide forecasts
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+import sys
+import os
+
+# Add shared services to path for imports
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'shared', 'services'))
+
+from demand_model import DemandModel
+from iot_integration_service import IoTIntegrationService
+
+
+def make_history(sites: int, hours: int, seed: int = 0):
+    """Weather and demand (sites x hours) generated from known per-site coefficients"""
+    rng = np.random.default_rng(seed)
+    temperature = rng.normal(20, 6, (sites, hours))
+    humidity = rng.uniform(30, 90, (sites, hours))
+    cooling = rng.uniform(0.5, 2.0, (sites, 1))
+    demand = 200 + cooling * (temperature - 20) ** 2 + 0.5 * humidity
+    return [f"site_{i}" for i in range(sites)], temperature, humidity, demand, cooling
+
+
+class TestFit:
+    """Test fitting every site at once"""
+
+    def test_recovers_coefficients(self):
+        """Test noiseless demand is reproduced for a new weather forecast"""
+        sites, temperature, humidity, demand, cooling = make_history(50, 200)
+        model = DemandModel(ridge=0)
+        model.fit(sites, temperature, humidity, demand)
+
+        forecast_t, forecast_h = np.full((50, 3), 30.0), np.full((50, 3), 60.0)
+        expected = 200 + cooling * 100 + 30
+        np.testing.assert_allclose(model.predict(sites, forecast_t, forecast_h), np.repeat(expected, 3, axis=1), rtol=1e-6)
+        assert np.all(model.r2 > 0.999)
+
+    def test_matches_lstsq_with_missing_values(self):
+        """Test a site with gaps gets the same coefficients as a single least-squares fit on its valid rows"""
+        sites, temperature, humidity, demand, _ = make_history(3, 120, seed=1)
+        demand = demand + np.random.default_rng(2).normal(0, 5, demand.shape)
+        demand[1, :40] = np.nan
+        humidity[1, 50] = np.nan
+        model = DemandModel(ridge=0)
+        model.fit(sites, temperature, humidity, demand)
+
+        valid = np.isfinite(demand[1]) & np.isfinite(humidity[1])
+        t, h, y = temperature[1, valid], humidity[1, valid], demand[1, valid]
+        design = np.column_stack([np.ones(len(y)), t, t ** 2, h])
+        coefficients = np.linalg.lstsq(design, y, rcond=None)[0]
+        forecast_t, forecast_h = np.array([[10.0, 25.0]]), np.array([[40.0, 80.0]])
+        expected = np.column_stack([np.ones(2), forecast_t[0], forecast_t[0] ** 2, forecast_h[0]]) @ coefficients
+
+        np.testing.assert_allclose(model.predict(["site_1"], forecast_t, forecast_h)[0], expected, rtol=1e-6)
+        assert model.observations[1] == valid.sum()
+
+    def test_sparse_site_gets_mean_demand(self):
+        """Test a site with too few observations forecasts its mean demand"""
+        sites, temperature, humidity, demand, _ = make_history(2, 24)
+        demand[0, 3:] = np.nan
+        model = DemandModel()
+        model.fit(sites, temperature, humidity, demand)
+
+        prediction = model.predict(["site_0"], np.array([[35.0]]), np.array([[20.0]]))
+        assert prediction[0, 0] == pytest.approx(demand[0, :3].mean())
+        assert model.site_summary(["site_0"])[0]["r2"] is None
+
+    def test_unchanged_data_not_refitted(self):
+        """Test identical inputs reuse the cached coefficients and new data triggers a refit"""
+        sites, temperature, humidity, demand, _ = make_history(5, 48)
+        model = DemandModel()
+
+        assert model.fit(sites, temperature, humidity, demand) is True
+        assert model.fit(sites, temperature.copy(), humidity, demand) is False
+        demand[0, -1] += 1
+        assert model.fit(sites, temperature, humidity, demand) is True
+        assert model.get_status()["fits"] == 2
+        assert model.get_status()["cached_fits"] == 1
+
+    def test_shape_mismatch(self):
+        """Test matrices that do not line up are rejected"""
+        sites, temperature, humidity, demand, _ = make_history(4, 24)
+        with pytest.raises(ValueError):
+            DemandModel().fit(sites, temperature, humidity[:, :10], demand)
+
+
+class TestPredict:
+    """Test region-wide forecasts"""
+
+    def test_unknown_sites_are_nan(self):
+        """Test sites without a fitted model forecast NaN while others are unaffected"""
+        sites, temperature, humidity, demand, _ = make_history(3, 48)
+        model = DemandModel()
+        model.fit(sites, temperature, humidity, demand)
+
+        prediction = model.predict(["site_2", "elsewhere"], np.full((2, 4), 20.0), np.full((2, 4), 50.0))
+        assert np.all(np.isfinite(prediction[0]))
+        assert np.all(np.isnan(prediction[1]))
+        assert model.site_summary(["elsewhere"]) == [{"site": "elsewhere", "fitted": False}]
+
+    def test_region_scale(self):
+        """Test fitting and forecasting 10k sites stays well within interactive latency"""
+        sites, temperature, humidity, demand, _ = make_history(10_000, 168)
+        model = DemandModel()
+
+        started = time.perf_counter()
+        model.fit(sites, temperature, humidity, demand)
+        prediction = model.predict(sites, temperature[:, :24], humidity[:, :24])
+        elapsed = time.perf_counter() - started
+
+        assert prediction.shape == (10_000, 24)
+        assert elapsed < 5
+
+
+class TestServiceBatch:
+    """Test the IoT service batch forecast"""
+
+    def test_explicit_history(self):
+        """Test forecasts from history passed with the request, including totals and unfitted sites"""
+        sites, temperature, humidity, demand, _ = make_history(3, 48)
+        service = IoTIntegrationService()
+        history = {"temperature": temperature, "humidity": humidity, "power_consumption": demand}
+
+        result = service.predict_energy_demand_batch(sites + ["new_site"], np.full((4, 2), 22.0), np.full((4, 2), 55.0), {**history, "sites": sites})
+
+        assert result["hours"] == 2
+        assert result["unfitted_sites"] == ["new_site"]
+        assert result["predicted_demand_kw"][3] is None
+        assert result["total_demand_kw"][0] == pytest.approx(sum(row[0] for row in result["predicted_demand_kw"][:3]), abs=0.05)
+
+    def test_history_from_ingested_readings(self):
+        """Test the model is fitted on hourly rollups and reused until new readings arrive"""
+        service = IoTIntegrationService()
+        rng = np.random.default_rng(3)
+        hours = pd.date_range("2026-03-01", periods=48, freq="h", tz="UTC")
+        readings = []
+        for site, scale in (("north", 1.0), ("south", 2.0)):
+            temperature = rng.normal(20, 5, len(hours))
+            humidity = rng.uniform(40, 80, len(hours))
+            demand = 300 + scale * (temperature - 20) ** 2 + 0.2 * humidity
+            for timestamp, t, h, d in zip(hours, temperature, humidity, demand):
+                readings += [
+                    {"sensor_type": "temperature", "site": site, "value": t, "timestamp": timestamp.isoformat()},
+                    {"sensor_type": "humidity", "site": site, "value": h, "timestamp": timestamp.isoformat()},
+                    {"sensor_type": "power_consumption", "site": site, "value": d, "timestamp": timestamp.isoformat()},
+                ]
+        service.ingest_readings(readings)
+
+        forecast_t, forecast_h = np.array([[30.0], [30.0]]), np.array([[50.0], [50.0]])
+        first = service.predict_energy_demand_batch(["north", "south"], forecast_t, forecast_h)
+        second = service.predict_energy_demand_batch(["north", "south"], forecast_t, forecast_h)
+
+        assert first["refitted"] is True
+        assert second["refitted"] is False
+        assert first["predicted_demand_kw"][0][0] == pytest.approx(410, abs=0.5)
+        assert first["predicted_demand_kw"][1][0] == pytest.approx(510, abs=0.5)
+
+    def test_no_history(self):
+        """Test an error is returned when there is nothing to fit on"""
+        service = IoTIntegrationService()
+        result = service.predict_energy_demand_batch(["north"], [[20.0]], [[50.0]])
+        assert "error" in result
@@ -0,0 +1,238 @@
+"""
+Test forecast cache
+Tests the two cache tiers, single-flight recomputes, early refresh and tag invalidation across workers
+"""
+
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pytest
+import sys
+import os
+
+# Add shared services to path for imports
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'shared', 'services'))
+
+from forecast_cache import FORMAT_ZLIB, ForecastCache, decode_value, encode_value
+
+
+class SharedRedis:
+    """The subset of the Redis client the cache uses, shared by several cache instances"""
+
+    def __init__(self):
+        self.values = {}
+        self.hashes = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value, expires_at = self.values.get(key, (None, None))
+            if expires_at is not None and time.time() >= expires_at:
+                del self.values[key]
+                return None
+            return value
+
+    def set(self, key, value, nx=False, px=None):
+        with self.lock:
+            if nx and key in self.values:
+                return None
+            self.values[key] = (value.encode() if isinstance(value, str) else value, time.time() + px / 1000 if px else None)
+            return True
+
+    def delete(self, *keys):
+        with self.lock:
+            return sum(self.values.pop(key, None) is not None for key in keys)
+
+    def hmget(self, name, fields):
+        with self.lock:
+            return [self.hashes.get(name, {}).get(field) for field in fields]
+
+    def hincrby(self, name, field, amount=1):
+        with self.lock:
+            fields = self.hashes.setdefault(name, {})
+            fields[field] = fields.get(field, 0) + amount
+            return fields[field]
+
+
+class Counter:
+    def __init__(self, value="forecast", delay=0.0):
+        self.calls = 0
+        self.value = value
+        self.delay = delay
+
+    def __call__(self):
+        self.calls += 1
+        time.sleep(self.delay)
+        return {"value": self.value, "call": self.calls}
+
+
+@pytest.fixture
+def redis_client():
+    return SharedRedis()
+
+
+def worker_cache(redis_client, **kwargs):
+    options = {"ttl": 60, "stale_seconds": 60, "beta": 0.0, "lease_seconds": 1.0, "tag_check_interval": 0}
+    options.update(kwargs)
+    return ForecastCache(redis_client, **options)
+
+
+class TestSerialization:
+    """Test the non-pickle value format"""
+
+    def test_round_trip(self):
+        """Test NumPy values and datetimes become plain JSON types"""
+        value = {"price": np.float64(71.5), "hours": np.arange(3), "at": datetime(2026, 1, 1, 12)}
+
+        assert decode_value(encode_value(value)) == {"price": 71.5, "hours": [0, 1, 2], "at": "2026-01-01T12:00:00"}
+
+    def test_large_values_compressed(self):
+        """Test forecasts above the threshold are zlib-compressed"""
+        value = {"forecast_data": [{"predicted_price": 70.0 + i, "forecast_horizon": i} for i in range(168)]}
+        data = encode_value(value)
+
+        assert data[:1] == FORMAT_ZLIB
+        assert decode_value(data) == value
+
+    def test_unknown_types_rejected(self):
+        """Test arbitrary objects are never serialized"""
+        with pytest.raises(TypeError):
+            encode_value({"model": object()})
+
+
+class TestTiers:
+    """Test the in-process LRU over Redis"""
+
+    def test_local_tier_without_redis(self):
+        """Test the cache works in-process when Redis is unavailable"""
+        cache = ForecastCache(None, ttl=60, beta=0.0)
+        compute = Counter()
+
+        assert cache.get_or_compute("a", compute) == cache.get_or_compute("a", compute)
+        assert compute.calls == 1
+        assert cache.get_stats()["hits"] == 1
+
+    def test_other_worker_reads_redis(self, redis_client):
+        """Test a value computed by one worker is served to another from Redis"""
+        compute = Counter()
+        worker_cache(redis_client).get_or_compute("a", compute)
+
+        other = worker_cache(redis_client)
+        assert other.get_or_compute("a", compute)["call"] == 1
+        assert compute.calls == 1
+
+    def test_lru_bounded(self):
+        """Test the least recently used entries are evicted"""
+        cache = ForecastCache(None, max_entries=2, ttl=60)
+        for key in ["a", "b", "c"]:
+            cache.set(key, key)
+
+        assert cache.get("a") is None
+        assert cache.get("c") == "c"
+
+    def test_errors_not_cached(self):
+        """Test values rejected by ``cacheable`` are recomputed"""
+        cache = ForecastCache(None, ttl=60, beta=0.0)
+        compute = Counter()
+        for _ in range(2):
+            cache.get_or_compute("a", compute, cacheable=lambda result: False)
+
+        assert compute.calls == 2
+
+
+class TestStampedeProtection:
+    """Test recomputes are coalesced"""
+
+    def test_single_flight_in_process(self, redis_client):
+        """Test concurrent misses on one key compute it once"""
+        cache = worker_cache(redis_client)
+        compute = Counter(delay=0.1)
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(cache.get_or_compute("a", compute)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert compute.calls == 1
+        assert all(result["call"] == 1 for result in results)
+        assert cache.stats["coalesced"] == 7
+
+    def test_previous_value_served_while_other_worker_recomputes(self, redis_client):
+        """Test an expired entry is served while another worker holds the lease"""
+        cache = worker_cache(redis_client, ttl=0.05)
+        cache.get_or_compute("a", Counter("old"))
+        time.sleep(0.1)
+        redis_client.set("forecast:a:lease", "other-worker", nx=True, px=1000)
+
+        compute = Counter("new")
+        assert cache.get_or_compute("a", compute)["value"] == "old"
+        assert compute.calls == 0
+        assert cache.stats["stale_served"] == 1
+
+    def test_waits_for_other_worker_on_cold_miss(self, redis_client):
+        """Test a cold miss waits for the lease holder's result instead of computing"""
+        leader = worker_cache(redis_client)
+        follower = worker_cache(redis_client)
+        redis_client.set("forecast:a:lease", "leader", nx=True, px=1000)
+        threading.Timer(0.1, lambda: leader.set("a", {"value": "leader"})).start()
+
+        compute = Counter()
+        assert follower.get_or_compute("a", compute) == {"value": "leader"}
+        assert compute.calls == 0
+
+    def test_early_refresh(self):
+        """Test fresh entries are recomputed early when the XFetch draw says so"""
+        eager = ForecastCache(None, ttl=60, beta=1e9)
+        compute = Counter(delay=0.001)
+        eager.get_or_compute("a", compute)
+
+        assert eager.get_or_compute("a", compute)["call"] == 2
+        assert eager.stats["early_refreshes"] == 1
+
+
+class TestTagInvalidation:
+    """Test tag versions instead of key scans"""
+
+    def test_invalidation_reaches_other_workers(self, redis_client):
+        """Test bumping a tag in one worker makes entries stale in another"""
+        first = worker_cache(redis_client)
+        second = worker_cache(redis_client)
+        compute = Counter()
+        first.get_or_compute("crude", compute, tags=["commodity:crude_oil"])
+        first.get_or_compute("gas", compute, tags=["commodity:natural_gas"])
+
+        second.invalidate("commodity:crude_oil")
+
+        assert first.get("crude") is None
+        assert first.get("gas") is not None
+        assert first.get_or_compute("crude", compute, tags=["commodity:crude_oil"])["call"] == 3
+
+    def test_tag_checks_throttled(self, redis_client):
+        """Test tag versions are re-read from Redis at most once per interval"""
+        cache = worker_cache(redis_client, tag_check_interval=60)
+        cache.set("a", 1, tags=["commodity:crude_oil"])
+        redis_client.hincrby("forecast:tags", "commodity:crude_oil")
+
+        assert cache.get("a") == 1
+        cache.invalidate("commodity:crude_oil")
+        assert cache.get("a") is None
+
+    def test_invalidated_entry_never_served(self, redis_client):
+        """Test an invalidated entry is not served as stale while another worker recomputes"""
+        leader = worker_cache(redis_client)
+        follower = worker_cache(redis_client)
+        follower.get_or_compute("crude", Counter("old"), tags=["commodity:crude_oil"])
+        leader.invalidate("commodity:crude_oil")
+        redis_client.set("forecast:crude:lease", "leader", nx=True, px=1000)
+        threading.Timer(0.1, lambda: leader.set("crude", {"value": "new"}, tags=["commodity:crude_oil"])).start()
+
+        compute = Counter()
+        assert follower.get_or_compute("crude", compute, tags=["commodity:crude_oil"]) == {"value": "new"}
+        assert compute.calls == 0
+        assert follower.stats["stale_served"] == 0
@@ -0,0 +1,205 @@
+"""
+Test service instrumentation
+Tests latency histograms, error and batch metrics, label cardinality limits and cache hit ratios
+"""
+
+import os
+import sys
+import threading
+import time
+from unittest.mock import AsyncMock
+
+import pytest
+from fastapi import WebSocket
+from prometheus_client import CollectorRegistry, generate_latest
+
+from app.core.instrumentation import OVERFLOW_LABEL, ServiceInstrumentation, instrumentation
+from app.core.websocket_manager import ConnectionManager
+from app.services.market_risk_engine import MarketRiskEngine
+
+# Add shared services to path for imports
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'shared', 'services'))
+
+
+def scrape(instrumentation: ServiceInstrumentation) -> str:
+    registry = CollectorRegistry()
+    registry.register(instrumentation)
+    return generate_latest(registry).decode()
+
+
+class TestServiceInstrumentation:
+    """Test the instrument decorator and scrape-time export"""
+
+    def test_latency_histogram_exported(self):
+        """Test calls land in cumulative buckets of service_call_duration_seconds"""
+        metrics = ServiceInstrumentation()
+
+        @metrics.instrument("var")
+        def calculate(value):
+            return value * 2
+
+        assert calculate(21) == 42
+        calculate(1)
+
+        output = scrape(metrics)
+        assert 'service_call_duration_seconds_count{operation="var"} 2.0' in output
+        assert 'service_call_duration_seconds_bucket{le="+Inf",operation="var"} 2.0' in output
+
+    def test_errors_counted_and_raised(self):
+        """Test exceptions propagate and are counted with their latency"""
+        metrics = ServiceInstrumentation()
+
+        @metrics.instrument("mtm")
+        def failing():
+            raise ValueError("no price")
+
+        with pytest.raises(ValueError):
+            failing()
+
+        stats = metrics.get_stats()["operations"]["mtm"]
+        assert stats["calls"] == 1
+        assert stats["errors"] == 1
+
+    def test_batch_size_recorded(self):
+        """Test the batch callable sizes each call"""
+        metrics = ServiceInstrumentation()
+
+        @metrics.instrument("mtm", batch=lambda positions: len(positions))
+        def mark(positions):
+            return sum(positions)
+
+        mark([1, 2, 3])
+        output = scrape(metrics)
+        assert 'service_batch_size_sum{operation="mtm"} 3.0' in output
+        assert 'service_batch_size_bucket{le="5.0",operation="mtm"} 1.0' in output
+
+    @pytest.mark.asyncio
+    async def test_async_functions_timed(self):
+        """Test coroutines are awaited inside the timed region"""
+        metrics = ServiceInstrumentation()
+
+        @metrics.instrument("forecast")
+        async def forecast():
+            time.sleep(0.002)
+            return "ok"
+
+        assert await forecast() == "ok"
+        stats = metrics.get_stats()["operations"]["forecast"]
+        assert stats["calls"] == 1
+        assert stats["mean_seconds"] >= 0.002
+
+    def test_label_sets_capped(self):
+        """Test label sets beyond the limit share the overflow child"""
+        metrics = ServiceInstrumentation(max_label_sets=2)
+        for symbol in ["WTI", "BRENT", "HH", "TTF"]:
+            metrics.record_batch(symbol, 1)
+
+        assert set(metrics.batch_size.children) == {("WTI",), ("BRENT",), (OVERFLOW_LABEL,)}
+        assert metrics.batch_size.children[(OVERFLOW_LABEL,)].counts[0] == 2
+        assert metrics.get_stats()["label_overflows"] == 2
+
+    def test_cache_hit_ratio(self):
+        """Test recorded and tracked caches are combined into hit ratios at scrape time"""
+        metrics = ServiceInstrumentation()
+        metrics.record_cache("forecasts", hit=True)
+        metrics.record_cache("forecasts", hit=False)
+        tracked = {"hits": 3, "misses": 1}
+        metrics.track_cache("jwt_tokens", lambda: tracked)
+        tracked["hits"] = 9
+
+        output = scrape(metrics)
+        assert 'service_cache_hit_ratio{cache="forecasts"} 0.5' in output
+        assert 'service_cache_hit_ratio{cache="jwt_tokens"} 0.9' in output
+
+    def test_disabled_returns_function(self):
+        """Test disabled instrumentation leaves functions undecorated"""
+        metrics = ServiceInstrumentation(enabled=False)
+
+        def calculate():
+            return 1
+
+        assert metrics.instrument("var")(calculate) is calculate
+
+    def test_overhead_small(self):
+        """Test the decorator adds only a few microseconds per call"""
+        metrics = ServiceInstrumentation()
+
+        def plain(value):
+            return value
+
+        wrapped = metrics.instrument("noop")(plain)
+        calls = 20000
+
+        started = time.perf_counter()
+        for value in range(calls):
+            plain(value)
+        baseline = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for value in range(calls):
+            wrapped(value)
+        overhead = (time.perf_counter() - started - baseline) / calls
+
+        assert overhead < 20e-6
+
+    def test_threaded_calls_not_lost(self):
+        """Test calls made concurrently from worker threads are all counted"""
+        metrics = ServiceInstrumentation()
+        sys.setswitchinterval(1e-6)
+
+        @metrics.instrument("threaded")
+        def work(value):
+            return value
+
+        def run():
+            for value in range(5000):
+                work(value)
+
+        threads = [threading.Thread(target=run) for _ in range(8)]
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(0.005)
+
+        stats = metrics.get_stats()["operations"]["threaded"]
+        assert stats["calls"] == 40000
+        assert stats["mean_seconds"] > 0
+        assert 'service_call_duration_seconds_count{operation="threaded"} 40000.0' in scrape(metrics)
+
+
+def calls(operation: str) -> int:
+    """Calls recorded so far by the global instrumentation"""
+    return instrumentation.get_stats()["operations"].get(operation, {}).get("calls", 0)
+
+
+class TestInstrumentedCallSites:
+    """Test the service paths requests actually take record metrics"""
+
+    @pytest.mark.asyncio
+    async def test_websocket_broadcasts_recorded(self):
+        """Test broadcasts to organizations, users and everyone count as websocket fan-out"""
+        manager = ConnectionManager()
+        await manager.connect(AsyncMock(spec=WebSocket), "u1", "o1")
+        before = calls("websocket_fanout")
+
+        await manager.broadcast_to_organization("o1", {"type": "alert"})
+        await manager.broadcast_to_user("u1", {"type": "alert"})
+        await manager.broadcast_to_all({"type": "alert"})
+
+        assert calls("websocket_fanout") == before + 3
+
+    def test_var_without_positions(self):
+        """Test the VaR batch size tolerates a missing position list"""
+        assert MarketRiskEngine().calculate_var(None)["var"] == 0.0
+
+    def test_shared_forecasts_recorded(self):
+        """Test the shared forecasting service reports its forecast calls"""
+        forecasting = pytest.importorskip("forecasting_service")
+        before = calls("forecast_batch")
+
+        forecasting.forecasting_service.forecast_batch(["unknown"], days=1)
+
+        assert calls("forecast_batch") == before + 1
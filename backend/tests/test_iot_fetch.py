@@ -0,0 +1,158 @@
+"""
+Test IoT fetch layer
+Tests the pooled HTTP client, request coalescing, the bounded TTL cache and geo-bucketed batch lookups against a local stub server
+"""
+
+import asyncio
+import contextlib
+import time
+
+import pytest
+import sys
+import os
+
+from aiohttp import web
+
+# Add shared services to path for imports
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'shared', 'services'))
+
+from async_fetch import AsyncFetcher, TTLCache, geo_bucket
+from iot_integration_service import IoTIntegrationService
+from iot_stub_server import STATS, create_stub_app
+
+
+@contextlib.asynccontextmanager
+async def stub_server(delay: float = 0.0):
+    app = create_stub_app(delay)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        yield app[STATS], f"http://127.0.0.1:{port}/data/2.5"
+    finally:
+        await runner.cleanup()
+
+
+def stub_service(base_url: str) -> IoTIntegrationService:
+    service = IoTIntegrationService()
+    service.openweather_api_key = "test-key"
+    service.openweather_base_url = base_url
+    return service
+
+
+class TestCache:
+    """Test geo buckets and the bounded TTL cache"""
+
+    def test_geo_bucket(self):
+        """Test nearby coordinates snap to the same cell and distant ones do not"""
+        assert geo_bucket(29.7604, -95.3698, 0.1) == geo_bucket(29.7812, -95.3512, 0.1) == (29.8, -95.4)
+        assert geo_bucket(29.7604, -95.3698, 0.1) != geo_bucket(29.6604, -95.3698, 0.1)
+        assert geo_bucket(29.7604, -95.3698, 0) == (29.7604, -95.3698)
+
+    def test_bounded_and_expiring(self):
+        """Test the least recently used entries are evicted and expired ones dropped"""
+        cache = TTLCache(max_entries=2, ttl=0.05)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        time.sleep(0.06)
+        assert cache.get("c") is None
+        assert cache.stats["evictions"] == 1
+        assert cache.stats["expired"] == 1
+
+
+class TestFetcher:
+    """Test the shared HTTP pool"""
+
+    @pytest.mark.asyncio
+    async def test_identical_requests_coalesced(self):
+        """Test concurrent identical GETs share one upstream call"""
+        async with stub_server(delay=0.05) as (stats, base_url):
+            fetcher = AsyncFetcher()
+            params = {"lat": 1.0, "lon": 2.0, "appid": "key"}
+            results = await asyncio.gather(*(fetcher.get_json(f"{base_url}/weather", params) for _ in range(20)))
+            await fetcher.close()
+
+        assert stats["requests"] == {(1.0, 2.0): 1}
+        assert all(result == results[0] for result in results)
+        assert fetcher.stats["coalesced"] == 19
+
+    @pytest.mark.asyncio
+    async def test_per_host_limit(self):
+        """Test no more than ``per_host`` requests reach one host at a time"""
+        async with stub_server(delay=0.02) as (stats, base_url):
+            fetcher = AsyncFetcher(per_host=3)
+            await asyncio.gather(*(
+                fetcher.get_json(f"{base_url}/weather", {"lat": float(i), "lon": 0.0, "appid": "key"})
+                for i in range(12)
+            ))
+            await fetcher.close()
+
+        assert len(stats["requests"]) == 12
+        assert stats["max_active"] <= 3
+
+    @pytest.mark.asyncio
+    async def test_failures_not_cached(self):
+        """Test a failed load is retried on the next call"""
+        fetcher = AsyncFetcher()
+        calls = []
+
+        async def loader():
+            calls.append(1)
+            if len(calls) == 1:
+                raise RuntimeError("upstream down")
+            return {"value": 1}
+
+        with pytest.raises(RuntimeError):
+            await fetcher.cached("key", loader)
+        assert await fetcher.cached("key", loader) == {"value": 1}
+        assert await fetcher.cached("key", loader) == {"value": 1}
+        assert len(calls) == 2
+
+
+class TestBatchLookups:
+    """Test service batch endpoints against the stub"""
+
+    @pytest.mark.asyncio
+    async def test_weather_batch_one_call_per_cell(self):
+        """Test thousands of sites in a few grid cells cost one API call per cell"""
+        async with stub_server(delay=0.01) as (stats, base_url):
+            service = stub_service(base_url)
+            sites = [(29.76 + (i % 40) * 0.001, -95.37 + (i % 7) * 0.2) for i in range(2000)]
+            results = await service.get_weather_data_batch(sites)
+            await service.fetcher.close()
+
+        assert len(results) == 2000
+        assert sum(stats["requests"].values()) == 7
+        assert all(result["data_source"] == "openweathermap" for result in results)
+        assert results[1]["coordinates"] == {"lat": sites[1][0], "lon": sites[1][1]}
+        assert service.get_iot_status()["cache_size"] == 7
+
+    @pytest.mark.asyncio
+    async def test_upstream_errors_fall_back(self):
+        """Test a failing API yields fallback data that is not cached"""
+        async with stub_server() as (stats, base_url):
+            service = stub_service(f"{base_url}/missing")
+            results = await service.get_weather_data_batch([(10.0, 10.0), (50.0, 50.0)])
+            await service.fetcher.close()
+
+        assert [result["data_source"] for result in results] == ["fallback_simulation"] * 2
+        assert service.get_iot_status()["cache_size"] == 0
+        assert service.fetcher.stats["errors"] == 2
+
+    @pytest.mark.asyncio
+    async def test_grid_and_solar_batches(self):
+        """Test simulated sources go through the same cache"""
+        service = IoTIntegrationService()
+        grid = await service.get_grid_data_batch(["houston", "dallas", "houston"])
+        solar = await service.get_solar_radiation_data_batch([(29.76, -95.37), (29.761, -95.371)])
+
+        assert grid[0] == grid[2]
+        assert solar[0]["solar_radiation"] == solar[1]["solar_radiation"]
+        assert len(service.fetcher.cache) == 3
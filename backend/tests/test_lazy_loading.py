@@ -0,0 +1,192 @@
+"""
+Test lazy service loading
+Tests deferred imports, background warmup and the startup import report
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import types
+import pytest
+import httpx
+from fastapi import APIRouter, Depends, FastAPI
+
+from app.api.v1.health import router as health_router
+from app.core.lazy_loading import LazyService, ServiceRegistry, loaded_services
+
+class FakeMQTTClient:
+    """Stands in for paho's client: loop_start runs the network loop on a thread"""
+
+    def __init__(self):
+        self.loop_pid = None
+        self.thread = None
+
+    def connect(self, host, port, keepalive):
+        pass
+
+    def loop_start(self):
+        self.loop_pid = os.getpid()
+        self.thread = threading.Thread(target=threading.Event().wait, daemon=True)
+        self.thread.start()
+
+
+SERVICE_SOURCE = '''
+import time
+
+instances = 0
+
+class SlowService:
+    def __init__(self, scale=1):
+        global instances
+        instances += 1
+        self.scale = scale
+
+    def price(self, value):
+        return value * self.scale
+
+
+class BlockingService(SlowService):
+    def __init__(self, scale=1):
+        time.sleep(0.3)
+        super().__init__(scale)
+'''
+
+
+@pytest.fixture
+def service_module(tmp_path, monkeypatch):
+    """A throwaway service module that has not been imported yet"""
+    name = f"lazy_service_{tmp_path.name.replace('-', '_')}"
+    (tmp_path / f"{name}.py").write_text(SERVICE_SOURCE)
+    (tmp_path / f"{name}_broken.py").write_text("raise ImportError('torch not installed')\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield name
+    sys.modules.pop(name, None)
+    sys.modules.pop(f"{name}_broken", None)
+
+
+class TestLazyService:
+    """Test the service proxy"""
+
+    def test_import_deferred_until_first_use(self, service_module):
+        """Test the module is imported and the service built once, on first attribute access"""
+        registry = ServiceRegistry()
+        service = LazyService(service_module, "SlowService", 3, registry=registry)
+
+        assert service_module not in sys.modules
+        assert not service.loaded
+        assert service.price(2) == 6
+        assert service.price(5) == 15
+        assert sys.modules[service_module].instances == 1
+        assert registry.get_report()["services"][service.name]["error"] is None
+
+    def test_failed_import_reported(self, service_module):
+        """Test a missing optional dependency fails the service, not the router import"""
+        registry = ServiceRegistry()
+        service = LazyService(f"{service_module}_broken", "Anything", registry=registry)
+
+        with pytest.raises(ImportError):
+            service.load()
+        with pytest.raises(ImportError):
+            service.price(1)
+        assert "torch not installed" in registry.get_report()["services"][service.name]["error"]
+
+
+    @pytest.mark.asyncio
+    async def test_route_waits_for_warmup_off_the_event_loop(self, service_module):
+        """Test a request arriving while warmup is building its service does not stall the event loop"""
+        registry = ServiceRegistry()
+        service = LazyService(service_module, "BlockingService", 2, registry=registry)
+        router = APIRouter(dependencies=[Depends(loaded_services(service))])
+
+        @router.get("/price")
+        async def price():
+            return {"price": service.price(10)}
+
+        app = FastAPI()
+        app.include_router(router)
+        warmup = asyncio.create_task(registry.warmup())
+        await asyncio.sleep(0.05)
+
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        counting = asyncio.create_task(ticker())
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.get("/price")
+        counting.cancel()
+        await warmup
+
+        assert response.json() == {"price": 20}
+        assert sys.modules[service_module].instances == 1
+        assert ticks >= 5
+
+
+class TestServiceRegistry:
+    """Test warmup and the startup report"""
+
+    @pytest.mark.asyncio
+    async def test_warmup_loads_pending_services(self, service_module):
+        """Test background warmup loads every service and survives failures"""
+        registry = ServiceRegistry()
+        good = LazyService(service_module, "SlowService", registry=registry)
+        LazyService(f"{service_module}_broken", "Anything", registry=registry)
+        registry.mark_ready()
+
+        report = await registry.warmup()
+
+        assert good.loaded
+        assert report["loaded"] == 1 and report["pending"] == 1
+        assert report["warmup_seconds"] is not None
+        assert report["ready_seconds"] > 0
+        assert service_module in report["imports"]
+
+    @pytest.mark.asyncio
+    async def test_startup_report_endpoint(self):
+        """Test the health router exposes the import-time report"""
+        app = FastAPI()
+        app.include_router(health_router, prefix="/api/v1")
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.get("/api/v1/health/startup")
+
+        assert response.status_code == 200
+        assert {"imports", "services", "loaded", "pending", "ready_seconds"} <= set(response.json())
+
+    def test_preload_skips_services_that_are_not_fork_safe(self, service_module):
+        """Test preload builds fork-safe services and only imports the others"""
+        registry = ServiceRegistry()
+        shared = LazyService(service_module, "SlowService", registry=registry)
+        per_worker = LazyService(service_module, "SlowService", 2, registry=registry, fork_safe=False)
+
+        assert registry.preload() == 1
+        assert shared.loaded and not per_worker.loaded
+        assert sys.modules[service_module].instances == 1
+
+    @pytest.mark.skipif(not hasattr(os, "fork"), reason="requires fork")
+    def test_preloaded_worker_has_running_mqtt_loop(self, monkeypatch):
+        """Test a worker forked after preload builds the digital twin itself, with a live MQTT loop"""
+        from app.services import digital_twin as twin_module
+
+        monkeypatch.setattr(twin_module, "MQTT_AVAILABLE", True)
+        monkeypatch.setattr(twin_module, "REDIS_AVAILABLE", False)
+        monkeypatch.setattr(twin_module, "mqtt", types.SimpleNamespace(Client=FakeMQTTClient), raising=False)
+        registry = ServiceRegistry()
+        twin = LazyService("app.services.digital_twin", "GlobalEnergyDigitalTwin", registry=registry, fork_safe=False)
+
+        registry.preload()
+        assert not twin.loaded
+
+        pid = os.fork()
+        if pid == 0:
+            client = twin.mqtt_client
+            os._exit(0 if client.loop_pid == os.getpid() and client.thread.is_alive() else 1)
+        _, status = os.waitpid(pid, 0)
+        assert os.waitstatus_to_exitcode(status) == 0
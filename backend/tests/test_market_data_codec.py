@@ -0,0 +1,205 @@
+"""
+Test binary delta-encoded market data frames
+Tests the codec round trip and subprotocol negotiation in ConnectionManager
+"""
+
+import pytest
+import json
+from datetime import datetime
+from unittest.mock import AsyncMock
+
+from fastapi import WebSocket
+
+from app.core.market_data_codec import (
+    BINARY_SUBPROTOCOL,
+    DeltaDecoder,
+    DeltaEncoder,
+    SymbolRegistry,
+)
+from app.core.websocket_fanout import InProcessFanoutBridge, InProcessFanoutHub
+from app.core.websocket_manager import ConnectionManager
+
+
+def make_tick(symbol, last, volume=1000.0):
+    """Create a tick dict"""
+    return {
+        "symbol": symbol,
+        "bid": last - 0.01,
+        "ask": last + 0.01,
+        "last": last,
+        "volume": volume,
+        "timestamp": 1_700_000_000_000,
+    }
+
+
+class TestDeltaCodec:
+    """Test encoder/decoder round trip"""
+
+    @pytest.fixture
+    def codec(self):
+        """Create encoder and decoder pair"""
+        return DeltaEncoder(SymbolRegistry()), DeltaDecoder()
+
+    def test_keyframe_round_trip(self, codec):
+        """Test first frame carries every field and decodes exactly"""
+        encoder, decoder = codec
+        ticks = [make_tick("CL", 85.5), make_tick("NG", 3.2)]
+
+        frame = encoder.encode(ticks)
+        decoder.update_symbols(frame.new_symbols)
+
+        assert frame.is_keyframe
+        assert decoder.decode(frame.payload) == ticks
+
+    def test_delta_only_sends_changed_fields(self, codec):
+        """Test delta frame is smaller and rebuilds the full tick"""
+        encoder, decoder = codec
+        first = encoder.encode([make_tick("CL", 85.5)])
+        decoder.update_symbols(first.new_symbols)
+        decoder.decode(first.payload)
+
+        changed = make_tick("CL", 85.5, volume=1200.0)
+        delta = encoder.encode([changed])
+
+        assert not delta.is_keyframe
+        assert not delta.new_symbols
+        assert len(delta.payload) < len(first.payload)
+        assert decoder.decode(delta.payload) == [changed]
+
+    def test_unchanged_ticks_produce_no_frame(self, codec):
+        """Test repeated identical ticks are suppressed"""
+        encoder, _ = codec
+        encoder.encode([make_tick("CL", 85.5)])
+
+        assert encoder.encode([make_tick("CL", 85.5)]) is None
+
+    def test_reset_forces_keyframe(self, codec):
+        """Test resync emits a keyframe and resends the symbol map"""
+        encoder, _ = codec
+        encoder.encode([make_tick("CL", 85.5)])
+        encoder.reset()
+
+        frame = encoder.encode([make_tick("CL", 85.5)])
+        assert frame.is_keyframe
+        assert frame.new_symbols == {"CL": 0}
+
+    def test_binary_frame_much_smaller_than_json(self, codec):
+        """Test per-tick bytes against the JSON encoding"""
+        encoder, _ = codec
+        ticks = [make_tick(f"SYM{i}", 50.0 + i) for i in range(100)]
+        encoder.encode(ticks)
+
+        moved = [make_tick(f"SYM{i}", 50.5 + i) for i in range(100)]
+        for tick in moved:
+            tick["bid"], tick["ask"] = tick["last"] - 0.5 - 0.01, tick["last"] - 0.5 + 0.01
+        delta = encoder.encode(moved)
+        as_json = json.dumps({"type": "market_data", "ticks": moved})
+
+        assert len(delta.payload) * 5 < len(as_json)
+
+
+    def test_missing_fields_stay_missing(self, codec):
+        """Test absent prices and volumes decode as None rather than zero and are not resent"""
+        encoder, decoder = codec
+        tick = {**make_tick("CL", 85.5), "bid": None, "volume": None}
+        frame = encoder.encode([tick])
+        decoder.update_symbols(frame.new_symbols)
+
+        decoded = decoder.decode(frame.payload)[0]
+        assert decoded["bid"] is None and decoded["volume"] is None
+        assert decoded["last"] == 85.5
+        assert encoder.encode([dict(tick)]) is None
+
+        delta = encoder.encode([{**tick, "volume": 0.0}])
+        assert decoder.decode(delta.payload)[0]["volume"] == 0.0
+
+    def test_large_batch_split_into_frames(self, codec):
+        """Test ticks beyond one frame's capacity go out in further frames instead of being dropped"""
+        encoder, decoder = codec
+        ticks = [make_tick(f"SYM{i % 1000}", 50.0 + i * 0.001) for i in range(70000)]
+
+        frames = encoder.encode_frames(ticks)
+        decoded = []
+        for frame in frames:
+            decoder.update_symbols(frame.new_symbols)
+            decoded.extend(decoder.decode(frame.payload))
+
+        assert len(frames) == 2
+        assert len(decoded) == 70000
+        assert decoded[-1]["last"] == pytest.approx(ticks[-1]["last"])
+        with pytest.raises(ValueError):
+            encoder.encode(ticks)
+
+
+class TestBinarySubprotocolNegotiation:
+    """Test ConnectionManager market data delivery"""
+
+    def make_websocket(self, subprotocols):
+        """Create mock websocket offering subprotocols"""
+        websocket = AsyncMock(spec=WebSocket)
+        websocket.scope = {"type": "websocket", "subprotocols": subprotocols}
+        return websocket
+
+    @pytest.mark.asyncio
+    async def test_binary_client_receives_frames(self):
+        """Test negotiated connection gets symbol map then binary frames"""
+        manager = ConnectionManager()
+        websocket = self.make_websocket([BINARY_SUBPROTOCOL])
+        connection_id = await manager.connect(websocket, "user-1", "org-1")
+
+        await manager.send_market_data(connection_id, [make_tick("CL", 85.5)])
+
+        websocket.accept.assert_called_once_with(subprotocol=BINARY_SUBPROTOCOL)
+        last_text = json.loads(websocket.send_text.call_args[0][0])
+        assert last_text["type"] == "symbol_map"
+        websocket.send_bytes.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_json_client_receives_text(self):
+        """Test default connection keeps receiving JSON"""
+        manager = ConnectionManager()
+        websocket = self.make_websocket([])
+        connection_id = await manager.connect(websocket, "user-1", "org-1")
+
+        tick = make_tick("CL", 85.5)
+        tick["timestamp"] = datetime(2024, 1, 1)
+        await manager.send_market_data(connection_id, [tick])
+
+        websocket.send_bytes.assert_not_called()
+        message = json.loads(websocket.send_text.call_args[0][0])
+        assert message["type"] == "market_data"
+        assert message["ticks"][0]["timestamp"] == "2024-01-01T00:00:00"
+
+    @pytest.mark.asyncio
+    async def test_broadcast_respects_symbol_subscriptions(self):
+        """Test broadcast filters ticks per subscription"""
+        manager = ConnectionManager()
+        websocket = self.make_websocket([BINARY_SUBPROTOCOL])
+        connection_id = await manager.connect(websocket, "user-1", "org-1")
+        manager.connection_metadata[connection_id]["subscriptions"].add("market_data:NG")
+
+        await manager.broadcast_market_data([make_tick("CL", 85.5)])
+        websocket.send_bytes.assert_not_called()
+
+        await manager.broadcast_market_data([make_tick("NG", 3.2)])
+        websocket.send_bytes.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_market_data_broadcast_reaches_other_workers(self):
+        """Test market data sent with broadcast_to_all is relayed, filtered by subscription and binary-encoded"""
+        hub = InProcessFanoutHub()
+        worker_a, worker_b = ConnectionManager(), ConnectionManager()
+        await worker_a.attach_fanout(InProcessFanoutBridge(hub, "worker-a"))
+        await worker_b.attach_fanout(InProcessFanoutBridge(hub, "worker-b"))
+        subscribed, other = self.make_websocket([BINARY_SUBPROTOCOL]), self.make_websocket([])
+        connection_id = await worker_b.connect(subscribed, "user-1", "org-1")
+        worker_b.connection_metadata[connection_id]["subscriptions"].add("market_data:CL")
+        await worker_b.connect(other, "user-2", "org-1")
+        other.send_text.reset_mock()
+
+        tick = make_tick("CL", 85.5)
+        tick["timestamp"] = datetime(2024, 1, 1)
+        await worker_a.broadcast_to_all({"type": "market_data", "ticks": [tick]})
+
+        subscribed.send_bytes.assert_called_once()
+        other.send_text.assert_not_called()
@@ -0,0 +1,146 @@
+"""
+Test model registry
+Tests flattened tree artifacts, versioning, lazy loading and checksum verification
+"""
+
+import json
+import os
+
+import numpy as np
+import pytest
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor, VotingRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.preprocessing import StandardScaler
+
+from app.core.model_registry import CompiledForest, ModelRegistry
+
+
+@pytest.fixture
+def training_data():
+    rng = np.random.default_rng(7)
+    X = rng.normal(size=(300, 6))
+    y = 3 * X[:, 0] - 2 * X[:, 1] ** 2 + rng.normal(scale=0.1, size=300)
+    return X, y
+
+
+@pytest.fixture
+def ensemble(training_data):
+    X, y = training_data
+    model = VotingRegressor([
+        ("rf", RandomForestRegressor(n_estimators=20, max_depth=6, random_state=42)),
+        ("gb", GradientBoostingRegressor(n_estimators=30, random_state=42))
+    ])
+    return model.fit(X, y)
+
+
+@pytest.fixture
+def registry(tmp_path):
+    return ModelRegistry(root=str(tmp_path / "registry"), check_interval=0, verify=True, keep_versions=0)
+
+
+class TestCompiledForest:
+    """Test flattening tree ensembles"""
+
+    def test_matches_sklearn(self, ensemble, training_data):
+        """Test compiled predictions equal the voting ensemble's"""
+        X, _ = training_data
+        compiled = CompiledForest.from_estimator(ensemble)
+
+        np.testing.assert_allclose(compiled.predict(X), ensemble.predict(X), rtol=1e-9, atol=1e-9)
+        np.testing.assert_allclose(compiled.predict(X[0]), ensemble.predict(X[:1]), rtol=1e-9, atol=1e-9)
+
+    def test_matches_xgboost(self, training_data):
+        """Test XGBoost regressors, alone and inside a voting ensemble, flatten to the same predictions"""
+        xgboost = pytest.importorskip("xgboost")
+        X, y = training_data
+        booster = xgboost.XGBRegressor(n_estimators=40, max_depth=4, random_state=42).fit(X, y)
+        voting = VotingRegressor([
+            ("rf", RandomForestRegressor(n_estimators=10, max_depth=6, random_state=42)),
+            ("xgb", xgboost.XGBRegressor(n_estimators=40, random_state=42))
+        ]).fit(X, y)
+
+        # XGBoost accumulates leaves in float32
+        for model in (booster, voting):
+            np.testing.assert_allclose(CompiledForest.from_estimator(model).predict(X), model.predict(X), rtol=1e-5, atol=1e-5)
+
+    def test_unsupported_estimator_rejected(self, training_data):
+        """Test models without trees cannot be flattened"""
+        X, y = training_data
+        with pytest.raises(TypeError):
+            CompiledForest.from_estimator(LinearRegression().fit(X, y))
+
+
+class TestModelRegistry:
+    """Test publishing and loading versions"""
+
+    def test_publish_and_load_latest(self, registry, ensemble, training_data):
+        """Test published versions load lazily, memory-mapped, with their scaler"""
+        X, y = training_data
+        scaler = StandardScaler().fit(X)
+        registry.publish("crude_oil", ensemble, scaler, {"mae": 0.1})
+        assert registry.get_status()["loaded"] == {}
+
+        entry = registry.get("crude_oil")
+
+        assert entry.version == 1
+        assert entry.manifest["format"] == "forest"
+        assert isinstance(entry.model.arrays["threshold"], np.memmap)
+        np.testing.assert_allclose(entry.predict(X[:5]), ensemble.predict(scaler.transform(X[:5])), rtol=1e-9)
+        assert registry.get("crude_oil") is entry
+
+    def test_newer_version_picked_up(self, registry, ensemble, training_data):
+        """Test get reloads when LATEST moves and old versions stay addressable"""
+        X, y = training_data
+        registry.publish("crude_oil", ensemble)
+        first = registry.get("crude_oil")
+        registry.publish("crude_oil", RandomForestRegressor(n_estimators=5, random_state=1).fit(X, y))
+
+        assert registry.get("crude_oil").version == 2
+        assert registry.get("crude_oil", version=1).version == first.version
+        assert registry.versions("crude_oil") == [1, 2]
+        assert registry.stats["reloads"] == 1
+
+    def test_checksum_mismatch_rejected(self, registry, ensemble):
+        """Test a corrupted array file is refused on load"""
+        registry.publish("crude_oil", ensemble)
+        path = os.path.join(registry.root, "crude_oil", "v1", "value.npy")
+        with open(path, "r+b") as handle:
+            handle.seek(-8, os.SEEK_END)
+            handle.write(b"\x00" * 8)
+
+        with pytest.raises(ValueError):
+            registry.get("crude_oil")
+        assert registry.stats["checksum_failures"] == 1
+
+    def test_joblib_fallback(self, registry, training_data):
+        """Test models without trees are stored as joblib files"""
+        X, y = training_data
+        model = LinearRegression().fit(X, y)
+        manifest = registry.publish("linear", model)
+
+        assert manifest["format"] == "joblib"
+        np.testing.assert_allclose(registry.get("linear").predict(X[:3]), model.predict(X[:3]))
+
+    def test_prune_keeps_latest(self, registry, ensemble):
+        """Test pruning removes old versions only"""
+        for _ in range(4):
+            registry.publish("crude_oil", ensemble)
+
+        assert registry.prune("crude_oil", keep=2) == 2
+        assert registry.versions("crude_oil") == [3, 4]
+        with open(os.path.join(registry.root, "crude_oil", "LATEST")) as handle:
+            assert json.load(handle)["version"] == 4
+
+    def test_publish_prunes_old_versions(self, tmp_path, ensemble):
+        """Test publishing keeps only the newest versions"""
+        registry = ModelRegistry(root=str(tmp_path / "registry"), check_interval=0, keep_versions=2)
+        for _ in range(4):
+            registry.publish("crude_oil", ensemble)
+
+        assert registry.versions("crude_oil") == [3, 4]
+        assert registry.stats["pruned"] == 2
+
+    def test_invalid_name_rejected(self, registry):
+        """Test names cannot escape the registry directory"""
+        with pytest.raises(ValueError):
+            registry.get("../secrets")
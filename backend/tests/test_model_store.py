@@ -0,0 +1,118 @@
+"""
+Test shared model store
+Tests memory-mapped artifacts, atomic saves with hot reload and shared reference arrays
+"""
+
+import importlib
+import os
+import re
+import sys
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+from sklearn.linear_model import LinearRegression
+from sklearn.preprocessing import StandardScaler
+
+from app.core import model_store as model_store_module
+from app.core.lazy_loading import service_registry
+from app.core.model_store import SharedModelStore, preload_for_fork
+
+ROOT = os.path.join(os.path.dirname(__file__), '..', '..')
+
+
+def fitted_scaler(offset: float) -> StandardScaler:
+    return StandardScaler().fit(np.arange(20.0).reshape(10, 2) + offset)
+
+
+class TestSharedModelStore:
+    """Test loading, sharing and reloading artifacts"""
+
+    def test_arrays_memory_mapped(self, tmp_path):
+        """Test artifact arrays are read-only maps of the file, loaded once"""
+        store = SharedModelStore(str(tmp_path), check_interval=60)
+        store.save(fitted_scaler(0), "scaler.pkl")
+
+        first = store.get("scaler.pkl")
+        second = store.get("scaler.pkl")
+
+        assert first is second
+        assert isinstance(first.mean_, np.memmap)
+        assert not first.mean_.flags.writeable
+        assert store.get_status()["loads"] == 1
+
+    def test_retrained_artifact_reloaded(self, tmp_path):
+        """Test a new file is picked up while the old object stays intact for in-flight callers"""
+        store = SharedModelStore(str(tmp_path), check_interval=0)
+        X = np.arange(10.0).reshape(-1, 1)
+        store.save(LinearRegression().fit(X, 2 * X.ravel()), "model.pkl")
+        old = store.get("model.pkl")
+
+        # Another worker retrains and saves through its own store
+        SharedModelStore(str(tmp_path)).save(LinearRegression().fit(X, 3 * X.ravel()), "model.pkl")
+        new = store.get("model.pkl")
+
+        assert new is not old
+        assert old.predict([[1.0]])[0] == pytest.approx(2.0)
+        assert new.predict([[1.0]])[0] == pytest.approx(3.0)
+        assert store.get_status()["reloads"] == 1
+        assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+    def test_shared_reference_array(self, tmp_path):
+        """Test reference data published by one process is mapped by another"""
+        curve = np.linspace(80.0, 90.0, 365)
+        SharedModelStore(str(tmp_path)).share_array("crude_oil_forward_curve", curve)
+
+        mapped = SharedModelStore(str(tmp_path)).get_array("crude_oil_forward_curve")
+
+        assert np.array_equal(mapped, curve)
+        assert not mapped.flags.writeable
+        with pytest.raises(ValueError):
+            SharedModelStore(str(tmp_path)).share_array("../escape", curve)
+
+    def test_preload(self, tmp_path):
+        """Test preload loads every artifact and skips unreadable ones"""
+        store = SharedModelStore(str(tmp_path))
+        store.save(fitted_scaler(0), "a_scaler.pkl")
+        store.share_array("curve", np.ones(3))
+        (tmp_path / "broken.pkl").write_bytes(b"not a pickle")
+
+        assert SharedModelStore(str(tmp_path)).preload() == 2
+
+
+@pytest.fixture
+def preload_mode(monkeypatch):
+    """SERVICE_WARMUP=preload with the actual loading replaced by call counters"""
+    monkeypatch.setattr(model_store_module.settings, "SERVICE_WARMUP", "preload")
+    monkeypatch.setattr(model_store_module, "_preloaded", False)
+    calls = MagicMock()
+    monkeypatch.setattr(model_store_module.model_store, "preload", calls.preload)
+    monkeypatch.setattr(model_store_module.model_store, "freeze", calls.freeze)
+    monkeypatch.setattr(service_registry, "preload", calls.services)
+    return calls
+
+
+class TestPreloadForFork:
+    """Test master-process warmup for gunicorn preload_app"""
+
+    def test_runs_once(self, preload_mode):
+        """Test artifacts and services are loaded and the GC frozen once per process"""
+        assert preload_for_fork() is True
+        assert preload_for_fork() is False
+        assert preload_mode.preload.call_count == 1
+        assert preload_mode.services.call_count == 1
+        assert preload_mode.freeze.call_count == 1
+
+    def test_deployed_entrypoint_preloads(self, preload_mode, monkeypatch):
+        """Test importing the module render.yaml starts gunicorn with runs the warmup"""
+        with open(os.path.join(ROOT, "render.yaml")) as handle:
+            start_command = re.search(r"startCommand: (.*gunicorn .*)", handle.read()).group(1)
+        assert "-c gunicorn.conf.py" in start_command
+        module_name = start_command.split("gunicorn ", 1)[1].split()[0].split(":")[0]
+
+        for dependency in ("uvicorn", "grpc", "aiohttp"):
+            pytest.importorskip(dependency)
+        monkeypatch.delitem(sys.modules, module_name, raising=False)
+        importlib.import_module(module_name)
+
+        assert preload_mode.preload.call_count == 1
@@ -0,0 +1,66 @@
+"""
+Test notification tasks
+Tests push delivery from a worker process using tokens persisted by the API process
+"""
+
+import pytest
+
+from app.services.mobile_app_service import MobileAppService
+from app.tasks import notifications
+from app.tasks.notifications import send_notification
+
+NOTIFICATION = {"title": "Margin call", "body": "Top up book 3", "type": "risk_alert"}
+
+
+@pytest.fixture
+def token_dir(tmp_path):
+    return str(tmp_path / "push_tokens")
+
+
+@pytest.fixture
+def worker_service(token_dir, monkeypatch):
+    """A separate service instance standing in for the notification worker's process"""
+    service = MobileAppService(token_dir=token_dir)
+    monkeypatch.setattr(notifications, "mobile_app_service", service)
+    return service
+
+
+async def register_in_api(token_dir: str) -> MobileAppService:
+    """The API process, where devices register their push tokens"""
+    service = MobileAppService(token_dir=token_dir)
+    for device_id in ("D1", "D2"):
+        await service.register_mobile_device({
+            "device_id": device_id, "platform": "ios", "app_version": "1.0", "device_model": "iPhone"
+        })
+        await service.register_push_token(device_id, f"token-{device_id}", "ios")
+    return service
+
+
+class TestSendNotification:
+    """Test delivery status reported by the task"""
+
+    @pytest.mark.asyncio
+    async def test_worker_uses_persisted_tokens(self, token_dir, worker_service):
+        """Test a worker with no in-memory registrations reaches devices registered through the API"""
+        await register_in_api(token_dir)
+        result = send_notification({**NOTIFICATION, "device_ids": ["D1", "D2"]})
+
+        assert result["status"] == "success"
+        assert result["sent"] == 2 and result["failed"] == 0
+        assert worker_service.push_tokens["D1"]["push_token"] == "token-D1"
+
+    @pytest.mark.asyncio
+    async def test_partial_delivery_reported(self, token_dir, worker_service):
+        """Test devices without a push token are reported instead of a blanket success"""
+        await register_in_api(token_dir)
+        result = send_notification({**NOTIFICATION, "device_ids": ["D1", "unknown"]})
+
+        assert result["status"] == "partial"
+        assert [r["status"] for r in result["results"]] == ["success", "failed"]
+
+    def test_no_reachable_device_fails(self, worker_service):
+        """Test nothing delivered is a failure"""
+        result = send_notification({**NOTIFICATION, "device_ids": ["unknown"]})
+
+        assert result["status"] == "failed"
+        assert result["sent"] == 0
@@ -0,0 +1,205 @@
+"""
+Test versioned change log and delta offline sync
+Tests compaction, paging, ConnectionManager sync requests and MobileAppService sessions
+"""
+
+import pytest
+import asyncio
+import json
+from unittest.mock import AsyncMock
+
+from fastapi import WebSocket
+
+from app.core.change_log import ChangeLog, TradeChangeLogHandler, sync_scope
+from app.core.event_bus import EventType, create_event
+from app.core.websocket_manager import ConnectionManager
+from app.services.mobile_app_service import MobileAppService
+
+
+class TestChangeLog:
+    """Test change log compaction and paging"""
+
+    def test_changes_are_compacted_per_entity(self):
+        """Test only the latest state of each entity is returned"""
+        log = ChangeLog()
+        for price in range(100):
+            log.record("user:u1", "positions", "POS-1", {"price": price})
+        log.record("user:u1", "trades", "T-1", {"status": "confirmed"})
+
+        changes = log.changes_since("user:u1", 0)
+
+        assert [c.entity_id for c in changes] == ["POS-1", "T-1"]
+        assert changes[0].data == {"price": 99}
+        assert log.current_version("user:u1") == 101
+
+    def test_delta_since_version(self):
+        """Test a client only receives changes after its last version"""
+        log = ChangeLog()
+        log.record("user:u1", "trades", "T-1", {"qty": 1})
+        seen = log.record("user:u1", "trades", "T-2", {"qty": 2})
+        log.record("user:u1", "trades", "T-3", {"qty": 3})
+        log.record("user:u1", "trades", "T-1", None, operation="delete")
+
+        page = log.get_page("user:u1", since_version=seen, epoch=log.epoch)
+
+        assert [(c["entity_id"], c["operation"]) for c in page["changes"]] == [("T-3", "upsert"), ("T-1", "delete")]
+        assert page["to_version"] == page["current_version"] == 4
+
+    def test_paging_until_caught_up(self):
+        """Test paged chunks cover the delta exactly once"""
+        log = ChangeLog()
+        for i in range(25):
+            log.record("organization:o1", "trades", f"T-{i}", {"i": i})
+
+        received, since, epoch = [], 0, None
+        while True:
+            page = log.get_page("organization:o1", since, limit=10, epoch=epoch)
+            received.extend(c["entity_id"] for c in page["changes"])
+            since, epoch = page["to_version"], page["epoch"]
+            if not page["has_more"]:
+                break
+
+        assert received == [f"T-{i}" for i in range(25)]
+
+    def test_paging_large_delta_with_updates(self):
+        """Test paging a large, repeatedly updated log returns each entity once, in version order"""
+        log = ChangeLog(max_entries_per_scope=40000)
+        for i in range(60000):
+            log.record("user:u1", "trades" if i % 3 else "positions", f"E-{i % 45000}", {"i": i})
+
+        versions, since, epoch = [], 0, None
+        while True:
+            page = log.get_page("user:u1", since, limit=50, entity_types=["trades"], epoch=epoch)
+            versions.extend(c["version"] for c in page["changes"])
+            since, epoch = page["to_version"], page["epoch"]
+            if not page["has_more"]:
+                break
+
+        expected = [c.version for c in log.changes_since("user:u1", 0, ["trades"])]
+        assert versions == expected == sorted(expected)
+        assert log.count_since("user:u1", 0, ["trades"]) == len(expected)
+        assert log.count_since("user:u1", 0) == 40000
+
+    def test_client_behind_compaction_floor_resyncs(self):
+        """Test eviction forces a full resync for stale clients"""
+        log = ChangeLog(max_entries_per_scope=3)
+        for i in range(5):
+            log.record("user:u1", "trades", f"T-{i}", {})
+
+        page = log.get_page("user:u1", since_version=1, epoch=log.epoch)
+
+        assert page["full_resync"]
+        assert page["from_version"] == 0
+        assert len(page["changes"]) == 3
+
+    def test_version_from_other_epoch_resyncs(self):
+        """Test a version issued by another worker's log is not read as a delta of this one"""
+        other, log = ChangeLog(), ChangeLog()
+        for i in range(3):
+            other.record("user:u1", "trades", f"T-{i}", {})
+        for i in range(5):
+            log.record("user:u1", "trades", f"P-{i}", {})
+
+        page = log.get_page("user:u1", since_version=3, epoch=other.epoch)
+
+        assert page["full_resync"] and page["from_version"] == 0
+        assert len(page["changes"]) == 5 and page["epoch"] == log.epoch
+
+    @pytest.mark.asyncio
+    async def test_trade_events_recorded(self):
+        """Test trade lifecycle events land in user and organization scopes"""
+        log = ChangeLog()
+        event = create_event(EventType.TRADE_CONFIRMED, {"trade_id": "T-9"}, user_id="u1", organization_id="o1")
+
+        await TradeChangeLogHandler(log).handle(event)
+
+        assert log.current_version(sync_scope("user", "u1")) == 1
+        assert log.changes_since(sync_scope("organization", "o1"), 0)[0].data["status"] == "trade_confirmed"
+
+    @pytest.mark.asyncio
+    async def test_positions_recorded_from_trades(self):
+        """Test captured trades update the net commodity position and cancellations reverse it"""
+        log = ChangeLog()
+        handler = TradeChangeLogHandler(log)
+        for trade_id, direction, quantity in (("T-1", "buy", 100), ("T-2", "sell", 30), ("T-3", "buy", 50)):
+            await handler.handle(create_event(EventType.TRADE_CAPTURED, {
+                "trade_id": trade_id,
+                "trade_data": {"commodity": "crude_oil", "trade_direction": direction, "quantity": quantity},
+            }, user_id="u1", organization_id="o1"))
+        await handler.handle(create_event(EventType.TRADE_CANCELLED, {"trade_id": "T-3"}, user_id="u1", organization_id="o1"))
+
+        for scope in (sync_scope("user", "u1"), sync_scope("organization", "o1")):
+            positions = log.changes_since(scope, 0, ["positions"])
+            assert [c.entity_id for c in positions] == ["crude_oil"]
+            assert positions[0].data["long_position"] == 100
+            assert positions[0].data["net_position"] == 70
+            assert positions[0].data["trade_count"] == 2
+
+
+class TestConnectionManagerSync:
+    """Test WebSocket delta sync protocol"""
+
+    @pytest.mark.asyncio
+    async def test_sync_request_returns_delta(self):
+        """Test sync_request answers with compacted changes after last_version"""
+        manager = ConnectionManager(sync_log=ChangeLog())
+        websocket = AsyncMock(spec=WebSocket)
+        connection_id = await manager.connect(websocket, "u1", "o1")
+        versions = await manager.record_change("trades", "T-1", {"qty": 5}, user_id="u1")
+        await manager.record_change("trades", "T-2", {"qty": 7}, user_id="u1")
+
+        await manager.handle_message(connection_id, json.dumps({
+            "type": "sync_request", "last_version": versions["user"], "sync_type": "trades",
+            "epoch": manager.change_log.epoch
+        }))
+
+        response = json.loads(websocket.send_text.call_args[0][0])
+        assert response["type"] == "sync_response"
+        assert [c["entity_id"] for c in response["changes"]] == ["T-2"]
+        assert response["current_version"] == 2
+
+    @pytest.mark.asyncio
+    async def test_offline_writes_applied_to_change_log(self):
+        """Test processed offline items become versioned changes"""
+        manager = ConnectionManager(sync_log=ChangeLog())
+        connection_id = await manager.connect(AsyncMock(spec=WebSocket), "u1", "o1")
+        await manager.handle_message(connection_id, json.dumps({
+            "type": "offline_data", "entity_type": "positions", "entity_id": "P-1", "payload": {"qty": 3}
+        }))
+
+        await manager.process_offline_queue("u1")
+
+        changes = manager.change_log.changes_since(sync_scope("user", "u1"), 0)
+        assert changes[0].entity_id == "P-1" and changes[0].data == {"qty": 3}
+
+
+class TestMobileDeltaSync:
+    """Test MobileAppService delta sync sessions"""
+
+    @pytest.mark.asyncio
+    async def test_sync_session_pages_and_acknowledges(self):
+        """Test session builds pages and last page advances the device version"""
+        log = ChangeLog()
+        service = MobileAppService(sync_log=log)
+        service.mobile_configs["sync_batch_size"] = 2
+        await service.register_mobile_device({
+            "device_id": "D1", "platform": "ios", "app_version": "1.0",
+            "device_model": "iPhone", "user_id": "u1"
+        })
+        for i in range(5):
+            log.record(sync_scope("user", "u1"), "trades", f"T-{i}", {"i": i})
+
+        result = await service.start_offline_sync("D1", {"data_types": ["trades"]})
+        session_id = result["session_id"]
+        for _ in range(50):
+            if service.sync_sessions["D1"]["status"] != "in_progress":
+                break
+            await asyncio.sleep(0.01)
+
+        status = service.sync_sessions["D1"]
+        assert status["status"] == "completed"
+        assert status["total_pages"] == 3 and status["synced_items"] == 5
+
+        last = await service.get_sync_page("D1", session_id, 2)
+        assert last["is_last"]
+        assert service.offline_data_cache["D1"]["last_version"] == 5
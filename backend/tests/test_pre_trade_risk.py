@@ -0,0 +1,89 @@
+"""
+Test pre-trade risk checks
+Tests reason codes from the risk, credit and compliance services and the bidirectional RiskCheck stream
+"""
+
+import time
+
+import pytest
+import grpc
+
+from app.services.pre_trade_risk import PreTradeRiskChecker
+
+from risk_service import RiskCheckService, risk_pb2, risk_pb2_grpc
+
+
+ORDER = {"order_id": "O1", "counterparty_id": "CP001", "commodity": "crude_oil", "quantity": 1000, "price": 80.0}
+
+
+async def start_server(checker: PreTradeRiskChecker):
+    """grpc.aio server on a free local port"""
+    server = grpc.aio.server()
+    risk_pb2_grpc.add_RiskCheckServicer_to_server(RiskCheckService(checker), server)
+    port = server.add_insecure_port("127.0.0.1:0")
+    await server.start()
+    return server, port
+
+
+class TestPreTradeRiskChecker:
+    """Test accept/reject decisions"""
+
+    @pytest.mark.asyncio
+    async def test_order_within_limits_accepted(self):
+        """Test a small order against a known counterparty is accepted"""
+        result = await PreTradeRiskChecker().check_order(ORDER)
+
+        assert result["accepted"]
+        assert result["reasons"] == []
+        assert result["risk_level"] == "low"
+        assert result["available_credit"] == 1000000.0
+
+    @pytest.mark.asyncio
+    async def test_credit_and_size_reasons(self):
+        """Test every failed check is reported"""
+        checker = PreTradeRiskChecker()
+
+        unknown = await checker.check_order({**ORDER, "counterparty_id": "CP999"})
+        oversized = await checker.check_order({**ORDER, "quantity": 200000})
+
+        assert unknown["reasons"] == ["NO_CREDIT_LIMIT"]
+        assert oversized["reasons"] == ["SIZE_LIMIT", "INSUFFICIENT_CREDIT", "POSITION_LIMIT"]
+        assert checker.get_stats()["rejected"] == 2
+
+    @pytest.mark.asyncio
+    async def test_concentration_and_invalid_order(self):
+        """Test portfolio concentration and malformed orders are rejected"""
+        checker = PreTradeRiskChecker()
+
+        concentrated = await checker.check_order({**ORDER, "portfolio_value": 100000})
+        invalid = await checker.check_order({**ORDER, "quantity": 0})
+
+        assert concentrated["reasons"] == ["CONCENTRATION_LIMIT"]
+        assert invalid["reasons"] == ["INVALID_ORDER"]
+
+
+class TestRiskCheckService:
+    """Test the bidirectional gRPC stream"""
+
+    @pytest.mark.asyncio
+    async def test_stream_returns_results_in_order(self):
+        """Test one long-lived stream checks many orders and reports each order's server-side latency"""
+        server, port = await start_server(PreTradeRiskChecker())
+        orders = [
+            risk_pb2.OrderCheck(**{**ORDER, "order_id": f"O{i}", "counterparty_id": "CP001" if i % 2 else "CP999"})
+            for i in range(200)
+        ]
+        try:
+            async with grpc.aio.insecure_channel(f"127.0.0.1:{port}") as channel:
+                started = time.perf_counter()
+                call = risk_pb2_grpc.RiskCheckStub(channel).CheckOrders(iter(orders))
+                results = [result async for result in call]
+                elapsed_us = (time.perf_counter() - started) * 1_000_000
+        finally:
+            await server.stop(None)
+
+        assert [result.order_id for result in results] == [order.order_id for order in orders]
+        assert all(result.accepted for result in results[1::2])
+        assert list(results[0].reasons) == [risk_pb2.NO_CREDIT_LIMIT]
+        # Wall-clock bounds are left to benchmarks; each check is timed inside the stream's span
+        assert max(result.latency_us for result in results) <= elapsed_us
@@ -0,0 +1,149 @@
+"""
+Test rate limit engine
+Tests local GCRA decisions, lease pre-check and Redis fallback
+"""
+
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from app.middleware.rate_limit_engine import GCRA_LUA, LocalGCRABackend, RateLimitEngine, RedisGCRABackend
+
+
+class TestLocalGCRABackend:
+    """Test in-process GCRA backend"""
+
+    def test_burst_up_to_limit_then_denied(self):
+        """Test a fresh key admits exactly the limit within one window"""
+        backend = LocalGCRABackend()
+        results = [backend.acquire("client", 10, 60, now=1000.0) for _ in range(11)]
+
+        assert all(granted == 1 for granted, *_ in results[:10])
+        assert results[9][1] == 0
+        granted, remaining, retry_after, _ = results[10]
+        assert granted == 0
+        assert retry_after == pytest.approx(6.0)
+
+    def test_tokens_replenish_at_emission_rate(self):
+        """Test one token returns after one emission interval"""
+        backend = LocalGCRABackend()
+        for _ in range(10):
+            backend.acquire("client", 10, 60, now=1000.0)
+
+        assert backend.acquire("client", 10, 60, now=1005.0)[0] == 0
+        assert backend.acquire("client", 10, 60, now=1006.0)[0] == 1
+
+    def test_memory_bounded_and_pruned(self):
+        """Test key count is bounded and idle keys are pruned"""
+        backend = LocalGCRABackend(max_keys=3)
+        for index in range(5):
+            backend.acquire(f"client-{index}", 10, 60, now=1000.0)
+
+        assert len(backend) == 3
+        assert backend.prune(now=2000.0) == 3
+        assert len(backend) == 0
+
+
+class TestRateLimitEngine:
+    """Test engine lease pre-check and fallback"""
+
+    @pytest.mark.asyncio
+    async def test_memory_engine_enforces_limit(self):
+        """Test engine without Redis uses the local backend"""
+        engine = RateLimitEngine()
+        results = [await engine.check("client", 5, 60) for _ in range(6)]
+
+        assert [result["allowed"] for result in results] == [True] * 5 + [False]
+        assert results[4]["remaining"] == 0
+        assert engine.get_stats()["backend"] == "memory"
+
+    @pytest.mark.asyncio
+    async def test_lease_serves_requests_without_redis(self):
+        """Test leased tokens are consumed locally"""
+        engine = RateLimitEngine()
+        engine.redis = AsyncMock()
+        engine.redis.acquire = AsyncMock(return_value=(5, 95, 0.0, 2000.0))
+
+        results = [await engine.check("client", 100, 60) for _ in range(5)]
+
+        assert engine.redis.acquire.await_count == 1
+        assert engine.redis.acquire.await_args[0][3] == engine.lease_size(100) == 5
+        assert [result["remaining"] for result in results] == [99, 98, 97, 96, 95]
+        assert engine.stats["local_hits"] == 4
+
+        await engine.check("client", 100, 60)
+        assert engine.redis.acquire.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_redis_error_falls_back_to_local(self):
+        """Test Redis failure falls back to memory and backs off"""
+        engine = RateLimitEngine(redis_retry_interval=60)
+        engine.redis = AsyncMock()
+        engine.redis.acquire = AsyncMock(side_effect=ConnectionError("down"))
+
+        first = await engine.check("client", 10, 60)
+        second = await engine.check("client", 10, 60)
+
+        assert first["allowed"] and second["allowed"]
+        assert engine.redis.acquire.await_count == 1
+        assert engine.stats["local_fallbacks"] == 1
+        assert not engine.redis_active
+
+
+def fake_redis_backend() -> RedisGCRABackend:
+    """Redis backend running the real GCRA script on fakeredis"""
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    backend = RedisGCRABackend.__new__(RedisGCRABackend)
+    backend.client = fakeredis.FakeAsyncRedis()
+    backend.pool = backend.client.connection_pool
+    backend.script = backend.client.register_script(GCRA_LUA)
+    return backend
+
+
+class TestRedisGCRAScript:
+    """Test the Lua script against fakeredis"""
+
+    @pytest.mark.asyncio
+    async def test_burst_then_denied_with_retry_after(self):
+        """Test the script grants up to the limit, then denies until one emission interval passes"""
+        backend = fake_redis_backend()
+
+        granted = [(await backend.acquire("key", 10, 60, 4, now=1000.0))[0] for _ in range(3)]
+        denied = await backend.acquire("key", 10, 60, 1, now=1000.0)
+        later = await backend.acquire("key", 10, 60, 1, now=1006.0)
+
+        assert granted == [4, 4, 2]
+        assert denied[0] == 0 and denied[2] == pytest.approx(6.0)
+        assert later[0] == 1
+
+    @pytest.mark.asyncio
+    async def test_refund_returns_tokens(self):
+        """Test refunded tokens are available again and never beyond a full bucket"""
+        backend = fake_redis_backend()
+
+        await backend.acquire("key", 10, 60, 10, now=1000.0)
+        assert (await backend.acquire("key", 10, 60, 1, now=1000.0))[0] == 0
+        granted, remaining, _, _ = await backend.acquire("key", 10, 60, 10, now=1000.0, refund=3)
+        assert (granted, remaining) == (3, 0)
+
+        granted, remaining, _, _ = await backend.acquire("other", 10, 60, 1, now=1000.0, refund=5)
+        assert (granted, remaining) == (1, 9)
+
+    @pytest.mark.asyncio
+    async def test_leases_admit_as_many_as_plain_gcra(self):
+        """Test a slow client behind leases is admitted exactly as often as without leasing"""
+        engine = RateLimitEngine()
+        engine.redis = fake_redis_backend()
+        reference = LocalGCRABackend()
+        clock = [1000.0]
+
+        admitted, expected = [], []
+        with patch("app.middleware.rate_limit_engine.time.time", side_effect=lambda: clock[0]):
+            for _ in range(200):
+                admitted.append((await engine.check("client", 100, 3600))["allowed"])
+                expected.append(reference.acquire("client", 100, 3600, now=clock[0])[0] > 0)
+                clock[0] += 10
+
+        assert admitted == expected
+        assert admitted.index(False) > 100
+        assert engine.stats["refunded"] > 0
@@ -0,0 +1,231 @@
+"""
+Test request inspection engine
+Tests single-pass rule evaluation, field attribution, size cap and the security middleware wiring
+"""
+
+import re
+import json
+import pytest
+import httpx
+from fastapi import FastAPI, Request
+
+from app.core import request_inspection
+from app.core.request_inspection import RequestInspector
+from app.core.security_audit import SecurityAuditor, SecurityMiddleware as AuditMiddleware
+from app.middleware.security import SecurityMiddleware, security_middleware, security_middleware_func
+
+
+RULES = {
+    "sql_injection": [r"(\b(SELECT|UNION|DROP)\b)", r"(\b(OR|AND)\s+\d+\s*=\s*\d+)"],
+    "xss": [r"<script[^>]*>.*?</script>", r"on\w+\s*="],
+    "path_traversal": [r"\.\./", r"\.\.%2f"],
+    "command_injection": [r"[;&|`$]"],
+}
+
+
+def trade_payload(size: int = 64 * 1024) -> str:
+    """Benign JSON trade batch of roughly the given size"""
+    trades = []
+    while len(json.dumps(trades)) < size:
+        trades.append({
+            "trade_id": f"T{len(trades)}",
+            "commodity": "crude_oil",
+            "quantity": 1000.5,
+            "price": 80.1,
+            "counterparty": "ACME Energy",
+        })
+    return json.dumps(trades)
+
+
+async def post(app: FastAPI, url: str, content: bytes, headers: dict = None) -> httpx.Response:
+    """POST to an ASGI app in-process"""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.post(url, content=content, headers=headers)
+
+
+class TestRequestInspector:
+    """Test compiled inspection engine"""
+
+    def test_matches_same_rules_as_individual_patterns(self):
+        """Test engine reports exactly the rules re.search would"""
+        inspector = RequestInspector(RULES)
+        samples = [
+            "SELECT * FROM users WHERE id = 1 OR 1=1",
+            "<SCRIPT>alert(1)</SCRIPT>",
+            "../../etc/passwd",
+            "..%2F..%2Fetc",
+            "name; rm -rf /",
+            "img onerror = x",
+            "Hello, World!",
+            trade_payload(4096),
+        ]
+
+        for sample in samples:
+            expected = sorted(
+                f"{family}: {pattern}"
+                for family, patterns in RULES.items()
+                for pattern in patterns
+                if re.search(pattern, sample, re.IGNORECASE)
+            )
+            assert sorted(rule.label for rule in inspector.scan(sample)) == expected
+
+    def test_hits_attributed_to_fields(self):
+        """Test one pass attributes matches to the field they occur in"""
+        inspector = RequestInspector(RULES)
+        report = inspector.scan_fields([
+            ("query param q", "1 UNION SELECT password"),
+            ("user-agent", "Mozilla/5.0"),
+            ("request body", '{"path": "../../secret"}'),
+        ])
+
+        assert report.families("query param q") == ["sql_injection"]
+        assert "user-agent" not in report.hits
+        assert report.families("request body") == ["path_traversal"]
+
+    @pytest.mark.parametrize("max_probes", [request_inspection._MAX_ANCHOR_PROBES, 0])
+    def test_match_does_not_cross_fields(self, monkeypatch, max_probes):
+        """Test a pattern is not matched across the boundary between two fields, probed or searched"""
+        monkeypatch.setattr(request_inspection, "_MAX_ANCHOR_PROBES", max_probes)
+        inspector = RequestInspector({"sql_injection": [r"(\b(OR|AND)\s+true)"]})
+
+        report = inspector.scan_fields([("query param q", "abc or"), ("x-flag", "true")])
+        assert report.clean
+
+        report = inspector.scan_fields([("query param q", "abc or"), ("x-flag", "1 or true")])
+        assert list(report.hits) == ["x-flag"]
+
+    def test_scan_size_capped(self):
+        """Test content beyond the size cap is not inspected"""
+        inspector = RequestInspector(RULES, max_scan_size=1024)
+        report = inspector.scan_fields([("request body", "a" * 2048 + " DROP table")])
+
+        assert report.clean
+        assert report.truncated
+        assert report.scanned == 1024
+
+    def test_per_rule_hit_counters(self):
+        """Test hit counters count requests per rule"""
+        inspector = RequestInspector(RULES)
+        inspector.scan("../a")
+        inspector.scan_fields([("a", "../b"), ("b", "../c")])
+        inspector.scan(trade_payload(1024))
+
+        stats = inspector.get_stats()
+        assert stats["scans"] == 3
+        assert stats["rule_hits"] == {r"path_traversal: \.\./": 2}
+
+
+class TestSecurityMiddlewareInspection:
+    """Test middleware and auditor wiring"""
+
+    @pytest.mark.asyncio
+    async def test_inspect_request_groups_issues(self):
+        """Test query, header and body issues come from a single inspection"""
+        middleware = SecurityMiddleware()
+        app = FastAPI()
+        captured = {}
+
+        @app.post("/trades")
+        async def create_trade(request: Request):
+            body = await middleware.read_body(request)
+            captured.update(middleware.inspect_request(request, body))
+            return {"received": len(await request.body())}
+
+        response = await post(
+            app,
+            "/trades?q=1%20UNION%20SELECT",
+            content=b'{"note": "<script>alert(1)</script>"}',
+            headers={"X-Custom": "../../etc/passwd"},
+        )
+
+        assert response.status_code == 200
+        assert captured["query_params"] and "sql_injection" in captured["query_params"][0]
+        assert any("path_traversal" in issue for issue in captured["headers"])
+        assert any("xss" in issue for issue in captured["body"])
+
+    @pytest.mark.asyncio
+    async def test_benign_trade_payload_clean(self):
+        """Test a 64KB trade batch raises no body issues"""
+        middleware = SecurityMiddleware()
+        app = FastAPI()
+        captured = {}
+
+        @app.post("/trades")
+        async def create_trade(request: Request):
+            body = await middleware.read_body(request)
+            captured.update(middleware.inspect_request(request, body))
+            return {}
+
+        await post(app, "/trades", trade_payload().encode())
+
+        assert captured["body"] == []
+
+    @pytest.mark.asyncio
+    async def test_binary_body_not_pattern_inspected(self):
+        """Test only text bodies are pattern inspected, judged by content type"""
+        middleware = SecurityMiddleware()
+        app = FastAPI()
+        captured = []
+
+        @app.post("/upload")
+        async def upload(request: Request):
+            body = await middleware.read_body(request)
+            captured.append(middleware.inspect_request(request, body)["body"])
+            return {}
+
+        content = b"<script>alert(1)</script> UNION SELECT"
+        await post(app, "/upload", content, headers={"Content-Type": "application/octet-stream"})
+        await post(app, "/upload", content, headers={"Content-Type": "application/json; charset=utf-8"})
+        await post(app, "/upload", content, headers={"Content-Type": "application/vnd.api+json"})
+
+        assert captured[0] == []
+        assert captured[1] and captured[2]
+
+    @pytest.mark.asyncio
+    async def test_http_middleware_inspects_and_replays_body(self):
+        """Test middleware flags a malicious body and the endpoint still receives it"""
+        app = FastAPI()
+        app.middleware("http")(security_middleware_func)
+
+        @app.post("/trades")
+        async def create_trade(request: Request):
+            return {"body": (await request.body()).decode()}
+
+        security_middleware.suspicious_requests.clear()
+        try:
+            response = await post(app, "/trades", b"<script>alert(1)</script>")
+            reasons = [
+                entry["details"]["reason"]
+                for entries in security_middleware.suspicious_requests.values()
+                for entry in entries
+            ]
+        finally:
+            security_middleware.suspicious_requests.clear()
+
+        assert response.json() == {"body": "<script>alert(1)</script>"}
+        assert "suspicious_body" in reasons
+
+    @pytest.mark.asyncio
+    async def test_auditor_reports_body_and_query(self):
+        """Test auditor reads the body once and reports per location"""
+        auditor = SecurityAuditor()
+        app = FastAPI()
+        results = {}
+
+        @app.post("/trades")
+        async def create_trade(request: Request):
+            results["audit"] = request.scope["security_audit"]
+            return {"body": (await request.body()).decode()}
+
+        app.add_middleware(AuditMiddleware)
+        response = await post(app, "/trades?cmd=system", b"1 UNION SELECT 2")
+
+        vulnerabilities = {(v["type"], v["parameter"]) for v in results["audit"]["vulnerabilities"]}
+        assert ("sql_injection", "request_body") in vulnerabilities
+        assert ("command_injection", "cmd") in vulnerabilities
+        # Body was replayed to the endpoint after the audit consumed it
+        assert response.json() == {"body": "1 UNION SELECT 2"}
+        assert auditor.inspector.get_stats()["rules"] == len(
+            [p for patterns in auditor.vulnerability_db.values() for p in patterns]
+        )
@@ -0,0 +1,173 @@
+"""
+Test request pipeline middleware
+Tests shared request context, single token verification, rate limiting, body replay and stage timings
+"""
+
+import pytest
+import httpx
+from unittest.mock import patch
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from prometheus_client import REGISTRY
+
+from app.core.jwt_auth import JWTAuthManager
+from app.middleware.pipeline import RequestPipeline, get_request_context
+from app.middleware.rate_limit_engine import RateLimitEngine
+from app.middleware.security import SecurityMiddleware
+
+
+USER = {"user_id": "trader_001", "username": "trader", "role": "trader"}
+
+
+def pipeline_app(**options) -> FastAPI:
+    """App echoing the pipeline context and body"""
+    app = FastAPI()
+
+    @app.post("/trades")
+    async def create_trade(request: Request):
+        context = get_request_context(request)
+        return {
+            "client_id": context.client_id,
+            "user_id": context.user_id,
+            "body": (await request.body()).decode(),
+            "stages": sorted(context.timings),
+        }
+
+    options.setdefault("auth", JWTAuthManager())
+    options.setdefault("engine", RateLimitEngine())
+    options.setdefault("security", SecurityMiddleware())
+    app.add_middleware(RequestPipeline, **options)
+    return app
+
+
+async def post(app: FastAPI, url: str, content: bytes = b"", headers: dict = None) -> httpx.Response:
+    """POST to an ASGI app in-process"""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.post(url, content=content, headers=headers)
+
+
+class TestRequestPipeline:
+    """Test single-hop middleware pipeline"""
+
+    @pytest.mark.asyncio
+    async def test_context_shared_with_endpoint(self):
+        """Test identity and claims resolved by the pipeline reach the endpoint"""
+        auth = JWTAuthManager()
+        token = auth.create_access_token(USER)
+        app = pipeline_app(auth=auth)
+
+        with patch.object(auth, "verify_token", wraps=auth.verify_token) as verify:
+            response = await post(app, "/trades", b'{"quantity": 10}', {"Authorization": f"Bearer {token}"})
+
+        assert response.status_code == 200
+        assert verify.call_count == 1
+        assert response.json() == {
+            "client_id": "user:trader_001",
+            "user_id": "trader_001",
+            "body": '{"quantity": 10}',
+            "stages": ["auth", "identity", "rate_limit", "security"],
+        }
+        assert response.headers["X-RateLimit-Limit"] == "100"
+        assert response.headers["X-Content-Type-Options"] == "nosniff"
+
+    @pytest.mark.asyncio
+    async def test_invalid_token_falls_back_to_ip(self):
+        """Test a bad token is not rejected by the pipeline but not trusted either"""
+        response = await post(pipeline_app(), "/trades", headers={"Authorization": "Bearer not-a-jwt"})
+
+        assert response.status_code == 200
+        assert response.json()["client_id"].startswith("ip:")
+        assert response.json()["user_id"] is None
+
+    @pytest.mark.asyncio
+    async def test_rate_limit_rejects_before_app(self):
+        """Test requests over the limit get 429 and skip the security stage"""
+        completed = []
+        app = pipeline_app(requests_per_minute=2, on_complete=lambda context, code: completed.append((context, code)))
+
+        codes = [(await post(app, "/trades")).status_code for _ in range(3)]
+
+        assert codes == [200, 200, 429]
+        context, code = completed[-1]
+        assert code == 429
+        assert context.rejected_by == "rate_limit"
+        assert "security" not in context.timings
+
+    @pytest.mark.asyncio
+    async def test_malicious_body_flagged_and_replayed(self):
+        """Test the body is read once for inspection and still reaches the endpoint"""
+        security = SecurityMiddleware()
+        app = pipeline_app(security=security)
+
+        response = await post(app, "/trades", b"<script>alert(1)</script>")
+
+        assert response.json()["body"] == "<script>alert(1)</script>"
+        reasons = [
+            entry["details"]["reason"]
+            for entries in security.suspicious_requests.values()
+            for entry in entries
+        ]
+        assert "suspicious_body" in reasons
+
+    @pytest.mark.asyncio
+    async def test_oversized_body_rejected(self):
+        """Test a streamed body over the size limit is rejected"""
+        security = SecurityMiddleware()
+        security.config['max_request_size'] = 1024
+        app = pipeline_app(security=security)
+
+        async def chunks():
+            for _ in range(4):
+                yield b"x" * 512
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post("/trades", content=chunks())
+
+        assert response.status_code == 413
+
+    @pytest.mark.asyncio
+    async def test_stage_histogram_exported(self):
+        """Test each stage observes the latency histogram"""
+        before = REGISTRY.get_sample_value("middleware_stage_duration_seconds_count", {"stage": "security"}) or 0
+
+        await post(pipeline_app(), "/trades")
+
+        after = REGISTRY.get_sample_value("middleware_stage_duration_seconds_count", {"stage": "security"})
+        assert after == before + 1
+
+    @pytest.mark.asyncio
+    async def test_normal_traffic_never_blocked(self):
+        """Test ordinary browser and tooling requests well past the suspicious threshold are not blocked"""
+        security = SecurityMiddleware()
+        app = pipeline_app(security=security, rate_limiting=False)
+        headers = {
+            "Accept": "*/*",
+            "Accept-Language": "en-GB,en;q=0.9",
+            "Cache-Control": "no-cache",
+            "User-Agent": "curl/8.5.0",
+            "Content-Type": "application/json",
+        }
+
+        codes = [
+            (await post(app, "/trades", b'{"quantity": 10}', headers)).status_code
+            for _ in range(security.config['max_suspicious_requests'] * 3)
+        ]
+
+        assert set(codes) == {200}
+        assert security.suspicious_requests == {}
+        assert security.blocked_ips == {}
+
+    @pytest.mark.asyncio
+    async def test_rejections_carry_cors_headers(self):
+        """Test early rejections still get CORS headers when the pipeline sits inside CORSMiddleware"""
+        app = pipeline_app(requests_per_minute=1)
+        app.add_middleware(CORSMiddleware, allow_origins=["https://app.example"], allow_methods=["*"], allow_headers=["*"])
+        headers = {"Origin": "https://app.example"}
+
+        await post(app, "/trades", headers=headers)
+        response = await post(app, "/trades", headers=headers)
+
+        assert response.status_code == 429
+        assert response.headers["access-control-allow-origin"] == "https://app.example"
@@ -0,0 +1,191 @@
+"""
+Test chunked portfolio risk tasks
+Tests the book-split chord in eager mode, the binary task serializer and claim-check via the blob store
+"""
+
+import os
+import json
+import pytest
+import numpy as np
+
+from app.core.blob_store import blob_store
+from app.core.celery_app import celery_app, calculate_risk_async
+from app.core.task_serialization import SERIALIZER_NAME, TaskPayloadSerializer, task_serializer
+from app.tasks.risk_calculation import build_portfolio_risk_workflow, calculate_portfolio_risk, split_by_book
+
+
+def make_portfolio(count: int):
+    """Positions spread over three books and two commodities"""
+    return {
+        "positions": [
+            {
+                "position_id": f"P{i}",
+                "book": f"book_{i % 3}",
+                "commodity": "crude_oil" if i % 2 else "natural_gas",
+                "notional_value": 1000.0 * (i + 1) * (-1 if i % 5 == 0 else 1),
+                "volatility": 0.25,
+            }
+            for i in range(count)
+        ],
+        "correlations": {"crude_oil": {"natural_gas": 0.4}},
+    }
+
+
+@pytest.fixture(autouse=True)
+def eager_blob_store(tmp_path, monkeypatch):
+    """Run tasks in-process against a temporary blob directory"""
+    monkeypatch.setattr(blob_store, "root", str(tmp_path))
+    monkeypatch.setattr(celery_app.conf, "task_always_eager", True)
+    yield tmp_path
+
+
+def stored_blobs(root):
+    return [name for _, _, files in os.walk(root) for name in files]
+
+
+class TestSplitByBook:
+    """Test chunking of positions"""
+
+    def test_books_are_split_into_chunks(self):
+        """Test positions are grouped by book and large books are chunked"""
+        chunks = split_by_book(make_portfolio(10)["positions"], chunk_size=2)
+
+        assert [book for book, _ in chunks] == ["book_0"] * 2 + ["book_1"] * 2 + ["book_2"] * 2
+        assert sum(len(chunk) for _, chunk in chunks) == 10
+        assert all(len(chunk) <= 2 for _, chunk in chunks)
+
+
+class TestPortfolioRiskChord:
+    """Test the chunked VaR and stress workflow"""
+
+    def test_chunked_result_matches_single_chunk(self, eager_blob_store):
+        """Test splitting a portfolio does not change portfolio VaR or stress totals"""
+        portfolio = make_portfolio(30)
+        stress = [{"name": "Oil Shock", "market_shocks": {"crude_oil": 0.7}}]
+
+        chunked = calculate_portfolio_risk.delay(
+            portfolio, num_simulations=2000, stress_scenarios=stress, chunk_size=4, seed=7
+        ).get()
+        whole = calculate_portfolio_risk.delay(
+            portfolio, num_simulations=2000, stress_scenarios=stress, chunk_size=1000, seed=7
+        ).get()
+
+        assert chunked["chunks"] == 9
+        assert whole["chunks"] == 3
+        assert chunked["var_value"] == pytest.approx(whole["var_value"])
+        assert chunked["expected_shortfall"] == pytest.approx(whole["expected_shortfall"])
+        assert chunked["stress_results"]["scenarios"] == pytest.approx(whole["stress_results"]["scenarios"])
+        assert set(chunked["books"]) == {"book_0", "book_1", "book_2"}
+        assert sum(book["positions"] for book in chunked["books"].values()) == 30
+        assert chunked["var_value"] < 0
+        assert chunked["expected_shortfall"] <= chunked["var_value"]
+
+    def test_blobs_cleaned_up(self, eager_blob_store):
+        """Test scenario and P&L arrays are removed once aggregated"""
+        calculate_portfolio_risk.delay(make_portfolio(12), num_simulations=500, chunk_size=2).get()
+
+        assert stored_blobs(eager_blob_store) == []
+
+    def test_failed_chord_discards_blobs(self, eager_blob_store):
+        """Test the reduce step's error callback removes the scenario and every chunk's P&L array"""
+        workflow = build_portfolio_risk_workflow(make_portfolio(6), num_simulations=200, chunk_size=2)
+        # One chunk completes, then the chord fails before the reduce step deletes anything
+        workflow.tasks[0].apply().get()
+        assert len(stored_blobs(eager_blob_store)) == 2
+
+        errbacks = workflow.body.options["link_error"]
+        for errback in errbacks:
+            celery_app.signature(errback).apply()
+
+        assert len(errbacks) == 1
+        assert stored_blobs(eager_blob_store) == []
+
+    def test_no_positions_skipped(self):
+        """Test the scheduled run without a portfolio is a no-op"""
+        assert calculate_portfolio_risk.delay().get()["status"] == "skipped"
+
+    def test_legacy_task_delegates(self):
+        """Test calculate_risk_async runs the chunked workflow"""
+        result = calculate_risk_async.delay(make_portfolio(6)).get()
+
+        assert result["status"] == "success"
+        assert result["method"] == "monte_carlo"
+
+
+class TestTaskPayloadSerializer:
+    """Test the binary Celery serializer"""
+
+    def test_arrays_round_trip_as_buffers(self):
+        """Test arrays keep dtype and shape and the frame is far smaller than JSON"""
+        serializer = TaskPayloadSerializer(claim_check_bytes=0)
+        matrix = np.round(np.random.default_rng(1).normal(size=(500, 40)), 2)
+        payload = {"factors": ["crude_oil"], "scenario_returns": matrix, "mask": np.array([True, False]), "n": np.int64(3)}
+
+        encoded = serializer.dumps(payload)
+        decoded = serializer.loads(encoded)
+
+        assert np.array_equal(decoded["scenario_returns"], matrix)
+        assert decoded["mask"].dtype == bool
+        assert decoded["n"] == 3
+        assert len(encoded) < len(json.dumps(matrix.tolist())) / 2
+        assert serializer.get_stats()["compressed"] == 1
+
+    def test_large_payload_claim_checked(self, eager_blob_store):
+        """Test payloads above the threshold travel as a blob key"""
+        serializer = TaskPayloadSerializer(claim_check_bytes=1024)
+        matrix = np.arange(10000, dtype=np.float64).reshape(100, 100)
+
+        encoded = serializer.dumps({"matrix": matrix})
+        keys = serializer.claim_check_keys(encoded)
+
+        assert len(encoded) < 100
+        assert len(keys) == 1 and stored_blobs(eager_blob_store)
+        assert np.array_equal(serializer.loads(encoded)["matrix"], matrix)
+
+    @pytest.mark.parametrize("state, kept", [("SUCCESS", False), ("RETRY", True)])
+    def test_claim_check_deleted_after_success(self, eager_blob_store, monkeypatch, state, kept):
+        """Test a worker deletes the payload blob once its task succeeded and keeps it for a retry"""
+        from celery.signals import task_postrun, task_prerun
+
+        monkeypatch.setattr(task_serializer, "claim_check_bytes", 1024)
+        encoded = task_serializer.dumps({"matrix": np.ones((100, 100))})
+
+        # A worker decodes the message, then runs the task on the same thread
+        task_serializer.loads(encoded)
+        task_prerun.send(sender=None, task_id="task-1", task=None, args=(), kwargs={})
+        task_postrun.send(sender=None, task_id="task-1", task=None, args=(), kwargs={}, retval=None, state=state)
+
+        assert bool(stored_blobs(eager_blob_store)) == kept
+
+    def test_claim_check_deleted_after_failure(self, eager_blob_store, monkeypatch):
+        """Test a failed task's payload blob is deleted, since the acked message is not redelivered"""
+        from celery.signals import task_failure, task_postrun, task_prerun
+
+        monkeypatch.setattr(task_serializer, "claim_check_bytes", 1024)
+        encoded = task_serializer.dumps({"matrix": np.ones((100, 100))})
+
+        task_serializer.loads(encoded)
+        task_prerun.send(sender=None, task_id="task-1", task=None, args=(), kwargs={})
+        task_failure.send(sender=None, task_id="task-1", exception=ValueError("bad book"), args=(), kwargs={})
+        task_postrun.send(sender=None, task_id="task-1", task=None, args=(), kwargs={}, retval=None, state="FAILURE")
+
+        assert stored_blobs(eager_blob_store) == []
+
+    def test_registered_with_celery(self):
+        """Test tasks and results use the binary serializer"""
+        assert celery_app.conf.task_serializer == SERIALIZER_NAME
+        assert celery_app.conf.result_serializer == SERIALIZER_NAME
+
+    def test_supplied_scenarios_used(self):
+        """Test a caller-supplied scenario matrix drives the VaR"""
+        returns = np.linspace(-0.1, 0.1, 1001).reshape(-1, 1)
+        portfolio = {
+            "positions": [{"book": "a", "commodity": "crude_oil", "notional_value": 1000.0}],
+            "factors": ["crude_oil"],
+            "scenario_returns": returns,
+        }
+
+        result = calculate_portfolio_risk.delay(portfolio, confidence_level=0.95).get()
+
+        assert result["num_simulations"] == 1001
+        assert result["var_value"] == pytest.approx(-90.0)
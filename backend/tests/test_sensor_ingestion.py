@@ -0,0 +1,177 @@
+"""
+Test sensor ingestion
+Tests columnar ring buffers, vectorized range validation, incremental rollups and serving grid data from memory
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+import sys
+import os
+
+# Add shared services to path for imports
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'shared', 'services'))
+
+from sensor_ingestion import NANOS, ColumnRing, SensorIngestion
+from iot_integration_service import DataQuality, IoTIntegrationService, SensorData, SensorType
+
+CONFIGS = {
+    "grid_voltage": {"unit": "V", "min_value": 200, "max_value": 250},
+    "grid_frequency": {"unit": "Hz", "min_value": 49.5, "max_value": 50.5},
+}
+START = pd.Timestamp("2026-03-01T12:00:00").value
+
+
+@pytest.fixture
+def ingestion():
+    return SensorIngestion(CONFIGS, capacity=1000, rollup_capacity=1000, batch_size=3)
+
+
+class TestBuffers:
+    """Test raw storage and validation"""
+
+    def test_ring_keeps_newest_in_order(self):
+        """Test the ring overwrites the oldest rows and reads back oldest first"""
+        ring = ColumnRing(4, {"timestamp": np.int64})
+        ring.append(timestamp=np.arange(3))
+        ring.append(timestamp=np.arange(3, 6))
+
+        assert ring.to_arrays()["timestamp"].tolist() == [2, 3, 4, 5]
+        ring.append(timestamp=np.arange(6, 16))
+        assert ring.to_arrays()["timestamp"].tolist() == [12, 13, 14, 15]
+
+    def test_out_of_range_rejected(self, ingestion):
+        """Test readings outside the configured range or not finite are dropped"""
+        result = ingestion.ingest("grid_voltage", ["a"] * 4, [230.0, 260.0, np.nan, 199.0], START + np.arange(4))
+
+        assert result == {"accepted": 1, "rejected": 3}
+        assert ingestion.readings("grid_voltage")["value"].tolist() == [230.0]
+        with pytest.raises(ValueError):
+            ingestion.ingest("pressure", ["a"], [1.0])
+
+    def test_unissued_site_codes_rejected(self, ingestion):
+        """Test integer site codes must already have been issued"""
+        ingestion.ingest("grid_voltage", ["a", "b"], [230.0, 231.0], START + np.arange(2))
+        ingestion.ingest("grid_voltage", np.array([1, 0]), [232.0, 233.0], START + np.arange(2, 4))
+
+        for codes in ([0, 2], [-1, 1]):
+            with pytest.raises(ValueError):
+                ingestion.ingest("grid_voltage", np.array(codes), [230.0, 230.0], START + np.arange(2))
+        assert len(ingestion.readings("grid_voltage")["value"]) == 4
+
+    def test_latest_per_site(self, ingestion):
+        """Test the latest reading is tracked per site regardless of arrival order"""
+        ingestion.ingest("grid_voltage", ["a", "b", "a"], [231.0, 232.0, 229.0], [START + 5, START, START + 1])
+
+        assert ingestion.latest("grid_voltage", "a")["value"] == 231.0
+        assert ingestion.latest("grid_voltage", "b")["value"] == 232.0
+        assert ingestion.latest("grid_voltage", "c") is None
+
+    def test_submit_batches(self, ingestion):
+        """Test single readings are ingested once a batch is pending, or on read"""
+        ingestion.submit("grid_voltage", "a", 230.0, START)
+        ingestion.submit("grid_voltage", "a", 231.0, START + NANOS)
+        assert ingestion.get_stats()["pending"] == 2
+
+        ingestion.submit("grid_frequency", "a", 50.0, START)
+        assert ingestion.get_stats()["pending"] == 0
+        ingestion.submit("grid_voltage", "a", 232.0, START + 2 * NANOS)
+        assert ingestion.latest("grid_voltage", "a")["value"] == 232.0
+
+    def test_malformed_submission_rejected_alone(self):
+        """Test a malformed queued value is rejected without losing the rest of the batch"""
+        ingestion = SensorIngestion(CONFIGS, capacity=1000, rollup_capacity=1000, batch_size=100)
+        for offset, value in enumerate([230.0, 231.0, "n/a", 232.0, {"v": 1}, "233.5"]):
+            ingestion.submit("grid_voltage", "a", value, START + offset)
+
+        assert ingestion.flush() == {"accepted": 4, "rejected": 2}
+        assert ingestion.readings("grid_voltage")["value"].tolist() == [230.0, 231.0, 232.0, 233.5]
+
+    def test_records_grouped_by_type(self, ingestion):
+        """Test per-message dicts are grouped into columnar batches; unknown types are rejected"""
+        result = ingestion.ingest_records([
+            {"sensor_type": "grid_voltage", "site": "a", "value": 230.0, "timestamp": "2026-03-01T12:00:00"},
+            {"sensor_type": "grid_frequency", "site": "a", "value": 50.1, "timestamp": None},
+            {"sensor_type": "pressure", "site": "a", "value": 1.0, "timestamp": None},
+        ])
+
+        assert result == {"accepted": 2, "rejected": 1}
+        assert ingestion.latest("grid_voltage", "a")["timestamp"] == pd.Timestamp("2026-03-01T12:00:00", tz="UTC")
+
+
+class TestRollups:
+    """Test incremental downsampling"""
+
+    def test_incremental_matches_resample(self, ingestion):
+        """Test rollups built batch by batch equal a groupby over all readings"""
+        rng = np.random.default_rng(3)
+        n = 600
+        timestamps = START + np.sort(rng.integers(0, 180 * NANOS, n))
+        sites = rng.choice(["a", "b", "c"], n)
+        values = rng.uniform(210, 240, n).astype(np.float32)
+        for batch in np.array_split(np.arange(n), 7):
+            # Shuffled within each batch; batches arrive in time order
+            batch = rng.permutation(batch)
+            ingestion.ingest("grid_voltage", sites[batch], values[batch], timestamps[batch])
+
+        frame = pd.DataFrame({"site": sites, "bucket": timestamps // (60 * NANOS), "value": values})
+        expected = frame.groupby(["site", "bucket"])["value"].agg(["count", "mean", "min", "max"]).reset_index()
+        rollups = ingestion.rollups("grid_voltage", "1m")
+
+        assert rollups["count"].tolist() == expected["count"].tolist()
+        np.testing.assert_allclose(rollups["mean"], expected["mean"], rtol=1e-6)
+        np.testing.assert_allclose(rollups["max"], expected["max"])
+        assert rollups["timestamp"].iloc[0] == pd.Timestamp("2026-03-01T12:00:00", tz="UTC")
+        assert len(ingestion.rollups("grid_voltage", "1s", site="a")) == len(np.unique(timestamps[sites == "a"] // NANOS))
+
+    def test_late_readings_left_out(self, ingestion):
+        """Test readings older than a site's open bucket are counted but not rolled up"""
+        ingestion.ingest("grid_voltage", ["a", "a"], [230.0, 231.0], [START, START + 120 * NANOS])
+        ingestion.ingest("grid_voltage", ["a"], [240.0], [START + 5 * NANOS])
+
+        rollups = ingestion.rollups("grid_voltage", "1m", site="a")
+        assert rollups["count"].tolist() == [1, 1]
+        assert ingestion.get_stats()["types"]["grid_voltage"]["late"]["1m"] == 1
+        assert len(ingestion.readings("grid_voltage", site="a")) == 3
+
+    def test_unknown_resolution(self, ingestion):
+        """Test only the configured rollup widths are served"""
+        with pytest.raises(ValueError):
+            ingestion.rollups("grid_voltage", "5m")
+
+
+class TestServiceIngestion:
+    """Test the IoT service over ingested readings"""
+
+    @pytest.mark.asyncio
+    async def test_grid_data_served_from_memory(self):
+        """Test fresh voltage and frequency readings answer grid data requests without a fetch"""
+        service = IoTIntegrationService()
+        now = datetime.now(timezone.utc)
+        service.ingest_readings([
+            SensorData("v1", SensorType.GRID_VOLTAGE, 231.0, "V", now, {"lat": 0.0, "lon": 0.0}, DataQuality.GOOD, {"site": "houston"}),
+            {"sensor_type": "grid_frequency", "site": "houston", "value": 50.02, "timestamp": now.isoformat()},
+            {"sensor_type": "power_consumption", "location": "houston", "value": 750.0, "timestamp": now.isoformat()},
+        ])
+
+        grid = await service.get_real_time_grid_data("houston")
+
+        assert grid["data_source"] == "iot_ingestion"
+        assert (grid["voltage"], grid["frequency"], grid["power_flow"]) == (231.0, 50.02, 750.0)
+        assert service.get_sensor_rollups("grid_voltage", "1s", site="houston")["rollups"][0]["count"] == 1
+
+    @pytest.mark.asyncio
+    async def test_stale_readings_not_served(self):
+        """Test readings older than the live window fall back to the regular lookup"""
+        service = IoTIntegrationService()
+        old = (datetime.now(timezone.utc) - timedelta(minutes=10)).isoformat()
+        service.ingest_readings([
+            {"sensor_type": "grid_voltage", "site": "dallas", "value": 231.0, "timestamp": old},
+            {"sensor_type": "grid_frequency", "site": "dallas", "value": 50.0, "timestamp": old},
+        ])
+
+        grid = await service.get_real_time_grid_data("dallas")
+
+        assert grid["data_source"] != "iot_ingestion"
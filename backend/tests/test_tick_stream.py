@@ -0,0 +1,148 @@
+"""
+Test market data tick streaming
+Tests hub filtering, size/time micro-batching, bounded buffers and the grpc.aio StreamTicks service
+"""
+
+import asyncio
+import pytest
+import grpc
+
+from app.core.market_data_codec import SymbolRegistry
+from app.core.tick_stream import TickHub, market_data_to_tick
+from app.services.market_data_integration import MarketDataIntegration
+
+from energy_service import EnergyService, energy_pb2, energy_pb2_grpc
+
+
+def tick(symbol: str, last: float, timestamp: int = 1_700_000_000_000) -> dict:
+    return {"symbol": symbol, "bid": last - 0.01, "ask": last + 0.01, "last": last, "volume": 10, "timestamp": timestamp}
+
+
+async def start_server(hub: TickHub):
+    """grpc.aio server on a free local port"""
+    server = grpc.aio.server()
+    energy_pb2_grpc.add_EnergyServiceServicer_to_server(EnergyService(hub), server)
+    port = server.add_insecure_port("127.0.0.1:0")
+    await server.start()
+    return server, port
+
+
+class TestTickHub:
+    """Test hub fan-out and subscriber batching"""
+
+    @pytest.mark.asyncio
+    async def test_batch_flushed_by_size(self):
+        """Test a full batch is returned without waiting for the delay"""
+        hub = TickHub(SymbolRegistry())
+        subscriber = hub.subscribe(max_batch_size=3, max_batch_delay=60)
+        hub.publish([tick("crude_oil:ICE", 80 + i) for i in range(5)])
+
+        rows, dropped = await asyncio.wait_for(subscriber.next_batch(), 1)
+
+        assert [row[3] for row in rows] == [80, 81, 82]
+        assert dropped == 0
+        assert len(subscriber) == 2
+
+    @pytest.mark.asyncio
+    async def test_partial_batch_flushed_by_delay(self):
+        """Test a partial batch is returned once the oldest tick has waited max_batch_delay"""
+        hub = TickHub(SymbolRegistry())
+        subscriber = hub.subscribe(max_batch_size=100, max_batch_delay=0.01)
+
+        async def publish_later():
+            await asyncio.sleep(0.005)
+            hub.publish([tick("crude_oil:ICE", 80)])
+
+        asyncio.get_running_loop().create_task(publish_later())
+        rows, _ = await asyncio.wait_for(subscriber.next_batch(), 1)
+
+        assert len(rows) == 1
+
+    def test_symbol_filter(self):
+        """Test subscribers only buffer their symbols"""
+        hub = TickHub(SymbolRegistry())
+        oil = hub.subscribe(["crude_oil:ICE"])
+        everything = hub.subscribe()
+        hub.publish([tick("crude_oil:ICE", 80), tick("natural_gas:CME", 3.5)])
+
+        assert len(oil) == 1
+        assert len(everything) == 2
+
+    @pytest.mark.asyncio
+    async def test_slow_consumer_drops_oldest(self):
+        """Test buffering is bounded and drops are reported with the next batch"""
+        hub = TickHub(SymbolRegistry())
+        subscriber = hub.subscribe(max_batch_size=2, max_pending_batches=2)
+        hub.publish([tick("crude_oil:ICE", 80 + i) for i in range(7)])
+
+        rows, dropped = await subscriber.next_batch()
+
+        assert dropped == 3
+        assert [row[3] for row in rows] == [83, 84]
+        assert hub.get_stats()["dropped"] == 3
+
+    @pytest.mark.asyncio
+    async def test_market_data_integration_feeds_hub(self):
+        """Test MarketDataIntegration updates are published as ticks"""
+        hub = TickHub(SymbolRegistry())
+        integration = MarketDataIntegration()
+        hub.attach(integration)
+        subscriber = hub.subscribe(["crude_oil:ICE"])
+
+        market_data = await integration.fetch_real_time_feed("crude_oil", "ICE")
+
+        assert subscriber._buffer[0][1:4] == pytest.approx(tuple(
+            market_data_to_tick(market_data)[field] for field in ("bid", "ask", "last")
+        ))
+
+
+class TestStreamTicksService:
+    """Test the grpc.aio EnergyService"""
+
+    @pytest.mark.asyncio
+    async def test_stream_ticks_batches_and_symbol_map(self):
+        """Test ticks arrive column-wise in batches with symbol names sent once"""
+        hub = TickHub(SymbolRegistry())
+        server, port = await start_server(hub)
+        try:
+            async with grpc.aio.insecure_channel(f"127.0.0.1:{port}") as channel:
+                stub = energy_pb2_grpc.EnergyServiceStub(channel)
+                call = stub.StreamTicks(energy_pb2.TickSubscription(
+                    symbols=["crude_oil:ICE"], max_batch_size=50, max_batch_delay_ms=1000
+                ))
+                while not hub.subscribers:
+                    await asyncio.sleep(0.01)
+                hub.publish([tick("crude_oil:ICE", 80 + i % 5) for i in range(100)])
+                hub.publish([tick("natural_gas:CME", 3.5)])
+
+                batches = [await call.read(), await call.read()]
+                call.cancel()
+        finally:
+            await server.stop(None)
+
+        assert [len(batch.symbol_ids) for batch in batches] == [50, 50]
+        assert [batch.sequence for batch in batches] == [1, 2]
+        assert dict(batches[0].symbols) == {hub.registry.get_id("crude_oil:ICE")[0]: "crude_oil:ICE"}
+        assert not batches[1].symbols
+        assert list(batches[0].lasts[:5]) == [80, 81, 82, 83, 84]
+        assert list(batches[0].timestamps[:1]) == [1_700_000_000_000]
+
+    @pytest.mark.asyncio
+    async def test_stream_closed_on_cancel(self):
+        """Test a cancelled stream unsubscribes from the hub"""
+        hub = TickHub(SymbolRegistry())
+        server, port = await start_server(hub)
+        try:
+            async with grpc.aio.insecure_channel(f"127.0.0.1:{port}") as channel:
+                call = energy_pb2_grpc.EnergyServiceStub(channel).StreamTicks(energy_pb2.TickSubscription())
+                while not hub.subscribers:
+                    await asyncio.sleep(0.01)
+                call.cancel()
+                for _ in range(100):
+                    if not hub.subscribers:
+                        break
+                    await asyncio.sleep(0.01)
+        finally:
+            await server.stop(None)
+
+        assert not hub.subscribers
@@ -0,0 +1,133 @@
+"""
+Test hierarchical timer wheel and WebSocket heartbeat scheduling
+"""
+
+import pytest
+import json
+from unittest.mock import AsyncMock
+
+from fastapi import WebSocket
+
+from app.core.timer_wheel import HierarchicalTimerWheel
+from app.core.websocket_manager import ConnectionManager
+
+
+class TestHierarchicalTimerWheel:
+    """Test timer wheel scheduling"""
+
+    def test_timer_fires_at_deadline(self):
+        """Test timer fires on its tick and not before"""
+        wheel = HierarchicalTimerWheel(tick_seconds=1.0, slots_per_level=8, levels=3)
+        wheel.schedule("a", 5, payload="x")
+
+        assert wheel.advance(4) == []
+        assert wheel.advance(5) == [("a", "x")]
+        assert len(wheel) == 0
+
+    def test_cancel_and_reschedule(self):
+        """Test cancelled timers never fire and rescheduling moves the deadline"""
+        wheel = HierarchicalTimerWheel(tick_seconds=1.0, slots_per_level=8, levels=3)
+        wheel.schedule("a", 3)
+        wheel.schedule("b", 3)
+        assert wheel.cancel("a")
+        assert not wheel.cancel("a")
+        wheel.schedule("b", 10)
+
+        assert wheel.advance(9) == []
+        assert wheel.advance(10) == [("b", None)]
+
+    @pytest.mark.parametrize("delay", [7, 8, 9, 63, 64, 65, 200, 511, 512, 1000])
+    def test_cascading_levels_fire_exactly(self, delay):
+        """Test timers on higher levels cascade down and fire on time"""
+        wheel = HierarchicalTimerWheel(tick_seconds=1.0, slots_per_level=8, levels=3, start=3)
+        wheel.schedule("t", delay)
+
+        assert wheel.advance(3 + delay - 1) == []
+        assert wheel.advance(3 + delay) == [("t", None)]
+
+    def test_many_timers_fire_in_order(self):
+        """Test a batch of timers expires tick by tick"""
+        wheel = HierarchicalTimerWheel(tick_seconds=0.5, slots_per_level=16, levels=2)
+        for i in range(100):
+            wheel.schedule(i, 0.5 * (i + 1))
+
+        fired = []
+        for step in range(1, 101):
+            fired.extend(key for key, _ in wheel.advance(0.5 * step))
+        assert fired == list(range(100))
+
+
+class TestConnectionHeartbeats:
+    """Test ConnectionManager timer-driven reaping"""
+
+    def make_websocket(self):
+        """Create mock websocket"""
+        websocket = AsyncMock(spec=WebSocket)
+        websocket.send_text = AsyncMock()
+        return websocket
+
+    @pytest.mark.asyncio
+    async def test_silent_connection_pinged_then_reaped(self):
+        """Test heartbeat ping followed by reap when unanswered"""
+        manager = ConnectionManager(heartbeat_interval=10, idle_timeout=3600)
+        websocket = self.make_websocket()
+        connection_id = await manager.connect(websocket, "user-1", "org-1")
+        start = manager.connection_metadata[connection_id]["last_seen"]
+
+        fired = await manager.run_timers(start + 11)
+        assert fired["pinged"] == 1
+        assert json.loads(websocket.send_text.call_args[0][0])["type"] == "heartbeat"
+
+        fired = await manager.run_timers(start + 22)
+        assert fired["reaped"] == 1
+        assert connection_id not in manager.active_connections
+        assert manager.get_connection_stats()["timers"]["scheduled"] == 0
+
+    @pytest.mark.asyncio
+    async def test_pong_keeps_connection_alive(self):
+        """Test a reply to the heartbeat prevents reaping"""
+        manager = ConnectionManager(heartbeat_interval=10, idle_timeout=3600)
+        connection_id = await manager.connect(self.make_websocket(), "user-1", "org-1")
+        start = manager.connection_metadata[connection_id]["last_seen"]
+
+        await manager.run_timers(start + 11)
+        await manager.handle_message(connection_id, json.dumps({"type": "pong"}))
+        manager.connection_metadata[connection_id]["last_seen"] = start + 15
+
+        fired = await manager.run_timers(start + 22)
+        assert fired["reaped"] == 0
+        assert connection_id in manager.active_connections
+
+    @pytest.mark.asyncio
+    async def test_idle_timeout_reaps_and_activity_defers(self):
+        """Test idle timer reschedules on activity and reaps once idle"""
+        manager = ConnectionManager(heartbeat_interval=1000, idle_timeout=60)
+        connection_id = await manager.connect(self.make_websocket(), "user-1", "org-1")
+        start = manager.connection_metadata[connection_id]["last_seen"]
+        manager.connection_metadata[connection_id]["last_seen"] = start + 30
+
+        fired = await manager.run_timers(start + 61)
+        assert fired == {"expired": 1, "pinged": 0, "reaped": 0}
+
+        fired = await manager.run_timers(start + 91)
+        assert fired["reaped"] == 1
+        assert manager.timer_stats["reaped"] == 1
+
+    @pytest.mark.asyncio
+    async def test_dead_socket_removed_when_close_fails(self):
+        """Test a socket that raises on close is still unregistered when reaped"""
+        manager = ConnectionManager(heartbeat_interval=10, idle_timeout=3600)
+        websocket = self.make_websocket()
+        websocket.send_text.side_effect = RuntimeError("socket is gone")
+        websocket.close.side_effect = RuntimeError("socket is gone")
+        connection_id = await manager.connect(websocket, "user-1", "org-1")
+        start = manager.connection_metadata[connection_id]["last_seen"]
+
+        await manager.run_timers(start + 11)
+        fired = await manager.run_timers(start + 22)
+
+        assert fired["reaped"] == 1
+        assert connection_id not in manager.active_connections
+        assert connection_id not in manager.connection_metadata
+        assert "user-1" not in manager.user_connections
+        assert manager.connection_count == 0
@@ -0,0 +1,162 @@
+"""
+Test verified token cache, shared revocation list and permission matrix
+Tests cached JWT verification, cross-worker revocation and compiled RBAC checks
+"""
+
+import pytest
+import asyncio
+from datetime import timedelta
+from unittest.mock import patch
+
+from fastapi import HTTPException
+
+from app.core.jwt_auth import JWTAuthManager, auth_manager
+from app.core.token_cache import (
+    BloomFilter,
+    PermissionMatrix,
+    RevocationList,
+    VerifiedTokenCache,
+    token_digest,
+)
+from app.core.websocket_fanout import InProcessFanoutHub, InProcessFanoutBridge
+from app.middleware.auth import AuthenticationService
+
+
+USER = {"user_id": "trader_001", "username": "trader", "role": "trader"}
+
+
+async def attach_workers():
+    """Two auth managers sharing revocations over an in-process hub"""
+    hub = InProcessFanoutHub()
+    worker_a, worker_b = JWTAuthManager(), JWTAuthManager()
+    await worker_a.revocations.attach(InProcessFanoutBridge(hub, "worker-a"))
+    await worker_b.revocations.attach(InProcessFanoutBridge(hub, "worker-b"))
+    return worker_a, worker_b
+
+
+class TestVerifiedTokenCache:
+    """Test verified token LRU"""
+
+    def test_entry_expires_at_token_exp(self):
+        """Test cached claims are dropped once the token expires"""
+        cache = VerifiedTokenCache()
+        cache.put("digest", {"user_id": "u1"}, expires_at=1000.0)
+
+        assert cache.get("digest", now=999.0) == {"user_id": "u1"}
+        assert cache.get("digest", now=1000.0) is None
+        assert len(cache) == 0
+
+    def test_least_recently_used_evicted(self):
+        """Test cache size is bounded"""
+        cache = VerifiedTokenCache(max_size=2)
+        cache.put("a", {}, 1000.0)
+        cache.put("b", {}, 1000.0)
+        cache.get("a", now=0.0)
+        cache.put("c", {}, 1000.0)
+
+        assert cache.get("b", now=0.0) is None
+        assert cache.get("a", now=0.0) is not None
+
+
+class TestRevocationList:
+    """Test Bloom-fronted revocation list"""
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        """Test every added digest is reported as present"""
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        digests = [token_digest(f"token-{i}") for i in range(1000)]
+        for digest in digests:
+            bloom.add(digest)
+
+        assert all(digest in bloom for digest in digests)
+        false_positives = sum(token_digest(f"other-{i}") in bloom for i in range(10000))
+        assert false_positives < 300
+
+    def test_revocation_expires_with_token(self):
+        """Test revocations lapse after the token's exp and are pruned"""
+        revocations = RevocationList()
+        digest = token_digest("token")
+        revocations.add(digest, expires_at=1000.0)
+
+        assert revocations.is_revoked(digest, now=999.0)
+        assert not revocations.is_revoked(digest, now=1001.0)
+        assert revocations.prune(now=1001.0) == 1
+        assert len(revocations) == 0
+
+
+class TestJWTAuthCaching:
+    """Test JWTAuthManager with token cache and shared revocations"""
+
+    def test_repeat_verification_skips_decode(self):
+        """Test only the first verification decodes the signature"""
+        manager = JWTAuthManager()
+        token = manager.create_access_token(USER)
+
+        with patch("app.core.jwt_auth.jwt.decode", wraps=__import__("jwt").decode) as decode:
+            first = manager.verify_token(token)
+            second = manager.verify_token(token)
+
+        assert decode.call_count == 1
+        assert first == second
+        assert manager.token_cache.get_stats()["hits"] == 1
+
+    def test_revoked_token_rejected_after_caching(self):
+        """Test revocation wins over a cached verification"""
+        manager = JWTAuthManager()
+        token = manager.create_access_token(USER)
+        manager.verify_token(token)
+
+        manager.revoke_token(token)
+
+        with pytest.raises(HTTPException) as exc_info:
+            manager.verify_token(token)
+        assert exc_info.value.status_code == 401
+        assert "revoked" in exc_info.value.detail.lower()
+
+    @pytest.mark.asyncio
+    async def test_revocation_propagates_to_other_worker(self):
+        """Test a token revoked on one worker is rejected by another"""
+        worker_a, worker_b = await attach_workers()
+        token = worker_a.create_access_token(USER, expires_delta=timedelta(minutes=5))
+        assert worker_b.verify_token(token)["user_id"] == "trader_001"
+
+        worker_a.revoke_token(token)
+        await asyncio.sleep(0)
+        await worker_a.revocations.detach()
+
+        with pytest.raises(HTTPException) as exc_info:
+            worker_b.verify_token(token)
+        assert exc_info.value.status_code == 401
+        assert worker_b.revocations.get_stats()["received"] == 1
+        await worker_b.revocations.detach()
+
+
+    def test_session_revocations_use_shared_list(self):
+        """Test the session auth service revokes through the shared revocation list"""
+        service = AuthenticationService()
+        token = service.create_access_token(USER)
+        assert service.verify_token(token)["user_id"] == "trader_001"
+
+        service.revoke_token(token)
+
+        assert auth_manager.revocations.is_revoked(token_digest(token))
+        with pytest.raises(HTTPException) as exc_info:
+            service.verify_token(token)
+        assert "revoked" in exc_info.value.detail.lower()
+
+
+class TestPermissionMatrix:
+    """Test compiled role x permission bitmap"""
+
+    def test_matches_role_permission_lists(self):
+        """Test bitmap answers match the role lists for every pair"""
+        manager = JWTAuthManager()
+        matrix = PermissionMatrix(manager.role_permissions)
+        all_permissions = {p for perms in manager.role_permissions.values() for p in perms} | {"unknown"}
+
+        for role, permissions in manager.role_permissions.items():
+            for permission in all_permissions:
+                expected = "*" in permissions or permission in permissions
+                assert matrix.allows(role, permission) == expected
+        assert not matrix.allows("unknown_role", "trade_view")
+        assert matrix.permissions("viewer") == manager.role_permissions["viewer"]
@@ -0,0 +1,195 @@
+"""
+Test cross-process WebSocket fan-out
+Tests broadcast relay between managers, presence tracking and the Unix socket bridge
+"""
+
+import pytest
+import asyncio
+import json
+import time
+from unittest.mock import AsyncMock
+
+from fastapi import WebSocket
+
+from app.core.websocket_manager import ConnectionManager
+from app.core.websocket_fanout import (
+    InProcessFanoutHub,
+    InProcessFanoutBridge,
+    PresenceIndex,
+    RedisPresenceIndex,
+    UnixSocketFanoutBridge,
+    presence_key,
+)
+
+
+def make_websocket():
+    """Create mock websocket"""
+    websocket = AsyncMock(spec=WebSocket)
+    websocket.send_text = AsyncMock()
+    return websocket
+
+
+async def attach_workers():
+    """Two managers joined by an in-process hub and a shared presence index"""
+    hub = InProcessFanoutHub()
+    presence = PresenceIndex()
+    worker_a, worker_b = ConnectionManager(), ConnectionManager()
+    await worker_a.attach_fanout(InProcessFanoutBridge(hub, "worker-a"), presence)
+    await worker_b.attach_fanout(InProcessFanoutBridge(hub, "worker-b"), presence)
+    return worker_a, worker_b
+
+
+def sent_types(websocket):
+    """Message types sent to a mock websocket"""
+    return [json.loads(call[0][0])["type"] for call in websocket.send_text.call_args_list]
+
+
+class TestConnectionManagerFanout:
+    """Test broadcasts relayed between two workers"""
+
+    @pytest.mark.asyncio
+    async def test_organization_broadcast_reaches_remote_worker(self):
+        """Test broadcast published on one worker is delivered on the other"""
+        worker_a, worker_b = await attach_workers()
+        local_ws, remote_ws = make_websocket(), make_websocket()
+        await worker_a.connect(local_ws, "user-1", "org-1")
+        await worker_b.connect(remote_ws, "user-2", "org-1")
+
+        await worker_a.broadcast_to_organization("org-1", {"type": "trade_update"})
+
+        assert sent_types(local_ws).count("trade_update") == 1
+        assert sent_types(remote_ws).count("trade_update") == 1
+
+    @pytest.mark.asyncio
+    async def test_presence_skips_publish_without_remote_connections(self):
+        """Test broadcast stays local when no other worker holds the organization"""
+        worker_a, worker_b = await attach_workers()
+        await worker_a.connect(make_websocket(), "user-1", "org-1")
+
+        await worker_a.broadcast_to_organization("org-1", {"type": "trade_update"})
+
+        assert worker_a.fanout_bridge.published_count == 0
+        assert worker_b.fanout_bridge.received_count == 0
+
+    @pytest.mark.asyncio
+    async def test_presence_counts_connections_across_workers(self):
+        """Test presence counts and cleanup on disconnect"""
+        worker_a, worker_b = await attach_workers()
+        await worker_a.connect(make_websocket(), "user-1", "org-1")
+        connection_id = await worker_b.connect(make_websocket(), "user-2", "org-1")
+
+        assert await worker_a.get_presence_count("organization", "org-1") == 2
+
+        await worker_b.disconnect(connection_id)
+        assert await worker_a.get_presence_count("organization", "org-1") == 1
+        assert await worker_a.presence.workers(presence_key("organization", "org-1")) == {"worker-a"}
+
+    @pytest.mark.asyncio
+    async def test_broadcast_to_all_reaches_every_worker(self):
+        """Test broadcast to all connections on every worker"""
+        worker_a, worker_b = await attach_workers()
+        remote_ws = make_websocket()
+        await worker_b.connect(remote_ws, "user-2", "org-2")
+
+        await worker_a.broadcast_to_all({"type": "market_data"})
+
+        assert "market_data" in sent_types(remote_ws)
+
+
+class RecordingPresenceIndex(PresenceIndex):
+    """In-memory presence index that records heartbeats"""
+
+    def __init__(self, ttl_seconds: float):
+        super().__init__(ttl_seconds)
+        self.heartbeats = []
+
+    async def heartbeat(self, worker_id: str) -> None:
+        self.heartbeats.append(worker_id)
+
+
+class TestPresenceExpiry:
+    """Test presence heartbeats and expiry of crashed workers"""
+
+    @pytest.mark.asyncio
+    async def test_timer_wheel_renews_presence(self):
+        """Test the worker heartbeats on attach and again from the timer wheel"""
+        manager = ConnectionManager()
+        presence = RecordingPresenceIndex(ttl_seconds=3)
+        await manager.attach_fanout(InProcessFanoutBridge(InProcessFanoutHub(), "worker-a"), presence)
+        assert presence.heartbeats == ["worker-a"]
+
+        await manager.run_timers(time.monotonic() + 2)
+        assert presence.heartbeats == ["worker-a", "worker-a"]
+        assert ("worker-a", "presence") in manager.timer_wheel
+
+        await manager.detach_fanout()
+        assert ("worker-a", "presence") not in manager.timer_wheel
+
+    @pytest.mark.asyncio
+    async def test_crashed_worker_presence_expires(self):
+        """Test entries of a worker whose heartbeat key expired are dropped"""
+        fakeredis = pytest.importorskip("fakeredis")
+        client = fakeredis.FakeAsyncRedis(decode_responses=True)
+        live = RedisPresenceIndex("redis://unused", ttl_seconds=30)
+        crashed = RedisPresenceIndex("redis://unused", ttl_seconds=30)
+        live._client = crashed._client = client
+        key = presence_key("organization", "org-1")
+
+        for index, worker_id in ((live, "worker-a"), (crashed, "worker-b")):
+            await index.heartbeat(worker_id)
+            await index.add(key, worker_id)
+        assert 0 < await client.pttl("ws:presence:worker:worker-b") <= 30000
+        assert await live.workers(key) == {"worker-a", "worker-b"}
+
+        # The crashed worker never calls clear_worker; its heartbeat key simply expires
+        await client.delete("ws:presence:worker:worker-b")
+
+        assert await live.workers(key) == {"worker-a"}
+        assert await live.count(key) == 1
+        assert await client.hkeys("ws:presence:organization:org-1") == ["worker-a"]
+
+
+class TestUnixSocketFanoutBridge:
+    """Test Unix datagram socket bridge"""
+
+    @pytest.mark.asyncio
+    async def test_envelope_delivered_to_peer(self, tmp_path):
+        """Test envelope round trip between two bridges in one directory"""
+        received = []
+
+        async def handler(envelope):
+            received.append(envelope)
+
+        sender = UnixSocketFanoutBridge(str(tmp_path), "sender")
+        receiver = UnixSocketFanoutBridge(str(tmp_path), "receiver")
+        await sender.start(AsyncMock())
+        await receiver.start(handler)
+
+        try:
+            await sender.publish("organization", "org-1", {"type": "risk_alert"})
+            for _ in range(50):
+                if received:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await sender.stop()
+            await receiver.stop()
+
+        assert received[0]["origin"] == "sender"
+        assert received[0]["target"] == "org-1"
+        assert received[0]["message"] == {"type": "risk_alert"}
+
+    @pytest.mark.asyncio
+    async def test_stale_peer_socket_removed(self, tmp_path):
+        """Test sockets of dead workers are cleaned up on publish"""
+        stale = tmp_path / "dead-worker.sock"
+        stale.touch()
+
+        bridge = UnixSocketFanoutBridge(str(tmp_path), "live")
+        await bridge.start(AsyncMock())
+        try:
+            await bridge.publish("all", None, {"type": "ping"})
+        finally:
+            await bridge.stop()
+
+        assert not stale.exists()
@@ -0,0 +1,353 @@
+"""
+Streaming Anomaly Detection
+Per-series O(1) anomaly scoring (EWMA level and variance, robust MAD tracking, seasonal offsets) for price and sensor ticks
+"""
+
+import math
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+import structlog
+
+logger = structlog.get_logger()
+
+# MAD of a normal distribution is 0.6745 sigma; 1.4826 turns a MAD into a sigma estimate
+MAD_TO_SIGMA = 1.4826
+# Ratio of median to mean absolute deviation for normal data, used while warming up
+MEAN_TO_MEDIAN_DEVIATION = 0.8453
+SEASON_MIN_OBSERVATIONS = 2
+EPSILON = 1e-9
+
+
+class StreamingAnomalyDetector:
+    """Anomaly scores for many series, one tick at a time
+
+    Each series keeps a fixed amount of state in shared NumPy arrays (one
+    row per series): an EWMA level, an EWMA variance of residuals, a
+    tracked median and median absolute deviation of residuals, and one
+    EWMA offset per seasonal slot (hour of day by default). A tick's
+    residual is its distance from level plus seasonal offset; its score is
+    the robust z-score ``(residual - median) / (1.4826 * MAD)``.
+
+    Updates cost the same however long a series has run, and
+    ``update_many`` scores one tick for any number of series with a single
+    set of array operations. Values flagged as anomalous are clipped to the
+    threshold before they update the state, so a spike does not widen the
+    band that should catch the next one.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 3.5,
+        alpha: float = 0.05,
+        mad_rate: float = 0.05,
+        season_length: int = 24,
+        seasonal_alpha: float = 0.1,
+        interval_seconds: float = 3600.0,
+        warmup: int = 20,
+        capacity: int = 64
+    ):
+        self.threshold = threshold
+        self.alpha = alpha
+        self.mad_rate = mad_rate
+        self.season_length = season_length
+        self.seasonal_alpha = seasonal_alpha
+        self.interval_seconds = interval_seconds
+        self.warmup = warmup
+
+        self._index: Dict[str, int] = {}
+        self._names: List[str] = []
+        self._lock = threading.Lock()
+        self._allocate(capacity)
+        self.ticks = 0
+        self.anomalies = 0
+
+    def _allocate(self, capacity: int) -> None:
+        seasons = max(self.season_length, 1)
+        arrays = {
+            "count": np.zeros(capacity, dtype=np.int64),
+            "level": np.zeros(capacity),
+            "variance": np.zeros(capacity),
+            "median": np.zeros(capacity),
+            "mad": np.zeros(capacity),
+            "anomaly_count": np.zeros(capacity, dtype=np.int64),
+            "last_value": np.full(capacity, np.nan),
+            "offsets": np.zeros((capacity, seasons)),
+            "offset_counts": np.zeros((capacity, seasons), dtype=np.int64),
+        }
+        for name, array in arrays.items():
+            previous = getattr(self, name, None)
+            if previous is not None:
+                array[:len(previous)] = previous
+            setattr(self, name, array)
+        self.capacity = capacity
+
+    def _rows(self, series: Sequence[str]) -> np.ndarray:
+        """Row per series id, registering new series (and growing the arrays) as needed"""
+        index = self._index
+        for name in series:
+            if name not in index:
+                index[name] = len(self._names)
+                self._names.append(name)
+        if len(self._names) > self.capacity:
+            capacity = self.capacity
+            while capacity < len(self._names):
+                capacity *= 2
+            self._allocate(capacity)
+        return np.fromiter((index[name] for name in series), dtype=np.int64, count=len(series))
+
+    def _slots(self, rows: np.ndarray, timestamps: Optional[Sequence[Any]]) -> np.ndarray:
+        """Seasonal slot per tick: interval since the epoch (hour of day by default), else the series' tick count"""
+        if self.season_length <= 1:
+            return np.zeros(len(rows), dtype=np.int64)
+        if timestamps is None:
+            return self.count[rows] % self.season_length
+        seconds = pd.to_datetime(list(timestamps), utc=True).as_unit("s").asi8
+        return (seconds // int(self.interval_seconds)) % self.season_length
+
+    def _slot(self, row: int, timestamp: Optional[Any]) -> int:
+        if self.season_length <= 1:
+            return 0
+        if timestamp is None:
+            return int(self.count[row]) % self.season_length
+        return int(pd.Timestamp(timestamp).timestamp() // self.interval_seconds) % self.season_length
+
+    def _step(self, rows: np.ndarray, values: np.ndarray, slots: np.ndarray) -> Dict[str, np.ndarray]:
+        """Score one tick for each row (rows must be distinct) and advance their state"""
+        count = self.count[rows]
+        level = self.level[rows]
+        first = count == 0
+        level = np.where(first, values, level)
+
+        offset_counts = self.offset_counts[rows, slots]
+        offsets = np.where(offset_counts >= SEASON_MIN_OBSERVATIONS, self.offsets[rows, slots], 0.0)
+        expected = level + offsets
+        residual = values - expected
+
+        median = self.median[rows]
+        mad = self.mad[rows]
+        scale = np.maximum(MAD_TO_SIGMA * mad, EPSILON)
+        variance = self.variance[rows]
+        warmed = count >= self.warmup
+        score = np.where(warmed, (residual - median) / scale, 0.0)
+        zscore = np.where(warmed, residual / np.sqrt(np.maximum(variance, EPSILON)), 0.0)
+        is_anomaly = np.abs(score) > self.threshold
+
+        # Anomalous ticks update the state as if they had landed on the threshold
+        bound = self.threshold * scale
+        clipped = np.where(is_anomaly, np.clip(residual, median - bound, median + bound), residual)
+
+        alpha = self.alpha
+        self.level[rows] = np.where(first, values, level + alpha * clipped)
+        self.variance[rows] = (1 - alpha) * variance + alpha * clipped ** 2
+
+        if self.season_length > 1:
+            # Offsets track the seasonal deviation from the level; a slot's first observations are averaged
+            seen = offset_counts + 1
+            rate = np.maximum(self.seasonal_alpha, 1.0 / seen)
+            deviation = offsets + clipped
+            self.offsets[rows, slots] = self.offsets[rows, slots] + rate * (deviation - self.offsets[rows, slots])
+            self.offset_counts[rows, slots] = seen
+
+        # Median and MAD: running means while warming up, then proportional sign steps (O(1) quantile tracking)
+        warm_rate = 1.0 / (count + 1)
+        distance = np.abs(clipped - median)
+        step = self.mad_rate * np.maximum(mad, EPSILON)
+        self.median[rows] = np.where(warmed, median + step * np.sign(clipped - median), median + warm_rate * (clipped - median))
+        self.mad[rows] = np.where(
+            warmed,
+            np.maximum(mad * (1 + self.mad_rate * np.sign(distance - mad)), EPSILON),
+            mad + warm_rate * (MEAN_TO_MEDIAN_DEVIATION * distance - mad)
+        )
+
+        self.count[rows] = count + 1
+        self.last_value[rows] = values
+        self.anomaly_count[rows] += is_anomaly
+        self.ticks += len(rows)
+        self.anomalies += int(is_anomaly.sum())
+        return {"expected": expected, "score": score, "zscore": zscore, "is_anomaly": is_anomaly}
+
+    def update_many(
+        self,
+        series: Sequence[str],
+        values: Union[Sequence[float], np.ndarray],
+        timestamps: Optional[Sequence[Any]] = None
+    ) -> Dict[str, np.ndarray]:
+        """Score one tick per entry; a series listed twice is applied in order"""
+        values = np.asarray(values, dtype=float)
+        with self._lock:
+            rows = self._rows(series)
+            slots = self._slots(rows, timestamps)
+            if len(np.unique(rows)) == len(rows):
+                return self._step(rows, values, slots)
+            return self._step_in_rounds(rows, values, slots, timestamps is None)
+
+    def _step_in_rounds(self, rows: np.ndarray, values: np.ndarray, slots: np.ndarray, count_slots: bool) -> Dict[str, np.ndarray]:
+        """Repeated series: apply ticks in rounds so each round touches a row once"""
+        results = {
+            "expected": np.empty(len(rows)),
+            "score": np.empty(len(rows)),
+            "zscore": np.empty(len(rows)),
+            "is_anomaly": np.empty(len(rows), dtype=bool),
+        }
+        occurrence = pd.Series(rows).groupby(rows).cumcount().to_numpy()
+        for round_number in range(occurrence.max() + 1):
+            positions = np.flatnonzero(occurrence == round_number)
+            if count_slots:
+                slots[positions] = self._slots(rows[positions], None)
+            step = self._step(rows[positions], values[positions], slots[positions])
+            for name, array in step.items():
+                results[name][positions] = array
+        return results
+
+    def update(self, series: str, value: float, timestamp: Optional[Any] = None) -> Dict[str, Any]:
+        """Score one tick of one series"""
+        value = float(value)
+        with self._lock:
+            row = int(self._rows([series])[0])
+            expected, score, zscore, is_anomaly = self._step_one(row, value, self._slot(row, timestamp))
+            observations = int(self.count[row])
+        return {
+            "series": series,
+            "value": value,
+            "expected": round(expected, 6),
+            "score": round(score, 4),
+            "zscore": round(zscore, 4),
+            "is_anomaly": is_anomaly,
+            "observations": observations
+        }
+
+    def _step_one(self, row: int, value: float, slot: int):
+        """_step for a single row on Python floats (array element access is much cheaper than 1-element array ops)"""
+        count = int(self.count[row])
+        first = count == 0
+        level = value if first else float(self.level[row])
+
+        offset_count = int(self.offset_counts[row, slot])
+        stored_offset = float(self.offsets[row, slot])
+        offset = stored_offset if offset_count >= SEASON_MIN_OBSERVATIONS else 0.0
+        expected = level + offset
+        residual = value - expected
+
+        median = float(self.median[row])
+        mad = float(self.mad[row])
+        scale = max(MAD_TO_SIGMA * mad, EPSILON)
+        variance = float(self.variance[row])
+        warmed = count >= self.warmup
+        score = (residual - median) / scale if warmed else 0.0
+        zscore = residual / math.sqrt(max(variance, EPSILON)) if warmed else 0.0
+        is_anomaly = abs(score) > self.threshold
+
+        bound = self.threshold * scale
+        clipped = min(max(residual, median - bound), median + bound) if is_anomaly else residual
+
+        alpha = self.alpha
+        self.level[row] = value if first else level + alpha * clipped
+        self.variance[row] = (1 - alpha) * variance + alpha * clipped ** 2
+
+        if self.season_length > 1:
+            seen = offset_count + 1
+            rate = max(self.seasonal_alpha, 1.0 / seen)
+            self.offsets[row, slot] = stored_offset + rate * (offset + clipped - stored_offset)
+            self.offset_counts[row, slot] = seen
+
+        distance = abs(clipped - median)
+        if warmed:
+            step = self.mad_rate * max(mad, EPSILON)
+            self.median[row] = median + step * _sign(clipped - median)
+            self.mad[row] = max(mad * (1 + self.mad_rate * _sign(distance - mad)), EPSILON)
+        else:
+            warm_rate = 1.0 / (count + 1)
+            self.median[row] = median + warm_rate * (clipped - median)
+            self.mad[row] = mad + warm_rate * (MEAN_TO_MEDIAN_DEVIATION * distance - mad)
+
+        self.count[row] = count + 1
+        self.last_value[row] = value
+        self.ticks += 1
+        if is_anomaly:
+            self.anomaly_count[row] += 1
+            self.anomalies += 1
+        return expected, score, zscore, is_anomaly
+
+    def backfill(
+        self,
+        series: Union[str, Sequence[str]],
+        values: Union[Sequence[float], np.ndarray],
+        timestamps: Optional[Sequence[Any]] = None
+    ) -> Dict[str, np.ndarray]:
+        """Replay history: ``values`` is (T,) for one series or (T, N) for N series sharing timestamps
+
+        With several series each time step is one vectorized update over
+        all of them, so backfilling thousands costs little more than one;
+        a single series runs the scalar update. The result arrays have the
+        shape of ``values``.
+        """
+        names = [series] if isinstance(series, str) else list(series)
+        values = np.asarray(values, dtype=float)
+        matrix = values.reshape(len(values), -1)
+        if matrix.shape[1] != len(names):
+            raise ValueError(f"Expected {len(names)} columns of values, got {matrix.shape[1]}")
+
+        results = {
+            "expected": np.empty(matrix.shape),
+            "score": np.empty(matrix.shape),
+            "zscore": np.empty(matrix.shape),
+            "is_anomaly": np.empty(matrix.shape, dtype=bool),
+        }
+        with self._lock:
+            rows = self._rows(names)
+            if timestamps is not None:
+                slot_column = self._slots(np.zeros(len(matrix), dtype=np.int64), timestamps)
+            if len(rows) == 1:
+                row = int(rows[0])
+                for step_index, value in enumerate(matrix[:, 0]):
+                    slot = self._slot(row, None) if timestamps is None else int(slot_column[step_index])
+                    step = self._step_one(row, float(value), slot)
+                    for name, result in zip(("expected", "score", "zscore", "is_anomaly"), step):
+                        results[name][step_index, 0] = result
+                return {name: array.reshape(values.shape) for name, array in results.items()}
+            for step_index, row_values in enumerate(matrix):
+                if timestamps is None:
+                    slots = self._slots(rows, None)
+                else:
+                    slots = np.full(len(rows), slot_column[step_index])
+                step = self._step(rows, row_values, slots)
+                for name, array in step.items():
+                    results[name][step_index] = array
+        return {name: array.reshape(values.shape) for name, array in results.items()}
+
+    def get_state(self, series: str) -> Optional[Dict[str, Any]]:
+        """Current state of one series (None if never seen)"""
+        row = self._index.get(series)
+        if row is None:
+            return None
+        return {
+            "series": series,
+            "observations": int(self.count[row]),
+            "level": float(self.level[row]),
+            "sigma": math.sqrt(float(self.variance[row])),
+            "robust_sigma": MAD_TO_SIGMA * float(self.mad[row]),
+            "last_value": float(self.last_value[row]),
+            "anomalies": int(self.anomaly_count[row]),
+            "warmed_up": bool(self.count[row] >= self.warmup)
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Totals across series"""
+        return {
+            "series": len(self._names),
+            "capacity": self.capacity,
+            "ticks": self.ticks,
+            "anomalies": self.anomalies,
+            "threshold": self.threshold,
+            "state_bytes": sum(
+                getattr(self, name).nbytes
+                for name in ("count", "level", "variance", "median", "mad", "anomaly_count", "last_value", "offsets", "offset_counts")
+            )
+        }
+
+
+def _sign(value: float) -> float:
+    return (value > 0) - (value < 0)
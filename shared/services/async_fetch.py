@@ -0,0 +1,166 @@
+"""
+Async Fetch
+Shared HTTP connection pool with per-host limits, coalesced in-flight requests and a bounded TTL cache
+"""
+
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+import aiohttp
+import structlog
+
+logger = structlog.get_logger()
+
+
+def geo_bucket(lat: float, lon: float, resolution: float) -> Tuple[float, float]:
+    """Snap coordinates to the centre of a ``resolution``-degree grid cell (0 keeps them as given)"""
+    if resolution <= 0:
+        return float(lat), float(lon)
+    return round(round(lat / resolution) * resolution, 6), round(round(lon / resolution) * resolution, 6)
+
+
+class TTLCache:
+    """Least-recently-used cache whose entries also expire after ``ttl`` seconds"""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+        expires_at, value = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            self.stats["expired"] += 1
+            self.stats["misses"] += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats["hits"] += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class AsyncFetcher:
+    """One aiohttp session per event loop, shared by every fetch of a service
+
+    The connector caps open connections overall and per host, so a batch
+    over thousands of sites queues on the pool instead of opening a socket
+    each. ``get_json`` and ``cached`` coalesce identical requests: callers
+    arriving while one is in flight await its result rather than starting
+    another. ``cached`` also keeps results in a bounded TTL cache; failures
+    are not cached.
+    """
+
+    def __init__(
+        self,
+        max_connections: Optional[int] = None,
+        per_host: Optional[int] = None,
+        timeout: Optional[float] = None,
+        max_entries: Optional[int] = None,
+        ttl: float = 300
+    ):
+        self.max_connections = max_connections or int(os.getenv("HTTP_POOL_MAX_CONNECTIONS", "100"))
+        self.per_host = per_host or int(os.getenv("HTTP_POOL_PER_HOST", "10"))
+        self.timeout = timeout or float(os.getenv("HTTP_POOL_TIMEOUT_SECONDS", "10"))
+        self.cache = TTLCache(max_entries or int(os.getenv("IOT_CACHE_MAX_ENTRIES", "10000")), ttl)
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.stats = {"requests": 0, "coalesced": 0, "errors": 0}
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            # Sessions and in-flight futures belong to the loop that created them
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections, limit_per_host=self.per_host, ttl_dns_cache=300),
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+            self._session_loop = loop
+            self._inflight.clear()
+        return self._session
+
+    async def _coalesce(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._inflight.get(key)
+        if future is None or future.get_loop() is not asyncio.get_running_loop():
+            future = asyncio.ensure_future(factory())
+            self._inflight[key] = future
+            future.add_done_callback(lambda done: self._inflight.pop(key, None) if self._inflight.get(key) is done else None)
+        else:
+            self.stats["coalesced"] += 1
+        # A cancelled caller must not cancel the request for the others waiting on it
+        return await asyncio.shield(future)
+
+    async def _request_json(self, url: str, params: Optional[Dict[str, Any]], headers: Optional[Dict[str, str]]) -> Any:
+        self.stats["requests"] += 1
+        try:
+            async with self._get_session().get(url, params=params, headers=headers) as response:
+                if response.status != 200:
+                    raise Exception(f"{url} returned status {response.status}")
+                return await response.json()
+        except Exception:
+            self.stats["errors"] += 1
+            raise
+
+    async def get_json(self, url: str, params: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, str]] = None) -> Any:
+        """GET a JSON document through the shared pool; identical concurrent requests share one call"""
+        key = f"GET {url}?{json.dumps(params or {}, sort_keys=True, default=str)}"
+        return await self._coalesce(key, lambda: self._request_json(url, params, headers))
+
+    async def cached(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: Optional[float] = None) -> Any:
+        """Cached value for ``key``, loading it once however many callers miss at the same time"""
+        value = self.cache.get(key)
+        if value is not None:
+            return value
+
+        async def load() -> Any:
+            result = await loader()
+            self.cache.set(key, result, ttl)
+            return result
+
+        return await self._coalesce(f"cache:{key}", load)
+
+    async def gather(self, calls: Iterable[Callable[[], Awaitable[Any]]], limit: int) -> List[Any]:
+        """Run ``calls`` with at most ``limit`` in progress; results (or exceptions) in call order"""
+        semaphore = asyncio.Semaphore(limit)
+
+        async def bounded(call: Callable[[], Awaitable[Any]]) -> Any:
+            async with semaphore:
+                return await call()
+
+        return await asyncio.gather(*(bounded(call) for call in calls), return_exceptions=True)
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "inflight": len(self._inflight),
+            "max_connections": self.max_connections,
+            "per_host": self.per_host,
+            "cache": {"size": len(self.cache), "max_entries": self.cache.max_entries, "ttl_seconds": self.cache.ttl, **self.cache.stats}
+        }
@@ -0,0 +1,418 @@
+"""
+Backtesting
+Walk-forward (rolling-origin) evaluation of the forecasting models on historical data
+"""
+
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import joblib
+import numpy as np
+import pandas as pd
+import structlog
+from sklearn.base import clone
+from sklearn.preprocessing import StandardScaler
+
+from forecasting_service import (
+    HISTORY_HOURS,
+    PROPHET_OPTIONS,
+    ForecastingService,
+    RollingFeatureState,
+    _set_n_jobs,
+    forecasting_service,
+    predict_recursive,
+)
+
+logger = structlog.get_logger()
+
+MODELS = ("ensemble", "prophet", "anomaly_corrected")
+
+
+def _fold_key(*parts: Any) -> str:
+    """Content hash of everything a fitted fold depends on"""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(part.tobytes() if isinstance(part, np.ndarray) else repr(part).encode())
+    return digest.hexdigest()
+
+
+def _load_fold(path: str) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return None
+    try:
+        fitted = joblib.load(path)
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable backtest fold {path}: {e}")
+        return None
+    try:
+        # The modification time doubles as the last use for the cache's LRU eviction
+        os.utime(path)
+    except OSError:
+        pass
+    return fitted
+
+
+def _save_fold(fitted: Dict[str, Any], path: str) -> None:
+    """Write a fitted fold atomically, so concurrent runs never read a partial file"""
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        joblib.dump(fitted, temp_path)
+        os.replace(temp_path, path)
+    except Exception as e:
+        logger.warning(f"Failed to cache backtest fold {path}: {e}")
+
+
+def _fit_fold(job: Dict[str, Any]) -> Dict[str, Any]:
+    started = time.perf_counter()
+    if job["model"] == "ensemble":
+        model, scaler = clone(job["template"]), StandardScaler()
+        _set_n_jobs(model, job["n_jobs"])
+        model.fit(scaler.fit_transform(job["X"]), job["y"])
+        fitted = {"model": model, "scaler": scaler}
+    else:
+        from prophet import Prophet
+        from prophet.serialize import model_to_json
+
+        model = Prophet(**PROPHET_OPTIONS)
+        model.fit(job["history"].rename(columns={"timestamp": "ds", "price": "y"}))
+        # Prophet models are stored as JSON, not pickled
+        fitted = {"prophet_json": model_to_json(model)}
+    fitted["fit_seconds"] = time.perf_counter() - started
+    return fitted
+
+
+def _predict_fold(job: Dict[str, Any], fitted: Dict[str, Any]) -> np.ndarray:
+    if job["model"] == "ensemble":
+        return predict_recursive(
+            fitted["model"], fitted["scaler"], job["state"], job["timestamps"], job["recursive_hours"]
+        )
+    from prophet.serialize import model_from_json
+
+    model = model_from_json(fitted["prophet_json"])
+    return model.predict(pd.DataFrame({"ds": job["timestamps"]}))["yhat"].to_numpy()
+
+
+def run_backtest_fold(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Fit (or load) one model on one fold's training rows and forecast its test window (process pool entry point)
+
+    ``job`` is built by Backtester._fold_jobs. Fitted folds are cached under
+    ``cache_path``, keyed by the training data and model settings, so a
+    rerun over the same history only repeats the forecasts.
+    """
+    fitted = _load_fold(job["cache_path"])
+    cached = fitted is not None
+    if fitted is None:
+        fitted = _fit_fold(job)
+        _save_fold(fitted, job["cache_path"])
+
+    started = time.perf_counter()
+    predictions = _predict_fold(job, fitted)
+    return {
+        "model": job["model"],
+        "fold": job["fold"],
+        "predictions": np.asarray(predictions, dtype=float),
+        "train_rows": job["train_rows"],
+        "fit_seconds": fitted["fit_seconds"],
+        "predict_seconds": time.perf_counter() - started,
+        "cached": cached
+    }
+
+
+class Backtester:
+    """Rolling-origin evaluation of the ensemble, Prophet and anomaly-corrected forecasts
+
+    The history is split at ``folds`` origins, ``step_hours`` apart and
+    ending ``horizon_hours`` before the last observation. For each origin
+    every model is fitted on the rows before it (all of them, or the last
+    ``train_window_hours``) and forecasts the next ``horizon_hours``, which
+    are scored against the actuals. Folds run on a process pool with
+    ``n_jobs`` threads each; the anomaly-corrected forecast reuses the
+    ensemble folds and adds the detection and smoothing step in this
+    process. Fit times are reported as originally measured, also for folds
+    loaded from the cache, so costs stay comparable across runs.
+
+    After each run the fold cache is pruned: folds unused for
+    ``cache_seconds`` are deleted, then the least recently used ones until
+    the cache fits in ``cache_max_bytes`` (0 disables either limit).
+    """
+
+    def __init__(
+        self,
+        service: ForecastingService,
+        max_workers: Optional[int] = None,
+        n_jobs: Optional[int] = None,
+        cache_dir: Optional[str] = None,
+        cache_max_bytes: Optional[int] = None,
+        cache_seconds: Optional[float] = None
+    ):
+        self.service = service
+        self.max_workers = max_workers or int(os.getenv("BACKTEST_WORKERS", "2"))
+        self.n_jobs = n_jobs or int(os.getenv("BACKTEST_JOBS", "1"))
+        self.cache_dir = Path(cache_dir or os.getenv("BACKTEST_CACHE_DIR", "models/backtests"))
+        self.cache_max_bytes = (
+            int(os.getenv("BACKTEST_CACHE_MAX_MB", "2048")) * 1024 * 1024 if cache_max_bytes is None else cache_max_bytes
+        )
+        self.cache_seconds = float(os.getenv("BACKTEST_CACHE_SECONDS", "604800")) if cache_seconds is None else cache_seconds
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+    @staticmethod
+    def make_folds(
+        rows: int,
+        horizon_hours: int,
+        folds: int,
+        step_hours: Optional[int] = None,
+        min_train_hours: int = 168,
+        train_window_hours: Optional[int] = None
+    ) -> List[Dict[str, int]]:
+        """Row ranges of each fold, oldest origin first; origins leaving fewer than ``min_train_hours`` rows are dropped"""
+        step = step_hours or horizon_hours
+        result = []
+        for k in range(folds - 1, -1, -1):
+            origin = rows - horizon_hours - k * step
+            if origin < min_train_hours:
+                continue
+            start = max(0, origin - train_window_hours) if train_window_hours else 0
+            result.append({"train_start": start, "origin": origin, "end": origin + horizon_hours})
+        return result
+
+    def _fold_jobs(
+        self,
+        df: pd.DataFrame,
+        folds: List[Dict[str, int]],
+        models: Sequence[str],
+        recursive_hours: int
+    ) -> List[Dict[str, Any]]:
+        """Arguments for run_backtest_fold, one per model and fold"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # Features at hour t only use earlier prices, so one pass over the whole history serves every fold
+        features = self.service._engineer_features(df)
+        valid = features.notna().all(axis=1).to_numpy()
+        X, y = features.to_numpy(dtype=float), df["price"].to_numpy()
+        template = self.service._new_model("ensemble")
+        template_params = sorted((name, repr(value)) for name, value in template.get_params().items())
+
+        jobs = []
+        for index, fold in enumerate(folds):
+            start, origin, end = fold["train_start"], fold["origin"], fold["end"]
+            timestamps = pd.DatetimeIndex(df["timestamp"].iloc[origin:end])
+            common = {"fold": index, "timestamps": timestamps}
+            if "ensemble" in models:
+                rows = np.flatnonzero(valid[start:origin]) + start
+                key = _fold_key("ensemble", template_params, X[rows], y[rows])
+                jobs.append({
+                    **common,
+                    "model": "ensemble",
+                    "template": template,
+                    "n_jobs": self.n_jobs,
+                    "X": X[rows],
+                    "y": y[rows],
+                    "train_rows": len(rows),
+                    "state": RollingFeatureState.from_frame(df.iloc[max(0, origin - HISTORY_HOURS):origin]),
+                    "recursive_hours": recursive_hours,
+                    "cache_path": str(self.cache_dir / f"ensemble_{key}.joblib")
+                })
+            if "prophet" in models:
+                history = df[["timestamp", "price"]].iloc[start:origin].reset_index(drop=True)
+                key = _fold_key(
+                    "prophet", sorted(PROPHET_OPTIONS.items()),
+                    history["timestamp"].to_numpy(), history["price"].to_numpy()
+                )
+                jobs.append({
+                    **common,
+                    "model": "prophet",
+                    "history": history,
+                    "train_rows": len(history),
+                    "cache_path": str(self.cache_dir / f"prophet_{key}.joblib")
+                })
+        return jobs
+
+    def _anomaly_corrected(self, result: Dict[str, Any], method: str) -> Dict[str, Any]:
+        """An ensemble fold passed through forecast_with_anomaly_detection's detection and smoothing"""
+        started = time.perf_counter()
+        points = [{"predicted_price": float(value)} for value in result["predictions"]]
+        anomalies = self.service.detect_anomalies([point["predicted_price"] for point in points], method)
+        if anomalies.get("anomalies"):
+            points = self.service._apply_anomaly_corrections(points, anomalies)
+        return {
+            **result,
+            "model": "anomaly_corrected",
+            "predictions": np.array([point["predicted_price"] for point in points]),
+            "predict_seconds": result["predict_seconds"] + time.perf_counter() - started
+        }
+
+    @staticmethod
+    def _score(results: List[Dict[str, Any]], actuals: List[np.ndarray]) -> Dict[str, Any]:
+        """MAE and MAPE per forecast hour across folds, plus totals and throughput"""
+        errors = np.vstack([result["predictions"] - actuals[result["fold"]] for result in results])
+        actual = np.vstack([actuals[result["fold"]] for result in results])
+        absolute = np.abs(errors)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            percentage = np.where(actual != 0, absolute / np.abs(actual) * 100, np.nan)
+
+        fit_seconds = sum(result["fit_seconds"] for result in results)
+        predict_seconds = sum(result["predict_seconds"] for result in results)
+        train_rows = sum(result["train_rows"] for result in results)
+        return {
+            "folds": len(results),
+            "mae": round(float(absolute.mean()), 4),
+            "rmse": round(float(np.sqrt((errors ** 2).mean())), 4),
+            "mape": round(float(np.nanmean(percentage)), 2),
+            "horizons": [
+                {"horizon": hour + 1, "mae": round(float(mae), 4), "mape": round(float(mape), 2)}
+                for hour, (mae, mape) in enumerate(zip(absolute.mean(axis=0), np.nanmean(percentage, axis=0)))
+            ],
+            "throughput": {
+                "fit_seconds": round(fit_seconds, 3),
+                "predict_seconds": round(predict_seconds, 3),
+                "seconds_per_fold": round((fit_seconds + predict_seconds) / len(results), 3),
+                "train_rows_per_second": round(train_rows / fit_seconds, 1) if fit_seconds else None,
+                "forecast_hours_per_second": round(absolute.size / predict_seconds, 1) if predict_seconds else None,
+                "cached_folds": sum(result["cached"] for result in results)
+            }
+        }
+
+    def run(
+        self,
+        commodity: str,
+        historical_data: List[Dict[str, Any]],
+        models: Sequence[str] = MODELS,
+        horizon_hours: int = 24,
+        folds: int = 5,
+        step_hours: Optional[int] = None,
+        min_train_hours: int = 168,
+        train_window_hours: Optional[int] = None,
+        recursive_hours: Optional[int] = None,
+        anomaly_method: str = "isolation_forest"
+    ) -> Dict[str, Any]:
+        """Walk-forward backtest of ``models`` over hourly ``historical_data``
+
+        Returns per-model accuracy by forecast hour and cost, plus a ranking
+        by MAE. Models that cannot run (Prophet not installed, failed folds)
+        report an error instead of metrics.
+        """
+        started = time.perf_counter()
+        unknown = sorted(set(models) - set(MODELS))
+        if unknown:
+            return {"error": f"Unknown models: {', '.join(unknown)}"}
+
+        df = self.service._history_frame(historical_data)
+        fold_ranges = self.make_folds(len(df), horizon_hours, folds, step_hours, min_train_hours, train_window_hours)
+        if not fold_ranges:
+            return {"error": f"Insufficient data for backtesting {commodity}: {len(df)} rows"}
+
+        report: Dict[str, Any] = {}
+        fitted_models = {"ensemble"} if {"ensemble", "anomaly_corrected"} & set(models) else set()
+        if "prophet" in models:
+            if self.service.prophet_available:
+                fitted_models.add("prophet")
+            else:
+                report["prophet"] = {"error": "Prophet library not available"}
+
+        recursive = self.service.recursive_hours if recursive_hours is None else recursive_hours
+        jobs = self._fold_jobs(df, fold_ranges, sorted(fitted_models), recursive)
+        futures = [(job["model"], self._get_executor().submit(run_backtest_fold, job)) for job in jobs]
+
+        results: Dict[str, List[Dict[str, Any]]] = {name: [] for name in fitted_models}
+        failures: Dict[str, str] = {}
+        for name, future in futures:
+            try:
+                results[name].append(future.result())
+            except Exception as e:
+                logger.error(f"Backtest fold failed for {commodity} ({name}): {e}")
+                failures[name] = str(e)
+        self.prune_cache()
+        if "anomaly_corrected" in models and "ensemble" not in failures:
+            results["anomaly_corrected"] = [
+                self._anomaly_corrected(result, anomaly_method) for result in results["ensemble"]
+            ]
+
+        actuals = [df["price"].to_numpy()[fold["origin"]:fold["end"]] for fold in fold_ranges]
+        for name in models:
+            if name in report:
+                continue
+            error = failures.get("ensemble" if name == "anomaly_corrected" else name)
+            report[name] = {"error": error} if error else self._score(results[name], actuals)
+
+        ranking = sorted(
+            (name for name in models if "error" not in report[name]), key=lambda name: report[name]["mae"]
+        )
+        return {
+            "commodity": commodity,
+            "horizon_hours": horizon_hours,
+            "folds": [
+                {
+                    "origin": df["timestamp"].iloc[fold["origin"]].isoformat(),
+                    "train_rows": fold["origin"] - fold["train_start"],
+                    "test_rows": fold["end"] - fold["origin"]
+                }
+                for fold in fold_ranges
+            ],
+            "models": report,
+            "ranking": [
+                {
+                    "model": name,
+                    "mae": report[name]["mae"],
+                    "mape": report[name]["mape"],
+                    "seconds_per_fold": report[name]["throughput"]["seconds_per_fold"]
+                }
+                for name in ranking
+            ],
+            "wall_seconds": round(time.perf_counter() - started, 3),
+            "timestamp": datetime.now().isoformat()
+        }
+
+    def prune_cache(self) -> int:
+        """Delete expired and least recently used cached folds; returns the number removed"""
+        entries = []
+        for path in self.cache_dir.glob("*.joblib"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort(key=lambda entry: entry[0])
+
+        cutoff = time.time() - self.cache_seconds if self.cache_seconds else None
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for mtime, size, path in entries:
+            expired = cutoff is not None and mtime < cutoff
+            if not expired and (not self.cache_max_bytes or total <= self.cache_max_bytes):
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        if removed:
+            logger.info(f"Pruned {removed} cached backtest folds")
+        return removed
+
+    def clear_cache(self) -> int:
+        """Delete all cached fitted folds; returns the number removed"""
+        removed = 0
+        for path in self.cache_dir.glob("*.joblib"):
+            path.unlink(missing_ok=True)
+            removed += 1
+        return removed
+
+    def shutdown(self, wait_for_jobs: bool = True) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait_for_jobs)
+                self._executor = None
+
+
+# Global instance
+backtester = Backtester(forecasting_service)
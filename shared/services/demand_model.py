@@ -0,0 +1,161 @@
+"""
+Demand Model
+Per-site demand regression on weather, fitted for every site in one batched least-squares solve
+"""
+
+import hashlib
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import structlog
+
+logger = structlog.get_logger()
+
+# Intercept, temperature, temperature squared (heating and cooling load), humidity
+FEATURES = ("intercept", "temperature", "temperature_sq", "humidity")
+
+
+class DemandModel:
+    """Linear demand model per site: demand ~ 1 + T + T^2 + H
+
+    ``fit`` takes (sites x time) matrices; NaN marks a missing observation.
+    Temperature and humidity are centred on each site's means, the normal
+    equations of all sites are accumulated column by column (no sites x
+    time x features tensor) and solved together with a small ridge term.
+    Sites with too few observations get their mean demand. A refit with exactly the same inputs is skipped, so callers can
+    fit before every forecast and only pay when new data has arrived.
+    ``predict`` evaluates all sites over a (sites x hours) weather forecast
+    in one call.
+    """
+
+    def __init__(self, ridge: Optional[float] = None):
+        self.ridge = float(os.getenv("DEMAND_MODEL_RIDGE", "0.001")) if ridge is None else ridge
+        self.sites = pd.Index([], dtype=object)
+        self.coefficients = np.zeros((0, len(FEATURES)))
+        self.means = np.zeros((0, 2))
+        self.r2 = np.zeros(0)
+        self.observations = np.zeros(0, dtype=np.int64)
+        self.fingerprint: Optional[str] = None
+        self.fitted_at: Optional[pd.Timestamp] = None
+        self.stats = {"fits": 0, "cached_fits": 0, "predictions": 0}
+
+    @staticmethod
+    def _columns(temperature: np.ndarray, humidity: np.ndarray, means: np.ndarray, weight: Any = 1.0) -> tuple:
+        """Feature matrices (sites x time) in FEATURES order, on centred weather"""
+        t = temperature - means[:, :1]
+        h = humidity - means[:, 1:]
+        return np.broadcast_to(np.asarray(weight, dtype=float), t.shape), t, t * t, h
+
+    @staticmethod
+    def _fingerprint(sites: Sequence[str], *arrays: np.ndarray) -> str:
+        digest = hashlib.sha256()
+        digest.update("\x1f".join(map(str, sites)).encode())
+        for array in arrays:
+            digest.update(str(array.shape).encode())
+            digest.update(memoryview(np.ascontiguousarray(array)).cast("B"))
+        return digest.hexdigest()
+
+    def fit(self, sites: Sequence[str], temperature: Any, humidity: Any, demand: Any) -> bool:
+        """Fit coefficients for every site; returns False when the inputs are unchanged and nothing was refitted"""
+        temperature, humidity, demand = (np.asarray(array, dtype=float) for array in (temperature, humidity, demand))
+        if not temperature.shape == humidity.shape == demand.shape == (len(sites), temperature.shape[1]):
+            raise ValueError("temperature, humidity and demand must be (sites x time) matrices of the same shape")
+
+        fingerprint = self._fingerprint(sites, temperature, humidity, demand)
+        if fingerprint == self.fingerprint:
+            self.stats["cached_fits"] += 1
+            return False
+
+        valid = np.isfinite(temperature) & np.isfinite(humidity) & np.isfinite(demand)
+        counts = valid.sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = np.stack((
+                np.where(valid, temperature, 0).sum(axis=1) / counts,
+                np.where(valid, humidity, 0).sum(axis=1) / counts,
+            ), axis=1)
+            mean_demand = np.where(valid, demand, 0).sum(axis=1) / counts
+        means = np.nan_to_num(means)
+
+        # Missing observations become all-zero columns, which drop out of the normal equations
+        columns = self._columns(
+            np.where(valid, temperature, means[:, :1]), np.where(valid, humidity, means[:, 1:]), means, valid
+        )
+        y = np.where(valid, demand, 0)
+        k = len(FEATURES)
+        gram = np.empty((len(sites), k, k))
+        for i in range(k):
+            for j in range(i, k):
+                gram[:, i, j] = gram[:, j, i] = np.einsum("st,st->s", columns[i], columns[j])
+        moments = np.stack([np.einsum("st,st->s", column, y) for column in columns], axis=1)
+
+        scale = np.trace(gram, axis1=1, axis2=2) / k
+        penalty = self.ridge * np.maximum(scale, 1e-12)[:, None, None] * np.eye(k)
+        penalty[:, 0, 0] = 0  # the intercept is not shrunk
+        coefficients = np.linalg.solve(gram + penalty + 1e-12 * np.eye(k), moments[..., None])[..., 0]
+
+        sparse = counts <= k
+        coefficients[sparse] = 0
+        coefficients[sparse, 0] = np.nan_to_num(mean_demand[sparse])
+
+        # Residual and total sums of squares from the normal equations, without another pass over the data
+        yy = np.einsum("st,st->s", y, y)
+        residual = yy - 2 * np.einsum("sk,sk->s", coefficients, moments) + np.einsum("sk,skl,sl->s", coefficients, gram, coefficients)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            r2 = 1 - residual / (yy - counts * mean_demand ** 2)
+
+        self.sites = pd.Index(list(sites), dtype=object)
+        self.coefficients = coefficients
+        self.means = means
+        self.r2 = np.where(sparse, np.nan, r2)
+        self.observations = counts
+        self.fingerprint = fingerprint
+        self.fitted_at = pd.Timestamp.now()
+        self.stats["fits"] += 1
+        return True
+
+    def predict(self, sites: Sequence[str], temperature: Any, humidity: Any) -> np.ndarray:
+        """Demand (sites x hours) for a weather forecast; rows of sites never fitted are NaN"""
+        temperature, humidity = np.asarray(temperature, dtype=float), np.asarray(humidity, dtype=float)
+        if temperature.shape != humidity.shape or temperature.shape[0] != len(sites):
+            raise ValueError("temperature and humidity forecasts must be (sites x hours) matrices of the same shape")
+
+        index = self.sites.get_indexer(list(sites))
+        known = index >= 0
+        rows = np.where(known, index, 0)
+        if len(self.sites):
+            means, coefficients = self.means[rows], self.coefficients[rows]
+        else:
+            means, coefficients = np.zeros((len(sites), 2)), np.zeros((len(sites), len(FEATURES)))
+        columns = self._columns(temperature, humidity, means)
+        predictions = sum(coefficients[:, i, None] * column for i, column in enumerate(columns))
+        predictions[~known] = np.nan
+        self.stats["predictions"] += 1
+        return np.maximum(predictions, 0)
+
+    def site_summary(self, sites: Sequence[str]) -> List[Dict[str, Any]]:
+        """Coefficients, fit quality and observation count per site"""
+        index = self.sites.get_indexer(list(sites))
+        summary = []
+        for site, row in zip(sites, index):
+            if row < 0:
+                summary.append({"site": site, "fitted": False})
+                continue
+            summary.append({
+                "site": site,
+                "fitted": True,
+                "coefficients": dict(zip(FEATURES, np.round(self.coefficients[row], 6).tolist())),
+                "r2": None if np.isnan(self.r2[row]) else round(float(self.r2[row]), 4),
+                "observations": int(self.observations[row])
+            })
+        return summary
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "sites": len(self.sites),
+            "features": list(FEATURES),
+            "ridge": self.ridge,
+            "fitted_at": self.fitted_at.isoformat() if self.fitted_at is not None else None,
+            **self.stats
+        }
@@ -0,0 +1,422 @@
+"""
+Forecast Cache
+Two-tier result cache (in-process LRU over Redis) with single-flight recomputes, early refresh and tag invalidation
+"""
+
+import json
+import math
+import os
+import random
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterable, Optional
+
+import numpy as np
+import structlog
+
+logger = structlog.get_logger()
+
+# One format byte, then JSON (zlib-compressed above COMPRESS_MIN_BYTES)
+FORMAT_JSON = b"J"
+FORMAT_ZLIB = b"Z"
+COMPRESS_MIN_BYTES = 1024
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    raise TypeError(f"Cannot cache value of type {type(value).__name__}")
+
+
+def encode_value(value: Any) -> bytes:
+    """Compact JSON encoding of a cacheable value (dicts, lists, numbers, strings, NumPy values, datetimes)"""
+    body = json.dumps(value, separators=(",", ":"), default=_json_default).encode("utf-8")
+    if len(body) >= COMPRESS_MIN_BYTES:
+        return FORMAT_ZLIB + zlib.compress(body, 1)
+    return FORMAT_JSON + body
+
+
+def decode_value(data: bytes) -> Any:
+    """Inverse of encode_value; datetimes come back as ISO strings"""
+    kind, body = data[:1], data[1:]
+    if kind == FORMAT_ZLIB:
+        body = zlib.decompress(body)
+    elif kind != FORMAT_JSON:
+        raise ValueError(f"Unknown cache format {kind!r}")
+    return json.loads(body)
+
+
+class CacheEntry:
+    """A cached value with its logical expiry, recompute cost and tag versions"""
+
+    __slots__ = ("value", "expires_at", "delta", "tags")
+
+    def __init__(self, value: Any, expires_at: float, delta: float, tags: Dict[str, int]):
+        self.value = value
+        self.expires_at = expires_at
+        self.delta = delta
+        self.tags = tags
+
+    def encode(self) -> bytes:
+        return encode_value({"value": self.value, "expires_at": self.expires_at, "delta": self.delta, "tags": self.tags})
+
+    @classmethod
+    def decode(cls, data: bytes) -> "CacheEntry":
+        envelope = decode_value(data)
+        return cls(envelope["value"], envelope["expires_at"], envelope["delta"], envelope["tags"])
+
+
+class _Flight:
+    """One in-progress recompute that concurrent callers for the same key wait on"""
+
+    __slots__ = ("event", "value", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+    def resolve(self, value: Any = None, error: Optional[BaseException] = None) -> None:
+        self.value, self.error = value, error
+        self.event.set()
+
+    def wait(self) -> Any:
+        self.event.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class ForecastCache:
+    """Result cache shared by the workers of one deployment
+
+    Lookups try a bounded in-process LRU, then Redis; values are stored as
+    compact JSON (never pickle). ``get_or_compute`` recomputes a missing or
+    expired key once per process (single-flight) and once across workers (a
+    short Redis lease); callers that arrive meanwhile get the previous value
+    while it is still held and not invalidated, or wait for the new one.
+    Waiting blocks the thread, so call it from async code through
+    ``asyncio.to_thread``. Fresh entries are
+    refreshed early with probability rising towards expiry and with the
+    cost of the last recompute (XFetch), so hot keys rarely expire at all.
+
+    Entries carry the versions of their tags (``commodity:crude_oil``) at
+    write time; ``invalidate`` bumps a tag's version in one Redis hash, and
+    entries written under an older version count as stale. Workers re-read
+    tag versions at most every ``tag_check_interval`` seconds.
+    """
+
+    def __init__(
+        self,
+        redis_client: Any = None,
+        namespace: str = "forecast",
+        max_entries: Optional[int] = None,
+        ttl: Optional[float] = None,
+        stale_seconds: Optional[float] = None,
+        beta: Optional[float] = None,
+        lease_seconds: Optional[float] = None,
+        tag_check_interval: Optional[float] = None
+    ):
+        self.redis = redis_client
+        self.namespace = namespace
+        self.max_entries = max_entries or int(os.getenv("FORECAST_CACHE_MAX_ENTRIES", "1024"))
+        self.ttl = ttl or float(os.getenv("FORECAST_CACHE_TTL", "300"))
+        self.stale_seconds = float(os.getenv("FORECAST_CACHE_STALE_SECONDS", "120")) if stale_seconds is None else stale_seconds
+        self.beta = float(os.getenv("FORECAST_CACHE_EARLY_REFRESH_BETA", "1.0")) if beta is None else beta
+        self.lease_seconds = float(os.getenv("FORECAST_CACHE_LEASE_SECONDS", "10")) if lease_seconds is None else lease_seconds
+        self.tag_check_interval = (
+            float(os.getenv("FORECAST_CACHE_TAG_CHECK_SECONDS", "1")) if tag_check_interval is None else tag_check_interval
+        )
+        self.poll_interval = 0.05
+
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._flights: Dict[str, _Flight] = {}
+        self._tag_versions: Dict[str, int] = {}
+        self._tags_checked_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.stats = {
+            "hits": 0,
+            "local_hits": 0,
+            "misses": 0,
+            "stale_served": 0,
+            "early_refreshes": 0,
+            "coalesced": 0,
+            "computes": 0,
+            "invalidations": 0,
+            "redis_errors": 0
+        }
+
+    def _redis_key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    @property
+    def _tags_key(self) -> str:
+        return f"{self.namespace}:tags"
+
+    def _redis_failed(self, operation: str, error: Exception) -> None:
+        self.stats["redis_errors"] += 1
+        logger.warning(f"Forecast cache {operation} failed: {error}")
+
+    # Tags
+
+    def tag_versions(self, tags: Iterable[str]) -> Dict[str, int]:
+        """Current version of each tag (0 for tags never invalidated)"""
+        tags = list(tags)
+        now = time.monotonic()
+        due = [tag for tag in tags if now - self._tags_checked_at.get(tag, -math.inf) >= self.tag_check_interval]
+        if due and self.redis is not None:
+            try:
+                for tag, version in zip(due, self.redis.hmget(self._tags_key, due)):
+                    self._tag_versions[tag] = max(self._tag_versions.get(tag, 0), int(version or 0))
+                    self._tags_checked_at[tag] = now
+            except Exception as e:
+                self._redis_failed("tag lookup", e)
+        return {tag: self._tag_versions.get(tag, 0) for tag in tags}
+
+    def invalidate(self, *tags: str) -> Dict[str, int]:
+        """Mark every entry carrying one of the tags stale; returns the new tag versions"""
+        for tag in tags:
+            version = self._tag_versions.get(tag, 0) + 1
+            if self.redis is not None:
+                try:
+                    version = int(self.redis.hincrby(self._tags_key, tag, 1))
+                except Exception as e:
+                    self._redis_failed("invalidation", e)
+            self._tag_versions[tag] = max(version, self._tag_versions.get(tag, 0) + 1)
+            self._tags_checked_at[tag] = time.monotonic()
+        self.stats["invalidations"] += len(tags)
+        return {tag: self._tag_versions[tag] for tag in tags}
+
+    def _is_current(self, entry: CacheEntry) -> bool:
+        return not entry.tags or self.tag_versions(entry.tags) == entry.tags
+
+    # Storage tiers
+
+    def _lookup(self, key: str) -> Optional[CacheEntry]:
+        """Entry from the local LRU or Redis, including stale entries still within their grace period"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now < entry.expires_at + self.stale_seconds:
+                    self._entries.move_to_end(key)
+                    self.stats["local_hits"] += 1
+                    return entry
+                del self._entries[key]
+
+        if self.redis is None:
+            return None
+        try:
+            data = self.redis.get(self._redis_key(key))
+        except Exception as e:
+            self._redis_failed("get", e)
+            return None
+        if data is None:
+            return None
+        try:
+            entry = CacheEntry.decode(data)
+        except Exception as e:
+            logger.warning(f"Dropping undecodable cache entry {key}: {e}")
+            self.delete(key)
+            return None
+        self._remember(key, entry)
+        return entry
+
+    def _remember(self, key: str, entry: CacheEntry) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _store(self, key: str, entry: CacheEntry, ttl: float) -> bool:
+        self._remember(key, entry)
+        if self.redis is None:
+            return True
+        try:
+            # Kept past its logical expiry so it can be served while one caller recomputes
+            return bool(self.redis.set(self._redis_key(key), entry.encode(), px=int((ttl + self.stale_seconds) * 1000)))
+        except TypeError as e:
+            logger.warning(f"Value for {key} is not cacheable: {e}")
+            return False
+        except Exception as e:
+            self._redis_failed("set", e)
+            return False
+
+    # Plain get/set
+
+    def get(self, key: str) -> Optional[Any]:
+        """Fresh cached value, or None"""
+        entry = self._lookup(key)
+        if entry is None or time.time() >= entry.expires_at or not self._is_current(entry):
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return entry.value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, tags: Iterable[str] = ()) -> bool:
+        """Cache a value under the current versions of its tags"""
+        ttl = ttl or self.ttl
+        return self._store(key, CacheEntry(value, time.time() + ttl, 0.0, self.tag_versions(tags)), ttl)
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            removed = self._entries.pop(key, None) is not None
+        if self.redis is not None:
+            try:
+                removed = bool(self.redis.delete(self._redis_key(key))) or removed
+            except Exception as e:
+                self._redis_failed("delete", e)
+        return removed
+
+    def clear_local(self) -> None:
+        """Drop the in-process tier (Redis entries are kept)"""
+        with self._lock:
+            self._entries.clear()
+
+    # Read-through
+
+    def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Any],
+        ttl: Optional[float] = None,
+        tags: Iterable[str] = (),
+        cacheable: Optional[Callable[[Any], bool]] = None
+    ) -> Any:
+        """Cached value for ``key``, calling ``compute`` at most once per process and lease when it is due
+
+        ``cacheable`` decides whether a computed value is stored (e.g. not error results).
+        """
+        tags = list(tags)
+        entry = self._lookup(key)
+        now = time.time()
+        if entry is not None and now < entry.expires_at and self._is_current(entry):
+            # XFetch: refresh early with probability growing as expiry nears and with recompute cost
+            if now - entry.delta * self.beta * math.log(1.0 - random.random()) < entry.expires_at:
+                self.stats["hits"] += 1
+                return entry.value
+            self.stats["early_refreshes"] += 1
+        else:
+            self.stats["misses"] += 1
+        return self._refresh(key, compute, ttl or self.ttl, tags, cacheable, entry)
+
+    def _refresh(
+        self,
+        key: str,
+        compute: Callable[[], Any],
+        ttl: float,
+        tags: list,
+        cacheable: Optional[Callable[[Any], bool]],
+        previous: Optional[CacheEntry]
+    ) -> Any:
+        # Expired entries may be served while the new value is computed; invalidated ones never are
+        if previous is not None and not self._is_current(previous):
+            previous = None
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            if previous is not None:
+                self.stats["stale_served"] += 1
+                return previous.value
+            self.stats["coalesced"] += 1
+            return flight.wait()
+
+        lease = None
+        try:
+            lease = self._acquire_lease(key)
+            if lease is False:
+                # Another worker is recomputing: keep serving the previous value, or wait for theirs
+                if previous is not None:
+                    self.stats["stale_served"] += 1
+                    flight.resolve(previous.value)
+                    return previous.value
+                entry = self._wait_for_entry(key)
+                if entry is not None:
+                    self.stats["coalesced"] += 1
+                    flight.resolve(entry.value)
+                    return entry.value
+
+            tag_versions = self.tag_versions(tags)
+            started = time.perf_counter()
+            value = compute()
+            delta = time.perf_counter() - started
+            self.stats["computes"] += 1
+            if cacheable is None or cacheable(value):
+                self._store(key, CacheEntry(value, time.time() + ttl, delta, tag_versions), ttl)
+            flight.resolve(value)
+            return value
+        except BaseException as e:
+            flight.resolve(error=e)
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            if lease:
+                self._release_lease(key, lease)
+
+    def _acquire_lease(self, key: str):
+        """Lease token, None without Redis (nothing to coordinate), or False when another worker holds it"""
+        if self.redis is None or self.lease_seconds <= 0:
+            return None
+        token = uuid.uuid4().hex
+        try:
+            acquired = self.redis.set(f"{self._redis_key(key)}:lease", token, nx=True, px=int(self.lease_seconds * 1000))
+        except Exception as e:
+            self._redis_failed("lease", e)
+            return None
+        return token if acquired else False
+
+    def _release_lease(self, key: str, token: str) -> None:
+        lease_key = f"{self._redis_key(key)}:lease"
+        try:
+            held = self.redis.get(lease_key)
+            if held is not None and (held.decode() if isinstance(held, bytes) else held) == token:
+                self.redis.delete(lease_key)
+        except Exception as e:
+            self._redis_failed("lease release", e)
+
+    def _wait_for_entry(self, key: str) -> Optional[CacheEntry]:
+        """Poll Redis for the lease holder's result until the lease would have expired
+
+        Blocks the calling thread; async callers run get_or_compute in a worker thread.
+        """
+        deadline = time.monotonic() + self.lease_seconds
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            try:
+                data = self.redis.get(self._redis_key(key))
+                entry = CacheEntry.decode(data) if data is not None else None
+            except Exception as e:
+                self._redis_failed("get", e)
+                return None
+            if entry is not None and time.time() < entry.expires_at and self._is_current(entry):
+                self._remember(key, entry)
+                return entry
+        return None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and tier sizes"""
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+            "local_entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "redis": self.redis is not None,
+            "in_flight": len(self._flights)
+        }
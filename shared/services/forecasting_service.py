@@ -7,6 +7,7 @@ import time
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor, VotingRegressor
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import mean_absolute_error, mean_squared_error
+from sklearn.base import clone
 import joblib
 import os
 from pathlib import Path
@@ -14,11 +15,494 @@ import warnings
 import requests
 import json
 import redis
-import pickle
 import hashlib
+import functools
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+
+from anomaly_detection import StreamingAnomalyDetector
+from forecast_cache import ForecastCache
 
 logger = structlog.get_logger()
 
+# Shared, hot-reloadable model artifacts and service metrics when running inside the backend app
+try:
+    from app.core.model_store import model_store
+    from app.core.model_registry import model_registry
+    from app.core.instrumentation import instrument
+except ImportError:
+    model_store = None
+    model_registry = None
+
+    def instrument(operation, batch=None):
+        return lambda func: func
+
+# Feature layout shared by training and forecasting (46 columns, hourly data)
+FEATURE_LAGS = [1, 2, 3, 6, 12, 24]
+ROLLING_WINDOWS = [3, 6, 12, 24]
+FEATURE_COLUMNS = (
+    ["volume", "hour", "day_of_week", "month", "day_of_year", "quarter", "is_weekend", "is_month_start", "is_month_end"]
+    + [f"{series}_lag_{lag}" for lag in FEATURE_LAGS for series in ("price", "volume")]
+    + [
+        f"{name}_{window}"
+        for window in ROLLING_WINDOWS
+        for name in ("price_mean", "price_std", "price_min", "price_max", "volume_mean")
+    ]
+    + ["price_change", "price_change_24", "momentum_12", "volatility_24", "volume_change"]
+)
+# Hours of recent history kept per commodity to seed lag and rolling features
+HISTORY_HOURS = 48
+VOLATILITY_WINDOW = 24
+# Longest forecast served, in days
+MAX_FORECAST_DAYS = 30
+
+
+class RollingFeatureState:
+    """Recent hourly observations of one commodity in ring buffers
+    
+    ``push`` records an hourly actual (or a forecast, when forecasting
+    recursively) in O(1): the ring slot is overwritten and the running
+    sums and sums of squares for every rolling window are adjusted by the
+    value entering and the one leaving. ``features`` then yields the next
+    hour's feature row in FEATURE_COLUMNS order without a DataFrame.
+    Window minima and maxima are read from the ring (at most 24 values).
+    """
+    
+    def __init__(self, capacity: int = HISTORY_HOURS):
+        self.capacity = capacity
+        self.prices = np.zeros(capacity)
+        self.volumes = np.zeros(capacity)
+        self.returns = np.zeros(capacity)
+        self.count = 0
+        self.last_timestamp: Optional[pd.Timestamp] = None
+        # Per window: price sum, price sum of squares, volume sum
+        self.window_sums = np.zeros((len(ROLLING_WINDOWS), 3))
+        self.return_sums = np.zeros(2)
+    
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, capacity: int = HISTORY_HOURS) -> "RollingFeatureState":
+        """State seeded with the latest rows of a timestamp/price/volume frame"""
+        state = cls(capacity)
+        for timestamp, price, volume in df[["timestamp", "price", "volume"]].tail(capacity).itertuples(index=False):
+            state.push(price, volume, timestamp)
+        return state
+    
+    def copy(self) -> "RollingFeatureState":
+        state = RollingFeatureState.__new__(RollingFeatureState)
+        state.__dict__.update(self.__dict__)
+        for name in ("prices", "volumes", "returns", "window_sums", "return_sums"):
+            setattr(state, name, getattr(self, name).copy())
+        return state
+    
+    @property
+    def latest_price(self) -> float:
+        return float(self.prices[(self.count - 1) % self.capacity]) if self.count else 0.0
+    
+    @property
+    def latest_volume(self) -> float:
+        return float(self.volumes[(self.count - 1) % self.capacity]) if self.count else 0.0
+    
+    def push(self, price: float, volume: float, timestamp: Optional[Any] = None) -> None:
+        """Append the next hourly observation"""
+        n, capacity = self.count, self.capacity
+        price, volume = float(price), float(volume)
+        
+        for index, window in enumerate(ROLLING_WINDOWS):
+            sums = self.window_sums[index]
+            if n >= window:
+                leaving = (n - window) % capacity
+                sums[0] -= self.prices[leaving]
+                sums[1] -= self.prices[leaving] ** 2
+                sums[2] -= self.volumes[leaving]
+            sums[0] += price
+            sums[1] += price * price
+            sums[2] += volume
+        
+        if n >= 1:
+            previous = self.prices[(n - 1) % capacity]
+            change = price / previous - 1 if previous else 0.0
+            if n - VOLATILITY_WINDOW >= 1:
+                leaving = self.returns[(n - VOLATILITY_WINDOW) % capacity]
+                self.return_sums -= (leaving, leaving * leaving)
+            self.return_sums += (change, change * change)
+            self.returns[n % capacity] = change
+        
+        self.prices[n % capacity] = price
+        self.volumes[n % capacity] = volume
+        self.count = n + 1
+        if timestamp is not None:
+            self.last_timestamp = pd.Timestamp(timestamp)
+        elif self.last_timestamp is not None:
+            self.last_timestamp += pd.Timedelta(hours=1)
+        
+        if self.count % capacity == 0:
+            # Running sums drift slowly; recompute them exactly once per lap of the ring
+            self._resync()
+    
+    def _recent(self, values: np.ndarray, size: int) -> np.ndarray:
+        """Last ``size`` entries, oldest first"""
+        return values[np.arange(self.count - size, self.count) % self.capacity]
+    
+    def _resync(self) -> None:
+        for index, window in enumerate(ROLLING_WINDOWS):
+            if self.count >= window:
+                prices = self._recent(self.prices, window)
+                self.window_sums[index] = (prices.sum(), (prices ** 2).sum(), self._recent(self.volumes, window).sum())
+        if self.count > VOLATILITY_WINDOW:
+            returns = self._recent(self.returns, VOLATILITY_WINDOW)
+            self.return_sums[:] = (returns.sum(), (returns ** 2).sum())
+    
+    def features(self, timestamp: Any) -> np.ndarray:
+        """Feature row for the hour after the latest observation (unavailable values are 0)"""
+        n, capacity = self.count, self.capacity
+        timestamp = pd.Timestamp(timestamp)
+        nan = float("nan")
+        
+        def price(k: int) -> float:
+            return self.prices[(n - k) % capacity] if n >= k else nan
+        
+        def volume(k: int) -> float:
+            return self.volumes[(n - k) % capacity] if n >= k else nan
+        
+        row = [
+            volume(1),
+            timestamp.hour,
+            timestamp.dayofweek,
+            timestamp.month,
+            timestamp.dayofyear,
+            timestamp.quarter,
+            int(timestamp.dayofweek >= 5),
+            int(timestamp.is_month_start),
+            int(timestamp.is_month_end),
+        ]
+        for lag in FEATURE_LAGS:
+            row.extend((price(lag), volume(lag)))
+        
+        for index, window in enumerate(ROLLING_WINDOWS):
+            if n < window:
+                row.extend((nan,) * 5)
+                continue
+            total, squares, volume_total = self.window_sums[index]
+            recent = self._recent(self.prices, window)
+            row.extend((
+                total / window,
+                np.sqrt(max(squares - total * total / window, 0.0) / (window - 1)),
+                recent.min(),
+                recent.max(),
+                volume_total / window,
+            ))
+        
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if n > VOLATILITY_WINDOW:
+                total, squares = self.return_sums
+                volatility = np.sqrt(
+                    max(squares - total * total / VOLATILITY_WINDOW, 0.0) / (VOLATILITY_WINDOW - 1)
+                )
+            else:
+                volatility = nan
+            row.extend((
+                np.float64(price(1)) / price(2) - 1,
+                np.float64(price(1)) / price(24) - 1,
+                price(1) - price(12),
+                volatility,
+                np.float64(volume(1)) / volume(2) - 1,
+            ))
+        
+        return np.nan_to_num(np.array(row, dtype=float), nan=0.0, posinf=0.0, neginf=0.0)
+    
+    def to_frame(self) -> pd.DataFrame:
+        """Buffered observations as a timestamp/price/volume frame"""
+        size = min(self.count, self.capacity)
+        end = self.last_timestamp if self.last_timestamp is not None else pd.Timestamp.now().floor("h")
+        return pd.DataFrame({
+            "timestamp": pd.date_range(end=end, periods=size, freq="h"),
+            "price": self._recent(self.prices, size),
+            "volume": self._recent(self.volumes, size),
+        })
+
+def predict_recursive(
+    model: Any, scaler: Any, state: RollingFeatureState, timestamps: pd.DatetimeIndex, recursive_hours: int
+) -> np.ndarray:
+    """Predictions for ``timestamps``, the hours following the latest observation in ``state``
+    
+    The first ``recursive_hours`` steps are predicted one at a time, each
+    prediction pushed into ``state`` as the next hour's price (pass a copy
+    to keep the original). The remaining steps carry the last value forward
+    and are predicted in a single call.
+    """
+    hours = len(timestamps)
+    predictions = np.empty(hours)
+    steps = min(recursive_hours, hours)
+    for step in range(steps):
+        row = state.features(timestamps[step])
+        predictions[step] = model.predict(scaler.transform(row[np.newaxis, :]))[0]
+        state.push(predictions[step], state.latest_volume, timestamps[step])
+    
+    if steps < hours:
+        rows = np.empty((hours - steps, len(FEATURE_COLUMNS)))
+        for step in range(steps, hours):
+            rows[step - steps] = state.features(timestamps[step])
+            state.push(state.latest_price, state.latest_volume, timestamps[step])
+        predictions[steps:] = model.predict(scaler.transform(rows))
+    return predictions
+
+
+# Prophet settings shared by forecast_with_prophet and the backtests
+PROPHET_OPTIONS = {
+    "yearly_seasonality": True,
+    "weekly_seasonality": True,
+    "daily_seasonality": True,
+    "changepoint_prior_scale": 0.05
+}
+
+# Incremental refits add trees/boosting stages fitted on the new rows only
+INCREMENTAL_TREES = 20
+INCREMENTAL_STAGES = 20
+MAX_FOREST_TREES = 300
+MAX_BOOSTING_STAGES = 400
+
+
+def write_artifact(value: Any, path: Path) -> None:
+    """Write a model file atomically; readers see the previous or the new file, never a partial one"""
+    if model_store is not None:
+        model_store.save(value, str(path))
+        return
+    temp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    joblib.dump(value, temp_path)
+    os.replace(temp_path, path)
+
+
+def write_metadata(metadata: Dict[str, Any], path: Path) -> None:
+    temp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(temp_path, "w") as handle:
+        json.dump(metadata, handle, indent=2, default=str)
+    os.replace(temp_path, path)
+
+
+def write_feature_state(frame: pd.DataFrame, path: Path) -> None:
+    """Persist recent observations (timestamp/price/volume) so other processes can seed their rolling state"""
+    write_metadata({
+        "timestamps": [pd.Timestamp(timestamp).isoformat() for timestamp in frame["timestamp"]],
+        "prices": frame["price"].astype(float).tolist(),
+        "volumes": frame["volume"].astype(float).tolist()
+    }, path)
+
+
+def read_feature_state(path: Path) -> RollingFeatureState:
+    with open(path) as handle:
+        data = json.load(handle)
+    return RollingFeatureState.from_frame(pd.DataFrame({
+        "timestamp": pd.to_datetime(data["timestamps"]),
+        "price": data["prices"],
+        "volume": data["volumes"]
+    }))
+
+
+def _set_n_jobs(model: VotingRegressor, n_jobs: int) -> None:
+    """Apply the thread budget to the estimators that support it (forest, XGBoost)"""
+    for estimator in [estimator for _, estimator in model.estimators] + list(getattr(model, "estimators_", [])):
+        if "n_jobs" in estimator.get_params():
+            estimator.set_params(n_jobs=n_jobs)
+
+
+def _extend_ensemble(model: VotingRegressor, X: np.ndarray, y: np.ndarray) -> bool:
+    """Warm-start every fitted estimator on new rows; False (nothing changed) when a full refit is due"""
+    for estimator in model.estimators_:
+        if isinstance(estimator, GradientBoostingRegressor):
+            if estimator.n_estimators_ + INCREMENTAL_STAGES > MAX_BOOSTING_STAGES:
+                return False
+        elif not isinstance(estimator, RandomForestRegressor) and not hasattr(estimator, "get_booster"):
+            return False
+    
+    for estimator in model.estimators_:
+        if isinstance(estimator, RandomForestRegressor):
+            estimator.set_params(warm_start=True, n_estimators=len(estimator.estimators_) + INCREMENTAL_TREES)
+            estimator.fit(X, y)
+            # Keep the newest trees so the forest tracks recent regimes instead of growing forever
+            excess = len(estimator.estimators_) - MAX_FOREST_TREES
+            if excess > 0:
+                del estimator.estimators_[:excess]
+                estimator.set_params(n_estimators=len(estimator.estimators_))
+        elif isinstance(estimator, GradientBoostingRegressor):
+            estimator.set_params(warm_start=True, n_estimators=estimator.n_estimators_ + INCREMENTAL_STAGES)
+            estimator.fit(X, y)
+        else:
+            estimator.fit(X, y, xgb_model=estimator.get_booster())
+    return True
+
+
+def _load_training_model(job: Dict[str, Any]):
+    """Fitted ensemble and scaler to extend (the pickled estimators, not the compiled serving copy), or the job's template"""
+    model_path, scaler_path = Path(job["model_path"]), Path(job["scaler_path"])
+    if model_path.exists() and scaler_path.exists():
+        try:
+            return joblib.load(model_path), joblib.load(scaler_path)
+        except Exception as e:
+            logger.warning(f"Failed to load model for {job['commodity']}: {e}")
+    return job["template"], StandardScaler()
+
+
+def fit_forecast_model(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Fit or extend one commodity's ensemble and write its artifacts (process pool entry point)
+    
+    ``job`` is built by ForecastingService._training_job. The model and
+    scaler to extend are loaded here, in the worker, from ``model_path``
+    and ``scaler_path``. Incremental jobs fit only the rows from
+    ``new_from`` on and keep the scaler; they fall
+    back to a full fit on all rows when the model cannot be extended. The
+    metadata file is written last, so its version always refers to
+    complete artifacts (including the recent observations forecasts start
+    from).
+    """
+    started = time.perf_counter()
+    X, y = job["X"], job["y"]
+    model, scaler = _load_training_model(job)
+    _set_n_jobs(model, job["n_jobs"])
+    
+    mode = "full"
+    if job["incremental"] and hasattr(model, "estimators_"):
+        X_fit, y_fit = X[job["new_from"]:], y[job["new_from"]:]
+        X_scaled = scaler.transform(X_fit)
+        if _extend_ensemble(model, X_scaled, y_fit):
+            mode = "incremental"
+    if mode == "full":
+        model, scaler = clone(model), clone(scaler)
+        X_fit, y_fit = X, y
+        X_scaled = scaler.fit_transform(X_fit)
+        model.fit(X_scaled, y_fit)
+    
+    y_pred = model.predict(X_scaled)
+    mse = mean_squared_error(y_fit, y_pred)
+    metadata = {
+        **job["metadata"],
+        "mode": mode,
+        "training_samples": len(X_fit),
+        "metrics": {
+            "mae": round(float(mean_absolute_error(y_fit, y_pred)), 4),
+            "mse": round(float(mse), 4),
+            "rmse": round(float(np.sqrt(mse)), 4),
+            "mape": round(float(np.mean(np.abs((y_fit - y_pred) / y_fit)) * 100), 2),
+            "r2": round(float(1 - np.sum((y_fit - y_pred) ** 2) / np.sum((y_fit - np.mean(y_fit)) ** 2)), 4)
+        },
+        "estimators": {
+            name: len(getattr(estimator, "estimators_", [])) or getattr(estimator, "n_estimators", 0)
+            for name, estimator in zip(model.named_estimators_, model.estimators_)
+        },
+        "training_seconds": round(time.perf_counter() - started, 3),
+        "trained_at": datetime.now().isoformat()
+    }
+    
+    if mode == "full":
+        write_artifact(scaler, Path(job["scaler_path"]))
+    write_artifact(model, Path(job["model_path"]))
+    write_feature_state(job["state"], Path(job["state_path"]))
+    if model_registry is not None:
+        # Serving copy: flattened trees that workers map instead of unpickling
+        model_registry.publish(job["commodity"], model, scaler, metadata, version=metadata["version"])
+    write_metadata(metadata, Path(job["metadata_path"]))
+    
+    result = {"metadata": metadata}
+    if job.get("return_models"):
+        result.update(model=model, scaler=scaler)
+    return result
+
+
+class ModelTrainingPipeline:
+    """Background training of many commodities on a process pool
+    
+    Each job fits in a worker process with ``n_jobs`` threads for the
+    forest and XGBoost (``max_workers`` x ``n_jobs`` cores overall), writes
+    its artifacts and metadata, and the new model is swapped into the
+    service when the job completes. Forecasts keep using the previous
+    version until then; a commodity already training is not resubmitted.
+    """
+    
+    def __init__(self, service: "ForecastingService", max_workers: Optional[int] = None, n_jobs: Optional[int] = None):
+        self.service = service
+        self.max_workers = max_workers or int(os.getenv("FORECAST_TRAINING_WORKERS", "2"))
+        self.n_jobs = n_jobs or int(os.getenv("FORECAST_TRAINING_JOBS", "1"))
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self._futures: Dict[str, Future] = {}
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        # API routes submit from worker threads
+        self._submit_lock = threading.Lock()
+    
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+    
+    def submit(self, commodity: str, historical_data: List[Dict[str, Any]], incremental: bool = True) -> Optional[Future]:
+        """Queue a training job
+        
+        Returns a future resolved with the job status once the model has been
+        swapped in, or None when there is nothing to train.
+        """
+        with self._submit_lock:
+            running = self._futures.get(commodity)
+            if running is not None and not running.done():
+                return running
+            
+            job = self.service._training_job(commodity, historical_data, incremental, self.n_jobs)
+            if "error" in job:
+                self.jobs[commodity] = {"status": "skipped", "error": job["error"], "finished_at": datetime.now().isoformat()}
+                return None
+            
+            future = self._get_executor().submit(fit_forecast_model, job)
+            installed: Future = Future()
+            self.jobs[commodity] = {
+                "status": "running",
+                "version": job["metadata"]["version"],
+                "incremental": incremental,
+                "submitted_at": datetime.now().isoformat()
+            }
+            self._futures[commodity] = installed
+        future.add_done_callback(functools.partial(self._finish, commodity, historical_data, installed))
+        return installed
+    
+    def train_many(
+        self,
+        datasets: Dict[str, List[Dict[str, Any]]],
+        incremental: bool = True,
+        wait_for_completion: bool = False
+    ) -> Dict[str, Any]:
+        """Submit one job per commodity; optionally block until all have been swapped in"""
+        futures = [self.submit(commodity, data, incremental) for commodity, data in datasets.items()]
+        if wait_for_completion:
+            wait([future for future in futures if future is not None])
+        return self.get_status()
+    
+    def _finish(self, commodity: str, historical_data: List[Dict[str, Any]], installed: Future, future: Future) -> None:
+        try:
+            metadata = future.result()["metadata"]
+            self.service._install_model(commodity, metadata, historical_data)
+            self.jobs[commodity] = {"status": "completed", **{
+                key: metadata[key] for key in ("version", "mode", "training_samples", "metrics", "training_seconds")
+            }, "finished_at": datetime.now().isoformat()}
+        except Exception as e:
+            logger.error(f"Training failed for {commodity}: {e}")
+            self.jobs[commodity] = {"status": "failed", "error": str(e), "finished_at": datetime.now().isoformat()}
+        installed.set_result(self.jobs[commodity])
+    
+    def get_status(self) -> Dict[str, Any]:
+        """Per-commodity job status"""
+        return {
+            "workers": self.max_workers,
+            "n_jobs": self.n_jobs,
+            "running": sum(1 for job in self.jobs.values() if job["status"] == "running"),
+            "jobs": dict(self.jobs),
+            "timestamp": datetime.now().isoformat()
+        }
+    
+    def shutdown(self, wait_for_jobs: bool = True) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait_for_jobs)
+                self._executor = None
+
+
 class ForecastingService:
     """Advanced forecasting service with ML models, Prophet integration, and Grok AI"""
     
@@ -75,7 +559,7 @@ class ForecastingService:
                     port=redis_port,
                     db=redis_db,
                     password=redis_password,
-                    decode_responses=False,  # Keep as bytes for pickle
+                    decode_responses=False,  # Cache values are binary (format byte + JSON)
                     socket_connect_timeout=5,
                     socket_timeout=5,
                     retry_on_timeout=True,
@@ -96,9 +580,12 @@ class ForecastingService:
                 logger.info(f"Redis caching enabled at {redis_host}:{redis_port}")
             
         except Exception as e:
-            logger.warning(f"Redis not available: {e}. Caching disabled.")
+            logger.warning(f"Redis not available: {e}. Caching in-process only.")
             self.redis_enabled = False
         
+        # Two-tier result cache: per-process LRU in front of Redis when it is available
+        self.forecast_cache = ForecastCache(self._get_redis_client() if self.redis_enabled else None)
+        
         # Try to import Prophet
         try:
             from prophet import Prophet
@@ -127,92 +614,48 @@ class ForecastingService:
         # Anomaly detection configuration
         self.anomaly_detection_enabled = True
         self.anomaly_threshold = 2.0  # Standard deviations for anomaly detection
+        # Live per-series state for scoring actuals and sensor ticks as they arrive
+        self.anomaly_detector = StreamingAnomalyDetector(
+            threshold=float(os.getenv("STREAMING_ANOMALY_THRESHOLD", "3.5")),
+            warmup=int(os.getenv("STREAMING_ANOMALY_WARMUP", "20"))
+        )
+        
+        # Latest observations per commodity, seeded by training or the persisted state and advanced by update_actual
+        self.feature_states: Dict[str, RollingFeatureState] = {}
+        # Modification time of each commodity's persisted state when it was last read or written
+        self._state_mtimes: Dict[str, int] = {}
+        # Leading forecast hours predicted recursively (each prediction feeds the next hour's lags)
+        self.recursive_hours = int(os.getenv("FORECAST_RECURSIVE_HOURS", "24"))
+        
+        # Artifact metadata per commodity and the background training pool
+        self.model_versions: Dict[str, Dict[str, Any]] = {}
+        self.training = ModelTrainingPipeline(self)
     
     def _generate_cache_key(self, method: str, **kwargs) -> str:
         """Generate a unique cache key for caching operations"""
-        try:
-            # Create a string representation of the method and parameters
-            key_data = f"{method}:{sorted(kwargs.items())}"
-            # Generate hash for consistent key length
-            return hashlib.md5(key_data.encode()).hexdigest()
-        except Exception as e:
-            logger.warning(f"Error generating cache key: {e}")
-            return f"{method}_{hash(str(kwargs))}"
+        # Canonical JSON, so equal arguments give equal keys in every worker
+        key_data = json.dumps(kwargs, sort_keys=True, separators=(",", ":"), default=str)
+        return f"{method}:{hashlib.blake2b(key_data.encode(), digest_size=16).hexdigest()}"
     
     def _get_redis_client(self):
         """Get the appropriate Redis client (cluster or single)"""
         return self.redis_cluster if self.redis_cluster else self.redis_client
     
     def _cache_get(self, key: str) -> Optional[Any]:
-        """Get value from cache with failover handling"""
-        if not self.redis_enabled:
-            return None
-        
-        try:
-            client = self._get_redis_client()
-            cached_data = client.get(key)
-            if cached_data:
-                return pickle.loads(cached_data)
-        except Exception as e:
-            logger.warning(f"Cache get failed for key {key}: {e}")
-            # Try to recover from cache corruption
-            self._cache_delete(key)
-        
-        return None
+        """Get value from cache (in-process, then Redis); failures count as misses"""
+        return self.forecast_cache.get(key)
     
-    def _cache_set(self, key: str, value: Any, ttl: int = None) -> bool:
-        """Set value in cache with failover handling"""
-        if not self.redis_enabled:
-            return False
-        
-        try:
-            client = self._get_redis_client()
-            ttl = ttl or self.cache_ttl
-            serialized_data = pickle.dumps(value)
-            return client.setex(key, ttl, serialized_data)
-        except Exception as e:
-            logger.warning(f"Cache set failed for key {key}: {e}")
-            return False
+    def _cache_set(self, key: str, value: Any, ttl: int = None, tags: Optional[List[str]] = None) -> bool:
+        """Set value in cache as compact JSON"""
+        return self.forecast_cache.set(key, value, ttl or self.cache_ttl, tags or ())
     
     def _cache_delete(self, key: str) -> bool:
         """Delete value from cache"""
-        if not self.redis_enabled:
-            return False
-        
-        try:
-            client = self._get_redis_client()
-            return bool(client.delete(key))
-        except Exception as e:
-            logger.warning(f"Cache delete failed for key {key}: {e}")
-            return False
+        return self.forecast_cache.delete(key)
     
-    def _cache_invalidate_pattern(self, pattern: str) -> int:
-        """Invalidate cache keys matching a pattern"""
-        if not self.redis_enabled:
-            return 0
-        
-        try:
-            client = self._get_redis_client()
-            if self.redis_cluster:
-                # For Redis Cluster, scan all nodes
-                deleted_count = 0
-                for node in client.get_nodes():
-                    keys = client.scan_iter(match=pattern, target_nodes=[node])
-                    for key in keys:
-                        if client.delete(key):
-                            deleted_count += 1
-                return deleted_count
-            else:
-                # For single Redis, use scan
-                keys = client.scan_iter(match=pattern)
-                deleted_count = 0
-                for key in keys:
-                    if client.delete(key):
-                        deleted_count += 1
-                return deleted_count
-        except Exception as e:
-            logger.warning(f"Cache pattern invalidation failed for {pattern}: {e}")
-            return 0
+    def _cache_invalidate(self, *tags: str) -> Dict[str, int]:
+        """Mark cached results carrying any of the tags stale (one hash increment per tag, no key scans)"""
+        return self.forecast_cache.invalidate(*tags)
     
     def _cache_health_check(self) -> Dict[str, Any]:
         """Check cache health and performance"""
@@ -267,10 +710,7 @@ class ForecastingService:
             }
     
     def _get_cached_result(self, cache_key: str) -> Optional[Dict[str, Any]]:
-        """Get cached result from Redis using enhanced caching"""
-        if not self.redis_enabled:
-            return None
-        
+        """Get cached result using enhanced caching"""
         try:
             result = self._cache_get(cache_key)
             if result:
@@ -282,10 +722,7 @@ class ForecastingService:
         return None
     
     def _set_cached_result(self, cache_key: str, result: Dict[str, Any], ttl: int = None) -> bool:
-        """Set result in Redis cache using enhanced caching"""
-        if not self.redis_enabled:
-            return False
-        
+        """Set result in cache using enhanced caching"""
         try:
             success = self._cache_set(cache_key, result, ttl)
             if success:
@@ -295,21 +732,125 @@ class ForecastingService:
             logger.warning(f"Error setting cache: {e}")
             return False
     
+    def _load_artifact(self, path: Path):
+        """Load a model file, shared read-only across workers when the model store is available"""
+        if model_store is not None:
+            return model_store.get(str(path))
+        return joblib.load(path)
+    
+    def _save_artifact(self, value: Any, path: Path):
+        """Save a model file atomically so other workers pick it up on their next reload check"""
+        write_artifact(value, path)
+    
+    def _metadata_path(self, commodity: str) -> Path:
+        return self.model_dir / f"{commodity}_ensemble.json"
+    
+    def _state_path(self, commodity: str) -> Path:
+        return self.model_dir / f"{commodity}_ensemble_state.json"
+    
+    def _sync_feature_state(self, commodity: str) -> None:
+        """Adopt the persisted observations when they changed on disk and are not older than ours
+        
+        Written with every trained model and every recorded actual, so a
+        process that loads a model trained elsewhere (or restarts) forecasts
+        from the same lags as the process that trained it.
+        """
+        path = self._state_path(commodity)
+        try:
+            mtime = path.stat().st_mtime_ns
+        except OSError:
+            return
+        if self._state_mtimes.get(commodity) == mtime:
+            return
+        try:
+            persisted = read_feature_state(path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Failed to load feature state for {commodity}: {e}")
+            return
+        self._state_mtimes[commodity] = mtime
+        current = self.feature_states.get(commodity)
+        if (
+            current is None
+            or current.last_timestamp is None
+            or (persisted.last_timestamp is not None and persisted.last_timestamp >= current.last_timestamp)
+        ):
+            self.feature_states[commodity] = persisted
+    
+    def _persist_feature_state(self, commodity: str) -> None:
+        path = self._state_path(commodity)
+        try:
+            write_feature_state(self.feature_states[commodity].to_frame(), path)
+            self._state_mtimes[commodity] = path.stat().st_mtime_ns
+        except OSError as e:
+            logger.warning(f"Failed to persist feature state for {commodity}: {e}")
+    
+    def _read_metadata(self, commodity: str) -> Dict[str, Any]:
+        """Version metadata written with the commodity's artifacts ({} before the first training)"""
+        try:
+            with open(self._metadata_path(commodity)) as handle:
+                return json.load(handle)
+        except (OSError, ValueError):
+            return {}
+    
+    def _registered_model(self, commodity: str, force: bool = False):
+        """Latest registry version of the commodity's model, or None when nothing is published"""
+        if model_registry is None:
+            return None
+        try:
+            return model_registry.get(commodity, force=force)
+        except KeyError:
+            return None
+        except Exception as e:
+            logger.warning(f"Failed to load registered model for {commodity}: {e}")
+            return None
+    
+    def _refresh_model(self, commodity: str):
+        """Swap in a model retrained by another worker"""
+        self._sync_feature_state(commodity)
+        entry = self._registered_model(commodity)
+        if entry is not None:
+            self.models[commodity], self.scalers[commodity] = entry.model, entry.scaler
+            self.model_versions[commodity] = entry.manifest["metadata"]
+            return
+        model_path = self.model_dir / f"{commodity}_ensemble.pkl"
+        scaler_path = self.model_dir / f"{commodity}_ensemble_scaler.pkl"
+        if model_store is not None and model_path.exists() and scaler_path.exists():
+            try:
+                self.models[commodity] = model_store.get(str(model_path))
+                self.scalers[commodity] = model_store.get(str(scaler_path))
+            except Exception as e:
+                logger.warning(f"Failed to refresh model for {commodity}: {e}")
+    
     def _load_or_create_model(self, commodity: str, model_type: str = "ensemble"):
         """Load existing model or create new one with advanced ensemble methods"""
+        entry = self._registered_model(commodity) if model_type == "ensemble" else None
+        if model_type == "ensemble":
+            self._sync_feature_state(commodity)
+        if entry is not None:
+            self.models[commodity], self.scalers[commodity] = entry.model, entry.scaler
+            self.model_versions[commodity] = entry.manifest["metadata"]
+            logger.info(f"Loaded registered model version {entry.version} for {commodity}")
+            return True
+        
         model_path = self.model_dir / f"{commodity}_{model_type}.pkl"
         scaler_path = self.model_dir / f"{commodity}_{model_type}_scaler.pkl"
         
         if model_path.exists() and scaler_path.exists():
             try:
-                self.models[commodity] = joblib.load(model_path)
-                self.scalers[commodity] = joblib.load(scaler_path)
+                self.models[commodity] = self._load_artifact(model_path)
+                self.scalers[commodity] = self._load_artifact(scaler_path)
                 logger.info(f"Loaded existing model for {commodity}")
                 return True
             except Exception as e:
                 logger.warning(f"Failed to load model for {commodity}: {e}")
         
-        # Create advanced ensemble model
+        self.models[commodity] = self._new_model(model_type)
+        self.scalers[commodity] = StandardScaler()
+        logger.info(f"Created new {model_type} model for {commodity}")
+        return False
+    
+    def _new_model(self, model_type: str = "ensemble"):
+        """Unfitted model with advanced ensemble methods"""
         if model_type == "ensemble":
             estimators = [
                 ('rf', RandomForestRegressor(n_estimators=100, max_depth=10, random_state=42)),
@@ -319,33 +860,96 @@ class ForecastingService:
             if self.xgb_available:
                 estimators.append(('xgb', self.XGBRegressor(n_estimators=100, random_state=42)))
             
-            self.models[commodity] = VotingRegressor(estimators=estimators)
-        else:
-            self.models[commodity] = RandomForestRegressor(
-                n_estimators=100,
-                max_depth=10,
-                random_state=42
-            )
+            return VotingRegressor(estimators=estimators)
+        return RandomForestRegressor(
+            n_estimators=100,
+            max_depth=10,
+            random_state=42
+        )
+    
+    def _history_frame(self, historical_data: List[Dict[str, Any]]) -> pd.DataFrame:
+        """Hourly observations as a sorted timestamp/price/volume frame"""
+        df = pd.DataFrame(historical_data)
+        if df.empty:
+            return pd.DataFrame({
+                "timestamp": pd.Series(dtype="datetime64[ns]"),
+                "price": pd.Series(dtype=float),
+                "volume": pd.Series(dtype=float)
+            })
+        if "volume" not in df:
+            df["volume"] = 0.0
+        df = df[["timestamp", "price", "volume"]].copy()
+        df["timestamp"] = pd.to_datetime(df["timestamp"])
+        df[["price", "volume"]] = df[["price", "volume"]].astype(float)
+        return df.sort_values("timestamp").reset_index(drop=True)
+    
+    def _engineer_features(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Calendar, lag, rolling and momentum features for every row at once
         
-        self.scalers[commodity] = StandardScaler()
-        logger.info(f"Created new {model_type} model for {commodity}")
-        return False
+        ``df`` holds consecutive hourly rows per ``commodity`` (optional when
+        there is only one). Features at hour t only use prices up to t-1;
+        windows that would reach into another commodity's rows are NaN.
+        """
+        groups = df.groupby("commodity", sort=False) if "commodity" in df else df
+        timestamps = df["timestamp"].dt
+        price = groups["price"].shift(1)
+        volume = groups["volume"].shift(1)
+        
+        features = {
+            "volume": df["volume"],
+            "hour": timestamps.hour,
+            "day_of_week": timestamps.dayofweek,
+            "month": timestamps.month,
+            "day_of_year": timestamps.dayofyear,
+            "quarter": timestamps.quarter,
+            "is_weekend": (timestamps.dayofweek >= 5).astype(int),
+            "is_month_start": timestamps.is_month_start.astype(int),
+            "is_month_end": timestamps.is_month_end.astype(int),
+        }
+        for lag in FEATURE_LAGS:
+            features[f"price_lag_{lag}"] = groups["price"].shift(lag)
+            features[f"volume_lag_{lag}"] = groups["volume"].shift(lag)
+        
+        # Rolling over the whole column is safe: each commodity's first shifted value is NaN,
+        # so a window crossing into the previous commodity never reaches min_periods
+        for window in ROLLING_WINDOWS:
+            price_window = price.rolling(window, min_periods=window)
+            features[f"price_mean_{window}"] = price_window.mean()
+            features[f"price_std_{window}"] = price_window.std()
+            features[f"price_min_{window}"] = price_window.min()
+            features[f"price_max_{window}"] = price_window.max()
+            features[f"volume_mean_{window}"] = volume.rolling(window, min_periods=window).mean()
+        
+        returns = price / price.shift(1) - 1
+        features["price_change"] = returns
+        features["price_change_24"] = price / features["price_lag_24"] - 1
+        features["momentum_12"] = price - features["price_lag_12"]
+        features["volatility_24"] = returns.rolling(24, min_periods=24).std()
+        features["volume_change"] = volume / volume.shift(1) - 1
+        
+        return pd.DataFrame(features, index=df.index)[FEATURE_COLUMNS].replace([np.inf, -np.inf], np.nan)
     
-    def _prepare_features(self, historical_data: List[Dict[str, Any]]) -> tuple:
-        """Prepare features for ML model with advanced feature engineering"""
+    def _training_set(self, historical_data: List[Dict[str, Any]]) -> tuple:
+        """Feature matrix, targets and row timestamps, without the warm-up rows lacking a full history"""
         if not historical_data:
-            return None, None
+            return None, None, None
         
-        df = pd.DataFrame(historical_data)
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        df = df.sort_values('timestamp')
+        df = self._history_frame(historical_data)
+        features = self._engineer_features(df)
         
-        # Create time-based features
-        df['hour'] = df['timestamp'].dt.hour
-        df['day_of_week'] = df['timestamp'].dt.dayofweek
-        df['month'] = df['timestamp'].dt.month
-        df['day_of_year'] = df['timestamp'].dt.dayofyear
-        df['quarter'] = df['timestamp'].dt.quarter
+        valid = features.notna().all(axis=1).to_numpy()
+        if not valid.any():
+            return None, None, None
+        return (
+            features.to_numpy(dtype=float)[valid],
+            df["price"].to_numpy()[valid],
+            df["timestamp"].to_numpy()[valid]
+        )
+    
+    def _prepare_features(self, historical_data: List[Dict[str, Any]]) -> tuple:
+        """Prepare features for ML model with advanced feature engineering"""
+        X, y, _ = self._training_set(historical_data)
+        return X, y
     
     def _apply_ai_correction(self, forecast: float, market_context: Dict[str, Any]) -> float:
         """Apply AI-powered correction to forecasts based on market context"""
@@ -476,54 +1080,99 @@ class ForecastingService:
             logger.error(f"Error calling Grok AI: {e}")
             return None
     
-    def train_model(self, commodity: str, historical_data: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Train advanced ML model for a specific commodity"""
-        try:
-            X, y = self._prepare_features(historical_data)
-            if X is None or y is None:
-                return {"error": "Insufficient data for training"}
-            
-            # Load or create model
-            self._load_or_create_model(commodity, "ensemble")
-            
-            # Scale features
-            X_scaled = self.scalers[commodity].fit_transform(X)
-            
-            # Train model
-            self.models[commodity].fit(X_scaled, y)
-            
-            # Make predictions on training data
-            y_pred = self.models[commodity].predict(X_scaled)
-            
-            # Calculate metrics
-            mae = mean_absolute_error(y, y_pred)
-            mse = mean_squared_error(y, y_pred)
-            rmse = np.sqrt(mse)
-            
-            # Calculate additional metrics
-            mape = np.mean(np.abs((y - y_pred) / y)) * 100
-            r2 = 1 - (np.sum((y - y_pred) ** 2) / np.sum((y - np.mean(y)) ** 2))
-            
-            # Save model
+    def _training_job(
+        self,
+        commodity: str,
+        historical_data: List[Dict[str, Any]],
+        incremental: bool = False,
+        n_jobs: int = 1
+    ) -> Dict[str, Any]:
+        """Arguments for fit_forecast_model, or {"error": ...} when there is nothing to fit"""
+        X, y, timestamps = self._training_set(historical_data)
+        if X is None or y is None:
+            return {"error": "Insufficient data for training"}
+        state = self._history_frame(historical_data).tail(HISTORY_HOURS)[["timestamp", "price", "volume"]]
+        
+        previous = self._read_metadata(commodity)
+        
+        new_from = 0
+        if incremental and previous.get("data_end"):
+            new_from = int(np.searchsorted(timestamps, np.datetime64(previous["data_end"]), side="right"))
+            if new_from >= len(X):
+                return {"error": f"No new data for {commodity} since {previous['data_end']}"}
+        
+        return {
+            "commodity": commodity,
+            "X": X,
+            "y": y,
+            "new_from": new_from,
+            "incremental": incremental,
+            # Unfitted ensemble for a commodity without artifacts; fitted ones are
+            # loaded by the worker, and a new commodity stays untrained until installed
+            "template": self._new_model("ensemble"),
+            "n_jobs": n_jobs,
+            "model_path": str(self.model_dir / f"{commodity}_ensemble.pkl"),
+            "scaler_path": str(self.model_dir / f"{commodity}_ensemble_scaler.pkl"),
+            "metadata_path": str(self._metadata_path(commodity)),
+            "state": state,
+            "state_path": str(self._state_path(commodity)),
+            "metadata": {
+                "commodity": commodity,
+                "version": previous.get("version", 0) + 1,
+                "data_end": pd.Timestamp(timestamps[-1]).isoformat(),
+                "features": len(FEATURE_COLUMNS)
+            }
+        }
+    
+    def _install_model(
+        self,
+        commodity: str,
+        metadata: Dict[str, Any],
+        historical_data: List[Dict[str, Any]],
+        model: Any = None,
+        scaler: Any = None
+    ) -> None:
+        """Swap a newly trained model in; forecasts already running finish with the old one"""
+        entry = self._registered_model(commodity, force=True)
+        if entry is not None and entry.version == metadata["version"]:
+            model, scaler = entry.model, entry.scaler
+        elif model is None:
             model_path = self.model_dir / f"{commodity}_ensemble.pkl"
             scaler_path = self.model_dir / f"{commodity}_ensemble_scaler.pkl"
+            if model_store is not None:
+                model = model_store.get(str(model_path), force=True)
+                scaler = model_store.get(str(scaler_path), force=True)
+            else:
+                model, scaler = joblib.load(model_path), joblib.load(scaler_path)
+        
+        self.scalers[commodity] = scaler
+        self.models[commodity] = model
+        self.model_versions[commodity] = metadata
+        self.feature_states[commodity] = RollingFeatureState.from_frame(self._history_frame(historical_data))
+        self._state_mtimes.pop(commodity, None)
+        self._cache_invalidate(f"commodity:{commodity}")
+        logger.info(f"Installed {metadata['mode']} model version {metadata['version']} for {commodity}")
+    
+    def train_model(self, commodity: str, historical_data: List[Dict[str, Any]], incremental: bool = False) -> Dict[str, Any]:
+        """Train advanced ML model for a specific commodity (in this process; see ``training`` for the pool)"""
+        try:
+            job = self._training_job(commodity, historical_data, incremental)
+            if "error" in job:
+                return {"error": job["error"]}
             
-            joblib.dump(self.models[commodity], model_path)
-            joblib.dump(self.scalers[commodity], scaler_path)
+            result = fit_forecast_model({**job, "return_models": True})
+            metadata = result["metadata"]
+            self._install_model(commodity, metadata, historical_data, result["model"], result["scaler"])
             
             logger.info(f"Advanced model trained successfully for {commodity}")
             
             return {
                 "commodity": commodity,
-                "training_samples": len(X),
+                "training_samples": metadata["training_samples"],
                 "model_type": "Ensemble",
-                "metrics": {
-                    "mae": round(mae, 4),
-                    "mse": round(mse, 4),
-                    "rmse": round(rmse, 4),
-                    "mape": round(mape, 2),
-                    "r2": round(r2, 4)
-                },
+                "version": metadata["version"],
+                "mode": metadata["mode"],
+                "metrics": metadata["metrics"],
                 "timestamp": datetime.now().isoformat()
             }
             
@@ -546,12 +1195,7 @@ class ForecastingService:
             prophet_df = df[['timestamp', 'price']].rename(columns={'timestamp': 'ds', 'price': 'y'})
             
             # Create and fit Prophet model
-            model = self.Prophet(
-                yearly_seasonality=True,
-                weekly_seasonality=True,
-                daily_seasonality=True,
-                changepoint_prior_scale=0.05
-            )
+            model = self.Prophet(**PROPHET_OPTIONS)
             
             model.fit(prophet_df)
             
@@ -579,7 +1223,7 @@ class ForecastingService:
                 "model_info": {
                     "type": "Prophet",
                     "seasonality": "yearly, weekly, daily",
-                    "changepoint_prior_scale": 0.05
+                    "changepoint_prior_scale": PROPHET_OPTIONS["changepoint_prior_scale"]
                 },
                 "timestamp": datetime.now().isoformat()
             }
@@ -588,64 +1232,111 @@ class ForecastingService:
             logger.error(f"Error forecasting with Prophet for {commodity}: {e}")
             return {"error": str(e)}
     
-    def forecast_future_consumption(self, commodity: str, days: int = 7) -> Dict[str, Any]:
-        """Forecast future prices using ensemble model"""
+    def update_actual(
+        self, commodity: str, price: float, volume: Optional[float] = None, timestamp: Optional[Any] = None
+    ) -> Dict[str, Any]:
+        """Record the latest hourly actual; the next forecast starts from it without re-reading history"""
+        state = self.feature_states.setdefault(commodity, RollingFeatureState())
+        timestamp = timestamp or pd.Timestamp.now().floor("h")
+        state.push(price, state.latest_volume if volume is None else volume, timestamp)
+        self._persist_feature_state(commodity)
+        self._cache_invalidate(f"commodity:{commodity}")
+        return {
+            "commodity": commodity,
+            "observations": state.count,
+            "last_timestamp": state.last_timestamp.isoformat(),
+            "anomaly": self.anomaly_detector.update(commodity, price, timestamp)
+        }
+    
+    def score_ticks(self, ticks: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Score a batch of ``{"series", "value", "timestamp"}`` ticks against each series' live state"""
+        series = [tick["series"] for tick in ticks]
+        values = [tick["value"] for tick in ticks]
+        timestamps = [tick.get("timestamp") for tick in ticks]
+        # Seasonal slots come from timestamps when every tick has one, else from each series' tick count
+        result = self.anomaly_detector.update_many(
+            series, values, timestamps if all(stamp is not None for stamp in timestamps) else None
+        )
+        flagged = np.flatnonzero(result["is_anomaly"])
+        return {
+            "scores": np.round(result["score"], 4).tolist(),
+            "expected": np.round(result["expected"], 6).tolist(),
+            "anomalies": [
+                {"index": int(i), "series": series[i], "value": float(values[i]), "score": round(float(result["score"][i]), 4)}
+                for i in flagged
+            ],
+            "threshold": self.anomaly_detector.threshold,
+            "detector": self.anomaly_detector.get_stats()
+        }
+    
+    def _forecast_from_state(
+        self,
+        commodity: str,
+        hours: int,
+        recursive_hours: Optional[int] = None,
+        state: Optional[RollingFeatureState] = None
+    ) -> Tuple[pd.DatetimeIndex, np.ndarray]:
+        """Hourly predictions from the commodity's rolling state (or ``state``, e.g. seeded from caller history)
+        
+        Hours between the last actual and now carry it forward; the forecast
+        itself is predict_recursive on a copy of the state.
+        """
+        state = self.feature_states.get(commodity) if state is None else state
+        if state is None or state.count == 0:
+            # Forecasting from empty lags would return plausible-looking but wrong prices
+            raise ValueError(f"No observations for {commodity}: retrain the model or record actuals first")
+        work = state.copy()
+        model, scaler = self.models[commodity], self.scalers[commodity]
+        
+        start = pd.Timestamp.now().floor("h")
+        if work.last_timestamp is not None:
+            # Hours between the last actual and now carry it forward
+            gap = int((start - work.last_timestamp) / pd.Timedelta(hours=1))
+            for _ in range(min(max(gap - 1, 0), work.capacity)):
+                work.push(work.latest_price, work.latest_volume)
+            start = max(start, work.last_timestamp + pd.Timedelta(hours=1))
+        timestamps = pd.date_range(start, periods=hours, freq="h")
+        
+        predictions = predict_recursive(
+            model, scaler, work, timestamps, self.recursive_hours if recursive_hours is None else recursive_hours
+        )
+        return timestamps, predictions
+    
+    @instrument("forecast")
+    def forecast_future_consumption(
+        self, commodity: str, days: int = 7, recursive_hours: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Forecast future prices using ensemble model
+        
+        Results are cached per model version and invalidated by the
+        ``commodity:<name>`` tag when a new model or actual arrives;
+        concurrent requests for the same forecast share one computation.
+        """
+        self._refresh_model(commodity)
+        if commodity not in self.models:
+            return {"error": f"No trained model found for {commodity}"}
+        
+        version = self.model_versions.get(commodity, {}).get("version", 0)
+        cache_key = self._generate_cache_key(
+            "forecast", commodity=commodity, days=days, recursive_hours=recursive_hours, version=version
+        )
+        return self.forecast_cache.get_or_compute(
+            cache_key,
+            lambda: self._compute_forecast(commodity, days, recursive_hours),
+            tags=[f"commodity:{commodity}", f"model:{commodity}:v{version}"],
+            cacheable=lambda result: "error" not in result
+        )
+    
+    def _compute_forecast(self, commodity: str, days: int, recursive_hours: Optional[int]) -> Dict[str, Any]:
         try:
-            if commodity not in self.models:
-                return {"error": f"No trained model found for {commodity}"}
-            
-            # Generate future timestamps
-            future_dates = []
-            current_time = datetime.now()
-            
-            for i in range(days * 24):  # Hourly forecasts
-                future_time = current_time + timedelta(hours=i)
-                future_dates.append(future_time)
-            
-            # Prepare future features with advanced engineering
-            future_features = []
-            for timestamp in future_dates:
-                # Calculate quarter manually since datetime doesn't have quarter attribute
-                quarter = (timestamp.month - 1) // 3 + 1
-                
-                features = [
-                    0,  # volume (placeholder, will be filled with recent data)
-                    timestamp.hour,
-                    timestamp.weekday(),
-                    timestamp.month,
-                    timestamp.timetuple().tm_yday,
-                    quarter,  # Fixed: calculate quarter manually
-                    1 if timestamp.weekday() in [5, 6] else 0,
-                    1 if timestamp.day == 1 else 0,
-                    1 if timestamp.day == 1 else 0  # Simplified month end check
-                ]
-                
-                # Add lag features (will be filled with recent data)
-                for lag in [1, 2, 3, 6, 12, 24]:
-                    features.extend([0, 0])  # price_lag, volume_lag
-                
-                # Add rolling features
-                for window in [3, 6, 12, 24]:
-                    features.extend([0, 0, 0, 0, 0])  # rolling features
-                
-                # Add other features
-                features.extend([0, 0, 0, 0, 0])  # price_change, momentum, volatility features
-                
-                future_features.append(features)
-            
-            # Scale features
-            X_future = np.array(future_features)
-            X_future_scaled = self.scalers[commodity].transform(X_future)
-            
-            # Make predictions
-            predictions = self.models[commodity].predict(X_future_scaled)
+            timestamps, predictions = self._forecast_from_state(commodity, days * 24, recursive_hours)
             
             # Create forecast data
             forecast_data = []
-            for i, (timestamp, pred) in enumerate(zip(future_dates, predictions)):
+            for i, (timestamp, pred) in enumerate(zip(timestamps, predictions)):
                 forecast_data.append({
                     "timestamp": timestamp.isoformat(),
-                    "predicted_price": round(pred, 2),
+                    "predicted_price": round(float(pred), 2),
                     "confidence": max(0.6, 0.95 - (i * 0.01)),  # Better confidence model
                     "forecast_horizon": i
                 })
@@ -664,7 +1355,8 @@ class ForecastingService:
                 "model_info": {
                     "type": "Ensemble",
                     "last_trained": datetime.now().isoformat(),
-                    "confidence_trend": "adaptive"
+                    "confidence_trend": "adaptive",
+                    "recursive_hours": min(self.recursive_hours if recursive_hours is None else recursive_hours, days * 24)
                 },
                 "grok_ai_insights": grok_insights,
                 "timestamp": datetime.now().isoformat()
@@ -674,6 +1366,89 @@ class ForecastingService:
             logger.error(f"Error forecasting for {commodity}: {e}")
             return {"error": str(e)}
     
+    @instrument("forecast_batch", batch=lambda self, commodities, *args, **kwargs: len(commodities))
+    def forecast_batch(
+        self,
+        commodities: List[str],
+        days: int = 7,
+        horizons: Optional[Dict[str, int]] = None,
+        history: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+        recursive_hours: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Hourly forecasts for many commodities in one call
+        
+        ``horizons`` overrides ``days`` per commodity; horizons outside
+        (0, MAX_FORECAST_DAYS] are reported in ``errors``. ``history``
+        supplies recent observations (otherwise each commodity's rolling
+        state is used).
+        Each commodity is forecast like forecast_future_consumption: from a
+        copy of its RollingFeatureState, recursively for the first
+        ``recursive_hours`` and then in one direct call, so both endpoints
+        return the same prices for the same commodity and horizon.
+        """
+        started = time.perf_counter()
+        horizons = horizons or {}
+        history = history or {}
+        
+        forecasts = {}
+        errors = {}
+        rows = 0
+        for commodity in dict.fromkeys(commodities):
+            horizon = horizons.get(commodity, days)
+            hours = int(horizon * 24)
+            if hours < 1 or horizon > MAX_FORECAST_DAYS:
+                errors[commodity] = f"Invalid horizon for {commodity}: {horizon} days (1 hour to {MAX_FORECAST_DAYS} days)"
+                continue
+            
+            self._refresh_model(commodity)
+            if commodity not in self.models:
+                errors[commodity] = f"No trained model found for {commodity}"
+                continue
+            
+            state = None
+            if commodity in history:
+                state = RollingFeatureState.from_frame(self._history_frame(history[commodity]))
+            try:
+                timestamps, predictions = self._forecast_from_state(commodity, hours, recursive_hours, state)
+            except Exception as e:
+                logger.error(f"Error forecasting for {commodity}: {e}")
+                errors[commodity] = str(e)
+                continue
+            
+            steps = np.arange(hours)
+            confidence = np.maximum(0.6, 0.95 - steps * 0.01)  # Better confidence model
+            forecasts[commodity] = {
+                "commodity": commodity,
+                "forecast_period_days": horizon,
+                "forecast_data": [
+                    {
+                        "timestamp": timestamp,
+                        "predicted_price": price,
+                        "confidence": round(float(level), 2),
+                        "forecast_horizon": int(step)
+                    }
+                    for timestamp, price, level, step in zip(
+                        [timestamp.isoformat() for timestamp in timestamps], np.round(predictions, 2).tolist(), confidence, steps
+                    )
+                ]
+            }
+            rows += hours
+        
+        return {
+            "forecasts": forecasts,
+            "errors": errors,
+            "model_info": {
+                "type": "Ensemble",
+                "features": len(FEATURE_COLUMNS),
+                "recursive_hours": self.recursive_hours if recursive_hours is None else recursive_hours
+            },
+            "performance": {
+                "rows": rows,
+                "total_ms": round((time.perf_counter() - started) * 1000, 2)
+            },
+            "timestamp": datetime.now().isoformat()
+        }
+    
     def get_forecast_insights(self, commodity: str, forecast_data: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Generate insights from forecast data"""
         try:
@@ -811,16 +1586,14 @@ class ForecastingService:
         return recommendations
     
     def retrain_model(self, commodity: str, new_data: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Retrain model with new data"""
+        """Retrain model with new data
+        
+        Existing models are extended with trees and boosting stages fitted on
+        the rows newer than the last training run; ``new_data`` should
+        include the preceding day so lag features can be computed.
+        """
         try:
-            # Combine historical and new data
-            if commodity in self.models:
-                # In production, you'd load historical data from database
-                historical_data = new_data  # For now, just use new data
-            else:
-                historical_data = new_data
-            
-            return self.train_model(commodity, historical_data)
+            return self.train_model(commodity, new_data, incremental=commodity in self.models)
             
         except Exception as e:
             logger.error(f"Error retraining model for {commodity}: {e}")
@@ -832,11 +1605,14 @@ class ForecastingService:
             if commodity:
                 if commodity in self.models:
                     model_path = self.model_dir / f"{commodity}_ensemble.pkl"
+                    metadata = self.model_versions.get(commodity) or self._read_metadata(commodity)
                     return {
                         "commodity": commodity,
                         "status": "trained",
                         "last_modified": datetime.fromtimestamp(model_path.stat().st_mtime).isoformat(),
-                        "model_type": "Ensemble"
+                        "model_type": "Ensemble",
+                        "version": metadata.get("version"),
+                        "training": self.training.jobs.get(commodity)
                     }
                 else:
                     return {"commodity": commodity, "status": "not_trained"}
@@ -848,7 +1624,8 @@ class ForecastingService:
                 all_models[commodity_name] = {
                     "status": "trained",
                     "last_modified": datetime.fromtimestamp(model_file.stat().st_mtime).isoformat(),
-                    "model_type": "Ensemble"
+                    "model_type": "Ensemble",
+                    "version": self._read_metadata(commodity_name).get("version")
                 }
             
             return {
@@ -895,7 +1672,7 @@ class ForecastingService:
             processed_news = self._process_news_data(news_data, commodity)
             
             # Cache the result
-            self._cache_result(cache_key, processed_news, self.news_cache_ttl)
+            self._set_cached_result(cache_key, processed_news, self.news_cache_ttl)
             
             return processed_news
             
@@ -1071,6 +1848,8 @@ class ForecastingService:
                 return self._detect_anomalies_statistical(data)
             elif method == "zscore":
                 return self._detect_anomalies_zscore(data)
+            elif method == "streaming":
+                return self._detect_anomalies_streaming(data)
             else:
                 logger.warning(f"Unknown anomaly detection method: {method}")
                 return self._detect_anomalies_statistical(data)
@@ -1121,14 +1900,12 @@ class ForecastingService:
             upper_bound = mean_val + (self.anomaly_threshold * std_val)
             
             # Find anomalies
-            anomalies = []
-            for i, value in enumerate(data_array):
-                if value < lower_bound or value > upper_bound:
-                    anomalies.append({
-                        "index": i,
-                        "value": value,
-                        "deviation": round((value - mean_val) / std_val, 2)
-                    })
+            flagged = np.flatnonzero((data_array < lower_bound) | (data_array > upper_bound))
+            deviations = np.round((data_array[flagged] - mean_val) / std_val, 2)
+            anomalies = [
+                {"index": int(i), "value": data_array[i], "deviation": deviation}
+                for i, deviation in zip(flagged, deviations)
+            ]
             
             return {
                 "anomalies": anomalies,
@@ -1162,14 +1939,11 @@ class ForecastingService:
             z_scores = np.abs((data_array - mean_val) / std_val)
             
             # Find anomalies (Z-score > threshold)
-            anomalies = []
-            for i, z_score in enumerate(z_scores):
-                if z_score > self.anomaly_threshold:
-                    anomalies.append({
-                        "index": i,
-                        "value": data_array[i],
-                        "z_score": round(z_score, 2)
-                    })
+            flagged = np.flatnonzero(z_scores > self.anomaly_threshold)
+            anomalies = [
+                {"index": int(i), "value": data_array[i], "z_score": round(z_scores[i], 2)}
+                for i in flagged
+            ]
             
             return {
                 "anomalies": anomalies,
@@ -1184,23 +1958,59 @@ class ForecastingService:
             logger.error(f"Error in Z-score anomaly detection: {e}")
             return {"anomalies": [], "method": "zscore_failed", "error": str(e)}
     
-    def forecast_with_anomaly_detection(self, commodity: str, days: int = 30) -> Dict[str, Any]:
+    def _detect_anomalies_streaming(self, data: List[float]) -> Dict[str, Any]:
+        """Detect anomalies by replaying the series through a fresh streaming detector
+        
+        Each point is scored only against the points before it, as it would
+        have been live; the service's live detector state is not touched.
+        """
+        try:
+            # A bare list has no timestamps to derive seasonal slots from
+            detector = StreamingAnomalyDetector(
+                threshold=self.anomaly_detector.threshold, warmup=self.anomaly_detector.warmup, season_length=0
+            )
+            data_array = np.asarray(data, dtype=float)
+            result = detector.backfill("series", data_array)
+            flagged = np.flatnonzero(result["is_anomaly"])
+            anomalies = [
+                {"index": int(i), "value": data_array[i], "score": round(float(result["score"][i]), 2)}
+                for i in flagged
+            ]
+            
+            return {
+                "anomalies": anomalies,
+                "method": "streaming",
+                "total_points": len(data),
+                "anomaly_count": len(anomalies),
+                "anomaly_percentage": round(len(anomalies) / len(data) * 100, 2),
+                "scores": np.round(result["score"], 4).tolist(),
+                "threshold": detector.threshold
+            }
+            
+        except Exception as e:
+            logger.error(f"Error in streaming anomaly detection: {e}")
+            return {"anomalies": [], "method": "streaming_failed", "error": str(e)}
+    
+    def forecast_with_anomaly_detection(
+        self, commodity: str, days: int = 30, method: str = "isolation_forest"
+    ) -> Dict[str, Any]:
         """Generate forecast with integrated anomaly detection"""
         try:
             # Get base forecast
-            base_forecast = self.forecast_prices(commodity, days)
+            base_forecast = self.forecast_future_consumption(commodity, days)
             
             if "error" in base_forecast:
                 return base_forecast
             
             # Extract price data for anomaly detection
             if "forecast_data" in base_forecast:
-                prices = [point.get("price", 0) for point in base_forecast["forecast_data"]]
+                prices = [point.get("predicted_price", 0) for point in base_forecast["forecast_data"]]
                 
                 # Detect anomalies
-                anomalies = self.detect_anomalies(prices)
+                anomalies = self.detect_anomalies(prices, method)
                 
-                # Add anomaly information to forecast
+                # Cached forecasts are shared; annotate a copy
+                base_forecast = dict(base_forecast)
                 base_forecast["anomaly_detection"] = anomalies
                 
                 # Apply anomaly corrections if needed
@@ -1218,19 +2028,20 @@ class ForecastingService:
     def _apply_anomaly_corrections(self, forecast_data: List[Dict], anomalies: Dict) -> List[Dict]:
         """Apply corrections to anomalous forecast points"""
         try:
-            corrected_data = forecast_data.copy()
+            corrected_data = [dict(point) for point in forecast_data]
             
             for anomaly in anomalies.get("anomalies", []):
-                idx = anomaly.get("index", 0)
+                # Isolation forest reports bare indices, the other methods dicts
+                idx = anomaly.get("index", 0) if isinstance(anomaly, dict) else int(anomaly)
                 if idx < len(corrected_data):
                     # Apply smoothing correction
                     if idx > 0 and idx < len(corrected_data) - 1:
                         # Use moving average of surrounding points
-                        prev_price = corrected_data[idx - 1].get("price", 0)
-                        next_price = corrected_data[idx + 1].get("price", 0)
+                        prev_price = corrected_data[idx - 1].get("predicted_price", 0)
+                        next_price = corrected_data[idx + 1].get("predicted_price", 0)
                         corrected_price = (prev_price + next_price) / 2
                         
-                        corrected_data[idx]["price"] = round(corrected_price, 2)
+                        corrected_data[idx]["predicted_price"] = round(corrected_price, 2)
                         corrected_data[idx]["anomaly_corrected"] = True
                         corrected_data[idx]["correction_method"] = "moving_average_smoothing"
             
@@ -1,5 +1,5 @@
 import asyncio
-import aiohttp
+import functools
 import json
 import time
 from typing import Dict, Any, List, Optional, Tuple
@@ -11,6 +11,10 @@ from enum import Enum
 import numpy as np
 import pandas as pd
 
+from async_fetch import AsyncFetcher, geo_bucket
+from demand_model import DemandModel
+from sensor_ingestion import SensorIngestion
+
 logger = structlog.get_logger()
 
 class SensorType(Enum):
@@ -62,9 +66,12 @@ class IoTIntegrationService:
     def __init__(self):
         self.openweather_api_key = os.getenv("OPENWEATHER_API_KEY")
         self.grid_api_key = os.getenv("GRID_API_KEY")
-        self.sensor_data_cache = {}
-        self.last_update = {}
-        self.cache_duration = 300  # 5 minutes
+        self.cache_duration = int(os.getenv("IOT_CACHE_SECONDS", "300"))
+        # Sites within one grid cell share a cached lookup (0.1 degrees is about 11 km)
+        self.geo_resolution = float(os.getenv("IOT_GEO_BUCKET_DEGREES", "0.1"))
+        self.batch_concurrency = int(os.getenv("IOT_BATCH_CONCURRENCY", "64"))
+        # Pooled HTTP client and bounded result cache shared by every lookup
+        self.fetcher = AsyncFetcher(ttl=self.cache_duration)
         
         # Enhanced logging configuration
         self.logger = structlog.get_logger()
@@ -85,7 +92,7 @@ class IoTIntegrationService:
         }
         
         # API endpoints
-        self.openweather_base_url = "https://api.openweathermap.org/data/2.5"
+        self.openweather_base_url = os.getenv("OPENWEATHER_BASE_URL", "https://api.openweathermap.org/data/2.5")
         self.grid_base_url = "https://api.grid.com/v1"  # Example grid API
         
         # Sensor configurations
@@ -99,6 +106,15 @@ class IoTIntegrationService:
             "solar_radiation": {"unit": "W/m²", "min_value": 0, "max_value": 1200},
             "battery_level": {"unit": "%", "min_value": 0, "max_value": 100}
         }
+        
+        # Readings pushed by sensors, in columnar buffers; grid data is served from here while fresh
+        self.ingestion = SensorIngestion(self.sensor_configs)
+        self.live_max_age = float(os.getenv("IOT_LIVE_MAX_AGE_SECONDS", "60"))
+        
+        # Per-site demand regressions for region-wide forecasts, refitted only when new data arrives
+        self.demand_model = DemandModel()
+        self._demand_history_version: Optional[Tuple] = None
+        self._demand_history: Optional[Tuple] = None
     
     def _get_fallback_data(self, sensor_type: str, location: str = "default") -> Dict[str, Any]:
         """Get fallback data when sensors are unavailable"""
@@ -138,21 +154,10 @@ class IoTIntegrationService:
     async def get_real_time_grid_data(self, location: str = "default") -> Dict[str, Any]:
         """Get real-time grid data from IoT sensors"""
         try:
-            cache_key = f"grid_data_{location}"
-            
-            # Check cache first
-            if self._is_cache_valid(cache_key):
-                return self.sensor_data_cache[cache_key]
-            
-            # Fetch real-time data
-            grid_data = await self._fetch_grid_data(location)
-            
-            # Cache the data
-            self.sensor_data_cache[cache_key] = grid_data
-            self.last_update[cache_key] = datetime.now()
-            
-            logger.info(f"Real-time grid data fetched for {location}")
-            return grid_data
+            live = self._live_grid_data(location)
+            if live is not None:
+                return live
+            return await self.fetcher.cached(f"grid:{location}", lambda: self._fetch_grid_data(location))
             
         except Exception as e:
             logger.error(f"Error fetching real-time grid data: {e}")
@@ -164,21 +169,11 @@ class IoTIntegrationService:
             if not self.openweather_api_key:
                 return self._get_fallback_weather_data(lat, lon)
             
-            cache_key = f"weather_{lat}_{lon}"
-            
-            # Check cache first
-            if self._is_cache_valid(cache_key):
-                return self.sensor_data_cache[cache_key]
-            
-            # Fetch weather data
-            weather_data = await self._fetch_weather_data(lat, lon)
-            
-            # Cache the data
-            self.sensor_data_cache[cache_key] = weather_data
-            self.last_update[cache_key] = datetime.now()
-            
-            logger.info(f"Weather data fetched for coordinates ({lat}, {lon})")
-            return weather_data
+            cell = geo_bucket(lat, lon, self.geo_resolution)
+            weather_data = await self.fetcher.cached(
+                f"weather:{cell[0]}:{cell[1]}", lambda: self._fetch_weather_data(*cell)
+            )
+            return {**weather_data, "coordinates": {"lat": lat, "lon": lon}}
             
         except Exception as e:
             logger.error(f"Error fetching weather data: {e}")
@@ -187,26 +182,92 @@ class IoTIntegrationService:
     async def get_solar_radiation_data(self, lat: float, lon: float) -> Dict[str, Any]:
         """Get solar radiation data for renewable energy optimization"""
         try:
-            cache_key = f"solar_{lat}_{lon}"
-            
-            # Check cache first
-            if self._is_cache_valid(cache_key):
-                return self.sensor_data_cache[cache_key]
-            
-            # Fetch solar data
-            solar_data = await self._fetch_solar_data(lat, lon)
-            
-            # Cache the data
-            self.sensor_data_cache[cache_key] = solar_data
-            self.last_update[cache_key] = datetime.now()
-            
-            logger.info(f"Solar radiation data fetched for coordinates ({lat}, {lon})")
-            return solar_data
+            cell = geo_bucket(lat, lon, self.geo_resolution)
+            solar_data = await self.fetcher.cached(
+                f"solar:{cell[0]}:{cell[1]}", lambda: self._fetch_solar_data(*cell)
+            )
+            return {**solar_data, "coordinates": {"lat": lat, "lon": lon}}
             
         except Exception as e:
             logger.error(f"Error fetching solar radiation data: {e}")
             return self._get_fallback_solar_data(lat, lon)
     
+    def ingest_readings(self, readings: List[Any]) -> Dict[str, Any]:
+        """Store sensor readings (SensorData or dicts with sensor_type, site/location, value, timestamp)"""
+        records = []
+        for reading in readings:
+            if isinstance(reading, SensorData):
+                records.append({
+                    "sensor_type": reading.sensor_type.value,
+                    "site": reading.metadata.get("site", reading.sensor_id),
+                    "value": reading.value,
+                    "timestamp": reading.timestamp
+                })
+            else:
+                records.append({
+                    "sensor_type": reading.get("sensor_type"),
+                    "site": reading.get("site", reading.get("location", "default")),
+                    "value": reading.get("value"),
+                    "timestamp": reading.get("timestamp")
+                })
+        return {**self.ingestion.ingest_records(records), "timestamp": datetime.now().isoformat()}
+    
+    def _live_grid_data(self, location: str) -> Optional[Dict[str, Any]]:
+        """Grid data from ingested readings, or None when voltage and frequency are not both fresh"""
+        voltage = self.ingestion.latest("grid_voltage", location)
+        frequency = self.ingestion.latest("grid_frequency", location)
+        if voltage is None or frequency is None:
+            return None
+        oldest = min(voltage["timestamp"], frequency["timestamp"])
+        age = (pd.Timestamp.now(tz="UTC") - oldest).total_seconds()
+        if age > self.live_max_age:
+            return None
+        
+        consumption = self.ingestion.latest("power_consumption", location)
+        return {
+            "location": location,
+            "voltage": round(voltage["value"], 2),
+            "frequency": round(frequency["value"], 3),
+            "power_flow": round(consumption["value"], 2) if consumption else 0.0,
+            "timestamp": max(voltage["timestamp"], frequency["timestamp"]).isoformat(),
+            "reading_age_seconds": round(age, 3),
+            "data_source": "iot_ingestion"
+        }
+    
+    def get_sensor_rollups(
+        self, sensor_type: str, resolution: str = "1m", site: Optional[str] = None, since: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Downsampled readings (count, mean, min, max per bucket) for a sensor type"""
+        try:
+            frame = self.ingestion.rollups(sensor_type, resolution, site, since)
+        except ValueError as e:
+            return {"error": str(e)}
+        frame["timestamp"] = frame["timestamp"].map(pd.Timestamp.isoformat)
+        return {
+            "sensor_type": sensor_type,
+            "resolution": resolution,
+            "unit": self.sensor_configs.get(sensor_type, {}).get("unit"),
+            "rollups": frame.round({"mean": 4}).to_dict("records"),
+            "timestamp": datetime.now().isoformat()
+        }
+    
+    async def get_grid_data_batch(self, locations: List[str]) -> List[Dict[str, Any]]:
+        """Grid data for many locations, fetched concurrently (each distinct location once)"""
+        return await self._batch([functools.partial(self.get_real_time_grid_data, location) for location in locations])
+    
+    async def get_weather_data_batch(self, sites: List[Tuple[float, float]]) -> List[Dict[str, Any]]:
+        """Weather for many (lat, lon) sites; sites in the same grid cell share one API call"""
+        return await self._batch([functools.partial(self.get_weather_data, lat, lon) for lat, lon in sites])
+    
+    async def get_solar_radiation_data_batch(self, sites: List[Tuple[float, float]]) -> List[Dict[str, Any]]:
+        """Solar radiation for many (lat, lon) sites; sites in the same grid cell share one lookup"""
+        return await self._batch([functools.partial(self.get_solar_radiation_data, lat, lon) for lat, lon in sites])
+    
+    async def _batch(self, calls: List[Any]) -> List[Dict[str, Any]]:
+        # Per-site lookups already fall back on errors; anything left is reported in place
+        results = await self.fetcher.gather(calls, self.batch_concurrency)
+        return [{"error": str(result)} if isinstance(result, Exception) else result for result in results]
+    
     async def get_sensor_network_status(self, network_id: str = "main") -> Dict[str, Any]:
         """Get status of IoT sensor network"""
         try:
@@ -330,6 +391,78 @@ class IoTIntegrationService:
             logger.error(f"Error predicting energy demand: {e}")
             return {"error": str(e)}
     
+    def predict_energy_demand_batch(
+        self,
+        sites: List[str],
+        forecast_temperature: Any,
+        forecast_humidity: Any,
+        historical: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Demand forecast for many sites at once from (sites x hours) temperature and humidity forecasts
+        
+        ``historical`` holds (sites x time) "temperature", "humidity" and
+        "power_consumption" matrices, with optional "sites" naming their rows
+        (default: ``sites``). Without it the model is fitted on the hourly
+        rollups of ingested readings.
+        """
+        try:
+            if historical is not None:
+                history = (
+                    historical.get("sites", sites),
+                    historical["temperature"],
+                    historical["humidity"],
+                    historical["power_consumption"]
+                )
+            else:
+                history = self._ingested_demand_history()
+            if history is None or not len(history[0]):
+                return {"error": "No demand history: provide historical data or ingest temperature, humidity and power_consumption readings"}
+            
+            refitted = self.demand_model.fit(*history)
+            predictions = self.demand_model.predict(sites, forecast_temperature, forecast_humidity)
+        except (KeyError, ValueError) as e:
+            return {"error": f"Invalid demand forecast input: {e}"}
+        
+        unfitted = np.isnan(predictions).all(axis=1) if predictions.shape[1] else np.zeros(len(sites), dtype=bool)
+        rows = predictions.round(2).tolist()
+        for i in np.flatnonzero(unfitted):
+            rows[i] = None
+        return {
+            "sites": list(sites),
+            "hours": predictions.shape[1],
+            "predicted_demand_kw": rows,
+            "total_demand_kw": np.nansum(predictions, axis=0).round(2).tolist(),
+            "unfitted_sites": [sites[i] for i in np.flatnonzero(unfitted)],
+            "refitted": refitted,
+            "model": self.demand_model.get_status(),
+            "timestamp": datetime.now().isoformat()
+        }
+    
+    def _ingested_demand_history(self) -> Optional[Tuple]:
+        """(sites, temperature, humidity, demand) matrices from hourly rollups, rebuilt only after new readings"""
+        types = ("temperature", "humidity", "power_consumption")
+        self.ingestion.flush()
+        stats = self.ingestion.get_stats()["types"]
+        version = tuple(stats.get(t, {}).get("accepted", 0) for t in types)
+        if version == self._demand_history_version:
+            return self._demand_history
+        
+        pivots = {}
+        for sensor_type in types:
+            frame = self.ingestion.rollups(sensor_type, "1h")
+            pivots[sensor_type] = frame.pivot(index="site", columns="timestamp", values="mean")
+        demand = pivots["power_consumption"]
+        history = None
+        if not demand.empty:
+            history = (
+                list(demand.index),
+                pivots["temperature"].reindex(index=demand.index, columns=demand.columns).to_numpy(dtype=float),
+                pivots["humidity"].reindex(index=demand.index, columns=demand.columns).to_numpy(dtype=float),
+                demand.to_numpy(dtype=float)
+            )
+        self._demand_history_version, self._demand_history = version, history
+        return history
+    
     async def get_sensor_alerts(self, sensor_type: Optional[SensorType] = None) -> List[Dict[str, Any]]:
         """Get active sensor alerts"""
         try:
@@ -397,35 +530,29 @@ class IoTIntegrationService:
     async def _fetch_weather_data(self, lat: float, lon: float) -> Dict[str, Any]:
         """Fetch weather data from OpenWeatherMap API"""
         try:
-            async with aiohttp.ClientSession() as session:
-                url = f"{self.openweather_base_url}/weather"
-                params = {
-                    "lat": lat,
-                    "lon": lon,
-                    "appid": self.openweather_api_key,
-                    "units": "metric"
-                }
-                
-                async with session.get(url, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        
-                        weather_data = {
-                            "temperature": data["main"]["temp"],
-                            "humidity": data["main"]["humidity"],
-                            "pressure": data["main"]["pressure"],
-                            "wind_speed": data["wind"]["speed"],
-                            "wind_direction": data["wind"].get("deg", 0),
-                            "description": data["weather"][0]["description"],
-                            "icon": data["weather"][0]["icon"],
-                            "coordinates": {"lat": lat, "lon": lon},
-                            "timestamp": datetime.now().isoformat(),
-                            "data_source": "openweathermap"
-                        }
-                        
-                        return weather_data
-                    else:
-                        raise Exception(f"Weather API returned status {response.status}")
+            params = {
+                "lat": lat,
+                "lon": lon,
+                "appid": self.openweather_api_key,
+                "units": "metric"
+            }
+            data = await self.fetcher.get_json(f"{self.openweather_base_url}/weather", params)
+            
+            weather_data = {
+                "temperature": data["main"]["temp"],
+                "humidity": data["main"]["humidity"],
+                "pressure": data["main"]["pressure"],
+                "wind_speed": data["wind"]["speed"],
+                "wind_direction": data["wind"].get("deg", 0),
+                "description": data["weather"][0]["description"],
+                "icon": data["weather"][0]["icon"],
+                "coordinates": {"lat": lat, "lon": lon},
+                "timestamp": datetime.now().isoformat(),
+                "data_source": "openweathermap"
+            }
+            
+            logger.info(f"Weather data fetched for coordinates ({lat}, {lon})")
+            return weather_data
                         
         except Exception as e:
             logger.error(f"Error fetching weather data: {e}")
@@ -461,14 +588,6 @@ class IoTIntegrationService:
             logger.error(f"Error fetching solar data: {e}")
             raise
     
-    def _is_cache_valid(self, cache_key: str) -> bool:
-        """Check if cached data is still valid"""
-        if cache_key not in self.last_update:
-            return False
-        
-        time_diff = datetime.now() - self.last_update[cache_key]
-        return time_diff.total_seconds() < self.cache_duration
-    
     def _get_fallback_grid_data(self, location: str) -> Dict[str, Any]:
         """Get fallback grid data when API fails"""
         return {
@@ -535,9 +654,12 @@ class IoTIntegrationService:
         return {
             "openweather_configured": bool(self.openweather_api_key),
             "grid_api_configured": bool(self.grid_api_key),
-            "cache_size": len(self.sensor_data_cache),
+            "cache_size": len(self.fetcher.cache),
             "cache_duration_seconds": self.cache_duration,
-            "last_update": {k: v.isoformat() for k, v in self.last_update.items()},
+            "geo_bucket_degrees": self.geo_resolution,
+            "fetch": self.fetcher.get_stats(),
+            "ingestion": self.ingestion.get_stats(),
+            "demand_model": self.demand_model.get_status(),
             "supported_sensors": [sensor.value for sensor in SensorType],
             "timestamp": datetime.now().isoformat()
         }
@@ -0,0 +1,67 @@
+"""
+IoT Stub Server
+Local stand-in for the OpenWeatherMap current weather API, for offline development and tests
+
+Run ``python iot_stub_server.py --port 8089`` and set
+``OPENWEATHER_BASE_URL=http://localhost:8089/data/2.5`` (any API key works).
+"""
+
+import argparse
+import asyncio
+import math
+from typing import Any, Dict
+
+from aiohttp import web
+
+
+# Request counters: calls per (lat, lon) and the most requests served concurrently
+STATS = web.AppKey("stats", dict)
+
+
+def create_stub_app(delay: float = 0.0) -> web.Application:
+    """Application serving ``/data/2.5/weather``, counting requests in ``app[STATS]``"""
+    app = web.Application()
+    stats = {"requests": {}, "active": 0, "max_active": 0}
+    app[STATS] = stats
+
+    async def weather(request: web.Request) -> web.Response:
+        try:
+            lat, lon = float(request.query["lat"]), float(request.query["lon"])
+        except (KeyError, ValueError):
+            return web.json_response({"cod": 400, "message": "lat and lon required"}, status=400)
+        if not request.query.get("appid"):
+            return web.json_response({"cod": 401, "message": "Invalid API key"}, status=401)
+
+        key = (lat, lon)
+        stats["requests"][key] = stats["requests"].get(key, 0) + 1
+        stats["active"] += 1
+        stats["max_active"] = max(stats["max_active"], stats["active"])
+        try:
+            if delay:
+                await asyncio.sleep(delay)
+        finally:
+            stats["active"] -= 1
+
+        # Deterministic values that vary smoothly with location
+        body: Dict[str, Any] = {
+            "coord": {"lat": lat, "lon": lon},
+            "main": {
+                "temp": round(25 - abs(lat) * 0.4 + math.sin(math.radians(lon)) * 3, 2),
+                "humidity": int(50 + 30 * math.cos(math.radians(lat))),
+                "pressure": 1013
+            },
+            "wind": {"speed": round(3 + abs(math.sin(math.radians(lat + lon))) * 7, 2), "deg": int(lon) % 360},
+            "weather": [{"description": "clear sky", "icon": "01d"}]
+        }
+        return web.json_response(body)
+
+    app.router.add_get("/data/2.5/weather", weather)
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds to wait before each response")
+    args = parser.parse_args()
+    web.run_app(create_stub_app(args.delay), port=args.port)
@@ -0,0 +1,415 @@
+"""
+Sensor Ingestion
+Columnar per-sensor-type ring buffers with vectorized validation and incremental 1s/1m/1h rollups
+"""
+
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+import structlog
+
+logger = structlog.get_logger()
+
+NANOS = 1_000_000_000
+# Rollup bucket widths in nanoseconds
+RESOLUTIONS = {"1s": NANOS, "1m": 60 * NANOS, "1h": 3600 * NANOS}
+
+READING_DTYPES = {"timestamp": np.int64, "site": np.int32, "value": np.float32}
+ROLLUP_DTYPES = {
+    "site": np.int32,
+    "timestamp": np.int64,
+    "count": np.int64,
+    "sum": np.float64,
+    "min": np.float32,
+    "max": np.float32,
+}
+
+
+def _nanos(timestamp: Any) -> int:
+    """Epoch nanoseconds of one timestamp (naive values are taken as UTC)"""
+    return pd.Timestamp(timestamp).value
+
+
+class ColumnRing:
+    """Fixed-capacity ring of equal-length NumPy columns; the oldest rows are overwritten"""
+
+    def __init__(self, capacity: int, dtypes: Dict[str, Any]):
+        self.capacity = capacity
+        self.columns = {name: np.zeros(capacity, dtype=dtype) for name, dtype in dtypes.items()}
+        self.count = 0  # rows ever appended
+
+    def __len__(self) -> int:
+        return min(self.count, self.capacity)
+
+    def append(self, **values: np.ndarray) -> None:
+        n = len(values["timestamp"])
+        if n == 0:
+            return
+        if n > self.capacity:
+            # Only the newest rows would survive anyway
+            self.count += n - self.capacity
+            values = {name: column[-self.capacity:] for name, column in values.items()}
+            n = self.capacity
+
+        start = self.count % self.capacity
+        head = min(n, self.capacity - start)
+        for name, column in self.columns.items():
+            column[start:start + head] = values[name][:head]
+            if head < n:
+                column[:n - head] = values[name][head:]
+        self.count += n
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """Copies of the buffered rows, oldest first"""
+        size = len(self)
+        start = (self.count - size) % self.capacity
+        if start + size <= self.capacity:
+            return {name: column[start:start + size].copy() for name, column in self.columns.items()}
+        return {name: np.concatenate((column[start:], column[:start + size - self.capacity])) for name, column in self.columns.items()}
+
+
+class Rollup:
+    """Count/sum/min/max per site and time bucket, maintained incrementally
+
+    Each site has one open bucket (its latest). A batch merges into it or
+    closes it; closed buckets go to a ring and are never revisited, so
+    readings older than a site's open bucket are counted as ``late`` and
+    left out of the rollup (they are still in the raw buffer).
+    """
+
+    def __init__(self, resolution: int, capacity: int, sites: int):
+        self.resolution = resolution
+        self.closed = ColumnRing(capacity, ROLLUP_DTYPES)
+        self.open_bucket = np.full(sites, -1, dtype=np.int64)
+        self.open_count = np.zeros(sites, dtype=np.int64)
+        self.open_sum = np.zeros(sites)
+        self.open_min = np.zeros(sites, dtype=np.float32)
+        self.open_max = np.zeros(sites, dtype=np.float32)
+        self.late = 0
+
+    def grow(self, sites: int) -> None:
+        extra = sites - len(self.open_bucket)
+        if extra > 0:
+            self.open_bucket = np.concatenate((self.open_bucket, np.full(extra, -1, dtype=np.int64)))
+            for name in ("open_count", "open_sum", "open_min", "open_max"):
+                current = getattr(self, name)
+                setattr(self, name, np.concatenate((current, np.zeros(extra, dtype=current.dtype))))
+
+    def update(self, sites: np.ndarray, timestamps: np.ndarray, values: np.ndarray) -> None:
+        """Fold a batch sorted by (site, timestamp) into the rollup"""
+        buckets = timestamps // self.resolution
+        change = np.empty(len(sites), dtype=bool)
+        change[0] = True
+        change[1:] = (sites[1:] != sites[:-1]) | (buckets[1:] != buckets[:-1])
+        starts = np.flatnonzero(change)
+
+        group_site = sites[starts]
+        group_bucket = buckets[starts]
+        group_count = np.diff(np.append(starts, len(sites)))
+        group_sum = np.add.reduceat(values.astype(np.float64), starts)
+        group_min = np.minimum.reduceat(values, starts)
+        group_max = np.maximum.reduceat(values, starts)
+
+        current = group_bucket >= self.open_bucket[group_site]
+        if not current.all():
+            self.late += int(group_count[~current].sum())
+            group_site, group_bucket, group_count = group_site[current], group_bucket[current], group_count[current]
+            group_sum, group_min, group_max = group_sum[current], group_min[current], group_max[current]
+            if len(group_site) == 0:
+                return
+
+        first = np.empty(len(group_site), dtype=bool)
+        first[0] = True
+        first[1:] = group_site[1:] != group_site[:-1]
+        last = np.append(first[1:], True)
+        open_bucket = self.open_bucket[group_site]
+
+        # The batch's first bucket of a site continues its open bucket or closes it
+        merge = first & (group_bucket == open_bucket)
+        site = group_site[merge]
+        group_count[merge] += self.open_count[site]
+        group_sum[merge] += self.open_sum[site]
+        group_min[merge] = np.minimum(group_min[merge], self.open_min[site])
+        group_max[merge] = np.maximum(group_max[merge], self.open_max[site])
+
+        superseded = group_site[first & (group_bucket > open_bucket) & (open_bucket >= 0)]
+        self.closed.append(
+            site=superseded,
+            timestamp=self.open_bucket[superseded] * self.resolution,
+            count=self.open_count[superseded],
+            sum=self.open_sum[superseded],
+            min=self.open_min[superseded],
+            max=self.open_max[superseded]
+        )
+        done = ~last
+        self.closed.append(
+            site=group_site[done],
+            timestamp=group_bucket[done] * self.resolution,
+            count=group_count[done],
+            sum=group_sum[done],
+            min=group_min[done],
+            max=group_max[done]
+        )
+
+        site = group_site[last]
+        self.open_bucket[site] = group_bucket[last]
+        self.open_count[site] = group_count[last]
+        self.open_sum[site] = group_sum[last]
+        self.open_min[site] = group_min[last]
+        self.open_max[site] = group_max[last]
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """Closed buckets followed by the open ones"""
+        closed = self.closed.to_arrays()
+        site = np.flatnonzero(self.open_count > 0).astype(np.int32)
+        open_rows = {
+            "site": site,
+            "timestamp": self.open_bucket[site] * self.resolution,
+            "count": self.open_count[site],
+            "sum": self.open_sum[site],
+            "min": self.open_min[site],
+            "max": self.open_max[site],
+        }
+        return {name: np.concatenate((closed[name], open_rows[name])) for name in ROLLUP_DTYPES}
+
+
+class SensorSeries:
+    """Buffers, rollups and latest reading per site for one sensor type"""
+
+    def __init__(self, capacity: int, rollup_capacity: int, sites: int):
+        self.readings = ColumnRing(capacity, READING_DTYPES)
+        self.rollups = {name: Rollup(resolution, rollup_capacity, sites) for name, resolution in RESOLUTIONS.items()}
+        self.last_timestamp = np.full(sites, -1, dtype=np.int64)
+        self.last_value = np.zeros(sites, dtype=np.float32)
+        self.accepted = 0
+        self.rejected = 0
+
+    def grow(self, sites: int) -> None:
+        extra = sites - len(self.last_timestamp)
+        if extra > 0:
+            self.last_timestamp = np.concatenate((self.last_timestamp, np.full(extra, -1, dtype=np.int64)))
+            self.last_value = np.concatenate((self.last_value, np.zeros(extra, dtype=np.float32)))
+        for rollup in self.rollups.values():
+            rollup.grow(sites)
+
+
+class SensorIngestion:
+    """High-rate ingestion of sensor readings into per-type columnar buffers
+
+    ``ingest`` takes one sensor type's readings as columns (site names or
+    codes, values, timestamps): readings outside the type's configured
+    range are dropped, the rest are appended to a ring of int64
+    timestamps, int32 site codes and float32 values, folded into the
+    1s/1m/1h rollups and recorded as each site's latest reading, all with
+    a handful of NumPy calls per batch. Producers with one reading at a
+    time (MQTT callbacks) use ``submit``, which buffers until
+    ``batch_size`` readings are pending; readers flush first.
+    """
+
+    def __init__(
+        self,
+        sensor_configs: Dict[str, Dict[str, Any]],
+        capacity: Optional[int] = None,
+        rollup_capacity: Optional[int] = None,
+        batch_size: Optional[int] = None
+    ):
+        self.sensor_configs = sensor_configs
+        self.capacity = capacity or int(os.getenv("SENSOR_BUFFER_CAPACITY", "262144"))
+        self.rollup_capacity = rollup_capacity or int(os.getenv("SENSOR_ROLLUP_CAPACITY", "65536"))
+        self.batch_size = batch_size or int(os.getenv("SENSOR_INGEST_BATCH_SIZE", "10000"))
+        self.series: Dict[str, SensorSeries] = {}
+        self.site_codes: Dict[str, int] = {}
+        self.site_names: List[str] = []
+        self._pending: Dict[str, List[tuple]] = {}
+        self._pending_count = 0
+        self._lock = threading.RLock()
+
+    def _site_codes(self, sites: Any) -> np.ndarray:
+        """Site names (or codes already issued) as int32 codes, registering new names"""
+        sites = np.asarray(sites)
+        if np.issubdtype(sites.dtype, np.integer):
+            if len(sites) and (sites.min() < 0 or sites.max() >= len(self.site_names)):
+                raise ValueError("Site codes must be ones already issued for site names")
+            return sites.astype(np.int32, copy=False)
+        codes, names = pd.factorize(sites)
+        mapping = np.empty(len(names), dtype=np.int32)
+        for index, name in enumerate(names):
+            code = self.site_codes.get(name)
+            if code is None:
+                code = self.site_codes[name] = len(self.site_names)
+                self.site_names.append(name)
+            mapping[index] = code
+        return mapping[codes]
+
+    @staticmethod
+    def _timestamps(timestamps: Any, n: int) -> np.ndarray:
+        """Epoch nanoseconds; None stamps the batch with the current time"""
+        if timestamps is None:
+            return np.full(n, time.time_ns(), dtype=np.int64)
+        timestamps = np.asarray(timestamps)
+        if np.issubdtype(timestamps.dtype, np.integer):
+            return timestamps.astype(np.int64, copy=False)
+        return pd.to_datetime(timestamps, utc=True).as_unit("ns").asi8
+
+    def _get_series(self, sensor_type: str) -> SensorSeries:
+        series = self.series.get(sensor_type)
+        if series is None:
+            if sensor_type not in self.sensor_configs:
+                raise ValueError(f"Unknown sensor type: {sensor_type}")
+            series = self.series[sensor_type] = SensorSeries(
+                self.capacity, self.rollup_capacity, max(len(self.site_names), 64)
+            )
+        return series
+
+    def ingest(self, sensor_type: str, sites: Any, values: Any, timestamps: Any = None) -> Dict[str, int]:
+        """Validate and store one sensor type's readings; returns accepted and rejected counts"""
+        values = np.asarray(values, dtype=np.float32)
+        with self._lock:
+            series = self._get_series(sensor_type)
+            codes = self._site_codes(sites)
+            timestamps = self._timestamps(timestamps, len(values))
+            if not len(codes) == len(values) == len(timestamps):
+                raise ValueError("sites, values and timestamps must have the same length")
+
+            config = self.sensor_configs[sensor_type]
+            valid = np.isfinite(values) & (values >= config["min_value"]) & (values <= config["max_value"])
+            rejected = len(values) - int(np.count_nonzero(valid))
+            if rejected:
+                codes, values, timestamps = codes[valid], values[valid], timestamps[valid]
+            series.rejected += rejected
+            if len(values) == 0:
+                return {"accepted": 0, "rejected": rejected}
+
+            if len(self.site_names) > len(series.last_timestamp):
+                series.grow(max(len(self.site_names), 2 * len(series.last_timestamp)))
+            series.readings.append(timestamp=timestamps, site=codes, value=values)
+            series.accepted += len(values)
+
+            # One sort serves every rollup and the latest-reading update
+            order = np.lexsort((timestamps, codes))
+            codes, timestamps, values = codes[order], timestamps[order], values[order]
+            for rollup in series.rollups.values():
+                rollup.update(codes, timestamps, values)
+
+            ends = np.append(np.flatnonzero(codes[1:] != codes[:-1]), len(codes) - 1)
+            newer = timestamps[ends] >= series.last_timestamp[codes[ends]]
+            site = codes[ends][newer]
+            series.last_timestamp[site] = timestamps[ends][newer]
+            series.last_value[site] = values[ends][newer]
+            return {"accepted": len(values), "rejected": rejected}
+
+    def ingest_records(self, records: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+        """Ingest per-message dicts (``sensor_type``, ``site``, ``value``, optional ``timestamp``)
+
+        Records are grouped into one columnar batch per sensor type; records
+        of unknown types count as rejected.
+        """
+        frame = pd.DataFrame.from_records(records, columns=["sensor_type", "site", "value", "timestamp"])
+        result = {"accepted": 0, "rejected": 0}
+        for sensor_type, group in frame.groupby("sensor_type", sort=False):
+            if sensor_type not in self.sensor_configs:
+                result["rejected"] += len(group)
+                continue
+            timestamps = pd.to_datetime(group["timestamp"], utc=True, format="mixed").fillna(pd.Timestamp.now(tz="UTC"))
+            counts = self.ingest(
+                sensor_type,
+                group["site"].astype(str).to_numpy(),
+                pd.to_numeric(group["value"], errors="coerce").to_numpy(dtype=float),
+                timestamps.dt.as_unit("ns").astype("int64").to_numpy()
+            )
+            result["accepted"] += counts["accepted"]
+            result["rejected"] += counts["rejected"]
+        return result
+
+    def submit(self, sensor_type: str, site: str, value: float, timestamp: Any = None) -> None:
+        """Queue one reading; the pending batch is ingested once ``batch_size`` readings are waiting"""
+        with self._lock:
+            self._pending.setdefault(sensor_type, []).append((site, value, time.time_ns() if timestamp is None else _nanos(timestamp)))
+            self._pending_count += 1
+            if self._pending_count >= self.batch_size:
+                self.flush()
+
+    def flush(self) -> Dict[str, int]:
+        """Ingest all readings queued by ``submit``"""
+        result = {"accepted": 0, "rejected": 0}
+        with self._lock:
+            pending, self._pending, self._pending_count = self._pending, {}, 0
+            for sensor_type, readings in pending.items():
+                sites, values, timestamps = zip(*readings)
+                # Malformed payload values become NaN and are rejected one by one by the range check
+                values = pd.to_numeric(pd.Series(values, dtype=object), errors="coerce").to_numpy(dtype=float)
+                try:
+                    counts = self.ingest(sensor_type, list(sites), values, np.array(timestamps, dtype=np.int64))
+                except ValueError as e:
+                    logger.warning(f"Dropping {len(readings)} queued {sensor_type} readings: {e}")
+                    counts = {"accepted": 0, "rejected": len(readings)}
+                result["accepted"] += counts["accepted"]
+                result["rejected"] += counts["rejected"]
+        return result
+
+    def latest(self, sensor_type: str, site: str) -> Optional[Dict[str, Any]]:
+        """Most recent reading of a sensor type at a site, or None"""
+        with self._lock:
+            self.flush()
+            series = self.series.get(sensor_type)
+            code = self.site_codes.get(site)
+            if series is None or code is None or code >= len(series.last_timestamp) or series.last_timestamp[code] < 0:
+                return None
+            return {
+                "value": float(series.last_value[code]),
+                "timestamp": pd.Timestamp(int(series.last_timestamp[code]), tz="UTC"),
+                "unit": self.sensor_configs[sensor_type]["unit"]
+            }
+
+    def readings(self, sensor_type: str, site: Optional[str] = None, since: Any = None) -> pd.DataFrame:
+        """Buffered raw readings, oldest first"""
+        with self._lock:
+            self.flush()
+            series = self.series.get(sensor_type)
+            arrays = series.readings.to_arrays() if series is not None else {name: np.zeros(0, dtype) for name, dtype in READING_DTYPES.items()}
+        return self._frame(arrays, site, since)
+
+    def rollups(self, sensor_type: str, resolution: str = "1m", site: Optional[str] = None, since: Any = None) -> pd.DataFrame:
+        """Rollup rows (site, timestamp, count, mean, min, max) ordered by site and time"""
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Unknown resolution: {resolution}")
+        with self._lock:
+            self.flush()
+            series = self.series.get(sensor_type)
+            arrays = series.rollups[resolution].to_arrays() if series is not None else {name: np.zeros(0, dtype) for name, dtype in ROLLUP_DTYPES.items()}
+        frame = self._frame(arrays, site, since)
+        frame["mean"] = frame.pop("sum") / frame["count"]
+        return frame.sort_values(["site", "timestamp"], kind="stable").reset_index(drop=True)
+
+    def _frame(self, arrays: Dict[str, np.ndarray], site: Optional[str], since: Any) -> pd.DataFrame:
+        keep = np.ones(len(arrays["timestamp"]), dtype=bool)
+        if site is not None:
+            keep &= arrays["site"] == self.site_codes.get(site, -1)
+        if since is not None:
+            keep &= arrays["timestamp"] >= _nanos(since)
+        columns = {name: column[keep] for name, column in arrays.items()}
+        names = np.asarray(self.site_names + [""], dtype=object)
+        columns["site"] = names[columns["site"]]
+        columns["timestamp"] = pd.to_datetime(columns["timestamp"], unit="ns", utc=True)
+        return pd.DataFrame(columns)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "sites": len(self.site_names),
+                "pending": self._pending_count,
+                "capacity": self.capacity,
+                "types": {
+                    sensor_type: {
+                        "accepted": series.accepted,
+                        "rejected": series.rejected,
+                        "buffered": len(series.readings),
+                        "late": {name: rollup.late for name, rollup in series.rollups.items()}
+                    }
+                    for sensor_type, series in self.series.items()
+                }
+            }